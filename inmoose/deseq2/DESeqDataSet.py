@@ -30,6 +30,7 @@ from scipy.stats import median_abs_deviation as mad
 from scipy.stats import norm
 
 from ..utils import LOGGER, Factor, rnbinom
+from .compiledDesign import CompiledDesign
 from .misc import buildVectorWithNACols, checkFullRank, cleanCategoricalColumnName
 
 
@@ -145,16 +146,28 @@ class DESeqDataSet(AnnData):
             self.modelMatrix = None
             self.modelMatrixType = None
             self.weightsOK = None
+            self.computeDtype = np.dtype("float64")
 
     def copy(self):
         """deep copy of self"""
         res = __class__(super().copy())
         res.design = self.design
+        res.computeDtype = self.computeDtype
         for k, v in self.__dict__.items():
             if k not in res.__dict__:
                 res.__dict__[k] = v
         return res
 
+    def save(self, path):
+        """
+        save the dataset, including its fitted model, to a directory
+
+        See :func:`.writeDESeqDataSet` and :func:`.readDESeqDataSet`.
+        """
+        from .serialize import writeDESeqDataSet
+
+        writeDESeqDataSet(self, path)
+
     @property
     def design(self):
         """design matrix"""
@@ -185,6 +198,18 @@ class DESeqDataSet(AnnData):
 
         self.obsm["design"] = design
 
+    @property
+    def compiledDesign(self):
+        """
+        quantities derived from the design, computed once and shared by the
+        gene-wise subsets of the dataset (see :class:`.CompiledDesign`)
+        """
+        cd = self.__dict__.get("_compiledDesign")
+        if cd is None or cd.design is not self.design:
+            cd = CompiledDesign(self.design, self.obs)
+            self._compiledDesign = cd
+        return cd
+
     @property
     def dispersions(self):
         """
@@ -371,12 +396,19 @@ class DESeqDataSet(AnnData):
 
     def __getitem__(self, index):
         res = self.__class__(super().__getitem__(index).copy())
-        # make sure the design is valid
-        res.design = self.design.design_info
+        if res.n_obs == self.n_obs and np.all(res.obs_names == self.obs_names):
+            # the samples are unchanged: share the design and its derived
+            # quantities
+            res.obsm["design"] = self.design
+            res._compiledDesign = self.compiledDesign
+        else:
+            # make sure the design is valid
+            res.design = self.design.design_info
         # set the attributes already set in __init__
         res.modelMatrix = self.modelMatrix
         res.modelMatrixType = self.modelMatrixType
         res.weightsOK = self.weightsOK
+        res.computeDtype = self.computeDtype
         # other attributes
         for k, v in self.__dict__.items():
             if k not in res.__dict__:
@@ -458,7 +490,7 @@ class DESeqDataSet(AnnData):
             )
 
         if not betaPrior:
-            if np.linalg.matrix_rank(self.design) < self.design.shape[1]:
+            if self.compiledDesign.rank() < self.design.shape[1]:
                 raise ValueError("full model matrix is not full rank")
 
     def getBaseMeansAndVariances(self):
@@ -519,23 +551,7 @@ class DESeqDataSet(AnnData):
         return self
 
     def makeExpandedModelMatrix(self):
-        data = self.obs.apply(
-            lambda col: (
-                Factor(col)
-                .add_categories(["__null__"])
-                .reorder_categories(col.dtype.categories.insert(0, "__null__"))
-                if isinstance(col.dtype, pd.CategoricalDtype)
-                else col
-            )
-        )
-        # formula = "+".join([f"C({t.name()}, Treatment(reference='__null__'))"
-        formula = "+".join(
-            [
-                f"{t.name()}" if len(t.factors) != 0 else "1"
-                for t in self.design.design_info.terms
-            ]
-        )
-        return patsy.dmatrix(formula, data=data)
+        return self.compiledDesign.expandedModelMatrix
 
     def getDesignFactors(self):
         return [
@@ -548,22 +564,24 @@ class DESeqDataSet(AnnData):
         """add all first order contrasts"""
         designFactors = self.getDesignFactors()
         coldata = self.obs
+        contrasts = [betaMatrix]
         for f in designFactors:
             lvls = coldata[f].dtype.categories
             mmColnames = [f"{f}[T.{c}]" for c in lvls]
             M = betaMatrix.filter(mmColnames)
             n = M.shape[1]
             if n > 1:
-                ii = [f"{c}" for k in range(1, n) for c in M.columns[k:]]
-                jj = [f"{c}" for k, c in enumerate(M.columns) for _ in range(n - k - 1)]
-                contrastCols = pd.DataFrame(
-                    {
-                        f"{f}Cntrst{k}": M[i] - M[j]
-                        for k, (i, j) in enumerate(zip(ii, jj))
-                    }
+                # all pairs (i, j) with j < i, ordered by j then by i
+                jj, ii = np.triu_indices(n, k=1)
+                M = M.values
+                contrasts.append(
+                    pd.DataFrame(
+                        M[:, ii] - M[:, jj],
+                        index=betaMatrix.index,
+                        columns=[f"{f}Cntrst{k}" for k in range(len(ii))],
+                    )
                 )
-                betaMatrix = pd.concat([betaMatrix, contrastCols], axis=1)
-        return betaMatrix
+        return pd.concat(contrasts, axis=1)
 
     def averagePriorsOverLevels(self, betaPriorVar):
         expandedModelMatrix = self.makeExpandedModelMatrix()
@@ -47,7 +47,7 @@ def wtd_quantile(
         else:
             return np.quantile(x, q=probs)
 
-    i = np.isnan(weights) | weights == 0
+    i = np.isnan(weights) | (weights == 0)
     if np.any(i):
         x = x[~i]
         weights = weights[~i]
@@ -73,6 +73,65 @@ def wtd_quantile(
     return quantiles
 
 
+def wtd_quantile_cols(x, weights, prob, normwt=False):
+    """
+    compute a weighted quantile of each column of a matrix
+
+    This is a vectorized version of :func:`wtd_quantile` for a single
+    probability, applied to every column of :code:`x` with the same
+    row-wise weights. All columns are sorted at once, and NaN entries of
+    :code:`x` are left out of the computation of their column, as would be
+    done by subsetting each column before calling :func:`wtd_quantile`.
+
+    Arguments
+    ---------
+    x : ndarray
+        matrix of values, one quantile is computed per column
+    weights : array-like
+        weights of the rows of :code:`x`
+    prob : float
+        probability of the quantile
+    normwt : bool
+        whether to normalize the weights of each column to sum to the number of
+        values in the column
+
+    Returns
+    -------
+    ndarray
+        the weighted quantile of each column, NaN for columns without values
+    """
+    if prob < 0 or prob > 1:
+        raise ValueError("Probabilities must be between 0 and 1 inclusive")
+
+    x = np.asarray(x, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    use = ~np.isnan(x) & ~np.isnan(weights)[:, None] & (weights != 0)[:, None]
+    wts = np.where(use, weights[:, None], 0.0)
+    cnt = np.sum(use, 0)
+    if normwt:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            wts = wts * (cnt / np.sum(wts, 0))
+
+    # unused values are sorted last, with a null weight
+    order = np.argsort(np.where(use, x, np.inf), axis=0, kind="stable")
+    xs = np.take_along_axis(x, order, 0)
+    cumw = np.cumsum(np.take_along_axis(wts, order, 0), 0)
+
+    n = cumw[-1]
+    pos = 1 + (n - 1) * prob
+    low = np.maximum(np.floor(pos), 1)
+    high = np.minimum(low + 1, n)
+    pos = pos % 1
+    # the low and high order statistics are the minimum values of x such that
+    # the cumulative frequencies are >= (low, high)
+    last = np.maximum(cnt - 1, 0)
+    qlow = xs[np.minimum(np.sum(cumw < low, 0), last), np.arange(x.shape[1])]
+    qhigh = xs[np.minimum(np.sum(cumw < high, 0), last), np.arange(x.shape[1])]
+    res = (1 - pos) * qlow + pos * qhigh
+    res[cnt == 0] = np.nan
+    return res
+
+
 def wtd_table(x, weights=None, normwt=False, na_rm=True):
     if weights is None:
         weights = np.ones(len(x))
@@ -22,5 +22,10 @@ from .outliers import replaceOutliers as replaceOutliers
 from .parallel import estimateMLEForBetaPriorVar as estimateMLEForBetaPriorVar
 from .prior import estimateBetaPriorVar as estimateBetaPriorVar
 from .replicates import collapseReplicates as collapseReplicates
+from .serialize import readDESeqDataSet as readDESeqDataSet
+from .serialize import writeDESeqDataSet as writeDESeqDataSet
+from .vst import iterNormalizedCounts as iterNormalizedCounts
+from .vst import iterVarianceStabilizedData as iterVarianceStabilizedData
 from .vst import varianceStabilizingTransformation as varianceStabilizingTransformation
+from .vst import writeVarianceStabilizedData as writeVarianceStabilizedData
 from .wald import nbinomWaldTest as nbinomWaldTest
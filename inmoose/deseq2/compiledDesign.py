@@ -0,0 +1,162 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import patsy
+
+from ..utils import Factor
+from .misc import renameModelMatrixColumns
+
+
+class CompiledDesign:
+    """
+    Cache of the quantities derived from the design of a :class:`DESeqDataSet`
+
+    The DESeq2 pipeline repeatedly needs the same information about a model
+    matrix: the descriptive column names, the replicate cells (samples
+    sharing the same row of the model matrix), its rank and QR decomposition,
+    and the expanded model matrix used with a beta prior.  This class
+    computes each of them at most once per model matrix.
+
+    A :class:`CompiledDesign` is bound to one design matrix and is shared by
+    all the gene-wise subsets of a dataset (which share their samples).  It
+    is accessed through :attr:`DESeqDataSet.compiledDesign`, and rebuilt
+    whenever the design of the dataset is replaced.
+
+    Quantities derived from model matrices other than the design (*e.g.* a
+    user-supplied model matrix) are cached as well, for a bounded number of
+    matrices.  Model matrices are identified by object identity, and are
+    assumed not to be modified in place.
+    """
+
+    # maximum number of model matrices for which derived quantities are kept
+    maxCachedMatrices = 8
+
+    def __init__(self, design, obs):
+        """
+        Arguments
+        ---------
+        design : patsy.DesignMatrix
+            the design matrix of the dataset
+        obs : pandas.DataFrame
+            the sample data the design matrix was built from
+        """
+        self.design = design
+        self.obs = obs
+        self._expandedModelMatrix = None
+        self._matrices = OrderedDict()
+
+    def _entry(self, modelMatrix):
+        """return the cache entry of a model matrix (the design by default)"""
+        if modelMatrix is None:
+            modelMatrix = self.design
+        key = id(modelMatrix)
+        entry = self._matrices.get(key)
+        # a reference to the matrix is kept in the cache, so that its id is
+        # not reused while the entry is alive
+        if entry is None or entry[0] is not modelMatrix:
+            entry = (modelMatrix, {})
+            self._matrices[key] = entry
+            while len(self._matrices) > self.maxCachedMatrices:
+                self._matrices.popitem(last=False)
+        else:
+            self._matrices.move_to_end(key)
+        return entry
+
+    def _get(self, modelMatrix, name, compute):
+        mm, cache = self._entry(modelMatrix)
+        if name not in cache:
+            cache[name] = compute(mm)
+        return cache[name]
+
+    @property
+    def expandedModelMatrix(self):
+        """the expanded model matrix, with one column per level of each factor"""
+        if self._expandedModelMatrix is None:
+            data = self.obs.apply(
+                lambda col: (
+                    Factor(col)
+                    .add_categories(["__null__"])
+                    .reorder_categories(col.dtype.categories.insert(0, "__null__"))
+                    if isinstance(col.dtype, pd.CategoricalDtype)
+                    else col
+                )
+            )
+            formula = "+".join(
+                [
+                    f"{t.name()}" if len(t.factors) != 0 else "1"
+                    for t in self.design.design_info.terms
+                ]
+            )
+            self._expandedModelMatrix = patsy.dmatrix(formula, data=data)
+        return self._expandedModelMatrix
+
+    def convertNames(self, modelMatrix=None):
+        """
+        mapping from the patsy column names of a model matrix to the
+        descriptive names used in the results (see
+        :func:`renameModelMatrixColumns`)
+        """
+        return self._get(
+            modelMatrix,
+            "convertNames",
+            lambda mm: renameModelMatrixColumns(self.obs, mm),
+        )
+
+    def cells(self, modelMatrix=None):
+        """
+        the replicate cells of a model matrix, as a :class:`Factor` with one
+        value per sample, samples with identical rows sharing the same level
+        """
+        return self._get(
+            modelMatrix,
+            "cells",
+            lambda mm: Factor([tuple(mm[i]) for i in range(mm.shape[0])]),
+        )
+
+    def nOrMoreInCell(self, n, modelMatrix=None):
+        """
+        for each sample in the model matrix, are there n or more replicates in
+        the same cell (including that sample)
+        """
+        cells = self.cells(modelMatrix)
+        return (cells.value_counts() >= n)[cells]
+
+    def rank(self, modelMatrix=None):
+        """the rank of a model matrix"""
+        return self._get(modelMatrix, "rank", np.linalg.matrix_rank)
+
+    def qr(self, modelMatrix=None):
+        """the (reduced) QR decomposition of a model matrix"""
+        return self._get(modelMatrix, "qr", lambda mm: np.linalg.qr(mm))
+
+    def linearModelFactors(self, modelMatrix=None):
+        """
+        the factors :code:`(x R^-1, Q^T)` of the projection on the column space
+        of a (full rank) model matrix :code:`x = QR`, as used by
+        :func:`linearModelMu`
+        """
+
+        def compute(mm):
+            Q, R = self.qr(mm)
+            Rinv = np.linalg.solve(R, np.identity(R.shape[0]))
+            return (np.asarray(mm) @ Rinv, Q.T)
+
+        return self._get(modelMatrix, "linearModelFactors", compute)
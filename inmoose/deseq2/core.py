@@ -28,7 +28,6 @@ import patsy
 from ..utils import LOGGER
 from .DESeqDataSet import DESeqDataSet, checkFullRank
 from .lrt import checkLRT, nbinomLRT
-from .misc import nOrMoreInCell
 from .outliers import refitWithoutOutliers
 from .wald import nbinomWaldTest
 
@@ -47,6 +46,7 @@ def DESeq(
     useT=False,
     minmu=None,
     parallel=False,
+    dtype="float64",
 ):
     """
     Differential expression analysis based on the Negative Binomial distribution.
@@ -179,6 +179,18 @@ def DESeq(
         recommended), otherwise defaults to 0.5
     parallel : bool
         unimplemented
+    dtype : str or numpy dtype, optional
+        either :code:`"float64"` (default) or :code:`"float32"`, the floating
+        point type of the genes × samples matrices computed during the
+        analysis: the layers :code:`"mu"`, :code:`"H"` and :code:`"cooks"`
+        stored in :code:`obj`, as well as the weights and design tensors of
+        the inner IRLS and dispersion fitting loops. Single precision halves
+        the memory footprint of these matrices, at the cost of accuracy.
+        Log-likelihoods, deviances, coefficients and their standard errors are
+        always accumulated in double precision. On typical datasets, log2 fold
+        changes computed in single precision agree with the double precision
+        ones within 0.05, and dispersions, standard errors and p-values within
+        a relative tolerance of 5%.
 
     Returns
     -------
@@ -227,6 +239,13 @@ def DESeq(
     if sfType not in ["ratio", "poscounts", "iterate"]:
         raise ValueError(f"invalid value for parameter 'sfType': {sfType}")
 
+    try:
+        validDtype = np.dtype(dtype) in (np.float64, np.float32)
+    except TypeError:
+        validDtype = False
+    if not validDtype:
+        raise ValueError(f"invalid value for parameter 'dtype': {dtype}")
+
     # more argument checking
     # TODO check that minReplicatesForReplace is numeric
 
@@ -298,6 +317,7 @@ def DESeq(
         modelMatrix = full
 
     obj.betaPrior = betaPrior
+    obj.computeDtype = np.dtype(dtype)
 
     if obj.normalizationFactors is not None:
         LOGGER.info("using pre-existing normalization factors")
@@ -361,7 +381,9 @@ def DESeq(
         # )
 
     # if there are sufficient replicates, then pass through to refitting function
-    sufficientReps = nOrMoreInCell(obj.modelMatrix, minReplicatesForReplace).any()
+    sufficientReps = obj.compiledDesign.nOrMoreInCell(
+        minReplicatesForReplace, obj.modelMatrix
+    ).any()
     if sufficientReps:
         obj = refitWithoutOutliers(
             obj,
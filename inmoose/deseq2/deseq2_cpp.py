@@ -47,6 +47,7 @@ def log_posterior(
     useWeights,
     weightThreshold,
     useCR,
+    dtype=np.float64,
 ):
     """
     This function returns the log posterior of dispersion parameter alpha, for
@@ -79,6 +80,9 @@ def log_posterior(
         minimal weight to consider in Cox-Reid regularization
     useCR : bool
         whether to use Cox-Reid regularization
+    dtype : numpy dtype
+        floating point type of the Cox-Reid design tensors. The likelihood
+        terms are always computed in double precision.
 
     Returns
     -------
@@ -104,10 +108,12 @@ def log_posterior(
 
     alpha = np.exp(log_alpha)
     if useCR:
-        x = x[None]
+        x = np.asarray(x, dtype=dtype)[None]
         # NB: now, x.shape == (1, N, P)
         mu_neg1 = 1.0 / mu
-        w_diag = 1.0 / (mu_neg1 + np.expand_dims(alpha, axis=-2))
+        w_diag = (1.0 / (mu_neg1 + np.expand_dims(alpha, axis=-2))).astype(
+            dtype, copy=False
+        )
         if useWeights:
             # cancel out all weights below the threshold
             idx = weights <= weightThreshold
@@ -184,6 +190,7 @@ def dlog_posterior(
     useWeights,
     weightThreshold,
     useCR,
+    dtype=np.float64,
 ):
     """
     This function returns the derivative of the log posterior with respect to
@@ -214,6 +221,9 @@ def dlog_posterior(
         minimal weight to consider in Cox-Reid regularization
     useCR : bool
         whether to use Cox-Reid regularization
+    dtype : numpy dtype
+        floating point type of the Cox-Reid design tensors. The likelihood
+        terms are always computed in double precision.
 
     Returns
     -------
@@ -239,11 +249,11 @@ def dlog_posterior(
 
     alpha = np.exp(log_alpha)
     if useCR:
-        x = x[None]
+        x = np.asarray(x, dtype=dtype)[None]
         # NB: now, x.shape == (1, N, P)
         mu_neg1 = 1.0 / mu
-        w_diag = 1.0 / (mu_neg1 + alpha[None])
-        dw_diag = -np.power(mu_neg1 + alpha[None], -2)
+        w_diag = (1.0 / (mu_neg1 + alpha[None])).astype(dtype, copy=False)
+        dw_diag = (-np.power(mu_neg1 + alpha[None], -2)).astype(dtype, copy=False)
         assert w_diag.shape == (N, M)
         assert dw_diag.shape == (N, M)
         # NB: w_diag.shape == dw_diag.shape == mu.shape == (N, M)
@@ -321,6 +331,7 @@ def d2log_posterior(
     useWeights,
     weightThreshold,
     useCR,
+    dtype=np.float64,
 ):
     """
     This function returns the second derivative of the log posterior with
@@ -351,6 +362,9 @@ def d2log_posterior(
         minimal weight to consider in Cox-Reid regularization
     useCR : bool
         whether to use Cox-Reid regularization
+    dtype : numpy dtype
+        floating point type of the Cox-Reid design tensors. The likelihood
+        terms are always computed in double precision.
 
     Returns
     -------
@@ -376,12 +390,12 @@ def d2log_posterior(
 
     alpha = np.exp(log_alpha)
     if useCR:
-        x = x[None]
+        x = np.asarray(x, dtype=dtype)[None]
         # NB: now, x.shape == (1, N, P)
         mu_neg1 = 1.0 / mu
-        w_diag = 1.0 / (mu_neg1 + alpha[None])
-        dw_diag = -1.0 * np.power(mu_neg1 + alpha[None], -2)
-        d2w_diag = 2.0 * np.power(mu_neg1 + alpha[None], -3)
+        w_diag = (1.0 / (mu_neg1 + alpha[None])).astype(dtype, copy=False)
+        dw_diag = (-1.0 * np.power(mu_neg1 + alpha[None], -2)).astype(dtype, copy=False)
+        d2w_diag = (2.0 * np.power(mu_neg1 + alpha[None], -3)).astype(dtype, copy=False)
         assert w_diag.shape == (N, M)
         assert dw_diag.shape == (N, M)
         assert d2w_diag.shape == (N, M)
@@ -481,6 +495,7 @@ def d2log_posterior(
             useWeights,
             weightThreshold,
             useCR,
+            dtype,
         )
     ) + prior_part
     return res
@@ -502,6 +517,7 @@ def fitDisp(
     useWeights,
     weightThreshold,
     useCR,
+    dtype=np.float64,
 ):
     """
     Fit dispersions for negative binomial GLMs.
@@ -544,6 +560,9 @@ def fitDisp(
         calculate the Cox-Reid correction
     useCR : bool
         whether to use the Cox-Reid correction
+    dtype : numpy dtype
+        floating point type of the Cox-Reid design tensors (see
+        :func:`log_posterior`)
 
     Returns
     -------
@@ -606,6 +625,7 @@ def fitDisp(
         useWeights,
         weightThreshold,
         useCR,
+        dtype,
     )
     dlp = dlog_posterior(
         a,
@@ -619,6 +639,7 @@ def fitDisp(
         useWeights,
         weightThreshold,
         useCR,
+        dtype,
     )
 
     kappa = np.repeat(kappa_0, y_n)
@@ -651,6 +672,7 @@ def fitDisp(
             useWeights,
             weightThreshold,
             useCR,
+            dtype,
         )
         theta_kappa = np.zeros(y_n)
         theta_kappa[idx] = -lpost
@@ -685,6 +707,7 @@ def fitDisp(
             useWeights,
             weightThreshold,
             useCR,
+            dtype,
         )
         # instead of resetting kappa to kappa_0
         # multiply kappa by 1.1
@@ -709,6 +732,7 @@ def fitDisp(
         useWeights,
         weightThreshold,
         useCR,
+        dtype,
     )
     log_alpha = a
     # last change indicates the change for the final iteration
@@ -736,7 +760,7 @@ def fitDispWrapper(**kwargs):
     fitDisp
     """
     for k, v in kwargs.items():
-        if np.any(np.isnan(v)):
+        if k != "dtype" and np.any(np.isnan(v)):
             raise ValueError(f"argument {k} of fitDisp contains a NaN value")
     return fitDisp(**kwargs)
 
@@ -753,6 +777,7 @@ def fitDispGrid(
     useWeights,
     weightThreshold,
     useCR,
+    dtype=np.float64,
 ):
     """
     Fit dispersions by evaluating over a grid
@@ -786,6 +811,9 @@ def fitDispGrid(
         calculate the Cox-Reid correction
     useCR : bool
         whether to use the Cox-Reid correction
+    dtype : numpy dtype
+        floating point type of the Cox-Reid design tensors (see
+        :func:`log_posterior`)
 
     Returns
     -------
@@ -808,6 +836,7 @@ def fitDispGrid(
         useWeights,
         weightThreshold,
         useCR,
+        dtype,
     )
     idxmax = np.argmax(logpostvec, axis=0)
     assert idxmax.shape == (y_n,)
@@ -826,6 +855,7 @@ def fitDispGrid(
         useWeights,
         weightThreshold,
         useCR,
+        dtype,
     )
     idxmax = np.argmax(logpostvec, axis=0)
     assert idxmax.shape == (y_n,)
@@ -853,7 +883,7 @@ def fitDispGridWrapper(**kwargs):
         the estimated dispersion parameters, on the natural scale. Shape N.
     """
     for k, v in kwargs.items():
-        if np.any(np.isnan(v)):
+        if k != "dtype" and np.any(np.isnan(v)):
             raise ValueError(f"argument {k} of fitDispGrid contains a NaN value")
 
     minLogAlpha = np.log(1e-8)
@@ -880,6 +910,7 @@ def fitBeta(
     maxit,
     useQR,
     minmu,
+    dtype=np.float64,
 ):
     """
     Fit beta coefficients for negative binomial GLMs
@@ -913,6 +944,12 @@ def fitBeta(
         maximum number of iterations
     useQR : bool
         whether to use QR decomposition
+    minmu : float
+        lower bound on the estimated count
+    dtype : numpy dtype
+        floating point type of the expected means, IRLS weights and design
+        tensors, and of the returned hat diagonals. Coefficients, their
+        variances and the deviance are always returned in double precision.
 
     Returns
     -------
@@ -943,15 +980,24 @@ def fitBeta(
     assert lambda_.ndim == 1
     assert lambda_.shape[0] == x.shape[1], f"{lambda_.shape}, {x.shape}"
 
+    # the IRLS tensors are computed in `dtype`, the counts are only used as is
+    # for the deviance
+    x = np.asarray(x, dtype=dtype)
+    nf = np.asarray(nf, dtype=dtype)
+    y_f = np.asarray(y, dtype=dtype)
+    alpha_f = alpha_hat.astype(dtype)
+    if useWeights:
+        weights = np.asarray(weights, dtype=dtype)
+
     beta_var_mat = np.zeros(beta_mat.shape)
     contrast_num = np.zeros(beta_mat.shape[0])
     contrast_denom = np.zeros(beta_mat.shape[0])
     # bound the estimated count, as weights include 1/mu
     large = 30.0
     iter_ = np.zeros(y_n)
-    ridge = np.diag(lambda_)
+    ridge = np.diag(lambda_).astype(dtype)
 
-    mu_hat = np.maximum(nf * np.exp(x @ beta_mat.T), minmu)
+    mu_hat = np.maximum(nf * np.exp(x @ beta_mat.T.astype(dtype)), minmu)
     assert mu_hat.shape == nf.shape
     dev = np.zeros(y_n)
     dev_old = np.zeros(y_n)
@@ -963,9 +1009,9 @@ def fitBeta(
 
         mu_hat_idx = mu_hat[:, idx]
         if useWeights:
-            w_vec = weights[:, idx] * mu_hat_idx / (1.0 + alpha_hat[idx] * mu_hat_idx)
+            w_vec = weights[:, idx] * mu_hat_idx / (1.0 + alpha_f[idx] * mu_hat_idx)
         else:
-            w_vec = mu_hat_idx / (1.0 + alpha_hat[idx] * mu_hat_idx)
+            w_vec = mu_hat_idx / (1.0 + alpha_f[idx] * mu_hat_idx)
         assert w_vec.shape == (y_m, idx_n)
         w_sqrt_vec = np.sqrt(w_vec)
 
@@ -981,20 +1027,26 @@ def fitBeta(
             assert weighted_x_ridge.shape == (idx_n, y_m + x_p, x_p)
             q, r = np.linalg.qr(weighted_x_ridge)
             assert q.shape[0] == r.shape[0] == idx_n
-            big_w_diag = np.ones((idx_n, y_m + x_p))
+            big_w_diag = np.ones((idx_n, y_m + x_p), dtype=dtype)
             big_w_diag[:, :y_m] = w_vec.T
-            z = np.log(mu_hat_idx / nf[:, idx]) + (y[:, idx] - mu_hat_idx) / mu_hat_idx
+            z = (
+                np.log(mu_hat_idx / nf[:, idx])
+                + (y_f[:, idx] - mu_hat_idx) / mu_hat_idx
+            )
             assert z.shape == (y_m, idx_n)
             w_diag = w_vec.copy()
             z_sqrt_w = z * np.sqrt(w_diag)
-            big_z_sqrt_w = np.zeros((idx_n, y_m + x_p))
+            big_z_sqrt_w = np.zeros((idx_n, y_m + x_p), dtype=dtype)
             big_z_sqrt_w[:, :y_m] = z_sqrt_w.T
             # IRLS with Q matrix for X
             gamma_hat = np.swapaxes(q, -1, -2) @ big_z_sqrt_w[:, :, None]
             beta_hat = np.linalg.solve(r, gamma_hat).squeeze(-1)
         else:
             # use the standard design matrix and matrix inversion
-            z = np.log(mu_hat_idx / nf[:, idx]) + (y[:, idx] - mu_hat_idx) / mu_hat_idx
+            z = (
+                np.log(mu_hat_idx / nf[:, idx])
+                + (y_f[:, idx] - mu_hat_idx) / mu_hat_idx
+            )
             assert (x.T @ (x * w_vec.T[:, :, None]) + ridge).shape == (idx_n, x_p, x_p)
             zwtx = (z * w_vec).T @ x
             assert (zwtx).shape == (idx_n, x_p)
@@ -1038,9 +1090,9 @@ def fitBeta(
 
     # recalculate w so that this is identical if we start with beta_hat
     if useWeights:
-        w_vec = weights * mu_hat / (1.0 + alpha_hat * mu_hat)
+        w_vec = weights * mu_hat / (1.0 + alpha_f * mu_hat)
     else:
-        w_vec = mu_hat / (1.0 + alpha_hat * mu_hat)
+        w_vec = mu_hat / (1.0 + alpha_f * mu_hat)
     w_sqrt_vec = np.sqrt(w_vec)
 
     xw = x * w_sqrt_vec.T[:, :, None]
@@ -1048,7 +1100,7 @@ def fitBeta(
     xtwxr_inv = np.linalg.inv(x.T @ (x * w_vec.T[:, :, None]) + ridge)
     assert xtwxr_inv.shape == (y_n, x_p, x_p)
 
-    hat_diagonals = np.zeros(y.shape)
+    hat_diagonals = np.zeros(y.shape, dtype=dtype)
     # this is equivalent to (for all j):
     #   hat_diagonals[:,j] = np.diag(xw[j] @ xtwxr_inv[j] @ xw[j].T)
     # but it avoids computing full matrix products just to retrieve the diags
@@ -1059,6 +1111,7 @@ def fitBeta(
     # sigma is the covariance matrix for the betas
     sigma = xtwxr_inv @ x.T @ (x * w_vec.T[:, :, None]) @ xtwxr_inv
     assert sigma.shape == (y_n, x_p, x_p)
+    sigma = sigma.astype(np.float64)
     contrast_num = contrast @ beta_mat.T
     contrast_denom = np.sqrt(contrast.T @ sigma @ contrast)
     beta_var_mat = np.diagonal(sigma, axis1=-2, axis2=-1)
@@ -1086,7 +1139,7 @@ def fitBetaWrapper(**kwargs):
     fitBeta
     """
     for k, v in kwargs.items():
-        if np.any(np.isnan(v)):
+        if k != "dtype" and np.any(np.isnan(v)):
             raise ValueError(f"argument {k} of fitBeta contains a NaN value")
 
     if "contrast" not in kwargs:
@@ -29,7 +29,7 @@ from scipy.special import polygamma
 from scipy.stats import trim_mean
 from statsmodels.tools.sm_exceptions import DomainWarning
 
-from ..utils import LOGGER, Factor
+from ..utils import LOGGER
 from .deseq2_cpp import fitDispGridWrapper, fitDispWrapper
 from .fitNbinomGLMs import fitNbinomGLMs
 from .misc import buildMatrixWithNACols, buildVectorWithNACols, checkFullRank
@@ -321,7 +321,11 @@ def estimateDispersionsGeneEst(
         # this rough dispersion estimate (alpha_hat)
         # is for estimating mu
         # and for the initial starting point for line search
-        roughDisp = roughDispEstimate(y=objNZ.counts(normalized=True), x=modelMatrix)
+        roughDisp = roughDispEstimate(
+            y=objNZ.counts(normalized=True),
+            x=modelMatrix,
+            factors=obj.compiledDesign.linearModelFactors(modelMatrix),
+        )
         momentsDisp = momentsDispEstimate(objNZ)
         alpha_hat = np.minimum(roughDisp, momentsDisp)
     else:
@@ -345,9 +349,7 @@ def estimateDispersionsGeneEst(
     # if the number of groups according to the model matrix
     # is equal to the number of columns
     if linearMu is None:
-        modelMatrixGroups = Factor(
-            [tuple(modelMatrix[i]) for i in range(modelMatrix.shape[0])]
-        )
+        modelMatrixGroups = obj.compiledDesign.cells(modelMatrix)
         linearMu = modelMatrixGroups.nlevels() == modelMatrix.shape[1]
         # also check for weights (then can't do linear mu)
         if useWeights:
@@ -355,7 +357,7 @@ def estimateDispersionsGeneEst(
 
     # below, iterate between mean and dispersion estimation (niter) times
     fitidx = np.repeat(True, objNZ.n_vars)
-    mu = np.zeros(objNZ.shape)
+    mu = np.zeros(objNZ.shape, dtype=obj.computeDtype)
     dispIter = np.zeros(objNZ.n_vars)
     # bound the estimated count by 'minmu'
     # this helps make the fitting more robust
@@ -394,6 +396,7 @@ def estimateDispersionsGeneEst(
                 useWeights=useWeights,
                 weightThreshold=weightThreshold,
                 useCR=useCR,
+                dtype=obj.computeDtype,
             )
 
             dispIter[fitidx] = dispRes["iter"]
@@ -434,6 +437,7 @@ def estimateDispersionsGeneEst(
             useWeights=useWeights,
             weightThreshold=weightThreshold,
             useCR=useCR,
+            dtype=obj.computeDtype,
         )
         dispGeneEst[refitDisp] = dispGrid
 
@@ -524,11 +528,7 @@ def estimateDispersionsFit(obj, fitType="parametric", minDisp=1e-8, quiet=False)
         useForMean = objNZ.var["dispGeneEst"] > 10 * minDisp
         useForMean = useForMean & ~np.isnan(objNZ.var["dispGeneEst"])
         meanDisp = trim_mean(objNZ.var["dispGeneEst"][useForMean], 0.001)
-
-        def dispFunction(means):
-            return meanDisp
-
-        dispFunction.mean = meanDisp
+        dispFunction = meanDispersionFunction(meanDisp)
 
     if fitType == "glmGamPoi":
         raise NotImplementedError()
@@ -697,6 +697,7 @@ def estimateDispersionsMAP(
             useWeights=useWeights,
             weightThreshold=weightThreshold,
             useCR=useCR,
+            dtype=obj.computeDtype,
         )
 
         # prepare dispersions for storage
@@ -720,6 +721,7 @@ def estimateDispersionsMAP(
                 useWeights=useWeights,
                 weightThreshold=weightThreshold,
                 useCR=True,
+                dtype=obj.computeDtype,
             )
             dispMAP[refitDisp] = dispGrid
     elif type_ == "glmGamPoi":
@@ -843,7 +845,7 @@ def checkForExperimentalReplicates(obj, modelMatrix):
         )
 
 
-def roughDispEstimate(y, x):
+def roughDispEstimate(y, x, factors=None):
     """rough dispersion estimate using counts and fitted values
 
     Arguments
@@ -852,9 +854,11 @@ def roughDispEstimate(y, x):
         normalized counts matrix (shape nobs x nvar)
     x : array-like
         design matrix (shape nobs x nd)
+    factors : tuple, optional
+        precomputed projection factors of :code:`x`, see :func:`linearModelMu`
     """
     # must be positive
-    mu = linearModelMu(y, x)
+    mu = linearModelMu(y, x, factors=factors)
     mu = np.clip(mu, 1, None)
 
     m, p = x.shape
@@ -867,7 +871,7 @@ def roughDispEstimate(y, x):
     return np.clip(est, 0, None)
 
 
-def linearModelMu(y, x):
+def linearModelMu(y, x, factors=None):
     """
     Arguments
     ---------
@@ -875,6 +879,9 @@ def linearModelMu(y, x):
         counts matrix
     x : array-like
         design matrix (as many rows as y)
+    factors : tuple, optional
+        the pair :code:`(x Rinv, Q.T)` where :code:`x = QR`, as returned by
+        :meth:`.CompiledDesign.linearModelFactors`. Computed if not provided.
     """
     # NB: in the R version, y is transposed compared to this Python version
     # original R version: ((x Rinv Q.T) y.T).T
@@ -883,9 +890,12 @@ def linearModelMu(y, x):
 
     # NB: the R code, and the code below, assumes that p <= nobs.
     # this is guaranteed by the way we check that the design matrix is full rank.
-    (Q, R) = np.linalg.qr(x)
-    Rinv = np.linalg.solve(R, np.identity(R.shape[0]))
-    return (x @ Rinv) @ (Q.T @ y)
+    if factors is None:
+        (Q, R) = np.linalg.qr(x)
+        Rinv = np.linalg.solve(R, np.identity(R.shape[0]))
+        factors = (x @ Rinv, Q.T)
+    xRinv, Qt = factors
+    return xRinv @ (Qt @ y)
 
 
 def linearModelMuNormalized(obj, x):
@@ -897,7 +907,7 @@ def linearModelMuNormalized(obj, x):
         design matrix
     """
     norm_cts = obj.counts(normalized=True)
-    muhat = linearModelMu(norm_cts, x)
+    muhat = linearModelMu(norm_cts, x, factors=obj.compiledDesign.linearModelFactors(x))
     nf = obj.getSizeOrNormFactors()
     return muhat * nf
 
@@ -946,9 +956,36 @@ def parametricDispersionFit(means, disps):
             raise RuntimeError("dispersion fit did not converge")
 
     coefs.index = ["asymptDisp", "extraPois"]
+    return parametricDispersionFunction(coefs)
+
+
+def parametricDispersionFunction(coefs):
+    """the parametric dispersion function :code:`asymptDisp + extraPois / mean`
+
+    Arguments
+    ---------
+    coefs : pandas.Series
+        the coefficients :code:`asymptDisp` and :code:`extraPois` of the fit
+    """
 
     def ans(q):
         return coefs.iloc[0] + coefs.iloc[1] / q
 
     ans.coefficients = coefs
     return ans
+
+
+def meanDispersionFunction(meanDisp):
+    """the constant dispersion function of :code:`fitType="mean"`
+
+    Arguments
+    ---------
+    meanDisp : float
+        the mean dispersion
+    """
+
+    def dispFunction(means):
+        return meanDisp
+
+    dispFunction.mean = meanDisp
+    return dispFunction
@@ -29,7 +29,6 @@ from scipy.optimize import Bounds, minimize
 
 from ..utils import LOGGER, dnbinom_mu, dnorm
 from .deseq2_cpp import fitBetaWrapper
-from .misc import renameModelMatrixColumns
 from .prior import estimateBetaPriorVar
 from .weights import getAndCheckWeights
 
@@ -137,7 +136,7 @@ def fitNbinomGLMs(
     # rename columns, for use as columns in DataFrame
     # and to emphasize the reference level comparison
     if renameCols:
-        convertNames = renameModelMatrixColumns(obj.obs, modelFormula)
+        convertNames = obj.compiledDesign.convertNames(modelFormula)
         modelMatrix.design_info.column_name_indexes = OrderedDict(
             [
                 (convertNames[n] if n in convertNames else n, v)
@@ -147,7 +146,9 @@ def fitNbinomGLMs(
 
     modelMatrixNames = modelMatrix.design_info.column_names
 
-    normalizationFactors = obj.getSizeOrNormFactors()
+    # floating point type of the (genes x samples) matrices
+    dtype = obj.computeDtype
+    normalizationFactors = obj.getSizeOrNormFactors().astype(dtype, copy=False)
 
     if alpha_hat is None:
         alpha_hat = obj.var["dispersion"]
@@ -186,7 +187,7 @@ def fitNbinomGLMs(
         else:
             betaMatrix = np.log2(np.mean(obj.counts(normalized=True), 0))
         betaMatrix = pd.DataFrame(betaMatrix, columns=modelMatrixNames)
-        mu = normalizationFactors * (2 ** betaMatrix.values.squeeze())
+        mu = normalizationFactors * (2 ** betaMatrix.values.squeeze()).astype(dtype)
         logLikeMat = dnbinom_mu(obj.counts(), mu=mu, size=1 / alpha, log=True)
         if useWeights:
             logLike = np.sum(weights * logLikeMat, 0)
@@ -195,17 +196,17 @@ def fitNbinomGLMs(
 
         modelMatrix = patsy.dmatrix("~1", data=obj.obs)
         if useWeights:
-            w = weights * 1 / (1 / mu + alpha)
+            w = weights * 1 / (1 / mu + alpha.astype(dtype))
         else:
-            w = 1 / (1 / mu + alpha)
+            w = 1 / (1 / mu + alpha.astype(dtype))
 
-        xtwx = np.sum(w, 0)
+        xtwx = np.sum(w, 0, dtype=np.float64)
         sigma = 1 / xtwx
         betaSE = pd.DataFrame(
             np.log2(np.exp(1) * np.sqrt(sigma)),
             columns=[f"SE_{n}" for n in modelMatrixNames],
         )
-        hat_diagonals = w * sigma
+        hat_diagonals = (w * sigma).astype(dtype, copy=False)
         return {
             "logLike": logLike,
             "betaConv": betaConv,
@@ -219,8 +220,8 @@ def fitNbinomGLMs(
         }
 
     # if full rank, estimate initial betas for IRLS below
-    if np.linalg.matrix_rank(modelMatrix) == modelMatrix.shape[1]:
-        q, r = np.linalg.qr(modelMatrix)
+    if obj.compiledDesign.rank(modelMatrix) == modelMatrix.shape[1]:
+        q, r = obj.compiledDesign.qr(modelMatrix)
         y = np.log(obj.counts(normalized=True) + 0.1)
         beta_mat = np.linalg.solve(r, q.T @ y).T
     else:
@@ -252,6 +253,7 @@ def fitNbinomGLMs(
         maxit=maxit,
         useQR=useQR,
         minmu=minmu,
+        dtype=dtype,
     )
 
     # Note on deviance: the 'deviance' calculated in fitBeta()
@@ -261,7 +263,9 @@ def fitNbinomGLMs(
     # above intercept code, and below optim code)
 
     with np.errstate(over="ignore"):
-        mu = normalizationFactors * np.exp(modelMatrix @ betaRes["beta_mat"].T)
+        mu = normalizationFactors * np.exp(
+            np.asarray(modelMatrix, dtype=dtype) @ betaRes["beta_mat"].T.astype(dtype)
+        )
     logLike = nbinomLogLike(
         obj.counts(),
         mu,
@@ -389,7 +393,7 @@ def fitGLMsWithPrior(
         betaMatrix.columns = modelMatrixNames
 
         # save the MLE log fold changes for addMLE argument of results
-        convertNames = renameModelMatrixColumns(obj.obs, objNZ.design)
+        convertNames = objNZ.compiledDesign.convertNames()
         modelMatrixNames = [
             convertNames[n] if n in convertNames else n for n in modelMatrixNames
         ]
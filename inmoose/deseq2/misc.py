@@ -23,8 +23,6 @@
 import numpy as np
 import pandas as pd
 
-from ..utils import Factor
-
 
 def checkFullRank(modelMatrix):
     if np.linalg.matrix_rank(modelMatrix) < modelMatrix.shape[1]:
@@ -39,7 +37,9 @@ def checkFullRank(modelMatrix):
 
 
 def buildMatrixWithNACols(m, NACols):
-    mFull = np.full((m.shape[0], len(NACols)), np.nan)
+    # preserve single precision matrices (see DESeq's dtype argument)
+    dtype = m.dtype if m.dtype == np.float32 else np.float64
+    mFull = np.full((m.shape[0], len(NACols)), np.nan, dtype=dtype)
     mFull[:, ~NACols] = m
     return mFull
 
@@ -55,14 +55,6 @@ def buildDataFrameWithNACols(d, NACols):
     return pd.DataFrame(v, columns=d.columns)
 
 
-def nOrMoreInCell(modelMatrix, n):
-    """for each sample in the model matrix,
-    are there n or more replicates in the same cell (including that sample)
-    """
-    cells = Factor([tuple(modelMatrix[i]) for i in range(modelMatrix.shape[0])])
-    return (cells.value_counts() >= n)[cells]
-
-
 def renameModelMatrixColumns(data, design):
     """convenience function to make more descriptive names for factor variables"""
     factors = [
@@ -94,3 +86,21 @@ def cleanCategoricalColumnName(name):
         return getFactorName(name[:bracket]) + name[bracket:]
     else:
         return name
+
+
+def toPlainCategoricals(df):
+    """
+    convert the :class:`.Factor` columns of a DataFrame to plain categorical
+    columns, which can be written to h5ad files
+    """
+    return pd.DataFrame(
+        {
+            c: (
+                pd.Categorical(df[c].values)
+                if isinstance(df[c].dtype, pd.CategoricalDtype)
+                else df[c]
+            )
+            for c in df.columns
+        },
+        index=df.index,
+    )
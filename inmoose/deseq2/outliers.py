@@ -27,7 +27,6 @@ from scipy.stats import trim_mean
 from ..utils import LOGGER
 from .dispersions import estimateDispersionsGeneEst, estimateDispersionsMAP
 from .lrt import nbinomLRT
-from .misc import nOrMoreInCell
 from .wald import nbinomWaldTest, recordMaxCooks
 
 
@@ -115,7 +114,7 @@ def refitWithoutOutliers(
             replaceCooks = obj.layers["cooks"].copy()
             replaceCooks[obj.obs["replaceable"]] = 0
             obj.var["maxCooks"] = recordMaxCooks(
-                obj.design, obj.obs, obj.dispModelMatrix, replaceCooks, obj.n_vars
+                obj.compiledDesign, obj.dispModelMatrix, replaceCooks, obj.n_vars
             )
 
     if nrefit > 0:
@@ -239,7 +238,7 @@ def replaceOutliers(
     newCounts[idx] = replacementCounts[idx]
 
     if whichSamples is None:
-        whichSamples = nOrMoreInCell(obj.modelMatrix, n=minReplicates)
+        whichSamples = obj.compiledDesign.nOrMoreInCell(minReplicates, obj.modelMatrix)
 
     whichSamples.index = obj.obs_names
     obj.obs["replaceable"] = whichSamples
@@ -27,7 +27,6 @@ from .fitNbinomGLMs import fitNbinomGLMs
 from .misc import (
     buildDataFrameWithNACols,
     buildMatrixWithNACols,
-    renameModelMatrixColumns,
 )
 
 
@@ -65,7 +64,7 @@ def estimateMLEForBetaPriorVar(
     modelMatrixNames = modelMatrix.design_info.column_names
     H = fit["hat_diagonals"]
 
-    convertNames = renameModelMatrixColumns(obj.obs, objNZ.design)
+    convertNames = objNZ.compiledDesign.convertNames()
     modelMatrixNames = [
         convertNames[x] if x in convertNames else x for x in modelMatrixNames
     ]
@@ -20,12 +20,13 @@
 # (version 3.16).
 
 
+import warnings
+
 import numpy as np
 import pandas as pd
 import scipy.stats
 
-from .Hmisc import wtd_quantile
-from .misc import renameModelMatrixColumns
+from .Hmisc import wtd_quantile_cols
 
 
 def estimateBetaPriorVar(
@@ -68,7 +69,7 @@ def estimateBetaPriorVar(
     colnamesBM = [s.replace("MLE_", "") for s in betaMatrix.columns]
     # renaming in reverse:
     # make these standard colnames as from patsy.dmatrix
-    convertNames = renameModelMatrixColumns(obj.obs, obj.design)
+    convertNames = obj.compiledDesign.convertNames()
     convertNames = {y: x for x, y in convertNames.items()}
     colnamesBM = pd.Index(
         [convertNames[x] if x in convertNames else x for x in colnamesBM]
@@ -101,22 +102,23 @@ def estimateBetaPriorVar(
     weights = 1 / varlogk
 
     if betaMatrix.shape[0] > 1:
-
-        def _anon(x):
-            # this test removes genes which have betas tending to +/- infinity
-            useFinite = np.abs(x) < 10
-            # if no more betas pass test, return wide prior
-            if np.sum(useFinite) == 0:
-                return 1e6
-            else:
-                if betaPriorMethod == "quantile":
-                    return matchUpperQuantileForVariance(x[useFinite], upperQuantile)
-                else:
-                    return matchWeightedUpperQuantileForVariance(
-                        x[useFinite], weights[useFinite], upperQuantile
-                    )
-
-        betaPriorVar = betaMatrix.apply(_anon, 0)
+        # all columns are processed at once
+        x = np.abs(betaMatrix.values)
+        # this test removes genes which have betas tending to +/- infinity
+        useFinite = x < 10
+        x = np.where(useFinite, x, np.nan)
+        if betaPriorMethod == "quantile":
+            with warnings.catch_warnings():
+                # columns without finite betas are handled below
+                warnings.simplefilter("ignore", RuntimeWarning)
+                q = np.nanquantile(x, 1 - upperQuantile, axis=0)
+        else:
+            q = wtd_quantile_cols(x, weights, 1 - upperQuantile, normwt=True)
+        sdEst = q / scipy.stats.norm.ppf(1 - upperQuantile / 2)
+        # if no betas pass the test, use a wide prior
+        betaPriorVar = pd.Series(
+            np.where(useFinite.any(0), sdEst**2, 1e6), index=betaMatrix.columns
+        )
 
     else:
         betaPriorVar = betaMatrix**2
@@ -135,17 +137,3 @@ def estimateBetaPriorVar(
         betaPriorVar = objNZ.averagePriorsOverLevels(betaPriorVar)
 
     return betaPriorVar
-
-
-def matchUpperQuantileForVariance(x, upperQuantile=0.05):
-    sdEst = np.quantile(np.abs(x), 1 - upperQuantile) / scipy.stats.norm.ppf(
-        1 - upperQuantile / 2
-    )
-    return sdEst**2
-
-
-def matchWeightedUpperQuantileForVariance(x, weights, upperQuantile=0.05):
-    sdEst = wtd_quantile(
-        np.abs(x), weights=weights, probs=(1 - upperQuantile), normwt=True
-    ) / scipy.stats.norm.ppf(1 - upperQuantile / 2)
-    return sdEst**2
@@ -0,0 +1,299 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+import json
+import os
+from collections import OrderedDict
+
+import anndata
+import numpy as np
+import pandas as pd
+import patsy
+from scipy.sparse import issparse, load_npz, save_npz
+
+from ..utils import LOGGER, Factor
+from .DESeqDataSet import DESeqDataSet
+from .dispersions import meanDispersionFunction, parametricDispersionFunction
+from .misc import toPlainCategoricals
+
+FORMAT_VERSION = 1
+
+
+def writeDESeqDataSet(obj, path):
+    """
+    Save a (fitted) :class:`DESeqDataSet` to a directory
+
+    Beyond what is stored in an h5ad file, the saved dataset keeps every piece
+    of the fitted model needed to compute results and transformations
+    without refitting: the design, the model matrices, the dispersion
+    function, the beta prior variance, and the type and description metadata
+    of the sample and gene annotations.
+
+    The directory contains:
+
+    - :code:`metadata.json`: the model attributes and annotation metadata,
+    - :code:`annotations.h5ad`: the sample and gene annotations (and
+      :code:`uns`),
+    - :code:`X.npy`, :code:`layers/<name>.npy` and :code:`obsm/<name>.npy`:
+      the counts and the other matrices (:code:`.npz` for sparse matrices).
+
+    The matrices are stored as plain NumPy files, so that they can be
+    memory-mapped by :func:`readDESeqDataSet`.
+
+    Only the parametric and mean dispersion functions can be saved.  Other
+    dispersion functions are dropped with a warning (the fitted values of the
+    dispersion are still saved in :code:`obj.var["dispFit"]`).
+
+    Arguments
+    ---------
+    obj : DESeqDataSet
+        the dataset to save
+    path : str or path-like
+        the output directory, created if needed
+    """
+    os.makedirs(os.path.join(path, "layers"), exist_ok=True)
+    os.makedirs(os.path.join(path, "obsm"), exist_ok=True)
+
+    anndata.AnnData(
+        obs=toPlainCategoricals(obj.obs),
+        var=toPlainCategoricals(obj.var),
+        uns=obj.uns,
+    ).write_h5ad(os.path.join(path, "annotations.h5ad"))
+
+    _writeMatrix(os.path.join(path, "X"), obj.X)
+    for k, v in obj.layers.items():
+        _writeMatrix(os.path.join(path, "layers", k), v)
+    for k, v in obj.obsm.items():
+        if k != "design":
+            _writeMatrix(os.path.join(path, "obsm", k), v)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "obsAttrs": obj.obs.attrs,
+        "varAttrs": obj.var.attrs,
+        "layers": list(obj.layers.keys()),
+        "obsm": [k for k in obj.obsm.keys() if k != "design"],
+        "design": None,
+        "computeDtype": np.dtype(obj.computeDtype).name,
+        "modelMatrixType": obj.modelMatrixType,
+        "weightsOK": obj.weightsOK,
+    }
+    if "design" in obj.obsm:
+        di = obj.design.design_info
+        meta["design"] = {"formula": di.describe(), "columns": di.column_names}
+        for name in ["modelMatrix", "dispModelMatrix"]:
+            meta[name] = _encodeModelMatrix(obj, getattr(obj, name, None), path, name)
+    for name in ["betaPrior", "test"]:
+        meta[name] = getattr(obj, name, None)
+    meta["betaPriorVar"] = _encodeBetaPriorVar(getattr(obj, "betaPriorVar", None))
+    meta["dispersionFunction"] = _encodeDispFunction(
+        getattr(obj, "_dispersionFunction", None)
+    )
+
+    with open(os.path.join(path, "metadata.json"), "w") as f:
+        json.dump(meta, f, indent=1, default=_jsonDefault)
+
+
+def readDESeqDataSet(path, mmap=True):
+    """
+    Load a :class:`DESeqDataSet` saved by :func:`writeDESeqDataSet`
+
+    Arguments
+    ---------
+    path : str or path-like
+        the directory where the dataset was saved
+    mmap : bool
+        whether to memory-map the (dense) counts and layers, instead of
+        reading them into memory. Memory-mapped matrices are read-only.
+
+    Returns
+    -------
+    DESeqDataSet
+        the saved dataset
+    """
+    with open(os.path.join(path, "metadata.json")) as f:
+        meta = json.load(f)
+    if meta["version"] > FORMAT_VERSION:
+        raise ValueError(
+            f"unsupported DESeqDataSet format version {meta['version']}, please upgrade inmoose"
+        )
+
+    ann = anndata.read_h5ad(os.path.join(path, "annotations.h5ad"))
+    obs = ann.obs
+    for c in obs.columns:
+        if isinstance(obs[c].dtype, pd.CategoricalDtype):
+            obs[c] = Factor(obs[c].values)
+
+    obj = DESeqDataSet(
+        anndata.AnnData(
+            X=_readMatrix(os.path.join(path, "X"), mmap),
+            obs=obs,
+            var=ann.var,
+            uns=ann.uns,
+            layers={
+                k: _readMatrix(os.path.join(path, "layers", k), mmap)
+                for k in meta["layers"]
+            },
+            obsm={
+                k: _readMatrix(os.path.join(path, "obsm", k), mmap)
+                for k in meta["obsm"]
+            },
+        )
+    )
+    obj.obs.attrs.update(meta["obsAttrs"])
+    obj.var.attrs.update(meta["varAttrs"])
+
+    if meta["design"] is not None:
+        obj.design = meta["design"]["formula"]
+        _renameColumns(obj.design, meta["design"]["columns"])
+        for name in ["modelMatrix", "dispModelMatrix"]:
+            mm = _decodeModelMatrix(obj, meta[name], path, name)
+            if mm is not None or name == "modelMatrix":
+                setattr(obj, name, mm)
+
+    obj.computeDtype = np.dtype(meta["computeDtype"])
+    obj.modelMatrixType = meta["modelMatrixType"]
+    obj.weightsOK = meta["weightsOK"]
+    for name in ["betaPrior", "test"]:
+        if meta[name] is not None:
+            setattr(obj, name, meta[name])
+    betaPriorVar = _decodeBetaPriorVar(meta["betaPriorVar"])
+    if betaPriorVar is not None:
+        obj.betaPriorVar = betaPriorVar
+    dispFunction = _decodeDispFunction(meta["dispersionFunction"])
+    if dispFunction is not None:
+        # dispFit is already in obj.var: do not recompute it
+        obj._dispersionFunction = dispFunction
+
+    return obj
+
+
+def _jsonDefault(o):
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    raise TypeError(f"cannot save object of type {type(o)}")
+
+
+def _writeMatrix(base, m):
+    if issparse(m):
+        save_npz(base + ".npz", m)
+    else:
+        np.save(base + ".npy", np.asarray(m))
+
+
+def _readMatrix(base, mmap):
+    if os.path.exists(base + ".npz"):
+        return load_npz(base + ".npz")
+    return np.load(base + ".npy", mmap_mode="r" if mmap else None)
+
+
+def _renameColumns(mm, columns):
+    mm.design_info.column_name_indexes = OrderedDict(
+        [(n, i) for i, n in enumerate(columns)]
+    )
+
+
+def _encodeModelMatrix(obj, mm, path, name):
+    """describe how to rebuild a model matrix, saving its values if needed"""
+    if mm is None:
+        return None
+    columns = (
+        mm.design_info.column_names
+        if isinstance(mm, patsy.DesignMatrix)
+        else [f"x{i}" for i in range(mm.shape[1])]
+    )
+    if mm.shape == obj.design.shape and np.array_equal(mm, obj.design):
+        return {"kind": "design", "columns": columns}
+    if obj.modelMatrixType == "expanded":
+        expanded = obj.makeExpandedModelMatrix()
+        if mm.shape == expanded.shape and np.array_equal(mm, expanded):
+            return {"kind": "expanded", "columns": columns}
+    np.save(os.path.join(path, f"{name}.npy"), np.asarray(mm))
+    return {"kind": "matrix", "columns": columns}
+
+
+def _decodeModelMatrix(obj, desc, path, name):
+    if desc is None:
+        return None
+    if desc["kind"] == "design":
+        mm = obj.design
+    elif desc["kind"] == "expanded":
+        mm = obj.makeExpandedModelMatrix()
+    else:
+        mm = patsy.DesignMatrix(
+            np.load(os.path.join(path, f"{name}.npy")),
+            design_info=patsy.DesignInfo(desc["columns"]),
+        )
+    if mm.design_info.column_names != desc["columns"]:
+        _renameColumns(mm, desc["columns"])
+    return mm
+
+
+def _encodeBetaPriorVar(bpv):
+    if bpv is None:
+        return None
+    if isinstance(bpv, pd.DataFrame):
+        return {"kind": "frame", "index": list(bpv.columns), "values": bpv.values[0]}
+    if isinstance(bpv, pd.Series):
+        return {"kind": "series", "index": list(bpv.index), "values": bpv.values}
+    return {"kind": "array", "values": np.asarray(bpv)}
+
+
+def _decodeBetaPriorVar(desc):
+    if desc is None:
+        return None
+    values = np.asarray(desc["values"], dtype=float)
+    if desc["kind"] == "frame":
+        return pd.DataFrame(values[None], columns=desc["index"])
+    if desc["kind"] == "series":
+        bpv = pd.Series(values, index=desc["index"])
+        # see estimateBetaPriorVar
+        bpv.columns = bpv.index
+        return bpv
+    return values
+
+
+def _encodeDispFunction(fn):
+    if fn is None:
+        return None
+    fitType = getattr(fn, "fitType", None)
+    desc = {"fitType": fitType, "varLogDispEsts": getattr(fn, "varLogDispEsts", None)}
+    if fitType == "parametric":
+        desc["coefficients"] = fn.coefficients.to_dict()
+    elif fitType == "mean":
+        desc["mean"] = fn.mean
+    else:
+        LOGGER.warning(
+            f"dispersion function with fitType {fitType} cannot be saved, it is dropped"
+        )
+        return None
+    return desc
+
+
+def _decodeDispFunction(desc):
+    if desc is None:
+        return None
+    if desc["fitType"] == "parametric":
+        fn = parametricDispersionFunction(pd.Series(desc["coefficients"]))
+    else:
+        fn = meanDispersionFunction(desc["mean"])
+    fn.fitType = desc["fitType"]
+    if desc["varLogDispEsts"] is not None:
+        fn.varLogDispEsts = desc["varLogDispEsts"]
+    return fn
@@ -20,9 +20,13 @@
 # 3.16).
 
 
+import os
+
+import h5py
 import numpy as np
 from anndata import AnnData
 from scipy.interpolate import CubicSpline
+from scipy.sparse import issparse
 
 from . import (
     DESeqDataSet,
@@ -30,6 +34,7 @@ from . import (
     estimateDispersionsFit,
     estimateDispersionsGeneEst,
 )
+from .misc import toPlainCategoricals
 
 
 def varianceStabilizingTransformation(obj, blind=True, fitType="parametric"):
@@ -161,12 +166,44 @@ def varianceStabilizingTransformation(obj, blind=True, fitType="parametric"):
 
 
 def getVarianceStabilizedData(obj):
-    if obj.dispersionFunction.fitType is None:
+    ncounts = obj.counts(normalized=True)
+    return makeVarianceStabilizingFunction(obj, ncounts=ncounts)(ncounts)
+
+
+def makeVarianceStabilizingFunction(obj, ncounts=None, blockSize=1000):
+    """
+    Build the variance stabilizing transformation of a dataset
+
+    The transformation is derived from the dispersion function already fitted
+    on :code:`obj`, and maps normalized counts (of any shape) to variance
+    stabilized values.  See :func:`varianceStabilizingTransformation` for
+    details.
+
+    Arguments
+    ---------
+    obj : DESeqDataSet
+        a :class:`DESeqDataSet` with a fitted dispersion function
+    ncounts : ndarray, optional
+        the normalized counts of :code:`obj`. Only used for
+        :code:`fitType="local"`, which needs the maximum normalized count and
+        the gene-wise means of the normalized counts. If not provided, these
+        are computed by streaming over blocks of :code:`blockSize` samples.
+    blockSize : int
+        number of samples per block, when :code:`ncounts` is not provided
+
+    Returns
+    -------
+    function
+        the variance stabilizing transformation
+    """
+    if (
+        getattr(obj, "_dispersionFunction", None) is None
+        or obj.dispersionFunction.fitType is None
+    ):
         raise ValueError(
             "call estimateDispersions before calling getVarianceStabilizedData"
         )
 
-    ncounts = obj.counts(normalized=True)
     if obj.dispersionFunction.fitType == "parametric":
         coefs = obj.dispersionFunction.coefficients
 
@@ -186,7 +223,7 @@ def getVarianceStabilizedData(obj):
                 / (4 * coefs["asymptDisp"])
             ) / np.log(2)
 
-        return vst_fn(ncounts)
+        return vst_fn
 
     elif obj.dispersionFunction.fitType == "local":
         # non-parametric fit -> numerical integration
@@ -198,9 +235,17 @@ def getVarianceStabilizedData(obj):
             sf = np.exp(np.log(obj.normalizationFactors).mean(axis=1))
         else:
             sf = obj.sizeFactors
-        xg = np.sinh(np.linspace(np.arcsinh(0), np.arcsinh(ncounts.max()), num=1000))[
-            1:
-        ]
+        if ncounts is not None:
+            ncountsMax = ncounts.max()
+            geneMeans = ncounts.mean(axis=0)
+        else:
+            ncountsMax = 0
+            geneMeans = np.zeros(obj.n_vars)
+            for _, block in iterNormalizedCounts(obj, blockSize=blockSize, axis=0):
+                ncountsMax = max(ncountsMax, block.max())
+                geneMeans += block.sum(axis=0)
+            geneMeans /= obj.n_obs
+        xg = np.sinh(np.linspace(np.arcsinh(0), np.arcsinh(ncountsMax), num=1000))[1:]
         xim = (1 / sf).mean()
         baseVarsAtGrid = obj.dispersionFunction(xg) * xg**2 + xim * xg
         integrand = 1 / np.sqrt(baseVarsAtGrid)
@@ -208,18 +253,18 @@ def getVarianceStabilizedData(obj):
             np.arcsinh((xg[1:] + xg[:-1]) / 2),
             ((xg[1:] - xg[:-1]) * (integrand[1:] + integrand[:-1]) / 2).cumsum(),
         )
-        h1 = np.quantile(ncounts.mean(axis=1), 0.95)
-        h2 = np.quantile(ncounts.mean(axis=1), 0.999)
+        h1 = np.quantile(geneMeans, 0.95)
+        h2 = np.quantile(geneMeans, 0.999)
         eta = (np.log2(h2) - np.log2(h1)) / (
             splf(np.arcsinh(h2)) - splf(np.arcsinh(h1))
         )
         xi = np.log2(h1) - eta * splf(np.arcsinh(h1))
-        tc = [
-            eta * splf(np.arcsinh(ncounts[:, clm])) + xi
-            for clm in obj.counts().var_names
-        ]
-        tc.rownames = obj.counts().rownames
-        return tc
+
+        def vst_fn(q):
+            return eta * splf(np.arcsinh(q)) + xi
+
+        return vst_fn
+
     elif obj.dispersionFunction.fitType == "mean":
         alpha = obj.dispersionFunction.mean
         # the following stabilizes NB counts with fixed dispersion alpha
@@ -230,11 +275,193 @@ def getVarianceStabilizedData(obj):
                 2 * np.arcsinh(np.sqrt(alpha * q)) - np.log(alpha) - np.log(4)
             ) / np.log(2)
 
-        return vst_fn(ncounts)
+        return vst_fn
     else:
         raise ValueError("fitType is not parametric, local or mean")
 
 
+def iterNormalizedCounts(obj, blockSize=1000, axis=0):
+    """
+    Iterate over the normalized counts of a dataset, by blocks
+
+    Only one block of counts is normalized (and held in memory) at a time, so
+    that this function also applies to datasets whose counts are backed on disk
+    or memory-mapped.
+
+    Arguments
+    ---------
+    obj : DESeqDataSet
+        a :class:`DESeqDataSet` with size factors or normalization factors
+    blockSize : int
+        the number of samples (if :code:`axis=0`) or genes (if :code:`axis=1`)
+        per block
+    axis : { 0, 1 }
+        whether to iterate over blocks of samples (0) or genes (1)
+
+    Yields
+    ------
+    slice
+        the samples (if :code:`axis=0`) or genes (if :code:`axis=1`) of the
+        block
+    ndarray
+        the normalized counts of the block
+    """
+    if axis not in [0, 1]:
+        raise ValueError(f"invalid value for axis: {axis}")
+    if blockSize < 1:
+        raise ValueError("blockSize should be strictly positive")
+
+    nf = obj.normalizationFactors
+    if nf is None:
+        if obj.sizeFactors is None or np.isnan(obj.sizeFactors).any():
+            raise ValueError(
+                "first calculate size factors, add normalizationFactors, or set normalized=False"
+            )
+        sf = obj.sizeFactors.to_numpy()
+
+    for start in range(0, obj.shape[axis], blockSize):
+        sl = slice(start, min(start + blockSize, obj.shape[axis]))
+        idx = (sl, slice(None)) if axis == 0 else (slice(None), sl)
+        cnts = obj.X[idx]
+        if issparse(cnts):
+            cnts = cnts.toarray()
+        cnts = np.asarray(cnts, dtype=float)
+        if nf is not None:
+            yield sl, cnts / np.asarray(nf[idx])
+        else:
+            yield sl, cnts / sf[idx[0], None]
+
+
+def iterVarianceStabilizedData(obj, blockSize=1000, axis=0):
+    """
+    Iterate over the variance stabilized counts of a dataset, by blocks
+
+    This is a streaming version of :func:`getVarianceStabilizedData`: the
+    variance stabilizing transformation derived from the dispersion function
+    already fitted on :code:`obj` is applied to one block of normalized counts
+    at a time (see :func:`iterNormalizedCounts`), so that memory usage is
+    bounded by the block size.
+
+    Arguments
+    ---------
+    obj : DESeqDataSet
+        a :class:`DESeqDataSet` with a fitted dispersion function
+    blockSize : int
+        the number of samples (if :code:`axis=0`) or genes (if :code:`axis=1`)
+        per block
+    axis : { 0, 1 }
+        whether to iterate over blocks of samples (0) or genes (1)
+
+    Yields
+    ------
+    slice
+        the samples (if :code:`axis=0`) or genes (if :code:`axis=1`) of the
+        block
+    ndarray
+        the variance stabilized counts of the block
+    """
+    vst_fn = makeVarianceStabilizingFunction(obj, blockSize=blockSize)
+    for sl, block in iterNormalizedCounts(obj, blockSize=blockSize, axis=axis):
+        yield sl, vst_fn(block)
+
+
+def writeVarianceStabilizedData(
+    obj, filename, transform="vst", format=None, blockSize=1000, axis=0
+):
+    """
+    Write the variance stabilized (or normalized) counts of a dataset to a file
+
+    The counts are transformed and written by blocks (see
+    :func:`iterVarianceStabilizedData`), so that the whole transformed matrix
+    is never held in memory.  The output matrix has the same layout as the
+    counts: one row per sample and one column per gene.
+
+    Supported formats are:
+
+    - :code:`"h5ad"`: an AnnData file, with the transformed counts as
+      :code:`X` and the sample and gene annotations of :code:`obj`.
+    - :code:`"npy"`: a NumPy array file (which can be memory-mapped with
+      :func:`numpy.load`).
+    - :code:`"parquet"`: a Parquet file, one column per gene, written by
+      row groups of samples. This format requires :code:`pyarrow` and
+      :code:`axis=0`.
+
+    Arguments
+    ---------
+    obj : DESeqDataSet
+        a :class:`DESeqDataSet`, with a fitted dispersion function if
+        :code:`transform="vst"`
+    filename : str or path-like
+        the output file
+    transform : { "vst", "normalized" }
+        whether to write the variance stabilized counts, or the normalized
+        counts
+    format : { "h5ad", "npy", "parquet" }, optional
+        the output format. If :code:`None`, inferred from the extension of
+        :code:`filename`.
+    blockSize : int
+        the number of samples (if :code:`axis=0`) or genes (if :code:`axis=1`)
+        per block
+    axis : { 0, 1 }
+        whether to process blocks of samples (0) or genes (1)
+    """
+    if transform == "vst":
+        blocks = iterVarianceStabilizedData(obj, blockSize=blockSize, axis=axis)
+    elif transform == "normalized":
+        blocks = iterNormalizedCounts(obj, blockSize=blockSize, axis=axis)
+    else:
+        raise ValueError(f"invalid value for transform: {transform}")
+
+    if format is None:
+        format = os.path.splitext(filename)[1].lstrip(".")
+    if format not in ["h5ad", "npy", "parquet"]:
+        raise ValueError(f"invalid value for format: {format}")
+    if format == "parquet" and axis != 0:
+        raise ValueError("parquet files can only be written by blocks of samples")
+
+    if format == "npy":
+        out = np.lib.format.open_memmap(
+            filename, mode="w+", dtype=np.float64, shape=obj.shape
+        )
+        for sl, block in blocks:
+            if axis == 0:
+                out[sl, :] = block
+            else:
+                out[:, sl] = block
+        out.flush()
+        del out
+
+    elif format == "h5ad":
+        # write the annotations, then the transformed counts block by block
+        AnnData(
+            obs=toPlainCategoricals(obj.obs), var=toPlainCategoricals(obj.var)
+        ).write_h5ad(filename)
+        with h5py.File(filename, "r+") as f:
+            chunks = (min(blockSize, obj.n_obs), obj.n_vars)
+            if axis == 1:
+                chunks = (obj.n_obs, min(blockSize, obj.n_vars))
+            out = f.create_dataset(
+                "X", shape=obj.shape, dtype=np.float64, chunks=chunks
+            )
+            out.attrs["encoding-type"] = "array"
+            out.attrs["encoding-version"] = "0.2.0"
+            for sl, block in blocks:
+                if axis == 0:
+                    out[sl, :] = block
+                else:
+                    out[:, sl] = block
+
+    elif format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        names = [str(n) for n in obj.var_names]
+        schema = pa.schema([(n, pa.float64()) for n in names])
+        with pq.ParquetWriter(filename, schema) as writer:
+            for _, block in blocks:
+                writer.write_table(pa.Table.from_arrays(list(block.T), schema=schema))
+
+
 def vst(obj, blind=True, nsub=1000, fitType="parametric"):
     """
     Quickly estimate dispersion trend and apply a variance stabilizing transformation
@@ -28,7 +28,7 @@ from scipy.stats import trim_mean
 
 from ..utils import LOGGER, Factor, pnorm, pt
 from .fitNbinomGLMs import fitGLMsWithPrior, fitNbinomGLMs
-from .misc import buildDataFrameWithNACols, buildMatrixWithNACols, nOrMoreInCell
+from .misc import buildDataFrameWithNACols, buildMatrixWithNACols
 from .weights import getAndCheckWeights
 
 
@@ -294,7 +294,7 @@ def nbinomWaldTest(
     cooks = calculateCooksDistance(objNZ, H, dispModelMatrix)
 
     # record maximum Cook's
-    maxCooks = recordMaxCooks(obj.design, obj.obs, dispModelMatrix, cooks, objNZ.n_vars)
+    maxCooks = recordMaxCooks(obj.compiledDesign, dispModelMatrix, cooks, objNZ.n_vars)
 
     # store Cook's distance for each sample
     obj.layers["cooks"] = buildMatrixWithNACols(cooks, obj.var["allZero"])
@@ -438,9 +438,10 @@ def calculateCooksDistance(obj, H, modelMatrix):
         the design matrix
     """
     p = modelMatrix.shape[1]
-    dispersions = robustMethodOfMomentsDisp(obj, modelMatrix)
-    V = obj.layers["mu"] + dispersions * obj.layers["mu"] ** 2
-    PearsonResSq = (obj.counts() - obj.layers["mu"]) ** 2 / V
+    mu = obj.layers["mu"]
+    dispersions = robustMethodOfMomentsDisp(obj, modelMatrix).astype(mu.dtype)
+    V = mu + dispersions * mu**2
+    PearsonResSq = (obj.counts().astype(mu.dtype) - mu) ** 2 / V
     return PearsonResSq / p * H / (1 - H) ** 2
 
 
@@ -466,9 +467,9 @@ def robustMethodOfMomentsDisp(obj, modelMatrix):
     """
     cnts = obj.counts(normalized=True)
     # if there are 3 or more replicates in any cell
-    threeOrMore = nOrMoreInCell(modelMatrix, n=3)
+    threeOrMore = obj.compiledDesign.nOrMoreInCell(3, modelMatrix)
     if np.any(threeOrMore):
-        cells = Factor([tuple(modelMatrix[i]) for i in range(modelMatrix.shape[0])])
+        cells = obj.compiledDesign.cells(modelMatrix)
         levelsThreeOrMore = cells.categories[cells.value_counts() >= 3]
         idx = cells.isin(levelsThreeOrMore)
         cntsSub = cnts[idx, :]
@@ -537,7 +538,7 @@ def trimmedVariance(x):
     return 1.51 * trim_mean(sqerror, 1 / 8, axis=0)
 
 
-def recordMaxCooks(design, clinicalData, modelMatrix, cooks, numCol):
+def recordMaxCooks(compiledDesign, modelMatrix, cooks, numCol):
     """this function breaks out the logic for calculating the max Cook's distance:
     the samples over which max Cook's distance is calculated:
 
@@ -545,7 +546,7 @@ def recordMaxCooks(design, clinicalData, modelMatrix, cooks, numCol):
 
     if m == p or there are no samples over which to calculate max Cook's, return NA
     """
-    samplesForCooks = nOrMoreInCell(modelMatrix, n=3)
+    samplesForCooks = compiledDesign.nOrMoreInCell(3, modelMatrix)
     m, p = modelMatrix.shape
     if m > p and np.any(samplesForCooks):
         return np.max(cooks[samplesForCooks, :], axis=0)
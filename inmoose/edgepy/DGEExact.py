@@ -22,7 +22,7 @@ from ..diffexp import DEResults
 
 
 class DGEExact(DEResults):
-    _metadata = ["comparison", "genes"]
+    _metadata = ["comparison", "genes", "_adjusted_pvalues"]
 
     @property
     def _constructor(self):
@@ -41,3 +41,5 @@ class DGEExact(DEResults):
         super().__init__(table, *args, **kwargs)
         self.comparison = comparison
         self.genes = genes
+        # adjusted p-values, cached by topTags
+        self._adjusted_pvalues = None
@@ -22,7 +22,7 @@ from ..diffexp import DEResults
 
 
 class DGELRT(DEResults):
-    _metadata = ["fit", "comparison", "df_test", "df_total"]
+    _metadata = ["fit", "comparison", "df_test", "df_total", "_adjusted_pvalues"]
 
     @property
     def _constructor(self):
@@ -38,5 +38,7 @@ class DGELRT(DEResults):
     def __init__(self, df, glmfit, *args, **kwargs):
         super().__init__(df, *args, **kwargs)
         self.fit = glmfit
+        # adjusted p-values, cached by topTags
+        self._adjusted_pvalues = None
         # self.coefficients_full = None
         # self.coefficients_null = None
@@ -18,6 +18,8 @@
 
 # This file is based on the file 'R/DGEList.R' of the Bioconductor edgeR package (version 3.38.4).
 
+import copy
+
 import numpy as np
 import pandas as pd
 
@@ -55,18 +57,41 @@ class DGEList(object):
         :code:`counts`
     AveLogCPM : ndarray, optional
         average log2 counts per million for each gene
+    pseudo_counts : ndarray, optional
+        counts adjusted to equal library sizes (see :func:`equalizeLibSizes`)
+    pseudo_lib_size : float, optional
+        the common library size of :code:`pseudo_counts`
+
+    The library sizes, offsets and average log2 counts per million computed
+    from the object are memoized: they are computed at most once for given
+    counts, library sizes, normalization factors and weights (and prior count
+    and dispersion, for :func:`aveLogCPM`).  The memoized values, as well as
+    :attr:`AveLogCPM`, are discarded as soon as :attr:`counts` or
+    :attr:`weights` are replaced or the library sizes or normalization factors
+    in :attr:`samples` change.  The counts and weights are identified by object
+    identity, and are assumed not to be modified in place.
     """
 
     from .aveLogCPM import aveLogCPM_DGEList as aveLogCPM
+    from .calcNormFactors import calcNormFactors_DGEList as calcNormFactors
+    from .cpm import cpm_DGEList as cpm
+    from .equalizeLibSizes import equalizeLibSizes_DGEList as equalizeLibSizes
+    from .estimateCommonDisp import estimateCommonDisp_DGEList as estimateCommonDisp
+    from .estimateDisp import estimateDisp_DGEList as estimateDisp
     from .estimateGLMCommonDisp import (
         estimateGLMCommonDisp_DGEList as estimateGLMCommonDisp,
     )
     from .estimateGLMTagwiseDisp import (
         estimateGLMTagwiseDisp_DGEList as estimateGLMTagwiseDisp,
     )
+    from .estimateGLMTrendedDisp import (
+        estimateGLMTrendedDisp_DGEList as estimateGLMTrendedDisp,
+    )
+    from .filterByExpr import filterByExpr_DGEList as filterByExpr
     from .glmFit import glmFit_DGEList as glmFit
     from .glmQLFit import glmQLFit_DGEList as glmQLFit
     from .predFC import predFC_DGEList as predFC
+    from .rpkm import rpkm_DGEList as rpkm
     from .splitIntoGroups import splitIntoGroups_DGEList as splitIntoGroups
 
     def __init__(
@@ -86,7 +111,8 @@ class DGEList(object):
         Arguments
         ---------
         counts : array_like or pd.DataFrame
-            matrix of counts
+            matrix of counts, copied unless it is a memory-mapped array of
+            integers (as built by :func:`readDGE`), which is used in place
         lib_size : array_like, optional
             vector of total counts (sequence depth) for each library
         norm_factors : array_like, optional
@@ -109,7 +135,7 @@ class DGEList(object):
         if not isinstance(counts, (np.ndarray, pd.DataFrame)):
             counts = np.asarray(counts)
         try:
-            counts = counts.astype(int)
+            counts = counts.astype(int, copy=not isinstance(counts, np.memmap))
         except:  # noqa: E722
             raise ValueError("non-numeric values found in 'counts'")
         if counts.ndim != 2:
@@ -205,6 +231,9 @@ class DGEList(object):
         self.offset = None
         self.genes = None
         self.prior_df = None
+        self.pseudo_counts = None
+        self.pseudo_lib_size = None
+        self._cache = None
         self.AveLogCPM = None
 
         # TODO Add data frame of gene information (should set self.genes)
@@ -218,6 +247,179 @@ class DGEList(object):
         if remove_zeroes:
             raise NotImplementedError
 
+    def __getitem__(self, key):
+        """
+        Subset the genes (and the samples) of the DGEList.
+
+        :code:`y[i]` selects genes, and :code:`y[i, j]` selects genes and
+        samples, with any positional index accepted by NumPy (boolean masks,
+        integer arrays or slices). The library sizes are kept, see
+        :meth:`subset`.
+        """
+        if isinstance(key, tuple):
+            return self.subset(*key)
+        return self.subset(key)
+
+    def subset(self, i=None, j=None, keep_lib_sizes=True):
+        """
+        Subset the genes and/or the samples of the DGEList.
+
+        Only the selected rows and columns of the gene-wise and sample-wise
+        components are copied. Typical use is to filter out the genes with low
+        counts, as determined by :func:`filterByExpr`.
+
+        Arguments
+        ---------
+        i : array_like or slice, optional
+            positional index of the genes to keep (boolean mask, integer
+            array or slice). Defaults to all genes.
+        j : array_like or slice, optional
+            positional index of the samples to keep. Defaults to all samples.
+        keep_lib_sizes : bool
+            whether to keep the library sizes of the samples, or else to
+            recompute them from the column sums of the remaining counts.
+            Defaults to :code:`True`.
+
+        Returns
+        -------
+        DGEList
+            a new DGEList restricted to the selected genes and samples
+        """
+        (ntags, nlibs) = self.counts.shape
+        rows = np.arange(ntags) if i is None else np.arange(ntags)[i]
+        cols = np.arange(nlibs) if j is None else np.arange(nlibs)[j]
+        AveLogCPM = self.AveLogCPM
+
+        res = copy.copy(self)
+        res._cache = None
+        res.counts = self.counts.iloc[rows, cols]
+        res.samples = self.samples.iloc[cols].copy()
+        if j is not None:
+            res.samples["group"] = Factor(res.samples["group"]).droplevels()
+            if self.design is not None:
+                res.design = self.design[cols]
+        if not keep_lib_sizes:
+            res.samples["lib_size"] = res.counts.sum(axis=0)
+
+        def subsetMatrix(x):
+            if x is None or np.ndim(x) == 0:
+                return x
+            x = np.asarray(x)
+            if x.ndim == 1:
+                return x[cols]
+            return x[np.ix_(rows, cols)]
+
+        def subsetVector(x):
+            if x is None or np.ndim(x) == 0:
+                return x
+            return np.asarray(x)[rows]
+
+        res.weights = subsetMatrix(self.weights)
+        res.offset = subsetMatrix(self.offset)
+        res.pseudo_counts = subsetMatrix(self.pseudo_counts)
+        res.tagwise_dispersion = subsetVector(self.tagwise_dispersion)
+        res.trended_dispersion = subsetVector(self.trended_dispersion)
+        res.prior_df = subsetVector(self.prior_df)
+        if self.genes is not None:
+            res.genes = self.genes.iloc[rows]
+        res.AveLogCPM = subsetVector(AveLogCPM)
+        return res
+
+    def _cacheEntry(self):
+        """
+        return the dictionary of memoized values, after discarding them if the
+        counts, weights, library sizes or normalization factors have changed
+        """
+        state = (
+            tuple(self.samples["lib_size"]),
+            tuple(self.samples["norm_factors"]),
+        )
+        cache = self._cache
+        # references to the counts and weights are kept in the cache, so that
+        # their ids are not reused while the cache is alive
+        if (
+            cache is None
+            or cache["counts"] is not self.counts
+            or cache["weights"] is not self.weights
+            or cache["state"] != state
+        ):
+            cache = {
+                "counts": self.counts,
+                "weights": self.weights,
+                "state": state,
+                "values": {},
+            }
+            self._cache = cache
+        return cache
+
+    def _memoize(self, key, compute):
+        """return the memoized value for :code:`key`, computing it if needed"""
+        values = self._cacheEntry()["values"]
+        if key not in values:
+            value = compute()
+            # memoized arrays are shared between callers: protect them
+            if isinstance(value, pd.Series):
+                data = value.to_numpy(copy=True)
+                data.flags.writeable = False
+                value = pd.Series(data, index=value.index, name=value.name, copy=False)
+            elif isinstance(value, np.ndarray):
+                value.flags.writeable = False
+            values[key] = value
+        value = values[key]
+        if isinstance(value, pd.Series):
+            # a new Series on the read-only values, so that the memoized one
+            # cannot be modified either
+            value = pd.Series(
+                value.values, index=value.index, name=value.name, copy=False
+            )
+        return value
+
+    @property
+    def AveLogCPM(self):
+        """
+        average log2 counts per million for each gene, discarded when the
+        counts, weights, library sizes or normalization factors change
+        """
+        if self._AveLogCPM is None:
+            return None
+        value, cache = self._AveLogCPM
+        if cache is not self._cacheEntry():
+            self._AveLogCPM = None
+            return None
+        return value
+
+    @AveLogCPM.setter
+    def AveLogCPM(self, value):
+        self._AveLogCPM = None if value is None else (value, self._cacheEntry())
+
+    def getLibSize(self, normalized=True):
+        """
+        Extract the library sizes, computed from the counts if missing.
+
+        Arguments
+        ---------
+        normalized : bool, optional
+            whether to multiply the library sizes by the normalization factors.
+            Defaults to :code:`True`.
+
+        Returns
+        -------
+        pd.Series
+            the (normalized) library size of each sample
+        """
+
+        def compute():
+            lib_size = self.samples["lib_size"]
+            if (lib_size.values == None).any():  # noqa: E711
+                lib_size = self.counts.sum(axis=0)
+            if normalized:
+                norm_factors = self.samples["norm_factors"]
+                if (norm_factors.values != None).all():  # noqa: E711
+                    lib_size = lib_size * norm_factors
+            return lib_size
+
+        return self._memoize(("lib_size", bool(normalized)), compute)
+
     def getOffset(self):
         """
         Extract offset vector or matrix from data object and optional arguments.
@@ -226,11 +428,7 @@ class DGEList(object):
         if self.offset is not None:
             return self.offset
 
-        lib_size = self.samples["lib_size"]
-        norm_factors = self.samples["norm_factors"]
-        if (norm_factors.values != None).all():  # noqa: E711
-            lib_size = lib_size * norm_factors
-        return np.log(lib_size)
+        return self._memoize("offset", lambda: np.log(self.getLibSize()))
 
     def getDispersion(self):
         """
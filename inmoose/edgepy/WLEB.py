@@ -0,0 +1,137 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2008-2022 Yunshun Chen, Aaron TL Lun, Davis J McCarthy, Matthew E Ritchie, Belinda Phipson, Yifang Hu, Xiaobei Zhou, Mark D Robinson, Gordon K Smyth
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+# This file is based on the file 'R/WLEB.R' of the Bioconductor edgeR package (version 3.38.4).
+
+
+import numpy as np
+
+from .locfitByCol import locfitByCol
+from .maximizeInterpolant import maximizeInterpolant
+from .movingAverageByCol import movingAverageByCol
+
+
+def WLEB(
+    theta,
+    loglik,
+    prior_n=5,
+    covariate=None,
+    trend_method="locfit",
+    span=None,
+    overall=True,
+    trend=True,
+    individual=True,
+    m0=None,
+    m0_out=False,
+):
+    """
+    Weighted likelihood empirical Bayes.
+
+    Compute empirical Bayes estimates of a parameter, given a table of the
+    genewise log-likelihoods evaluated on a grid of values of the parameter.
+    The shared log-likelihood is the local average of the genewise
+    log-likelihoods with respect to the covariate (:code:`m0`). The
+    individual estimates maximize the weighted sum of the genewise
+    log-likelihood and of :code:`prior_n` times the shared log-likelihood.
+    All the maximizations use :func:`maximizeInterpolant`.
+
+    Arguments
+    ---------
+    theta : array_like
+        vector of the (sorted) parameter values on the grid
+    loglik : matrix
+        log-likelihoods, one row per gene and one column per value of
+        :code:`theta`
+    prior_n : float or array_like
+        weight of the shared log-likelihood, as a number of prior
+        observations. A vector gives one value per gene.
+    covariate : array_like, optional
+        covariate used to compute the shared log-likelihood (usually
+        :code:`AveLogCPM`)
+    trend_method : str
+        method to compute the shared log-likelihood: "locfit" (local constant
+        regression, see :func:`locfitByCol`), "movingave" (moving average, see
+        :func:`movingAverageByCol`) or "none" (the average over all genes)
+    span : float, optional
+        width of the smoothing window, as a proportion of the genes. Default
+        value decreases with the number of genes.
+    overall : bool
+        whether to compute the overall estimate, maximizing the sum of the
+        log-likelihoods
+    trend : bool
+        whether to compute the trended estimates, maximizing the shared
+        log-likelihood
+    individual : bool
+        whether to compute the individual estimates
+    m0 : matrix, optional
+        the shared log-likelihood, computed if :code:`None`
+    m0_out : bool
+        whether to output the shared log-likelihood
+
+    Returns
+    -------
+    dict
+        dictionary with key :code:`"span"`, and depending on the arguments
+        :code:`"overall"`, :code:`"trend"`, :code:`"individual"` and
+        :code:`"shared_loglik"`
+    """
+    loglik = np.asarray(loglik, dtype=float)
+    ntags = loglik.shape[0]
+
+    if span is None:
+        if ntags <= 50:
+            span = 1
+        else:
+            span = 0.25 + 0.75 * (50 / ntags) ** 0.5
+    out = {"span": span}
+
+    if overall:
+        out["overall"] = maximizeInterpolant(theta, loglik.sum(axis=0, keepdims=True))[
+            0
+        ]
+
+    # Shared log-likelihood
+    if m0 is None:
+        if trend_method == "movingave":
+            o = np.argsort(covariate, kind="stable")
+            m0 = np.empty_like(loglik)
+            m0[o] = movingAverageByCol(loglik[o], width=int(span * ntags))
+        elif trend_method == "locfit":
+            m0 = locfitByCol(loglik, covariate, span=span, degree=0)
+        elif trend_method == "none":
+            m0 = np.broadcast_to(loglik.mean(axis=0), loglik.shape)
+        else:
+            raise ValueError(f"invalid trend method: {trend_method}")
+
+    if trend:
+        out["trend"] = np.asarray(maximizeInterpolant(theta, m0))
+
+    if individual:
+        prior_n = np.asarray(prior_n, dtype=float)
+        if not np.isfinite(prior_n).all():
+            raise ValueError("prior_n must be finite")
+        if prior_n.ndim > 0:
+            prior_n = prior_n.reshape((-1, 1))
+        out["individual"] = np.asarray(
+            maximizeInterpolant(theta, loglik + prior_n * m0)
+        )
+
+    if m0_out:
+        out["shared_loglik"] = m0
+
+    return out
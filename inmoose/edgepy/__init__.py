@@ -3,37 +3,55 @@ from .adjustedProfileLik import adjustedProfileLik as adjustedProfileLik
 from .aveLogCPM import aveLogCPM as aveLogCPM
 from .binomTest import binomTest as binomTest
 from .DGEGLM import DGEGLM as DGEGLM
+from .calcNormFactors import calcNormFactors as calcNormFactors
+from .cpm import cpm as cpm
+from .cutWithMinN import cutWithMinN as cutWithMinN
 from .DGEList import DGEList as DGEList
+from .dispBinTrend import dispBinTrend as dispBinTrend
 from .dispCoxReid import dispCoxReid as dispCoxReid
 from .dispCoxReidInterpolateTagwise import (
     dispCoxReidInterpolateTagwise as dispCoxReidInterpolateTagwise,
 )
+from .dispCoxReidPowerTrend import dispCoxReidPowerTrend as dispCoxReidPowerTrend
+from .equalizeLibSizes import equalizeLibSizes as equalizeLibSizes
+from .estimateCommonDisp import estimateCommonDisp as estimateCommonDisp
+from .estimateDisp import estimateDisp as estimateDisp
 from .estimateGLMCommonDisp import estimateGLMCommonDisp as estimateGLMCommonDisp
 from .estimateGLMTagwiseDisp import estimateGLMTagwiseDisp as estimateGLMTagwiseDisp
+from .estimateGLMTrendedDisp import estimateGLMTrendedDisp as estimateGLMTrendedDisp
 from .exactTest import exactTest as exactTest
 from .exactTestBetaApprox import exactTestBetaApprox as exactTestBetaApprox
 from .exactTestByDeviance import exactTestByDeviance as exactTestByDeviance
 from .exactTestBySmallP import exactTestBySmallP as exactTestBySmallP
 from .exactTestDoubleTail import exactTestDoubleTail as exactTestDoubleTail
+from .filterByExpr import filterByExpr as filterByExpr
 from .glmFit import glmFit as glmFit
 from .glmFit import glmLRT as glmLRT
 from .glmQLFit import glmQLFit as glmQLFit
 from .glmQLFit import glmQLFTest as glmQLFTest
 from .glmQLFit import plotQLDisp as plotQLDisp
 from .maximizeInterpolant import maximizeInterpolant as maximizeInterpolant
+from .locfitByCol import locfitByCol as locfitByCol
 from .mglmLevenberg import mglmLevenberg as mglmLevenberg
 from .mglmOneGroup import mglmOneGroup as mglmOneGroup
 from .mglmOneWay import designAsFactor as designAsFactor
 from .mglmOneWay import mglmOneWay as mglmOneWay
 from .movingAverageByCol import movingAverageByCol as movingAverageByCol
 from .nbinomDeviance import nbinomDeviance as nbinomDeviance
+from .parallel import SharedGeneArrays as SharedGeneArrays
+from .parallel import mapGeneBlocks as mapGeneBlocks
+from .parallel import shutdownWorkers as shutdownWorkers
 from .predFC import predFC as predFC
 from .q2qnbinom import q2qnbinom as q2qnbinom
+from .readDGE import readCounts as readCounts
+from .readDGE import readDGE as readDGE
+from .rpkm import rpkm as rpkm
 from .splitIntoGroups import splitIntoGroups as splitIntoGroups
 from .stats import pnbinom as pnbinom
 from .stats import qnbinom as qnbinom
 from .systematicSubset import systematicSubset as systematicSubset
 from .topTags import topTags as topTags
 from .validDGEList import validDGEList as validDGEList
+from .WLEB import WLEB as WLEB
 
 from .edgepy_cpp import *  # noqa: F403
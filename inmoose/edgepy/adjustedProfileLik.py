@@ -28,10 +28,19 @@ from .makeCompressedMatrix import (
     _compressOffsets,
     _compressWeights,
 )
+from .parallel import _numThreads, mapGeneBlocks
 
 
 def adjustedProfileLik(
-    dispersion, y, design, offset, weights=None, adjust=True, start=None, get_coef=False
+    dispersion,
+    y,
+    design,
+    offset,
+    weights=None,
+    adjust=True,
+    start=None,
+    get_coef=False,
+    n_jobs=None,
 ):
     """
     Compute adjusted profile log-likelihoods for the dispersion parameters of
@@ -51,7 +60,9 @@ def adjustedProfileLik(
     the log-linear models.
 
     This implementation calls the LAPACK library to perform the Cholesky
-    decomposition during adjustment estimation.
+    decomposition during adjustment estimation. Genes are processed in
+    parallel, using as many threads as CPUs, or by blocks in :code:`n_jobs`
+    worker processes (see :func:`mapGeneBlocks`).
 
     The purpose of :code:`start` and :code:`get_coef` is to allow hot-starting
     for multiple calls to `adjustedProfileLik`, when only :code:`dispersion` is
@@ -86,6 +97,8 @@ def adjustedProfileLik(
         passed to :func:`glmFit`.
     get_coef : bool, optional
         specifying whether fitted GLM coefficients should be returned
+    n_jobs : int, optional
+        number of worker processes. Defaults to 1.
 
     Returns
     -------
@@ -117,6 +130,29 @@ def adjustedProfileLik(
     # Checking weights
     weights = _compressWeights(y, weights)
 
+    (apl, coef) = mapGeneBlocks(
+        _adjustedProfileLik,
+        {
+            "y": y,
+            "dispersion": dispersion,
+            "offset": offset,
+            "weights": weights,
+            "start": start,
+        },
+        n_jobs=n_jobs,
+        design=np.asarray(design),
+        adjust=adjust,
+    )
+
+    # Deciding what to return
+    if get_coef:
+        return (apl, coef)
+    else:
+        return apl
+
+
+def _adjustedProfileLik(y, dispersion, offset, weights, start, design, adjust):
+    """adjusted profile log-likelihoods and GLM coefficients of the genes"""
     # Fit tagwise linear models
     fit = glmFit(
         y,
@@ -131,10 +167,7 @@ def adjustedProfileLik(
     assert mu.dtype == np.dtype("double")
 
     # Compute adjusted log-likelihood
-    apl = compute_apl(y, mu, dispersion, weights, adjust, design)
-
-    # Deciding what to return
-    if get_coef:
-        return (apl, fit.coefficients)
-    else:
-        return apl
+    apl = compute_apl(
+        y, mu, dispersion, weights, adjust, design, nthreads=_numThreads()
+    )
+    return (apl, fit.coefficients)
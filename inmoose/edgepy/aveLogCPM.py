@@ -62,33 +62,40 @@ def aveLogCPM_DGEList(self, normalized_lib_sizes=True, prior_count=2, dispersion
     Returns
     -------
     ndarray
-        numeric vector giving :code:`log2(AveCPM)` for each row of :code:`y`
+        numeric vector giving :code:`log2(AveCPM)` for each row of :code:`y`.
+        The result is memoized in :code:`self` (see :class:`DGEList`).
     """
-    # Library sizes should be stored in y but are sometimes missing
-    lib_size = self.samples["lib_size"]
-    if (lib_size.values == None).any():  # noqa: E711
-        lib_size = self.counts.sum(axis=0)
-
-    # Normalization factors should be stored in y but are sometimes missing
-    if normalized_lib_sizes:
-        nf = self.samples["norm_factors"]
-        if (nf.values != None).all():  # noqa: E711
-            lib_size = lib_size * nf
-
     # Dispersion supplied as argument takes precedence over value in object
     # Should trended_dispersion or tagwise_dispersion be used instead of common_dispersion if available?
     if dispersion is None:
         dispersion = self.common_dispersion
 
-    return aveLogCPM(
-        self.counts,
-        lib_size=lib_size,
-        prior_count=prior_count,
-        dispersion=dispersion,
-        weights=self.weights,
+    key = (
+        "AveLogCPM",
+        bool(normalized_lib_sizes),
+        _memoKey(prior_count),
+        _memoKey(dispersion),
+    )
+    return self._memoize(
+        key,
+        lambda: aveLogCPM(
+            self.counts,
+            lib_size=self.getLibSize(normalized_lib_sizes),
+            prior_count=prior_count,
+            dispersion=dispersion,
+            weights=self.weights,
+        ),
     )
 
 
+def _memoKey(x):
+    """hashable key identifying the value of a scalar or array argument"""
+    if x is None:
+        return None
+    x = np.asarray(x)
+    return (x.dtype.str, x.shape, x.tobytes())
+
+
 def aveLogCPM_DGEGLM(y, prior_count=2, dispersion=None):
     """
     Compute average log2 counts per million for each row of counts.
@@ -19,7 +19,10 @@
 # This file is based on the file 'R/binomTest.R' of the Bioconductor edgeR package (version 3.38.4).
 
 import numpy as np
-from scipy.stats import binom, chi2_contingency
+from scipy.stats import binom, chi2
+
+from .edgepy_cpp import binom_test_cython
+from .parallel import _numThreads
 
 
 def binomTest(y1, y2, n1=None, n2=None, p=None):
@@ -39,7 +42,10 @@ def binomTest(y1, y2, n1=None, n2=None, p=None):
 
     The two-sided rejection region is chosen analogously to Fisher's test.
     Specifically, the rejection region consists of those values with smallest
-    probabilities under the null hypothesis.
+    probabilities under the null hypothesis (values as likely as the observed
+    count, up to a relative tolerance of 1e-7, are included). When the total
+    count of a gene exceeds 10000 and :code:`p` is not 0.5, Pearson's
+    chi-square test with continuity correction is used instead.
 
     Then the counts are reasonably large, the binomial test, Fisher's test and
     Pearson's chi square all give the same results. When the counts are
@@ -104,18 +110,31 @@ def binomTest(y1, y2, n1=None, n2=None, p=None):
             size = size[i]
             p_value[i] = np.minimum(2 * binom.cdf(y1, n=size, p=0.5), 1)
         return p_value
+    # Pearson's chi-square test (with Yates' continuity correction) for large
+    # counts, vectorized over genes
     big = size > 10000
     if big.any():
-        for i in range(len(y1)):
-            if big[i]:
-                p_value[i] = chi2_contingency(
-                    np.array([[y1[i], n1 - y1[i]], [y2[i], n2 - y2[i]]])
-                ).pvalue
-    size0 = size[(size > 0) & ~big]
-    for isize in np.unique(size0):
-        i = size == isize
-        d = binom.pmf(np.arange(isize + 1), p=p, n=isize)
-        o = np.argsort(d, kind="stable")
-        cumsump = d[o].cumsum()[np.argsort(o, kind="stable")]
-        p_value[i] = cumsump[y1[i]]
+        observed = np.array(
+            [[y1[big], n1 - y1[big]], [y2[big], n2 - y2[big]]], dtype="double"
+        )
+        expected = (
+            observed.sum(axis=1, keepdims=True)
+            * observed.sum(axis=0, keepdims=True)
+            / observed.sum(axis=(0, 1))
+        )
+        diff = expected - observed
+        observed += np.sign(diff) * np.minimum(0.5, np.abs(diff))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stat = ((observed - expected) ** 2 / expected).sum(axis=(0, 1))
+        p_value[big] = chi2.sf(stat, 1)
+
+    # exact test for smaller counts
+    i = (size > 0) & ~big
+    if i.any():
+        p_value[i] = binom_test_cython(
+            np.asarray(y1[i], dtype="double"),
+            np.asarray(size[i], dtype="double"),
+            p,
+            nthreads=_numThreads(),
+        )
     return p_value
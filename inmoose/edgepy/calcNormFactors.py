@@ -0,0 +1,386 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2008-2022 Yunshun Chen, Aaron TL Lun, Davis J McCarthy, Matthew E Ritchie, Belinda Phipson, Yifang Hu, Xiaobei Zhou, Mark D Robinson, Gordon K Smyth
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+# This file is based on the file 'R/calcNormFactors.R' of the Bioconductor edgeR package (version 3.38.4).
+
+
+import numpy as np
+from scipy.sparse import csc_matrix, issparse
+from scipy.stats import rankdata
+
+from ..utils import LOGGER
+
+# maximum number of matrix elements processed at once
+_BLOCK_SIZE = 2**24
+
+
+def calcNormFactors_DGEList(self, method="TMM", **kwargs):
+    """
+    Calculate scaling factors to convert the raw library sizes of a DGEList
+    into normalized effective library sizes.
+
+    NB: modifies :code:`self` in place
+
+    See :func:`calcNormFactors` for the details of the arguments.
+
+    Arguments
+    ---------
+    self : DGEList
+        the DGEList to normalize
+    method : str
+        normalization method, see :func:`calcNormFactors`
+    **kwargs
+        additional arguments passed to :func:`calcNormFactors`
+
+    Returns
+    -------
+    DGEList
+        :code:`self`, with updated :code:`samples["norm_factors"]`
+    """
+    self.samples["norm_factors"] = calcNormFactors(
+        self.counts, lib_size=self.samples["lib_size"], method=method, **kwargs
+    )
+    return self
+
+
+def calcNormFactors(
+    counts,
+    lib_size=None,
+    method="TMM",
+    ref_column=None,
+    logratio_trim=0.3,
+    sum_trim=0.05,
+    do_weighting=True,
+    A_cutoff=-1e10,
+    p=0.75,
+):
+    """
+    Calculate scaling factors to convert the raw library sizes into normalized
+    effective library sizes.
+
+    The available methods are:
+
+    - "TMM", the trimmed mean of M-values proposed by Robinson and Oshlack
+      (2010) [1]_. The M-values (log-ratios of expression) of each library
+      against a reference library are averaged, after trimming the genes with
+      the :code:`logratio_trim` most extreme M-values and the
+      :code:`sum_trim` most extreme A-values (average log-expression), with
+      precision weights if :code:`do_weighting` is :code:`True`. The
+      reference library is the one whose upper quartile is closest to the
+      mean upper quartile.
+    - "TMMwsp", TMM with singleton pairing. This variant of TMM is intended to
+      perform better for data with a high proportion of zeros: the genes with
+      a positive count in only one of the two libraries are paired together
+      and used in the computation. The reference library is the one with the
+      largest sum of square-root counts.
+    - "RLE", the relative log expression method of Anders and Huber (2010)
+      [2]_. The scale factor of each library is the median of the ratios of
+      its counts to the geometric means of the genes across all libraries.
+    - "upperquartile", the upper-quartile normalization of Bullard et al.
+      (2010) [3]_. The scale factor of each library is its :code:`p`
+      quantile of the counts, divided by the library size.
+    - "none", all factors are set to 1.
+
+    All libraries are processed at once: the computations are vectorized over
+    the libraries, by blocks of libraries for large datasets. Sparse count
+    matrices are densified one block of libraries at a time.
+
+    The factors are scaled to multiply to one.
+
+    Arguments
+    ---------
+    counts : matrix or sparse matrix
+        matrix of counts, one row per gene and one column per library
+    lib_size : array_like, optional
+        library sizes. Defaults to the column sums of :code:`counts`.
+    method : str
+        normalization method, one of "TMM", "TMMwsp", "RLE", "upperquartile"
+        or "none". Defaults to "TMM".
+    ref_column : int, optional
+        index of the reference library for "TMM" and "TMMwsp"
+    logratio_trim : float
+        proportion of the M-values to trim on each side for "TMM" and
+        "TMMwsp"
+    sum_trim : float
+        proportion of the A-values to trim on each side for "TMM" and "TMMwsp"
+    do_weighting : bool
+        whether to compute weighted means of the M-values for "TMM" and
+        "TMMwsp"
+    A_cutoff : float
+        genes with an A-value below this cutoff are ignored by "TMM"
+    p : float
+        quantile used by "upperquartile"
+
+    Returns
+    -------
+    ndarray
+        vector of normalization factors, one per library
+
+    References
+    ----------
+    .. [1] M. D. Robinson, A. Oshlack. 2010. A scaling normalization method for
+       differential expression analysis of RNA-seq data. Genome Biology 11,
+       R25. :doi:`10.1186/gb-2010-11-3-r25`
+    .. [2] S. Anders, W. Huber. 2010. Differential expression analysis for
+       sequence count data. Genome Biology 11, R106.
+       :doi:`10.1186/gb-2010-11-10-r106`
+    .. [3] J. H. Bullard, E. Purdom, K. D. Hansen, S. Dudoit. 2010. Evaluation
+       of statistical methods for normalization and differential expression in
+       mRNA-Seq experiments. BMC Bioinformatics 11, 94.
+       :doi:`10.1186/1471-2105-11-94`
+    """
+    if issparse(counts):
+        x = csc_matrix(counts, dtype=float)
+        x.eliminate_zeros()
+    else:
+        x = np.asarray(counts, dtype=float)
+        if np.isnan(x).any():
+            raise ValueError("NA counts not permitted")
+    nsamples = x.shape[1]
+
+    # Check lib_size
+    if lib_size is None:
+        lib_size = np.asarray(x.sum(axis=0)).ravel()
+    else:
+        lib_size = np.asarray(lib_size, dtype=float)
+        if np.isnan(lib_size).any():
+            raise ValueError("NA lib_sizes not permitted")
+        if lib_size.shape == () or len(lib_size) == 1:
+            lib_size = np.full(nsamples, lib_size.ravel()[0])
+        if len(lib_size) != nsamples:
+            raise ValueError("len(lib_size) doesn't match number of samples")
+
+    if method not in ["TMM", "TMMwsp", "RLE", "upperquartile", "none"]:
+        raise ValueError(f"invalid normalization method: {method}")
+
+    # Remove all zero rows
+    allzero = np.asarray((x > 0).sum(axis=1)).ravel() == 0
+    if allzero.any():
+        x = x[~allzero]
+
+    # Degenerate cases
+    if x.shape[0] == 0 or nsamples == 1:
+        method = "none"
+
+    # Calculate factors
+    if method == "TMM":
+        if ref_column is None:
+            f75 = _calcFactorQuantile(x, lib_size, p=0.75, warn=False)
+            if np.median(f75) < 1e-20:
+                ref_column = np.argmax(np.asarray(_sqrt(x).sum(axis=0)).ravel())
+            else:
+                ref_column = np.argmin(np.abs(f75 - f75.mean()))
+        f = _calcFactorTMM(
+            x,
+            ref_column,
+            lib_size,
+            logratio_trim=logratio_trim,
+            sum_trim=sum_trim,
+            do_weighting=do_weighting,
+            A_cutoff=A_cutoff,
+        )
+    elif method == "TMMwsp":
+        if ref_column is None:
+            ref_column = np.argmax(np.asarray(_sqrt(x).sum(axis=0)).ravel())
+        f = _calcFactorTMMwsp(
+            x,
+            ref_column,
+            lib_size,
+            logratio_trim=logratio_trim,
+            sum_trim=sum_trim,
+            do_weighting=do_weighting,
+        )
+    elif method == "RLE":
+        f = _calcFactorRLE(x) / lib_size
+    elif method == "upperquartile":
+        f = _calcFactorQuantile(x, lib_size, p=p)
+    else:
+        f = np.ones(nsamples)
+
+    # Factors should multiply to one
+    return f / np.exp(np.mean(np.log(f)))
+
+
+def _sqrt(x):
+    return x.sqrt() if issparse(x) else np.sqrt(x)
+
+
+def _blocks(x):
+    """iterate over blocks of columns of x, as dense arrays"""
+    width = max(1, _BLOCK_SIZE // max(1, x.shape[0]))
+    for start in range(0, x.shape[1], width):
+        j = slice(start, min(start + width, x.shape[1]))
+        block = x[:, j]
+        yield (j, block.toarray() if issparse(block) else block)
+
+
+def _column(x, j):
+    """dense column j of x"""
+    col = x[:, [j]]
+    return (col.toarray() if issparse(col) else col).ravel()
+
+
+def _calcFactorRLE(x):
+    """median ratio of the counts to the geometric means of the genes"""
+    # the geometric mean is positive only for genes with no zero count
+    allpos = np.asarray((x > 0).sum(axis=1)).ravel() == x.shape[1]
+    data = x[allpos]
+    if issparse(data):
+        data = data.toarray()
+    if data.shape[0] == 0:
+        return np.full(x.shape[1], np.nan)
+    gm = np.exp(np.log(data).mean(axis=1, keepdims=True))
+    return np.median(data / gm, axis=0)
+
+
+def _calcFactorQuantile(x, lib_size, p=0.75, warn=True):
+    """quantile of the counts of each library, divided by the library size"""
+    f = np.empty(x.shape[1])
+    for j, block in _blocks(x):
+        f[j] = np.quantile(block, p, axis=0)
+    if warn and f.min() == 0:
+        LOGGER.warning("One or more quantiles are zero")
+    return f / lib_size
+
+
+def _trimmedKeep(values, n, trim):
+    """
+    for each column, whether the rank of each value lies within the trimmed
+    range, ties being given their average rank (NaN values are ignored)
+    """
+    lo = np.floor(n * trim) + 1
+    hi = n + 1 - lo
+    rank = rankdata(values, axis=0, nan_policy="omit")
+    with np.errstate(invalid="ignore"):
+        return (rank >= lo) & (rank <= hi)
+
+
+def _orderKeep(keys, valid, n, trim):
+    """
+    for each column, whether the position of each value in the (stable)
+    lexicographic order of keys lies within the trimmed range
+    """
+    order = np.lexsort(keys + (~valid,), axis=0)
+    pos = np.empty_like(order)
+    np.put_along_axis(pos, order, np.arange(order.shape[0])[:, None], axis=0)
+    lo = np.floor(n * trim).astype(int)
+    return (pos >= lo) & (pos < n - lo)
+
+
+def _calcFactorTMM(
+    x, ref_column, lib_size, logratio_trim, sum_trim, do_weighting, A_cutoff
+):
+    """TMM factors of all columns of x against column ref_column"""
+    ref = _column(x, ref_column)[:, None]
+    nR = lib_size[ref_column]
+    f = np.ones(x.shape[1])
+    for j, obs in _blocks(x):
+        nO = lib_size[j]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # log ratio of expression, accounting for library size
+            logR = np.log2((obs / nO) / (ref / nR))
+            # absolute expression
+            absE = (np.log2(obs / nO) + np.log2(ref / nR)) / 2
+            # estimated asymptotic variance
+            v = (nO - obs) / nO / obs + (nR - ref) / nR / ref
+
+        # remove infinite values, cutoff based on A
+        fin = np.isfinite(logR) & np.isfinite(absE) & (absE > A_cutoff)
+        logR[~fin] = np.nan
+        absE[~fin] = np.nan
+        n = fin.sum(axis=0)
+
+        keep = _trimmedKeep(logR, n, logratio_trim) & _trimmedKeep(absE, n, sum_trim)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if do_weighting:
+                num = np.nansum(np.where(keep, logR / v, 0), axis=0)
+                den = np.nansum(np.where(keep, 1 / v, 0), axis=0)
+                fj = num / den
+            else:
+                fj = np.where(keep, logR, 0).sum(axis=0) / keep.sum(axis=0)
+        # results are missing if the two libraries share no features with
+        # positive counts: return unity
+        fj[np.isnan(fj)] = 0
+        fj = 2**fj
+
+        maxabs = np.max(np.abs(np.where(fin, logR, 0)), axis=0)
+        fj[(n == 0) | (maxabs < 1e-6)] = 1
+        f[j] = fj
+    return f
+
+
+def _calcFactorTMMwsp(x, ref_column, lib_size, logratio_trim, sum_trim, do_weighting):
+    """TMM with singleton pairing factors of all columns of x against column ref_column"""
+    eps = 1e-14
+    ref = _column(x, ref_column)[:, None]
+    nR = lib_size[ref_column]
+    nrow = x.shape[0]
+    f = np.ones(x.shape[1])
+    for j, obs in _blocks(x):
+        nO = lib_size[j]
+        pos_obs = obs > eps
+        pos_ref = np.broadcast_to(ref > eps, obs.shape)
+        both = pos_obs & pos_ref
+        zero_obs = ~pos_obs & pos_ref
+        zero_ref = pos_obs & ~pos_ref
+
+        # Pair the k-th largest positive count among the genes with a zero
+        # reference count with the k-th largest reference count among the genes
+        # with a zero count
+        n_singles = np.minimum(zero_obs.sum(axis=0), zero_ref.sum(axis=0))
+        order = np.argsort(np.where(zero_ref, -obs, np.inf), axis=0, kind="stable")
+        rank = np.empty_like(order)
+        np.put_along_axis(rank, order, np.arange(nrow)[:, None], axis=0)
+        paired = zero_ref & (rank < n_singles)
+        ref_sorted = -np.sort(np.where(zero_obs, -ref, np.inf), axis=0)
+        ref_paired = np.take_along_axis(ref_sorted, np.minimum(rank, nrow - 1), axis=0)
+
+        valid = both | paired
+        ref_full = np.where(both, ref, np.where(paired, ref_paired, np.nan))
+        obs_full = np.where(valid, obs, np.nan)
+        n = valid.sum(axis=0)
+        # position of the genes in edgeR's vector: the genes with positive
+        # counts in both libraries first, then the paired singletons
+        position = np.where(both, np.arange(nrow)[:, None], nrow + rank)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            obs_p = obs_full / nO
+            ref_p = ref_full / nR
+            M = np.log2(obs_p / ref_p)
+            A = 0.5 * np.log2(obs_p * ref_p)
+            M_shrunk = np.log2(
+                ((obs_full + 0.5) / (nO + 0.5)) / ((ref_full + 0.5) / (nR + 0.5))
+            )
+
+        keep_M = _orderKeep((position, M_shrunk, M), valid, n, logratio_trim)
+        keep_A = _orderKeep((position, A), valid, n, sum_trim)
+        keep = valid & keep_M & keep_A
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if do_weighting:
+                v = (1 - obs_p) / obs_p / nO + (1 - ref_p) / ref_p / nR
+                w = np.where(keep, (1 + 1e-6) / (v + 1e-6), 0)
+                fj = np.where(keep, w * M, 0).sum(axis=0) / w.sum(axis=0)
+            else:
+                fj = np.where(keep, M, 0).sum(axis=0) / keep.sum(axis=0)
+        fj = 2**fj
+
+        maxabs = np.max(np.abs(np.where(valid, M, 0)), axis=0)
+        fj[(n == 0) | (maxabs < 1e-6)] = 1
+        f[j] = fj
+    return f
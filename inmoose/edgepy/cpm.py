@@ -0,0 +1,143 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2008-2022 Yunshun Chen, Aaron TL Lun, Davis J McCarthy, Matthew E Ritchie, Belinda Phipson, Yifang Hu, Xiaobei Zhou, Mark D Robinson, Gordon K Smyth
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+
+# This file is based on the file 'R/cpm.R' of the Bioconductor edgeR package (version 3.38.4).
+# This file contains a Python port of the original C++ code from the file
+# 'src/R_calculate_cpm.cpp' of the Bioconductor edgeR package (version 3.38.4).
+
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, issparse
+
+from .addPriorCount import add_prior_count
+from .makeCompressedMatrix import _compressOffsets, _compressPrior
+
+
+def cpm_DGEList(self, normalized_lib_sizes=True, log=False, prior_count=2):
+    """
+    Compute counts per million (CPM) of a DGEList.
+
+    See :func:`cpm` for details.
+
+    Arguments
+    ---------
+    self : DGEList
+        the DGEList containing the matrix of counts
+    normalized_lib_sizes : bool
+        whether to use normalized library sizes. Defaults to :code:`True`.
+    log : bool
+        whether to return log2 values. Defaults to :code:`False`.
+    prior_count : float or array_like
+        average count to be added to each observation to avoid taking log of
+        zero. Used only if :code:`log=True`.
+
+    Returns
+    -------
+    pd.DataFrame
+        matrix of counts per million, with the same labels as
+        :code:`self.counts`
+    """
+    return cpm(
+        self.counts,
+        lib_size=self.getLibSize(normalized=normalized_lib_sizes),
+        log=log,
+        prior_count=prior_count,
+    )
+
+
+def cpm(y, lib_size=None, offset=None, log=False, prior_count=2):
+    """
+    Compute counts per million (CPM).
+
+    CPM values are the counts divided by the library sizes, multiplied by one
+    million. If :code:`log=True`, then the log2 CPM are computed after adding
+    a prior count scaled to the library size of each library (see
+    :func:`addPriorCount`), so that the log-CPM are always finite.
+
+    If :code:`offset` is supplied, it is used in favor of :code:`lib_size`,
+    where :code:`exp(offset)` is defined as the vector/matrix of library
+    sizes.
+
+    The computation is vectorized over the whole matrix. Sparse counts yield
+    sparse CPM values, computed on the non-zero counts only. Log-CPM values are
+    always dense, since the zero counts have finite log-CPM values.
+
+    Arguments
+    ---------
+    y : array_like, pd.DataFrame or sparse matrix
+        matrix of counts, genes in rows and libraries in columns
+    lib_size : array_like, optional
+        vector of library sizes. Defaults to the column sums of :code:`y`.
+    offset : array_like, optional
+        vector or matrix of offsets
+    log : bool
+        whether to return log2 values. Defaults to :code:`False`.
+    prior_count : float or array_like
+        average count to be added to each observation to avoid taking log of
+        zero. Can be a scalar or a vector with one value per gene. Used only if
+        :code:`log=True`.
+
+    Returns
+    -------
+    ndarray, pd.DataFrame or sparse matrix
+        matrix of counts per million, of the same shape as :code:`y`. A
+        :code:`pd.DataFrame` (with the labels of :code:`y`) if :code:`y` is
+        a :code:`pd.DataFrame`, a sparse matrix if :code:`y` is sparse and
+        :code:`log=False`, and a dense matrix otherwise.
+    """
+    labels = None
+    if isinstance(y, pd.DataFrame):
+        labels = (y.index, y.columns)
+        y = y.to_numpy()
+    if issparse(y):
+        y = csr_matrix(y, dtype=float)
+    else:
+        y = np.asarray(y, dtype=float)
+    if lib_size is None and offset is None:
+        lib_size = np.asarray(y.sum(axis=0)).ravel()
+    offset = _compressOffsets(y, lib_size=lib_size, offset=offset)
+
+    if log:
+        prior_count = _compressPrior(y, prior_count)
+        y, adj_libs = add_prior_count(y, offset, prior_count)
+        out = (np.log(np.asarray(y)) - adj_libs + np.log(1e6)) / np.log(2)
+    elif issparse(y):
+        # only the non-zero counts are scaled
+        out = y.copy()
+        if offset.repeat_row:
+            libs = np.exp(np.asarray(offset)[0])[y.indices]
+        else:
+            libs = np.exp(np.asarray(offset)[_sparseRows(y), y.indices])
+        out.data = out.data / libs * 1e6
+    else:
+        if offset.repeat_row:
+            libs = np.exp(np.asarray(offset)[0])
+        else:
+            libs = np.exp(offset)
+        out = np.asarray(y / libs * 1e6)
+
+    if labels is not None:
+        out = pd.DataFrame(out, index=labels[0], columns=labels[1])
+    return out
+
+
+def _sparseRows(x):
+    """row index of each stored element of the CSR matrix x"""
+    return np.repeat(np.arange(x.shape[0]), np.diff(x.indptr))
@@ -0,0 +1,79 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2008-2022 Yunshun Chen, Aaron TL Lun, Davis J McCarthy, Matthew E Ritchie, Belinda Phipson, Yifang Hu, Xiaobei Zhou, Mark D Robinson, Gordon K Smyth
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+# This file is based on the file 'R/cutWithMinN.R' of the Bioconductor edgeR package (version 3.38.4).
+
+
+import numpy as np
+
+
+def cutWithMinN(x, intervals=2, min_n=1):
+    """
+    Divide numeric values into intervals, striking a compromise between
+    intervals of equal length and intervals with equal numbers of observations.
+
+    Intervals of equal length are tried first. If some of them contain fewer
+    than :code:`min_n` values, the breaks are moved step by step towards the
+    quantiles of :code:`x`, until every interval contains at least
+    :code:`min_n` values. In the last resort, the values are split by rank into
+    intervals with (nearly) equal numbers of observations.
+
+    Arguments
+    ---------
+    x : array_like
+        vector of values to divide into intervals
+    intervals : int
+        number of intervals
+    min_n : int
+        minimum number of values in each interval
+
+    Returns
+    -------
+    ndarray
+        vector of integers in :code:`range(intervals)`, giving the interval of
+        each value of :code:`x`
+    ndarray
+        the breaks between the intervals, or :code:`None` if the values were
+        split by rank
+    """
+    x = np.asarray(x, dtype=float)
+    nx = len(x)
+    if intervals < 1:
+        raise ValueError("number of intervals must be at least 1")
+    if nx == 0:
+        return (np.zeros(0, dtype=int), None)
+    if intervals == 1:
+        return (np.zeros(nx, dtype=int), None)
+    if nx < intervals * min_n:
+        raise ValueError("too few observations: len(x) < intervals*min_n")
+
+    # Intervals of equal length, blended towards equal numbers
+    equal_length = np.linspace(x.min(), x.max(), intervals + 1)
+    equal_n = np.quantile(x, np.linspace(0, 1, intervals + 1))
+    for w in np.linspace(0, 0.9, 10):
+        breaks = (1 - w) * equal_length + w * equal_n
+        breaks[0] = -np.inf
+        breaks[-1] = np.inf
+        group = np.digitize(x, breaks[1:-1], right=True)
+        if np.all(np.bincount(group, minlength=intervals) >= min_n):
+            return (group, breaks)
+
+    # Intervals with equal numbers of observations
+    rank = np.empty(nx, dtype=int)
+    rank[np.argsort(x, kind="stable")] = np.arange(nx)
+    return (rank * intervals // nx, None)
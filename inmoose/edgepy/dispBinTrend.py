@@ -0,0 +1,190 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2008-2022 Yunshun Chen, Aaron TL Lun, Davis J McCarthy, Matthew E Ritchie, Belinda Phipson, Yifang Hu, Xiaobei Zhou, Mark D Robinson, Gordon K Smyth
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+# This file is based on the file 'R/dispBinTrend.R' of the Bioconductor edgeR package (version 3.38.4).
+
+
+import numpy as np
+from statsmodels.nonparametric.smoothers_lowess import lowess
+
+from ..utils import lm_fit, ns
+from .aveLogCPM import aveLogCPM
+from .cutWithMinN import cutWithMinN
+from .dispCoxReid import dispCoxReid
+from .makeCompressedMatrix import _compressOffsets, _compressWeights
+
+
+def dispBinTrend(
+    y,
+    design=None,
+    offset=None,
+    df=5,
+    span=0.3,
+    min_n=400,
+    method_bin="CoxReid",
+    method_trend="spline",
+    AveLogCPM=None,
+    weights=None,
+):
+    """
+    Estimate the abundance-dependent trend in the biological coefficient of
+    variation (BCV), the square root of the dispersion, by computing a common
+    dispersion for bins of genes.
+
+    This is a low-level function called by :func:`estimateGLMTrendedDisp`.
+
+    Genes with positive counts are grouped into bins of similar
+    :code:`AveLogCPM`, with at least :code:`min_n` genes in each bin (see
+    :func:`cutWithMinN`). A common dispersion is estimated for each bin with
+    :func:`dispCoxReid`, so that the trend costs one common dispersion fit per
+    bin, each on a small number of genes. The square roots of the bin
+    dispersions are then smoothed, either by a natural cubic spline regression
+    with :code:`df` degrees of freedom (:code:`method_trend="spline"`) or by a
+    lowess fit with smoothing span :code:`span` (:code:`method_trend="loess"`),
+    and the smooth curve is evaluated at the :code:`AveLogCPM` of every gene.
+
+    Arguments
+    ---------
+    y : matrix
+        matrix of counts
+    design : matrix, optional
+        design matrix, as in :func:`glmFit`
+    offset : array_like, optional
+        vector or matrix of offsets for the log-linear models, as in
+        :func:`glmFit`. Defaults to :code:`log(colSums(y))`.
+    df : int
+        degrees of freedom for the spline regression
+    span : float
+        smoothing span for the lowess regression
+    min_n : int
+        minimum number of genes in each bin
+    method_bin : str
+        method used to estimate the dispersion in each bin. Only "CoxReid" is
+        supported.
+    method_trend : str
+        type of curve to smooth the bin dispersions, either "spline" or
+        "loess". "loess" is always used if there are fewer than 7 bins.
+    AveLogCPM : array_like, optional
+        vector giving average log2 counts per million
+    weights : matrix, optional
+        observation weights
+
+    Returns
+    -------
+    dict
+        dictionary with keys :code:`"AveLogCPM"` (average log2 counts per
+        million of each gene), :code:`"dispersion"` (trended dispersion of each
+        gene), :code:`"bin_AveLogCPM"` (average log2 counts per million of each
+        bin) and :code:`"bin_dispersion"` (common dispersion of each bin)
+    """
+    # Check y
+    y = np.asarray(y)
+    (ntags, nlibs) = y.shape
+    pos = y.sum(axis=1) > 0
+    if not pos.any():
+        return {"AveLogCPM": AveLogCPM, "dispersion": np.zeros(ntags)}
+    npostags = pos.sum()
+
+    # Check design
+    if design is None:
+        design = np.ones((nlibs, 1))
+    else:
+        design = np.asarray(design)
+
+    # Check offset and weights
+    if offset is None:
+        offset = np.log(y.sum(axis=0))
+    offset = _compressOffsets(y, offset=offset)
+    weights = _compressWeights(y, weights)
+
+    # Check AveLogCPM
+    if AveLogCPM is None:
+        AveLogCPM = aveLogCPM(y, offset=offset, weights=weights)
+    AveLogCPM = np.asarray(AveLogCPM)
+
+    # Check methods
+    if method_bin != "CoxReid":
+        raise ValueError(f"invalid method for the bin dispersions: {method_bin}")
+    if method_trend not in ["spline", "loess"]:
+        raise ValueError(f"invalid method for the trend: {method_trend}")
+
+    # Define bins
+    if npostags < 100:
+        nbins = 1
+    else:
+        nbins = min(int(npostags // min_n), 1000)
+        if nbins < 1:
+            nbins = 1
+    min_n = min(min_n, npostags // nbins)
+    bins, _ = cutWithMinN(AveLogCPM[pos], intervals=nbins, min_n=min_n)
+
+    # Estimate the common dispersion of each bin
+    y = y[pos]
+    offset = offset[pos]
+    weights = weights[pos]
+    ave = AveLogCPM[pos]
+    disp_bins = np.empty(nbins)
+    ave_bins = np.empty(nbins)
+    for i in range(nbins):
+        b = bins == i
+        disp_bins[i] = dispCoxReid(
+            y[b],
+            design=design,
+            offset=offset[b],
+            weights=weights[b],
+            min_row_sum=0,
+        )
+        ave_bins[i] = ave[b].mean()
+
+    # If only one bin, then the trend is a flat line
+    if nbins == 1:
+        return {
+            "AveLogCPM": AveLogCPM,
+            "dispersion": np.full(ntags, disp_bins[0]),
+            "bin_AveLogCPM": ave_bins,
+            "bin_dispersion": disp_bins,
+        }
+
+    # Smooth the bin dispersions
+    if nbins < 7:
+        method_trend = "loess"
+
+    if method_trend == "spline":
+        # Natural spline regression, with the outermost knots moved towards
+        # the range of the bins
+        knots = np.quantile(ave_bins, np.arange(1, df) / df)
+        r = (ave_bins.min(), ave_bins.max())
+        knots[0] = 0.3 * knots[0] + 0.7 * r[0]
+        knots[-1] = 0.3 * knots[-1] + 0.7 * r[1]
+        basisbins = ns(ave_bins, knots=knots, include_intercept=True)
+        fit = lm_fit(basisbins.basis, np.sqrt(disp_bins))
+        basisall = basisbins.predict(AveLogCPM)
+        dispersion = (basisall.basis @ fit.coefficients) ** 2
+    else:
+        o = np.argsort(ave_bins)
+        fitted = lowess(
+            np.sqrt(disp_bins[o]), ave_bins[o], frac=span, it=0, return_sorted=False
+        )
+        dispersion = np.interp(AveLogCPM, ave_bins[o], fitted) ** 2
+
+    return {
+        "AveLogCPM": AveLogCPM,
+        "dispersion": dispersion,
+        "bin_AveLogCPM": ave_bins,
+        "bin_dispersion": disp_bins,
+    }
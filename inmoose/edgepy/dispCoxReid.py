@@ -18,13 +18,20 @@
 
 # This file is based on the file 'R/dispCoxReid.R' of the Bioconductor edgeR package (version 3.38.4).
 
+import time
 
 import numpy as np
 from scipy.optimize import minimize_scalar
 
-from .adjustedProfileLik import adjustedProfileLik
+from ..utils import LOGGER
+from .adjustedProfileLik import _adjustedProfileLik
 from .aveLogCPM import aveLogCPM
-from .makeCompressedMatrix import _compressOffsets, _compressWeights
+from .makeCompressedMatrix import (
+    _compressDispersions,
+    _compressOffsets,
+    _compressWeights,
+)
+from .parallel import SharedGeneArrays
 from .systematicSubset import systematicSubset
 
 
@@ -38,6 +45,9 @@ def dispCoxReid(
     tol=1e-5,
     min_row_sum=5,
     subset=10000,
+    warm_start=True,
+    return_info=False,
+    n_jobs=None,
 ):
     """
     Estimate a common dispersion parameter across multiple negative binomial
@@ -48,6 +58,13 @@ def dispCoxReid(
     Estimation is done by maximizing the Cox-Reid adjusted profile likelihood
     (Cox and Reid, 1987 [1]_), through :func:`scipy.optimize.minimize_scalar`.
 
+    Each evaluation of the objective refits a GLM for every gene. Unless
+    :code:`warm_start` is :code:`False`, the GLMs are first fitted once at the
+    middle of the dispersion interval, and every refit starts from these
+    reference coefficients. The objective thus does not depend on the order of
+    the evaluations, and only changes within the convergence tolerance of the
+    GLM fits.
+
     Robinson and Smyth (2008) [2]_ and McCarthy et al. (2012) [3]_ showed that
     the Pearson (pseudo-likelihood) estimator typically under-estimates the true
     dispersion. It can be seriously biased when the number of libraries is small.
@@ -79,11 +96,25 @@ def dispCoxReid(
     subset : int, optional
         number of rows to use in the calculation. Rows used are chosen evenly
         space by :code:`AveLogCPM`.
+    warm_start : bool, optional
+        whether to start the GLM fits of each objective evaluation from the
+        coefficients fitted at the middle of the dispersion interval.
+        Defaults to :code:`True`.
+    return_info : bool, optional
+        whether to also return information about the optimization. Defaults to
+        :code:`False`.
+    n_jobs : int, optional
+        number of worker processes fitting the GLMs, see
+        :func:`adjustedProfileLik`. Defaults to 1.
 
     Returns
     -------
     float
         the estimated common dispersion
+    dict (only if :code:`return_info` is :code:`True`)
+        information about the optimization: the number of objective
+        evaluations :code:`"nfev"`, the number of iterations :code:`"nit"` of
+        the optimizer, and the elapsed time in seconds :code:`"time"`
 
     References
     ----------
@@ -109,8 +140,7 @@ def dispCoxReid(
     # Check offset
     if offset is None:
         offset = np.log(y.sum(axis=0))
-    if offset.ndim == 1:
-        offset = np.broadcast_to(offset, y.shape)
+    offset = _compressOffsets(y, offset=offset)
     assert offset.shape == y.shape
 
     if interval[0] < 0:
@@ -141,18 +171,42 @@ def dispCoxReid(
         if weights is not None:
             weights = weights[i, :]
 
-    # Function for optimizing
-    def sumAPL(par, y, design, offset, weights):
-        return -sum(adjustedProfileLik(par**4, y, design, offset, weights=weights))
-
-    # anticipate the calls to _compress* in adjustedProfileLik
+    # check the arrays once for all the evaluations of the objective
     y = np.asarray(y)
     offset = _compressOffsets(y, offset=offset)
     weights = _compressWeights(y, weights)
-    out = minimize_scalar(
-        sumAPL,
-        args=(y, design, offset, weights),
-        bounds=(interval[0] ** 0.25, interval[1] ** 0.25),
-        options={"xatol": tol},
+
+    t0 = time.perf_counter()
+    bounds = (interval[0] ** 0.25, interval[1] ** 0.25)
+    # the counts, offsets and weights are shared once with the worker
+    # processes, for all the evaluations of the objective
+    with SharedGeneArrays(
+        {"y": y, "offset": offset, "weights": weights}, n_jobs=n_jobs
+    ) as shared:
+
+        def apl(par, arrays):
+            dispersion = _compressDispersions(y, par**4)
+            return shared.map(
+                _adjustedProfileLik,
+                {"dispersion": dispersion, **arrays},
+                design=design,
+                adjust=True,
+            )
+
+        # all the GLM fits start from the same reference coefficients, so that
+        # the objective does not depend on the previous evaluations
+        start = apl(np.mean(bounds), {"start": None})[1] if warm_start else None
+        shared.update({"start": start})
+
+        # Function for optimizing
+        def sumAPL(par):
+            return -sum(apl(par, {})[0])
+
+        out = minimize_scalar(sumAPL, bounds=bounds, options={"xatol": tol})
+    info = {"nfev": out.nfev, "nit": out.nit, "time": time.perf_counter() - t0}
+    LOGGER.debug(
+        f"dispCoxReid: {info['nfev']} evaluations of the objective in {info['time']:.3f}s"
     )
+    if return_info:
+        return (out.x**4, info)
     return out.x**4
@@ -127,8 +127,7 @@ def dispCoxReidInterpolateTagwise(
     if offset is None:
         lib_size = y.sum(axis=0)
         offset = np.log(lib_size)
-    if offset.ndim == 1:
-        offset = np.broadcast_to(offset, y.shape)
+    offset = _compressOffsets(y, offset=offset)
     assert offset.shape == y.shape
 
     # Check AveLogCPM
@@ -171,16 +170,22 @@ def dispCoxReidInterpolateTagwise(
         grid_range[0] + i * (grid_range[1] - grid_range[0]) / (grid_npts - 1)
         for i in range(grid_npts)
     ]
-    apl = np.zeros((ntags, grid_npts))
     # anticipate the calls to _compress* in adjustedProfileLik
     y = np.asarray(y)
     offset = _compressOffsets(y, offset=offset)
     weights = _compressWeights(y, weights)
-    for i in range(grid_npts):
-        spline_disp = dispersion * 2 ** spline_pts[i]
-        apl[:, i] = adjustedProfileLik(
-            spline_disp, y=y, design=design, offset=offset, weights=weights
-        )
+    # The GLM fit at each grid point is warm-started from the coefficients
+    # fitted at the neighbouring grid point. The grid is swept from the point
+    # closest to the input dispersion outwards, in both directions.
+    center = int(np.argmin(np.abs(spline_pts)))
+    apl = _gridAPL(
+        y,
+        offset,
+        weights,
+        design,
+        [dispersion * 2**pt for pt in spline_pts],
+        center,
+    )
 
     if trend:
         o = np.argsort(AveLogCPM)
@@ -195,3 +200,28 @@ def dispCoxReidInterpolateTagwise(
     d = maximizeInterpolant(spline_pts, apl_smooth)
     d = np.asarray(d)
     return dispersion * 2**d
+
+
+def _gridAPL(y, offset, weights, design, spline_disp, center):
+    """
+    adjusted profile log-likelihoods of the genes on the grid of dispersions
+    spline_disp (one scalar or vector of genewise dispersions per grid
+    point), sweeping from the grid point center outwards
+    """
+    l0 = np.zeros((y.shape[0], len(spline_disp)))
+    center_coef = None
+    for sweep in [range(center, len(spline_disp)), range(center - 1, -1, -1)]:
+        coef = center_coef
+        for i in sweep:
+            l0[:, i], coef = adjustedProfileLik(
+                spline_disp[i],
+                y=y,
+                design=design,
+                offset=offset,
+                weights=weights,
+                start=coef,
+                get_coef=True,
+            )
+            if i == center:
+                center_coef = coef
+    return l0
@@ -0,0 +1,149 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2008-2022 Yunshun Chen, Aaron TL Lun, Davis J McCarthy, Matthew E Ritchie, Belinda Phipson, Yifang Hu, Xiaobei Zhou, Mark D Robinson, Gordon K Smyth
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+# This file is based on the file 'R/dispCoxReidPowerTrend.R' of the Bioconductor edgeR package (version 3.38.4).
+
+
+import numpy as np
+from scipy.optimize import minimize
+
+from .adjustedProfileLik import adjustedProfileLik
+from .aveLogCPM import aveLogCPM
+from .makeCompressedMatrix import _compressOffsets, _compressWeights
+from .systematicSubset import systematicSubset
+
+
+def dispCoxReidPowerTrend(
+    y,
+    design=None,
+    offset=None,
+    AveLogCPM=None,
+    min_row_sum=5,
+    subset=10000,
+    weights=None,
+):
+    """
+    Estimate a power-law trend of the dispersion with respect to the abundance,
+    by maximizing the Cox-Reid adjusted profile likelihood.
+
+    This is a low-level function called by :func:`estimateGLMTrendedDisp`.
+
+    The dispersion of each gene is modeled as :code:`exp(a + b * AveLogCPM)`,
+    *i.e.* as a power of the expected count. The parameters :code:`a` and
+    :code:`b` are chosen to maximize the sum of the adjusted profile
+    likelihoods of the genes (see :func:`adjustedProfileLik`), with the
+    Nelder-Mead algorithm. The GLM fits of each evaluation of the objective
+    start from the coefficients fitted at the initial parameters, so that the
+    objective does not depend on the order of the evaluations.
+
+    Arguments
+    ---------
+    y : matrix
+        matrix of counts
+    design : matrix, optional
+        design matrix, as in :func:`glmFit`
+    offset : array_like, optional
+        vector or matrix of offsets for the log-linear models, as in
+        :func:`glmFit`. Defaults to :code:`log(colSums(y))`.
+    AveLogCPM : array_like, optional
+        vector giving average log2 counts per million
+    min_row_sum : int, optional
+        only rows with at least this number of counts are used to estimate the
+        trend
+    subset : int, optional
+        number of rows to use in the calculation. Rows used are chosen evenly
+        spaced by :code:`AveLogCPM`.
+    weights : matrix, optional
+        observation weights
+
+    Returns
+    -------
+    dict
+        dictionary with keys :code:`"AveLogCPM"` (average log2 counts per
+        million of each gene), :code:`"dispersion"` (trended dispersion of each
+        gene) and :code:`"coefficients"` (the parameters :code:`a` and
+        :code:`b` of the trend)
+    """
+    # Check y
+    y = np.asarray(y)
+    nlibs = y.shape[1]
+
+    # Check design
+    if design is None:
+        design = np.ones((nlibs, 1))
+    else:
+        design = np.asarray(design)
+
+    # Check offset and weights
+    if offset is None:
+        offset = np.log(y.sum(axis=0))
+    offset = _compressOffsets(y, offset=offset)
+    weights = _compressWeights(y, weights)
+
+    # Check AveLogCPM
+    if AveLogCPM is None:
+        AveLogCPM = aveLogCPM(y, offset=offset, weights=weights)
+    AveLogCPM = np.asarray(AveLogCPM)
+
+    # Apply min row count
+    keep = y.sum(axis=1) >= min_row_sum
+    if not keep.any():
+        raise ValueError("no data rows with required number of counts")
+    y = y[keep]
+    offset = offset[keep]
+    weights = weights[keep]
+    abundance = AveLogCPM[keep]
+
+    # Subsetting
+    if subset is not None and subset <= y.shape[0] / 2:
+        i = systematicSubset(subset, abundance)
+        y = y[i]
+        offset = offset[i]
+        weights = weights[i]
+        abundance = abundance[i]
+
+    # Function for optimizing
+    # all the GLM fits start from the coefficients fitted at the initial
+    # parameters, so that the objective does not depend on the simplex history
+    x0 = np.array([np.log(0.1), 0])
+
+    def fit(par, start=None):
+        dispersion = np.exp(par[0] + par[1] * abundance)
+        return adjustedProfileLik(
+            dispersion,
+            y,
+            design,
+            offset,
+            weights=weights,
+            start=start,
+            get_coef=True,
+        )
+
+    (apl0, start) = fit(x0)
+
+    def fun(par):
+        if np.array_equal(par, x0):
+            return -sum(apl0)
+        return -sum(fit(par, start)[0])
+
+    out = minimize(fun, x0=x0, method="Nelder-Mead")
+    return {
+        "AveLogCPM": AveLogCPM,
+        "dispersion": np.exp(out.x[0] + out.x[1] * AveLogCPM),
+        "coefficients": out.x,
+    }
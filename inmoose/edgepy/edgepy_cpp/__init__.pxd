@@ -25,6 +25,6 @@ cdef public ndarray[double, ndim=1] vector2ndarray "vector2ndarray"(const vector
 cdef public double compute_unit_nb_deviance(double, double, double)
 
 
-cdef extern from "maximize_interpolant.cpp":
-    cpdef vector.vector[double] cxx_maximize_interpolant "maximize_interpolant"(vector.vector[double] spts, ndarray[double] likelihoods) except +
+cdef extern from "interpolator.h":
+    double find_max(const size_t npts, const double* x, const double* y, double* work) nogil
 
@@ -23,18 +23,28 @@
 #   `compute_unit_nb_deviance`)
 # - 'src/R_compute_apl.cpp' and 'src/adj_coxreid.cpp' (functions `compute_apl`
 #   and `acr_compute`)
-# - 'src/glm_one_group.cpp' (function `glm_one_group_cython`)
-# - 'R/q2qnbinom.R' (function _q2qnbinom)
+# - 'src/glm_one_group.cpp' (functions `fit_one_way_cython` and
+#   `one_group_libs`)
+# - 'src/R_fit_levenberg.cpp' and 'src/glm_levenberg.cpp' (functions
+#   `fit_levenberg_cython` and `levenberg_one_tag`)
+# - 'R/q2qnbinom.R' (function `q2qnbinom_cython`)
+# - 'R/exactTestDoubleTail.R', 'R/exactTestBySmallP.R' and
+#   'R/exactTestByDeviance.R' (functions `exact_test_double_tail_cython`,
+#   `exact_test_by_small_p_cython` and `exact_test_by_deviance_cython`)
+# - 'R/binomTest.R' (function `binom_test_cython`)
+# - 'src/R_maximize_interpolant.cpp' (function `maximize_interpolant_cython`)
 
 import numpy as np
 cimport cython
 from libcpp.cmath cimport abs, log, isfinite, exp, isnan
 from numpy.math cimport INFINITY
 
-from libc.math cimport sqrt
+from cython.parallel cimport parallel, prange
+from libc.math cimport NAN, sqrt
+from libc.stdlib cimport free, malloc
 from scipy.special cimport cython_special as sp
 from scipy.special.cython_special cimport gammaln as lgamma
-from scipy.linalg.lapack import get_lapack_funcs
+from scipy.linalg.cython_lapack cimport dpotrf, dpotrs, dsytrf
 
 
 cdef public ndarray[double, ndim=1] vector2ndarray "vector2ndarray"(const vector.vector[double]& data):
@@ -78,6 +88,16 @@ cdef double compute_unit_nb_deviance(double y, double mu, double phi):
     ndarray
         matrix of deviances (same shape as :code:`y`)
     """
+    return unit_nb_deviance(y, mu, phi)
+
+
+@cython.cdivision(True)
+cdef inline double unit_nb_deviance(double y, double mu, double phi) noexcept nogil:
+    """
+    GIL-free implementation of :func:`compute_unit_nb_deviance`
+    """
+    cdef double resid, product
+
     # add a small value to protect against zero during division and log
     y = y + mildly_low_value
     mu = mu + mildly_low_value
@@ -95,12 +115,41 @@ cdef double compute_unit_nb_deviance(double y, double mu, double phi):
     else:
         return 2 * (y * log(y/mu) + (y + 1/phi) * log((mu + 1/phi)/(y + 1/phi)))
 
-@cython.ufunc
-cdef double _q2qnbinom(double x, double input_mean, double output_mean, double dispersion):
+@cython.cdivision(True)
+cdef inline double q2qnbinom_one(double x, double input_mean, double output_mean, double dispersion) noexcept nogil:
+    """quantile to quantile mapping of a single value, see :func:`q2qnbinom_cython`"""
+    cdef double eps = 1e-14
+    cdef double ri, vi, ro, vo, q1, p2, q2
+
+    if input_mean < eps or output_mean < eps:
+        input_mean += 0.25
+        output_mean += 0.25
+    ri = 1 + dispersion * input_mean
+    vi = input_mean * ri
+    ro = 1 + dispersion * output_mean
+    vo = output_mean * ro
+
+    q1 = output_mean + sqrt(vo / vi) * (x - input_mean)
+
+    if x >= input_mean:
+        p2 = sp.gammaincc(input_mean / ri, x/ri)
+        q2 = sp.gammainccinv(output_mean / ro, p2) * ro
+    else:
+        p2 = sp.gammainc(input_mean / ri, x/ri)
+        q2 = sp.gammaincinv(output_mean / ro, p2) * ro
+
+    return (q1+q2)/2
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cpdef ndarray q2qnbinom_cython(const double[:,:] x, const double[:,:] input_mean, const double[:,:] output_mean, const double[:,:] dispersion, int nthreads=1):
     """
     Interpolated quantile to quantile mapping between negative-binomial distributions with the same dispersion but different means.
 
-    This is the low-level Cythonized function called by :func:`q2qnbinom`.
+    This is the low-level function called by :func:`q2qnbinom`. The rows are
+    processed without holding the GIL, and are distributed across
+    :code:`nthreads` threads. The arguments are not checked.
 
     See also
     --------
@@ -109,15 +158,17 @@ cdef double _q2qnbinom(double x, double input_mean, double output_mean, double d
     Arguments
     ---------
     x : array_like
-        matrix of counts
+        matrix of non-negative counts
     input_mean : array_like
-        matrix of population means for :code:`x`. If 1-D, then of the same
-        length as :code:`x.shape[0]`
+        matrix of non-negative population means for :code:`x`, same shape as
+        :code:`x`
     output_mean : array_like
-        matrix of population means for the output values. If 1-D, then of the
-        same length as :code:`x.shape[0]`
+        matrix of non-negative population means for the output values, same
+        shape as :code:`x`
     dispersion : array_like
-        scalar, vector or matrix giving negative binomial dispersion values
+        matrix of non-negative dispersions, same shape as :code:`x`
+    nthreads : int
+        number of threads
 
     Returns
     -------
@@ -125,44 +176,33 @@ cdef double _q2qnbinom(double x, double input_mean, double output_mean, double d
         matrix of same dimensions as :code:`x`, with :code:`output_mean` as the
         new nominal population mean
     """
-    if x < 0:
-        raise ValueError("x must be non-negative")
-    if input_mean < 0:
-        raise ValueError("input_mean must be non-negative")
-    if output_mean < 0:
-        raise ValueError("output_mean must be non-negative")
-    if dispersion < 0:
-        raise ValueError("dispersion must be non-negative")
-
-    eps = 1e-14
-    if input_mean < eps or output_mean < eps:
-        input_mean += 0.25
-        output_mean += 0.25
-    ri = 1 + dispersion * input_mean
-    vi = input_mean * ri
-    ro = 1 + dispersion * output_mean
-    vo = output_mean * ro
+    cdef Py_ssize_t nrows = x.shape[0]
+    cdef Py_ssize_t ncols = x.shape[1]
+    cdef Py_ssize_t i, j
 
-    q1 = output_mean + sqrt(vo / vi) * (x - input_mean)
+    res = np.empty((nrows, ncols))
+    cdef double[:,::1] out = res
 
-    if x >= input_mean:
-        p2 = sp.gammaincc(input_mean / ri, x/ri)
-        q2 = sp.gammainccinv(output_mean / ro, p2) * ro
-    else:
-        p2 = sp.gammainc(input_mean / ri, x/ri)
-        q2 = sp.gammaincinv(output_mean / ro, p2) * ro
+    if nthreads < 1:
+        nthreads = 1
 
-    return (q1+q2)/2
+    for i in prange(nrows, nogil=True, schedule="static", num_threads=nthreads):
+        for j in range(ncols):
+            out[i, j] = q2qnbinom_one(x[i, j], input_mean[i, j], output_mean[i, j], dispersion[i, j])
+
+    return res
 
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.cdivision(True)
-cpdef ndarray compute_apl(const count_type[:,:] y, const double[:,:] means, const double[:,:] disps, const double[:,:] weights, bool adjust, ndarray design):
+cpdef ndarray compute_apl(const count_type[:,:] y, const double[:,:] means, const double[:,:] disps, const double[:,:] weights, bool adjust, design, int nthreads=1):
     """
     Compute adjusted profile log-likelihoods of genewise negative binomial GLMs
 
-    This is the low-level function called by :func:`adjustedProfileLik`.
+    This is the low-level function called by :func:`adjustedProfileLik`. Genes
+    are processed without holding the GIL, and are distributed across
+    :code:`nthreads` threads.
 
     Arguments
     ---------
@@ -178,6 +218,8 @@ cpdef ndarray compute_apl(const count_type[:,:] y, const double[:,:] means, cons
         whether to use Cox-Reid adjustment
     design : array_like
         the design matrix
+    nthreads : int
+        number of threads
 
     Returns
     -------
@@ -185,75 +227,113 @@ cpdef ndarray compute_apl(const count_type[:,:] y, const double[:,:] means, cons
         the genewise APL (one element per row in :code:`y`)
     """
 
-    cdef Py_ssize_t tag, lib
-    cdef double curmu, cury, curd, r, logmur, adj
-    cdef long lwork = -1
-
-    if adjust:
-        routine = get_lapack_funcs('sytrf_lwork', dtype=np.double)
-        ret = routine(design.shape[1])
-        assert len(ret) == 2
-        if ret[1] != 0:
+    cdef Py_ssize_t ntags = y.shape[0]
+    cdef Py_ssize_t nlibs = y.shape[1]
+    cdef const double[:,:] X = np.asarray(design, dtype=np.double)
+    cdef int ncoefs = X.shape[1]
+    cdef int lwork = 1
+    cdef int lwork_query = -1
+    cdef int info, ipiv_query
+    cdef double wkopt, a_query
+    cdef char uplo = b'L'
+    cdef Py_ssize_t tag
+    cdef double* work
+
+    if adjust and ncoefs > 1:
+        # workspace size query
+        dsytrf(&uplo, &ncoefs, &a_query, &ncoefs, &ipiv_query, &wkopt, &lwork_query, &info)
+        if info != 0:
             raise ValueError("Internal work array size computation failed: "
-                             "%d" % (ret[1],))
-        lwork = int(ret[0]+0.5)
-        if lwork < 1:
-            lwork = 1
-
-    res = np.zeros(y.shape[0])
-    cdef double[:] sum_loglike = res
-
-    working_weights_array = np.zeros(y.shape[1])
-    cdef double[:] working_weights = working_weights_array
-
-    for tag in range(y.shape[0]):
-        for lib in range(y.shape[1]):
-            # mean should only be zero if count is zero, where the
-            # log-likelihood would then be 0.
-            if means[tag,lib] == 0:
-                continue
-
-            # each y is assumed to be the average of 'weights' counts, so we
-            # convert from averages to the "original sums" in order to compute
-            # NB probabilities
-            curmu = means[tag,lib] * weights[tag,lib]
-            cury = y[tag,lib] * weights[tag,lib]
-            curd = disps[tag,lib] / weights[tag,lib]
-
-            # compute the log-likelihood
-            r = 1 / curd
-            logmur = log(curmu + r)
-
-            if curd > 0:
-                sum_loglike[tag] += cury*log(curmu) - cury*logmur + r*log(r) - r*logmur + lgamma(cury+r) - lgamma(cury+1) - lgamma(r)
-            else:
-                sum_loglike[tag] += cury*log(curmu) - curmu - lgamma(cury+1)
+                             "%d" % (info,))
+        lwork = max(<int>(wkopt+0.5), 1)
+
+    res = np.zeros(ntags)
+    cdef double[::1] sum_loglike = res
+
+    if nthreads < 1:
+        nthreads = 1
+
+    with nogil, parallel(num_threads=nthreads):
+        # per-thread workspace: working weights, XtWX, LAPACK workspace and
+        # pivots
+        work = <double*> malloc((nlibs + ncoefs*ncoefs + lwork + ncoefs) * sizeof(double))
+        if work == NULL:
+            with gil:
+                raise MemoryError()
+        for tag in prange(ntags, schedule="static"):
+            sum_loglike[tag] = apl_one_tag(tag, y, means, disps, weights, adjust, X, lwork, work)
+        free(work)
 
-            # adding the Jacobian, to account for the fact that we actually
-            # want the log-likelihood of the _scaled_ NB distribution (after
-            # dividing the original sum by the weight).
-            sum_loglike[tag] += log(weights[tag,lib])
+    return res
 
-            if adjust:
-                # computing W, the matrix of NB working weights
-                # this is used to compute the Cox-Reid adjustment factor
-                working_weights[lib] = curmu / (1 + curd*curmu)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef double apl_one_tag(Py_ssize_t tag, const count_type[:,:] y, const double[:,:] means,
+                        const double[:,:] disps, const double[:,:] weights, bool adjust,
+                        const double[:,:] design, int lwork, double* work) noexcept nogil:
+    """
+    Compute the adjusted profile log-likelihood of a single gene
+
+    See :func:`compute_apl`.
+    """
+    cdef Py_ssize_t lib
+    cdef double curmu, cury, curd, r, logmur, adj
+    cdef double sum_loglike = 0
+    cdef double* working_weights = work
+
+    for lib in range(y.shape[1]):
+        working_weights[lib] = 0
+
+        # mean should only be zero if count is zero, where the
+        # log-likelihood would then be 0.
+        if means[tag,lib] == 0:
+            continue
+
+        # each y is assumed to be the average of 'weights' counts, so we
+        # convert from averages to the "original sums" in order to compute
+        # NB probabilities
+        curmu = means[tag,lib] * weights[tag,lib]
+        cury = y[tag,lib] * weights[tag,lib]
+        curd = disps[tag,lib] / weights[tag,lib]
+
+        # compute the log-likelihood
+        r = 1 / curd
+        logmur = log(curmu + r)
+
+        if curd > 0:
+            sum_loglike += cury*log(curmu) - cury*logmur + r*log(r) - r*logmur + lgamma(cury+r) - lgamma(cury+1) - lgamma(r)
+        else:
+            sum_loglike += cury*log(curmu) - curmu - lgamma(cury+1)
+
+        # adding the Jacobian, to account for the fact that we actually
+        # want the log-likelihood of the _scaled_ NB distribution (after
+        # dividing the original sum by the weight).
+        sum_loglike += log(weights[tag,lib])
 
         if adjust:
-            if design.shape[1] == 1:
-                adj = working_weights_array.sum()
-                adj = 0.5*log(abs(adj))
-                sum_loglike[tag] -= adj
-            else:
-                sum_loglike[tag] -= acr_compute(working_weights, design, lwork)
+            # computing W, the matrix of NB working weights
+            # this is used to compute the Cox-Reid adjustment factor
+            working_weights[lib] = curmu / (1 + curd*curmu)
 
-    return res
+    if adjust:
+        if design.shape[1] == 1:
+            adj = 0
+            for lib in range(y.shape[1]):
+                adj += working_weights[lib]
+            adj = 0.5*log(abs(adj))
+            sum_loglike -= adj
+        else:
+            sum_loglike -= acr_compute(working_weights, design, lwork, working_weights + y.shape[1])
+
+    return sum_loglike
 
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.cdivision(True)
-cdef double acr_compute(const double[:] wptr, ndarray design, long lwork):
+cdef double acr_compute(const double* wptr, const double[:,:] design, int lwork, double* work) noexcept nogil:
     """
     Compute the Cox-Reid adjustment factor
 
@@ -285,7 +365,7 @@ cdef double acr_compute(const double[:] wptr, ndarray design, long lwork):
     any replacement value will eventually cancel out during interpolation to
     obtain the CRAPLE.
 
-    Note that the scipy routine will also do some pivoting, essentially solving
+    Note that the LAPACK routine will also do some pivoting, essentially solving
     PAP* = LDL* for some permutation matrix P. This should not affect anything:
     the determinant of the permutation matrix is either 1 or -1, but it cancels
     out, so det(A) = det(PAP*).
@@ -296,39 +376,47 @@ cdef double acr_compute(const double[:] wptr, ndarray design, long lwork):
 
     Arguments
     ---------
-    wptr : array_like
+    wptr : double*
         weights array
     design : array_like
         the design matrix
+    lwork : int
+        size of the LAPACK workspace
+    work : double*
+        workspace, of size at least :code:`ncoefs*ncoefs + lwork + ncoefs`
 
     Returns
     -------
     float
         the Cox-Reid adjustment factor
     """
+    cdef int ncoefs = design.shape[1]
+    cdef double* xtwx = work
+    cdef double* lapack_work = xtwx + ncoefs*ncoefs
+    cdef int* ipiv = <int*> (lapack_work + lwork)
+    cdef char uplo = b'L'
+    cdef int info
     cdef double res = 0
-    cdef Py_ssize_t i
+    cdef Py_ssize_t i, j, lib
 
-    xtwx = (design.T * wptr) @ design
+    # lower triangle of XtWX (column-major)
+    for j in range(ncoefs):
+        for i in range(j, ncoefs):
+            xtwx[j*ncoefs+i] = 0
+    for lib in range(design.shape[0]):
+        for j in range(ncoefs):
+            for i in range(j, ncoefs):
+                xtwx[j*ncoefs+i] += design[lib,i] * wptr[lib] * design[lib,j]
 
-    # BEGIN LDL* decomposition
-    solver = get_lapack_funcs('sytrf', dtype=np.double)
-    ldu, _, info = solver(xtwx, lwork=lwork, lower=True, overwrite_a=False)
-    if info < 0:
-        raise ValueError('{} exited with the internal error "illegal value '
-                         'in argument number {}". See LAPACK documentation '
-                         'for the error codes.'.format('DSYTRF', -info))
-    # END LDL* decomposition
-
-    cdef double[:,:] d = ldu
+    # LDL* decomposition
+    dsytrf(&uplo, &ncoefs, xtwx, &ncoefs, ipiv, lapack_work, &lwork, &info)
 
     # log-determinant as sum of the log-diagonals, then halving
-    assert d.shape[0] == d.shape[1]
-    for i in range(ldu.shape[0]):
-        if d[i,i] < low_value or not isfinite(d[i,i]):
+    for i in range(ncoefs):
+        if xtwx[i*ncoefs+i] < low_value or not isfinite(xtwx[i*ncoefs+i]):
             res += log_low_value
         else:
-            res += log(d[i,i])
+            res += log(xtwx[i*ncoefs+i])
 
     return 0.5*res
 
@@ -336,91 +424,830 @@ cdef double acr_compute(const double[:] wptr, ndarray design, long lwork):
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.cdivision(True)
-cpdef (double, bool) glm_one_group_cython(Py_ssize_t nlibs,
-                                          const count_type[:] counts, const double[:] offset,
-                                          const double[:] disp, const double[:] weights,
-                                          long maxit, double tolerance, double cur_beta):
+cpdef fit_one_way_cython(const count_type[:,:] y, const double[:,:] offset,
+                         const double[:,:] disp, const double[:,:] weights,
+                         groups, Py_ssize_t ngroups,
+                         const double[:,:] beta, long maxit, double tolerance,
+                         bool usePoisson=True, int nthreads=1):
     """
-    Simplified fit for negative binomial GLM when the design matrix is one group
+    Fit a oneway layout of negative binomial GLMs, for all genes at once
 
-    This is the low-level function ultimately called by :func:`fit_one_group`.
+    This is the low-level function called by :func:`mglmOneWay` and
+    :func:`fit_one_group`. For each gene, the coefficient of each group is
+    fitted on the libraries of that group by Newton-Raphson iterations,
+    without copying the data of the group. Genes are fitted independently of
+    each other, without holding the GIL, and are distributed across
+    :code:`nthreads` threads.
 
-    See Also
-    --------
-    glm_one_group
-    fit_one_group
+    If :code:`usePoisson` is :code:`True`, the coefficient of a group whose
+    libraries all have zero dispersion and unit weight is computed in closed
+    form from the Poisson likelihood.
 
     Arguments
     ---------
-    nlibs : Py_ssize_t
-        number of libraries
-    counts : array_like
-        vector of counts for a given gene, of size `nlibs`
+    y : array_like
+        matrix of counts
     offset : array_like
-        vector of offsets for a given gene, of size `nlibs`
+        offsets, same shape as :code:`y`
     disp : array_like
-        vector of dispersions for a given gene, of size `nlibs`
+        dispersions, same shape as :code:`y`
     weights : array_like
-        vector of observation weights for a given gene, of size `nlibs`
+        weights, same shape as :code:`y`
+    groups : array_like
+        group of each library, between 0 and :code:`ngroups-1`
+    ngroups : Py_ssize_t
+        number of groups
+    beta : array_like
+        initial coefficients, one row per gene and one column per group. NaN
+        values are replaced by the automatic starting values.
     maxit : long
         maximum number of Newton-Raphson iterations
-    tol : float
+    tolerance : float
         tolerance for convergence in the Newton-Raphson iteration
-    cur_beta : float
-        initial beta coefficient
+    usePoisson : bool
+        whether to use the Poisson closed form for zero-dispersion unit-weight
+        groups
+    nthreads : int
+        number of threads
 
     Returns
     -------
-    float
-        fitted coefficient
-    bool
-        whether the fit converged
+    ndarray
+        fitted coefficients, same shape as :code:`beta`
+    ndarray
+        whether the fit converged, same shape as :code:`beta`
     """
+    cdef Py_ssize_t ntags = y.shape[0]
+    cdef Py_ssize_t nlibs = y.shape[1]
+    cdef Py_ssize_t tag, g
+
+    # libraries sorted by group, in increasing order within each group
+    order_array = np.argsort(np.asarray(groups), kind="stable").astype(np.intp)
+    start_array = np.searchsorted(np.asarray(groups)[order_array],
+                                  np.arange(ngroups + 1)).astype(np.intp)
+    cdef const Py_ssize_t[::1] order = order_array
+    cdef const Py_ssize_t[::1] start = start_array
+
+    out_beta_array = np.array(beta, dtype=np.double, order="C")
+    conv_array = np.zeros((ntags, ngroups), dtype=np.uint8)
+    cdef double[:,::1] out_beta = out_beta_array
+    cdef unsigned char[:,::1] conv = conv_array
+
+    if nthreads < 1:
+        nthreads = 1
+
+    for tag in prange(ntags, nogil=True, schedule="static", num_threads=nthreads):
+        for g in range(ngroups):
+            out_beta[tag, g] = one_group_libs(tag, y, offset, disp, weights,
+                                              order, start[g], start[g+1],
+                                              maxit, tolerance,
+                                              out_beta[tag, g], usePoisson,
+                                              &conv[tag, g])
+
+    return (out_beta_array, conv_array.astype(np.bool_))
 
-    cdef Py_ssize_t j
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef double one_group_libs(Py_ssize_t tag, const count_type[:,:] y,
+                           const double[:,:] offset, const double[:,:] disp,
+                           const double[:,:] weights, const Py_ssize_t[::1] order,
+                           Py_ssize_t first, Py_ssize_t last, long maxit,
+                           double tolerance, double cur_beta, bool usePoisson,
+                           unsigned char* conv) noexcept nogil:
+    # fit the coefficient of gene tag on the libraries order[first:last]
+    cdef Py_ssize_t k, j
     cdef long i
-    cdef double totweight, dl, info, mu, cur_val
+    cdef double totweight, dl, info, mu, denom, step, cur_val
+    cdef double sum_counts, sum_lib
+    cdef bool nonzero, poisson
+
+    conv[0] = 1
+
+    # Poisson special case with all-unity weights and all-zero dispersions
+    if usePoisson:
+        poisson = True
+        for k in range(first, last):
+            j = order[k]
+            if disp[tag, j] != 0 or weights[tag, j] != 1:
+                poisson = False
+                break
+        if poisson:
+            sum_counts = 0
+            sum_lib = 0
+            for k in range(first, last):
+                j = order[k]
+                sum_counts = sum_counts + y[tag, j]
+                sum_lib = sum_lib + exp(offset[tag, j])
+            if sum_counts == 0:
+                return -INFINITY
+            return log(sum_counts / sum_lib)
 
-    # Setting up initial values for beta as the log of the mean of the ratio of
-    # counts to offsets. This is the exact solution for the gamma distribution
-    # (which is the limit of the NB as the dispersion goes to infinity).
-    # However, if cur_beta is not NA, then we assume it is good.
     nonzero = False
     if isnan(cur_beta):
         cur_beta = 0
         totweight = 0
-        for j in range(nlibs):
-            cur_val = counts[j]
+        for k in range(first, last):
+            j = order[k]
+            cur_val = y[tag, j]
             if cur_val > low_value:
-                cur_beta += cur_val / exp(offset[j]) * weights[j]
+                cur_beta = cur_beta + cur_val / exp(offset[tag, j]) * weights[tag, j]
                 nonzero = True
-            totweight += weights[j]
+            totweight = totweight + weights[tag, j]
         cur_beta = log(cur_beta / totweight)
     else:
-        for j in range(nlibs):
-            if counts[j] > low_value:
+        for k in range(first, last):
+            if y[tag, order[k]] > low_value:
                 nonzero = True
                 break
 
     # skipping to a result for all-zero rows
     if not nonzero:
-        return (-INFINITY, True)
+        return -INFINITY
 
     # Newton-Raphson iteration to converge to mean
-    has_converged = False
     for i in range(maxit):
         dl = 0
         info = 0
-
-        for j in range(nlibs):
-            mu = exp(cur_beta + offset[j])
-            denom = 1 + mu*disp[j]
-            dl += (counts[j] - mu) / denom * weights[j]
-            info += mu / denom * weights[j]
+        for k in range(first, last):
+            j = order[k]
+            mu = exp(cur_beta + offset[tag, j])
+            denom = 1 + mu*disp[tag, j]
+            dl = dl + (y[tag, j] - mu) / denom * weights[tag, j]
+            info = info + mu / denom * weights[tag, j]
         step = dl / info
-        cur_beta += step
+        cur_beta = cur_beta + step
         if abs(step) < tolerance:
-            has_converged = True
-            break
+            return cur_beta
+
+    conv[0] = 0
+    return cur_beta
+
+
+cdef double supremely_low_value = 1e-13
+cdef double ridiculously_low_value = 1e-100
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cpdef fit_levenberg_cython(const double[:,:] y, const double[:,:] offset,
+                           const double[:,:] disp, const double[:,:] weights,
+                           const double[:,:] design, const double[:,:] beta,
+                           double tol, long maxit, int nthreads=1):
+    """
+    Levenberg-Marquardt fit of negative binomial GLMs, for all genes at once
+
+    This is the low-level function called by :func:`fit_levenberg`. Genes are
+    fitted independently of each other, without holding the GIL, and are
+    distributed across :code:`nthreads` threads.
+
+    Arguments
+    ---------
+    y : array_like
+        matrix of counts
+    offset : array_like
+        offsets, same shape as :code:`y`
+    disp : array_like
+        dispersions, same shape as :code:`y`
+    weights : array_like
+        weights, same shape as :code:`y`
+    design : array_like
+        design matrix, as many rows as columns in :code:`y`
+    beta : array_like
+        initial values of the beta, as many rows as in :code:`y`, as many
+        columns as in :code:`design`
+    tol : float
+        tolerance for convergence
+    maxit : long
+        maximal number of iterations
+    nthreads : int
+        number of threads
+
+    Returns
+    -------
+    ndarray
+        fitted beta, same shape as :code:`beta`
+    ndarray
+        fitted mu, same shape as :code:`y`
+    ndarray
+        genewise deviance
+    ndarray
+        genewise number of iterations
+    ndarray
+        whether convergence was reached, genewise
+    """
+    cdef Py_ssize_t ntags = y.shape[0]
+    cdef Py_ssize_t nlibs = y.shape[1]
+    cdef Py_ssize_t ncoefs = design.shape[1]
+    cdef Py_ssize_t tag
+    cdef double* work
+
+    out_beta_array = np.array(beta, dtype=np.double, order="C")
+    mu_array = np.zeros((ntags, nlibs))
+    dev_array = np.zeros(ntags)
+    iter_array = np.zeros(ntags)
+    conv_array = np.zeros(ntags, dtype=np.uint8)
+    cdef double[:,::1] out_beta = out_beta_array
+    cdef double[:,::1] mu = mu_array
+    cdef double[::1] dev = dev_array
+    cdef double[::1] iter_ = iter_array
+    cdef unsigned char[::1] conv = conv_array
+
+    if nthreads < 1:
+        nthreads = 1
+
+    with nogil, parallel(num_threads=nthreads):
+        # per-thread workspace: XtWX, its Cholesky factor, dl, dbeta, beta_new
+        # and mu_new
+        work = <double*> malloc((2*ncoefs*ncoefs + 3*ncoefs + nlibs) * sizeof(double))
+        if work == NULL:
+            with gil:
+                raise MemoryError()
+        for tag in prange(ntags, schedule="dynamic"):
+            levenberg_one_tag(tag, y, offset, disp, weights, design, tol, maxit,
+                              out_beta, mu, dev, iter_, conv, work)
+        free(work)
+
+    return (out_beta_array, mu_array, dev_array, iter_array, conv_array.astype(np.bool_))
 
-    return (cur_beta, has_converged)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void levenberg_one_tag(Py_ssize_t tag, const double[:,:] y,
+                            const double[:,:] offset, const double[:,:] disp,
+                            const double[:,:] weights, const double[:,:] design,
+                            double tol, long maxit, double[:,::1] out_beta,
+                            double[:,::1] mu, double[::1] dev,
+                            double[::1] iter_, unsigned char[::1] conv,
+                            double* work) noexcept nogil:
+    """
+    Levenberg-Marquardt fit of the negative binomial GLM of a single gene
+
+    See :func:`fit_levenberg` for the detailed description of the algorithm.
+    """
+    cdef Py_ssize_t nlibs = y.shape[1]
+    cdef Py_ssize_t ncoefs = design.shape[1]
+    cdef double* xtwx = work
+    cdef double* chol = xtwx + ncoefs*ncoefs
+    cdef double* dl = chol + ncoefs*ncoefs
+    cdef double* dbeta = dl + ncoefs
+    cdef double* beta_new = dbeta + ncoefs
+    cdef double* mu_new = beta_new + ncoefs
+    cdef int n = <int> ncoefs
+    cdef int one = 1
+    cdef int info
+    cdef char uplo = b'U'
+    cdef Py_ssize_t lib, k, l
+    cdef long i, lev
+    cdef double ymax, cur, denom, ww, deriv, maxinfo, lambda_ = 0
+    cdef double dev_new, divergence
+    cdef bint low_dev, lev_rem, failed = False
+
+    # We compute mu based on beta
+    ymax = 0
+    for lib in range(nlibs):
+        if y[tag,lib] > ymax:
+            ymax = y[tag,lib]
+    if not ymax >= low_value:
+        # for all-zero libraries, there is really no point continuing
+        for k in range(ncoefs):
+            out_beta[tag,k] = NAN
+        return
+
+    for lib in range(nlibs):
+        cur = offset[tag,lib]
+        for k in range(ncoefs):
+            cur = cur + out_beta[tag,k] * design[lib,k]
+        mu[tag,lib] = exp(cur)
+    dev[tag] = tag_deviance(tag, y, &mu[tag,0], weights, disp)
+
+    # iterating using reweighted least squares
+    for i in range(maxit):
+        iter_[tag] += 1
+
+        # Set up the Fisher information matrix XtWX and the derivative of the
+        # log-likelihood dl. The aim is to solve (XtWX)(dbeta)=dl for 'dbeta'.
+        for k in range(ncoefs*ncoefs):
+            xtwx[k] = 0
+        for k in range(ncoefs):
+            dl[k] = 0
+            dbeta[k] = 0
+        for lib in range(nlibs):
+            denom = 1 + mu[tag,lib] * disp[tag,lib]
+            deriv = (y[tag,lib] - mu[tag,lib]) / denom * weights[tag,lib]
+            ww = mu[tag,lib] / denom * weights[tag,lib]
+            for k in range(ncoefs):
+                dl[k] += deriv * design[lib,k]
+                for l in range(k+1):
+                    xtwx[k*ncoefs+l] += ww * design[lib,k] * design[lib,l]
+        maxinfo = 0
+        for k in range(ncoefs):
+            for l in range(k):
+                xtwx[l*ncoefs+k] = xtwx[k*ncoefs+l]
+            if k == 0 or xtwx[k*ncoefs+k] > maxinfo:
+                maxinfo = xtwx[k*ncoefs+k]
+        if i == 0:
+            lambda_ = maxinfo * 1e-6
+            if not lambda_ >= supremely_low_value:
+                lambda_ = supremely_low_value
+
+        # Levenberg/Marquardt damping reduces step size until the deviance
+        # increases or no step can be found that increases the deviance.
+        lev = 0
+        low_dev = False
+        lev_rem = True
+        while lev_rem:
+            lev += 1
+
+            while True:
+                # We add lambda_ to the diagonal, then use the Cholesky
+                # decomposition to solve for dbeta in (XtWX)dbeta = dl.
+                for k in range(ncoefs*ncoefs):
+                    chol[k] = xtwx[k]
+                for k in range(ncoefs):
+                    chol[k*ncoefs+k] += lambda_
+                dpotrf(&uplo, &n, chol, &n, &info)
+                if info == 0:
+                    break
+                if info < 0 or not isfinite(lambda_):
+                    # cannot be fixed by more damping
+                    failed = True
+                    break
+                # If it fails, the matrix is singular due to numerical
+                # imprecision (see fit_levenberg): increase lambda_.
+                lambda_ *= 10
+                if lambda_ <= 0:
+                    # just to make sure it actually increases
+                    lambda_ = ridiculously_low_value
+            if failed:
+                conv[tag] = True
+                return
+
+            for k in range(ncoefs):
+                dbeta[k] = dl[k]
+            dpotrs(&uplo, &n, &one, chol, &n, dbeta, &n, &info)
+
+            # Updating beta and the means.
+            for k in range(ncoefs):
+                beta_new[k] = out_beta[tag,k] + dbeta[k]
+            for lib in range(nlibs):
+                cur = offset[tag,lib]
+                for k in range(ncoefs):
+                    cur = cur + beta_new[k] * design[lib,k]
+                mu_new[lib] = exp(cur)
+
+            # Checking if the deviance has decreased or if it is too small to
+            # care about. Either case is good and means that we will be using
+            # the updated fitted values and coefficients.
+            dev_new = tag_deviance(tag, y, mu_new, weights, disp)
+            if dev_new / ymax < supremely_low_value:
+                low_dev = True
+            if dev_new <= dev[tag] or low_dev:
+                for k in range(ncoefs):
+                    out_beta[tag,k] = beta_new[k]
+                for lib in range(nlibs):
+                    mu[tag,lib] = mu_new[lib]
+                dev[tag] = dev_new
+                break
+
+            # Increasing lambda_, to increase damping. Again, we have to make
+            # sure it is not zero.
+            lambda_ *= 2
+            if lambda_ <= 0:
+                lambda_ = ridiculously_low_value
+
+            # Excessive damping; steps get so small that it is pointless to
+            # continue.
+            if lambda_ / maxinfo > 1 / supremely_low_value:
+                conv[tag] = True
+                lev_rem = False
+
+        # Terminating if we failed, if divergence from the exact solution is
+        # acceptably low (cross-product of dbeta with the log-likelihood
+        # derivative) or if the actual deviance of the fit is acceptably low.
+        if conv[tag] or low_dev:
+            return
+        divergence = 0
+        for k in range(ncoefs):
+            divergence += dl[k] * dbeta[k]
+        if divergence < tol:
+            return
+
+        # If we quit the inner Levenberg loop immediately and survived all the
+        # break conditions above, that means that deviance is decreasing
+        # substantially. Thus, we need larger steps to get there faster.
+        if lev == 1:
+            lambda_ /= 10
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline double tag_deviance(Py_ssize_t tag, const double[:,:] y,
+                                const double* mu, const double[:,:] weights,
+                                const double[:,:] disp) noexcept nogil:
+    """total deviance of a gene, see :func:`nb_deviance`"""
+    cdef double res = 0
+    cdef Py_ssize_t lib
+    for lib in range(y.shape[1]):
+        res += weights[tag,lib] * unit_nb_deviance(y[tag,lib], mu[lib], disp[tag,lib])
+    return res
+
+
+cdef inline double log_cond_ratio(double x, double s, double r1, double r2) noexcept nogil:
+    """
+    Log-ratio of consecutive conditional NB probabilities
+
+    For two independent NB counts with sizes :code:`r1` and :code:`r2` and the
+    same probability parameter, this is :code:`log P(x+1 | s) - log P(x | s)`,
+    where :code:`P(x | s)` is the probability that the first count is
+    :code:`x` given that the sum of both counts is :code:`s`.
+    """
+    return log((x + r1) * (s - x) / ((x + 1) * (s - x - 1 + r2)))
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cpdef ndarray exact_test_double_tail_cython(const double[:] s1, const double[:] s,
+                                            const double[:] r1, const double[:] r2,
+                                            const double[:] logp_obs,
+                                            const unsigned char[:] upper,
+                                            int nthreads=1):
+    """
+    Tail sums of conditional NB probabilities, for the doubletail exact test
+
+    This is the low-level function called by :func:`exactTestDoubleTail`. For
+    each gene, it sums the conditional probabilities :code:`P(x | s)` (see
+    :func:`exact_test_by_small_p_cython`) for :code:`x` from :code:`s1` to
+    :code:`s` if :code:`upper`, from 0 to :code:`s1` otherwise. The
+    probabilities are computed from :code:`P(s1 | s)` by recurrence.
+
+    Arguments
+    ---------
+    s1 : array_like
+        observed counts of the first group
+    s : array_like
+        total counts
+    r1 : array_like
+        NB size of the first group
+    r2 : array_like
+        NB size of the second group
+    logp_obs : array_like
+        log of :code:`P(s1 | s)`
+    upper : array_like
+        whether to sum the upper or the lower tail
+    nthreads : int
+        number of threads
+
+    Returns
+    -------
+    ndarray
+        the genewise tail sums
+    """
+    cdef Py_ssize_t ntags = s1.shape[0]
+    cdef Py_ssize_t i
+    cdef double x, l, total
+
+    res = np.zeros(ntags)
+    cdef double[::1] tail = res
+
+    if nthreads < 1:
+        nthreads = 1
+
+    for i in prange(ntags, nogil=True, schedule="dynamic", num_threads=nthreads):
+        l = logp_obs[i]
+        total = exp(l)
+        x = s1[i]
+        if upper[i]:
+            while x < s[i]:
+                l = l + log_cond_ratio(x, s[i], r1[i], r2[i])
+                x = x + 1
+                total = total + exp(l)
+        else:
+            while x > 0:
+                x = x - 1
+                l = l - log_cond_ratio(x, s[i], r1[i], r2[i])
+                total = total + exp(l)
+        tail[i] = total
+
+    return res
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cpdef ndarray exact_test_by_small_p_cython(const double[:] s1, const double[:] s,
+                                           const double[:] r1, const double[:] r2,
+                                           const double[:] logp_obs,
+                                           int nthreads=1):
+    """
+    Sums of conditional NB probabilities, for the small probabilities exact test
+
+    This is the low-level function called by :func:`exactTestBySmallP`. For
+    each gene, it sums the conditional probabilities :code:`P(x | s)` no
+    larger than :code:`P(s1 | s)` (up to a relative tolerance of 1e-7), for
+    :code:`x` from 0 to :code:`s`. :code:`P(x | s)` is the probability that the
+    count of the first group is :code:`x` given that the total count is
+    :code:`s`, for two independent NB counts with sizes :code:`r1` and
+    :code:`r2` and the same probability parameter. The probabilities are
+    computed from :code:`P(s1 | s)` by recurrence.
+
+    Arguments
+    ---------
+    s1 : array_like
+        observed counts of the first group
+    s : array_like
+        total counts
+    r1 : array_like
+        NB size of the first group
+    r2 : array_like
+        NB size of the second group
+    logp_obs : array_like
+        log of :code:`P(s1 | s)`
+    nthreads : int
+        number of threads
+
+    Returns
+    -------
+    ndarray
+        the genewise sums
+    """
+    cdef Py_ssize_t ntags = s1.shape[0]
+    cdef Py_ssize_t i
+    cdef double x, l, lmax, total
+
+    res = np.zeros(ntags)
+    cdef double[::1] pvals = res
+
+    if nthreads < 1:
+        nthreads = 1
+
+    for i in prange(ntags, nogil=True, schedule="dynamic", num_threads=nthreads):
+        lmax = logp_obs[i] + 1e-7
+        total = exp(logp_obs[i])
+        # going up from the observed count
+        l = logp_obs[i]
+        x = s1[i]
+        while x < s[i]:
+            l = l + log_cond_ratio(x, s[i], r1[i], r2[i])
+            x = x + 1
+            if l <= lmax:
+                total = total + exp(l)
+        # going down from the observed count
+        l = logp_obs[i]
+        x = s1[i]
+        while x > 0:
+            x = x - 1
+            l = l - log_cond_ratio(x, s[i], r1[i], r2[i])
+            if l <= lmax:
+                total = total + exp(l)
+        pvals[i] = total
+
+    return res
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cpdef ndarray exact_test_by_deviance_cython(const double[:] s1, const double[:] s2,
+                                            const double[:] mu1, const double[:] mu2,
+                                            const double[:] r1, const double[:] r2,
+                                            const double[:] logp_left,
+                                            const double[:] logp_right,
+                                            int nthreads=1):
+    """
+    Sums of conditional NB probabilities, for the deviance exact test
+
+    This is the low-level function called by :func:`exactTestByDeviance`. For
+    each gene, it sums the conditional probabilities :code:`P(x | s)` of the
+    partitions :code:`(x, s-x)` of the total count :code:`s = s1 + s2` with a
+    deviance no smaller than the deviance of the observed partition. The sum
+    starts from both extreme partitions and stops when the deviance falls
+    below the observed one. The probabilities are computed by recurrence from
+    :code:`P(0 | s)` and :code:`P(s | s)`.
+
+    Arguments
+    ---------
+    s1 : array_like
+        observed counts of the first group
+    s2 : array_like
+        observed counts of the second group
+    mu1 : array_like
+        expected counts of the first group
+    mu2 : array_like
+        expected counts of the second group
+    r1 : array_like
+        NB size of the first group
+    r2 : array_like
+        NB size of the second group
+    logp_left : array_like
+        log of :code:`P(0 | s)`
+    logp_right : array_like
+        log of :code:`P(s | s)`
+    nthreads : int
+        number of threads
+
+    Returns
+    -------
+    ndarray
+        the genewise sums
+    """
+    cdef Py_ssize_t ntags = s1.shape[0]
+    cdef Py_ssize_t i
+    cdef long j, k, stotal
+    cdef double s, l, obsdev, phi1, phi2, total
+
+    res = np.zeros(ntags)
+    cdef double[::1] pvals = res
+
+    if nthreads < 1:
+        nthreads = 1
+
+    for i in prange(ntags, nogil=True, schedule="dynamic", num_threads=nthreads):
+        s = s1[i] + s2[i]
+        stotal = <long> s
+        phi1 = 1 / r1[i]
+        phi2 = 1 / r2[i]
+        obsdev = unit_nb_deviance(s1[i], mu1[i], phi1) + unit_nb_deviance(s2[i], mu2[i], phi2)
+        total = 0
+
+        # Going from the left
+        l = logp_left[i]
+        j = 0
+        while j <= stotal:
+            if obsdev <= unit_nb_deviance(j, mu1[i], phi1) + unit_nb_deviance(stotal - j, mu2[i], phi2):
+                total = total + exp(l)
+            else:
+                break
+            if j == stotal:
+                break
+            l = l + log_cond_ratio(j, s, r1[i], r2[i])
+            j = j + 1
+
+        # Going from the right, or what's left of it
+        l = logp_right[i]
+        k = 0
+        while k <= stotal - j:
+            if obsdev <= unit_nb_deviance(k, mu2[i], phi2) + unit_nb_deviance(stotal - k, mu1[i], phi1):
+                total = total + exp(l)
+            else:
+                break
+            l = l - log_cond_ratio(stotal - k - 1, s, r1[i], r2[i])
+            k = k + 1
+
+        pvals[i] = total
+
+    return res
+
+
+@cython.cdivision(True)
+cdef inline double binom_logpmf(double x, double n, double logp, double log1mp) noexcept nogil:
+    return lgamma(n+1) - lgamma(x+1) - lgamma(n-x+1) + x*logp + (n-x)*log1mp
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cpdef ndarray binom_test_cython(const double[:] y1, const double[:] size, double p,
+                                int nthreads=1):
+    """
+    Two-sided exact binomial test, with the rejection region made of the
+    values with smallest probabilities
+
+    This is the low-level function called by :func:`binomTest`. For each gene,
+    the *p*-value is the sum of the probabilities of the values no more likely
+    than :code:`y1` (up to a relative tolerance of 1e-7). As the binomial
+    distribution is unimodal, these values form two tails, one of them
+    starting at :code:`y1`. The other tail is located by bisection, and the
+    tail probabilities are given by the binomial distribution function.
+
+    Arguments
+    ---------
+    y1 : array_like
+        counts of the first library
+    size : array_like
+        total counts
+    p : float
+        expected proportion of :code:`y1` to the total under the null
+        hypothesis
+    nthreads : int
+        number of threads
+
+    Returns
+    -------
+    ndarray
+        the genewise *p*-values
+    """
+    cdef Py_ssize_t ntags = y1.shape[0]
+    cdef Py_ssize_t i
+    cdef double logp = log(p)
+    cdef double log1mp = log(1 - p)
+    cdef double log_rel_err = log(1 + 1e-7)
+    cdef double x, n, lx, pv
+    cdef long m, lo, hi, mid
+
+    res = np.ones(ntags)
+    cdef double[::1] pvals = res
+
+    if nthreads < 1:
+        nthreads = 1
+
+    for i in prange(ntags, nogil=True, schedule="static", num_threads=nthreads):
+        n = size[i]
+        x = y1[i]
+        if n <= 0:
+            continue
+        # mode of the distribution: the probabilities are non-decreasing up
+        # to m, and non-increasing from m
+        m = <long> ((n+1)*p)
+        if m > <long> n:
+            m = <long> n
+        lx = binom_logpmf(x, n, logp, log1mp) + log_rel_err
+        if x < m:
+            # smallest k >= m with P(k) <= P(x)
+            lo = m
+            hi = <long> n + 1
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if binom_logpmf(mid, n, logp, log1mp) <= lx:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            pv = sp.bdtr(x, <long> n, p)
+            if lo <= <long> n:
+                pv = pv + sp.bdtrc(lo - 1, <long> n, p)
+        elif x > m:
+            # smallest k <= m with P(k) > P(x)
+            lo = 0
+            hi = m + 1
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if binom_logpmf(mid, n, logp, log1mp) > lx:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            pv = sp.bdtrc(x - 1, <long> n, p)
+            if lo > 0:
+                pv = pv + sp.bdtr(lo - 1, <long> n, p)
+        else:
+            pv = 1
+        pvals[i] = min(pv, 1)
+
+    return res
+
+
+cpdef maximize_interpolant_cython(const double[::1] spts, const cython.floating[:,:] likelihoods, int nthreads=1):
+    """
+    Find the maximum of the cubic spline interpolating each row of a matrix
+
+    The rows are processed in parallel. Each thread copies the rows it
+    processes to a buffer, so that :code:`likelihoods` can be in single or
+    double precision and have any memory layout.
+
+    Arguments
+    ---------
+    spts : array_like
+        the spline points, unique and sorted
+    likelihoods : array_like
+        the function values, one row per function and one column per spline
+        point
+    nthreads : int
+        number of threads
+
+    Returns
+    -------
+    ndarray
+        the input value at which the maximum of each row occurs
+    """
+    cdef Py_ssize_t npts = spts.shape[0]
+    cdef Py_ssize_t ntags = likelihoods.shape[0]
+    cdef Py_ssize_t tag, j
+    cdef double* work
+
+    if npts < 2:
+        raise ValueError("must have at least two points for interpolation")
+    if likelihoods.shape[1] != npts:
+        raise ValueError("number of columns in likelihood matrix should be equal to number of spline points")
+
+    res = np.empty(ntags)
+    cdef double[::1] output = res
+
+    if nthreads < 1:
+        nthreads = 1
+
+    with nogil, parallel(num_threads=nthreads):
+        # per-thread workspace: current row and spline coefficients
+        work = <double*> malloc(4 * npts * sizeof(double))
+        if work == NULL:
+            with gil:
+                raise MemoryError()
+        for tag in prange(ntags, schedule="static"):
+            for j in range(npts):
+                work[j] = likelihoods[tag, j]
+            output[tag] = find_max(npts, &spts[0], work, work + npts)
+        free(work)
+
+    return res
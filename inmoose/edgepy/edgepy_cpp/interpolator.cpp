@@ -146,12 +146,10 @@ solution quad_solver (const double& a, const double& b, const double& c) {
  *
  ***********************************/
 
-interpolator::interpolator(const size_t& n) : npts(n), b(npts), c(npts), d(npts) {
-	if (npts<2) { throw std::runtime_error("must have at least two points for interpolation"); }
-    return;
-}
-
-double interpolator::find_max (const double*x, const double* y) {
+double find_max (const size_t npts, const double*x, const double* y, double* work) {
+    double* b=work;
+    double* c=work+npts;
+    double* d=work+2*npts;
     double maxed=-1;
 	size_t maxed_at=-1;
 	for (size_t i=0; i<npts; ++i) {
@@ -162,7 +160,7 @@ double interpolator::find_max (const double*x, const double* y) {
  	   	}
 	}
     double x_max=x[maxed_at];
-    fmm_spline(npts, x, y, b.data(), c.data(), d.data());
+    fmm_spline(npts, x, y, b, c, d);
 
 	// First we have a look at the segment on the left and see if it contains the maximum.
     if (maxed_at>0) {
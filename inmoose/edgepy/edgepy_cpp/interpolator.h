@@ -22,16 +22,15 @@
 
 #include "utils.h"
 
-/* This class just identifies the global maximum in the interpolating function. */
-
-class interpolator {
-public:
-	interpolator(const size_t&);
-	double find_max(const double* x, const double* y);
-private:
-	const size_t npts;
-    std::vector<double> b, c, d;
-};
+/* This function just identifies the global maximum in the cubic spline
+ * interpolating the 'npts' points of coordinates 'x' and 'y'.
+ *
+ * 'work' must have room for 3*npts doubles, to store the spline coefficients.
+ * The function does not allocate memory nor hold the GIL, so that it can be
+ * called concurrently from several threads with distinct 'work' buffers.
+ */
+
+double find_max(const size_t npts, const double* x, const double* y, double* work);
 
 
 #endif
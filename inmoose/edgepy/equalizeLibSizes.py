@@ -0,0 +1,147 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2008-2022 Yunshun Chen, Aaron TL Lun, Davis J McCarthy, Matthew E Ritchie, Belinda Phipson, Yifang Hu, Xiaobei Zhou, Mark D Robinson, Gordon K Smyth
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+
+# This file is based on the file 'R/equalizeLibSizes.R' of the Bioconductor edgeR package (version 3.38.4).
+
+
+import numpy as np
+
+from ..utils import asfactor
+from .makeCompressedMatrix import _compressDispersions
+from .mglmOneWay import mglmOneWay
+from .q2qnbinom import q2qnbinom
+
+
+def equalizeLibSizes_DGEList(self, dispersion=None):
+    """
+    Adjust the counts of the DGEList to equal library sizes, by
+    quantile-to-quantile normalization.
+
+    NB: modifies :code:`self` in place
+
+    See :func:`equalizeLibSizes` for details.
+
+    Arguments
+    ---------
+    self : DGEList
+        the DGEList containing the matrix of counts
+    dispersion : float or array_like, optional
+        scalar or vector of dispersions. Defaults to the most complex
+        dispersion estimate in :code:`self` (see
+        :meth:`DGEList.getDispersion`), or else to 0.05.
+
+    Returns
+    -------
+    DGEList
+        :code:`self` updated with :code:`pseudo_counts` and
+        :code:`pseudo_lib_size`
+    """
+    if dispersion is None:
+        dispersion = self.getDispersion()
+    out = equalizeLibSizes(
+        self.counts.to_numpy(),
+        group=self.samples["group"],
+        dispersion=dispersion,
+        lib_size=self.getLibSize(),
+    )
+    self.pseudo_counts = out["pseudo_counts"]
+    self.pseudo_lib_size = out["pseudo_lib_size"]
+    return self
+
+
+def equalizeLibSizes(y, group=None, dispersion=None, lib_size=None, nthreads=None):
+    """
+    Adjust counts so that the library sizes are approximately equal.
+
+    This function computes "pseudo-counts", *i.e.* counts adjusted to the
+    geometric mean of the library sizes, while preserving the fold-changes
+    between groups and the negative binomial distribution of the counts. The
+    pseudo-counts are used by the classic edgeR pipeline (conditional
+    maximum likelihood estimation of the dispersion, see
+    :func:`estimateCommonDisp`).
+
+    The mean of each gene in each group is estimated by a single call to
+    :func:`mglmOneWay`, and the counts are then mapped to the quantiles of the
+    negative binomial distributions with equalized library sizes by a single
+    call to :func:`q2qnbinom` over the whole matrix.
+
+    See also
+    --------
+    q2qnbinom
+
+    Arguments
+    ---------
+    y : array_like
+        matrix of counts, genes in rows and libraries in columns
+    group : array_like or Factor, optional
+        vector or factor giving the experimental group/condition for each
+        library. Defaults to a single group.
+    dispersion : float or array_like, optional
+        scalar or vector of dispersions. Defaults to 0.05.
+    lib_size : array_like, optional
+        vector of library sizes. Defaults to the column sums of :code:`y`.
+    nthreads : int, optional
+        number of threads. Defaults to the number of CPUs.
+
+    Returns
+    -------
+    dict
+        dictionary with the following keys:
+
+        - :code:`"pseudo_counts"`, the matrix of adjusted counts, of the same
+          shape as :code:`y`
+        - :code:`"pseudo_lib_size"`, the common library size of the adjusted
+          counts
+    """
+    y = np.asarray(y)
+    (ntags, nlibs) = y.shape
+    if group is None:
+        group = np.ones(nlibs)
+    if len(group) != nlibs:
+        raise ValueError("Incorrect length of group")
+    group = asfactor(group).droplevels()
+    if dispersion is None:
+        dispersion = 0.05
+    if lib_size is None:
+        lib_size = y.sum(axis=0)
+    else:
+        if len(lib_size) != nlibs:
+            raise ValueError("Incorrect length of lib_size")
+    lib_size = np.asarray(lib_size, dtype="double")
+    common_lib_size = np.exp(np.mean(np.log(lib_size)))
+
+    dispersion = _compressDispersions(y, dispersion)
+    beta, _ = mglmOneWay(
+        y,
+        group=group,
+        dispersion=dispersion,
+        offset=np.log(lib_size),
+        nthreads=nthreads,
+    )
+    # the mean of each gene in the group of each library, per unit of library size
+    lam = np.exp(beta)[:, group.codes]
+    pseudo = q2qnbinom(
+        y,
+        input_mean=lam * lib_size,
+        output_mean=lam * common_lib_size,
+        dispersion=dispersion,
+        nthreads=nthreads,
+    )
+    pseudo[pseudo < 0] = 0
+    return {"pseudo_counts": pseudo, "pseudo_lib_size": common_lib_size}
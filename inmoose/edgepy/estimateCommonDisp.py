@@ -0,0 +1,186 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2008-2022 Yunshun Chen, Aaron TL Lun, Davis J McCarthy, Matthew E Ritchie, Belinda Phipson, Yifang Hu, Xiaobei Zhou, Mark D Robinson, Gordon K Smyth
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+
+# This file is based on the file 'R/estimateCommonDisp.R' of the Bioconductor edgeR package (version 3.38.4).
+
+
+import numpy as np
+from scipy.optimize import minimize_scalar
+from scipy.special import gammaln
+
+from ..utils import LOGGER, asfactor
+from .equalizeLibSizes import equalizeLibSizes
+from .validDGEList import validDGEList
+
+
+def estimateCommonDisp_DGEList(self, tol=1e-6, rowsum_filter=5, verbose=False):
+    """
+    Estimate a common negative binomial dispersion by conditional maximum
+    likelihood.
+
+    NB: modifies :code:`self` in place
+
+    See :func:`estimateCommonDisp` for details.
+
+    Arguments
+    ---------
+    self : DGEList
+        the DGEList containing the matrix of counts
+    tol : float
+        the desired accuracy of the optimization
+    rowsum_filter : int
+        genes with total count (across all samples) below this value are
+        filtered out before estimating the dispersion
+    verbose : bool
+        whether to log the estimated dispersion and BCV
+
+    Returns
+    -------
+    DGEList
+        :code:`self` updated with :code:`common_dispersion`,
+        :code:`pseudo_counts`, :code:`pseudo_lib_size` and :code:`AveLogCPM`
+    """
+    y = validDGEList(self)
+    group = asfactor(y.samples["group"])
+    if (group.value_counts() <= 1).all():
+        LOGGER.warning("There is no replication, setting dispersion to NaN.")
+        y.common_dispersion = np.nan
+        return y
+
+    disp = estimateCommonDisp(
+        y.counts.to_numpy(),
+        group=group,
+        lib_size=y.getLibSize(),
+        tol=tol,
+        rowsum_filter=rowsum_filter,
+        verbose=verbose,
+    )
+    y.common_dispersion = disp
+    y.equalizeLibSizes(dispersion=disp)
+    y.AveLogCPM = y.aveLogCPM(dispersion=disp)
+    return y
+
+
+def estimateCommonDisp(
+    y, group=None, lib_size=None, tol=1e-6, rowsum_filter=5, verbose=False
+):
+    """
+    Estimate a common negative binomial dispersion by conditional maximum
+    likelihood.
+
+    This is the classic edgeR estimator of the dispersion, for experiments
+    with a single factor (Robinson and Smyth, 2008 [1]_). The counts are first
+    adjusted to equal library sizes by :func:`equalizeLibSizes`, and the
+    dispersion maximizing the likelihood of the resulting pseudo-counts,
+    conditional on the total count of each gene in each group, is then found.
+    The pseudo-counts depend on the dispersion, so the procedure is iterated
+    twice, starting from a dispersion of 0.01.
+
+    The conditional log-likelihood is evaluated over all the genes and groups
+    at once, without splitting the counts into groups.
+
+    See also
+    --------
+    equalizeLibSizes
+    estimateDisp
+
+    Arguments
+    ---------
+    y : array_like
+        matrix of counts, genes in rows and libraries in columns
+    group : array_like or Factor, optional
+        vector or factor giving the experimental group/condition for each
+        library. Defaults to a single group.
+    lib_size : array_like, optional
+        vector of library sizes. Defaults to the column sums of :code:`y`.
+    tol : float
+        the desired accuracy of the optimization
+    rowsum_filter : int
+        genes with total count (across all samples) below this value are
+        filtered out before estimating the dispersion
+    verbose : bool
+        whether to log the estimated dispersion and BCV
+
+    Returns
+    -------
+    float
+        the estimated common dispersion
+
+    References
+    ----------
+    .. [1] M. D. Robinson, G. K. Smyth. 2008. Small-sample estimation of
+       negative binomial dispersion, with applications to SAGE data.
+       Biostatistics 9, 321-332. :doi:`10.1093/biostatistics/kxm030`
+    """
+    y = np.asarray(y)
+    nlibs = y.shape[1]
+    if group is None:
+        group = np.ones(nlibs)
+    if len(group) != nlibs:
+        raise ValueError("Incorrect length of group")
+    group = asfactor(group).droplevels()
+    if lib_size is None:
+        lib_size = y.sum(axis=0)
+    elif len(lib_size) != nlibs:
+        raise ValueError("Incorrect length of lib_size")
+
+    # Filter low count genes
+    sel = y.sum(axis=1) > rowsum_filter
+    if not sel.any():
+        raise ValueError("No genes satisfy rowsum filter")
+
+    # one-hot encoding of the groups, to sum the counts within each group
+    onehot = np.asarray(group.codes)[:, None] == np.arange(len(group.categories))
+    n = onehot.sum(axis=0)
+
+    # Start from small dispersion
+    disp = 0.01
+    for _ in range(2):
+        out = equalizeLibSizes(y, group=group, dispersion=disp, lib_size=lib_size)
+        y_pseudo = out["pseudo_counts"][sel]
+        t = y_pseudo @ onehot
+        delta = minimize_scalar(
+            lambda d: -_commonCondLogLik(y_pseudo, t, n, d),
+            bounds=(1e-4, 100 / (100 + 1)),
+            method="bounded",
+            options={"xatol": tol},
+        ).x
+        disp = delta / (1 - delta)
+
+    if verbose:
+        LOGGER.info(f"Disp = {disp:.5f}, BCV = {np.sqrt(disp):.4f}")
+    return disp
+
+
+def _commonCondLogLik(y, t, n, delta):
+    """
+    conditional log-likelihood of the pseudo-counts :code:`y`, summed over all
+    genes and groups, for dispersion :code:`delta/(1-delta)`
+
+    :code:`t` is the matrix of the total counts of each gene in each group, and
+    :code:`n` the vector of the number of libraries in each group.
+    """
+    r = 1 / delta - 1
+    ngenes = y.shape[0]
+    return (
+        gammaln(y + r).sum()
+        + ngenes * gammaln(n * r).sum()
+        - gammaln(t + n * r).sum()
+        - ngenes * (n * gammaln(r)).sum()
+    )
@@ -0,0 +1,424 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2008-2022 Yunshun Chen, Aaron TL Lun, Davis J McCarthy, Matthew E Ritchie, Belinda Phipson, Yifang Hu, Xiaobei Zhou, Mark D Robinson, Gordon K Smyth
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+# This file is based on the file 'R/estimateDisp.R' of the Bioconductor edgeR package (version 3.38.4).
+
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import qr
+
+from ..limma import squeezeVar
+from ..utils import LOGGER, Factor
+from .aveLogCPM import aveLogCPM
+from .dispCoxReidInterpolateTagwise import _gridAPL
+from .glmFit import glmFit
+from .makeCompressedMatrix import _compressOffsets, _compressWeights
+from .maximizeInterpolant import maximizeInterpolant
+from .parallel import mapGeneBlocks
+from .residDF import _comboGroups, _residDF
+from .validDGEList import validDGEList
+from .WLEB import WLEB
+
+
+def estimateDisp_DGEList(
+    self,
+    design=None,
+    prior_df=None,
+    trend_method="locfit",
+    tagwise=True,
+    span=None,
+    min_row_sum=5,
+    grid_length=21,
+    grid_range=(-10, 10),
+    n_jobs=None,
+):
+    """
+    Estimate the common, trended and tagwise negative binomial dispersions by
+    weighted likelihood empirical Bayes.
+
+    NB: modifies :code:`self` in place
+
+    See :func:`estimateDisp` for the details of the arguments.
+
+    Arguments
+    ---------
+    self : DGEList
+        the DGEList containing the matrix of counts
+    design : matrix, optional
+        design matrix. Defaults to :code:`self.design`, or else to the one-way
+        layout defined by the groups of the samples.
+
+    Returns
+    -------
+    DGEList
+        :code:`self` updated with :code:`common_dispersion`,
+        :code:`trended_dispersion`, :code:`tagwise_dispersion` (if
+        :code:`tagwise` is :code:`True`), :code:`AveLogCPM`,
+        :code:`trend_method`, :code:`prior_df`, :code:`prior_n` and
+        :code:`span`
+    """
+    y = validDGEList(self)
+    if design is None:
+        design = y.design
+    else:
+        y.design = design
+
+    d = estimateDisp(
+        y.counts,
+        design=design,
+        group=y.samples["group"],
+        lib_size=y.getLibSize(),
+        offset=y.getOffset(),
+        prior_df=prior_df,
+        trend_method=trend_method,
+        tagwise=tagwise,
+        span=span,
+        min_row_sum=min_row_sum,
+        grid_length=grid_length,
+        grid_range=grid_range,
+        weights=y.weights,
+        n_jobs=n_jobs,
+    )
+
+    y.common_dispersion = d["common_dispersion"]
+    y.trended_dispersion = d["trended_dispersion"]
+    if tagwise:
+        y.tagwise_dispersion = d["tagwise_dispersion"]
+    y.AveLogCPM = y.aveLogCPM()
+    y.trend_method = trend_method
+    y.prior_df = d["prior_df"]
+    y.prior_n = d["prior_n"]
+    y.span = d["span"]
+    return y
+
+
+def estimateDisp(
+    y,
+    design=None,
+    group=None,
+    lib_size=None,
+    offset=None,
+    prior_df=None,
+    trend_method="locfit",
+    tagwise=True,
+    span=None,
+    min_row_sum=5,
+    grid_length=21,
+    grid_range=(-10, 10),
+    weights=None,
+    n_jobs=None,
+):
+    """
+    Estimate the common, trended and tagwise negative binomial dispersions by
+    weighted likelihood empirical Bayes.
+
+    The Cox-Reid adjusted profile likelihood (see :func:`adjustedProfileLik`)
+    of every gene is evaluated once, on a grid of :code:`grid_length`
+    dispersion values :code:`0.1 * 2**grid` where :code:`grid` is evenly spaced
+    in :code:`grid_range`. The GLM fits at each grid point are warm-started
+    from the coefficients fitted at the neighbouring grid point. All three
+    estimates are then derived from this matrix of likelihoods with
+    :func:`maximizeInterpolant`:
+
+    - the common dispersion maximizes the sum of the likelihoods of all genes,
+    - the trended dispersions maximize the local averages of the likelihoods
+      with respect to the abundance (see :func:`WLEB`),
+    - the tagwise dispersions maximize the weighted sum of the likelihood of
+      each gene and of the local average, with weight :code:`prior_n`
+      (McCarthy et al. 2012 [1]_, Chen et al. 2014 [2]_).
+
+    Unless given, the prior degrees of freedom are estimated by empirical
+    Bayes squeezing (see :func:`.squeezeVar`) of the quasi-likelihood
+    dispersions of the GLM fitted with the trended dispersions.
+
+    Observations whose fitted value is exactly zero (*e.g.* a group of samples
+    with only zero counts) are dropped from the likelihood of the gene, along
+    with the coefficients that they make unestimable.
+
+    If :code:`design` is :code:`None`, the one-way layout defined by
+    :code:`group` is used. Contrary to edgeR, this "classic" case is handled by
+    the same adjusted profile likelihood as a general design, rather than by a
+    conditional likelihood on pseudo-counts.
+
+    If :code:`n_jobs` is greater than 1, the likelihoods of the genes are
+    evaluated by blocks of genes in as many worker processes (see
+    :func:`mapGeneBlocks`).
+
+    Arguments
+    ---------
+    y : matrix
+        matrix of counts
+    design : matrix, optional
+        design matrix, as in :func:`glmFit`
+    group : array_like, optional
+        vector or factor giving the experimental group of each sample, used if
+        :code:`design` is :code:`None`
+    lib_size : array_like, optional
+        library sizes. Defaults to :code:`colSums(y)`.
+    offset : array_like, optional
+        vector or matrix of offsets for the log-linear models, as in
+        :func:`glmFit`. Defaults to :code:`log(lib_size)`.
+    prior_df : float, optional
+        prior degrees of freedom. Estimated from the data if :code:`None`.
+    trend_method : str
+        method to estimate the trend in the dispersions: "locfit" (local
+        constant regression, see :func:`locfitByCol`), "movingave" (moving
+        average, see :func:`movingAverageByCol`) or "none" (no trend).
+        Defaults to "locfit".
+    tagwise : bool
+        whether to compute the tagwise dispersions
+    span : float, optional
+        width of the smoothing window for the trend, as a proportion of the
+        genes. Default value decreases with the number of genes.
+    min_row_sum : int
+        only genes with at least this number of counts are used. The other
+        genes get the trended (or common) dispersion.
+    grid_length : int
+        number of points in the grid of dispersions
+    grid_range : tuple
+        range of the grid of dispersions, in terms of :code:`log2(dispersion /
+        0.1)`
+    weights : matrix, optional
+        observation weights
+    n_jobs : int, optional
+        number of worker processes. Defaults to 1.
+
+    Returns
+    -------
+    dict
+        dictionary with keys :code:`"common_dispersion"`,
+        :code:`"trended_dispersion"` (:code:`None` if :code:`trend_method` is
+        "none"), :code:`"tagwise_dispersion"` (only if :code:`tagwise` is
+        :code:`True`), :code:`"span"`, :code:`"prior_df"` and
+        :code:`"prior_n"`
+
+    References
+    ----------
+    .. [1] D. J. McCarthy, Y. Chen, G. K. Smyth. 2012. Differential expression
+       analysis of multifactor RNA-Seq experiments with respect to biological
+       variation. Nucleic Acids Research 40, 4288-4297. :doi:`10.1093/nar/gks042`
+    .. [2] Y. Chen, A. T. L. Lun, G. K. Smyth. 2014. Differential expression
+       analysis of complex RNA-seq experiments using edgeR. In: Statistical
+       Analysis of Next Generation Sequence Data, Springer, 51-74.
+       :doi:`10.1007/978-3-319-07212-8_3`
+    """
+    # Check y
+    y = np.asarray(y)
+    (ntags, nlibs) = y.shape
+    if ntags == 0:
+        return {"span": span, "prior_df": prior_df, "prior_n": None}
+
+    if trend_method not in ["none", "locfit", "movingave"]:
+        raise ValueError(f"invalid trend method: {trend_method}")
+
+    # Check group
+    if group is None:
+        group = np.ones(nlibs)
+    if len(group) != nlibs:
+        raise ValueError("Incorrect length of group.")
+    group = Factor(group).remove_unused_categories()
+
+    # Check lib_size and offset
+    if lib_size is None:
+        lib_size = y.sum(axis=0)
+    lib_size = np.asarray(lib_size)
+    if len(lib_size) != nlibs:
+        raise ValueError("Incorrect length of lib_size.")
+    if offset is None:
+        offset = np.log(lib_size)
+    offset = _compressOffsets(y, offset=offset)
+    weights = _compressWeights(y, weights)
+
+    nan_disp = {
+        "common_dispersion": np.nan,
+        "trended_dispersion": np.full(ntags, np.nan),
+        "tagwise_dispersion": np.full(ntags, np.nan),
+        "span": span,
+        "prior_df": prior_df,
+        "prior_n": None,
+    }
+
+    # Check design
+    if design is None:
+        if np.all(group.value_counts() <= 1):
+            LOGGER.warning("There is no replication, setting dispersion to NA.")
+            return nan_disp
+        design = np.column_stack(
+            [np.ones(nlibs)]
+            + [np.asarray(group == lvl, dtype=float) for lvl in group.categories[1:]]
+        )
+    else:
+        design = np.asarray(design)
+        if design.shape[1] >= nlibs:
+            LOGGER.warning("No residual df: setting dispersion to NA")
+            return nan_disp
+
+    # Check for genes with small counts
+    sel = y.sum(axis=1) >= min_row_sum
+    sely = y[sel]
+    seloffset = offset[sel]
+    selweights = weights[sel]
+
+    # Spline points
+    spline_pts = np.linspace(grid_range[0], grid_range[1], grid_length)
+    spline_disp = 0.1 * 2**spline_pts
+    l0 = np.zeros((sely.shape[0], grid_length))
+
+    # Identify which observations have means of zero (weights aren't needed
+    # here)
+    glmfit = glmFit(
+        sely,
+        design,
+        offset=seloffset,
+        dispersion=0.05,
+        prior_count=0,
+        n_jobs=n_jobs,
+    )
+    zerofit = (np.asarray(glmfit.counts) < 1e-4) & (glmfit.fitted_values < 1e-4)
+
+    # The likelihood of the genes sharing the same observations with fitted
+    # values at zero is evaluated on the whole grid at once. The GLM fit at each
+    # grid point is warm-started from the coefficients fitted at the
+    # neighbouring grid point, sweeping from the middle of the grid outwards.
+    center = int(np.argmin(np.abs(spline_pts)))
+    for subg in _comboGroups(zerofit):
+        cur_nzero = ~zerofit[subg[0]]
+        if not cur_nzero.any():
+            continue
+        if cur_nzero.all():
+            redesign = design
+        else:
+            redesign = design[cur_nzero]
+            _, R, piv = qr(redesign, mode="economic", pivoting=True)
+            rank = np.linalg.matrix_rank(R)
+            redesign = redesign[:, piv[:rank]]
+            if redesign.shape[0] == redesign.shape[1]:
+                continue
+        l0[subg] = mapGeneBlocks(
+            _gridAPL,
+            {
+                "y": sely[np.ix_(subg, cur_nzero)],
+                "offset": np.asarray(seloffset[subg])[:, cur_nzero],
+                "weights": np.asarray(selweights[subg])[:, cur_nzero],
+            },
+            n_jobs=n_jobs,
+            design=redesign,
+            spline_disp=spline_disp,
+            center=center,
+        )
+
+    # Calculate common dispersion
+    overall = maximizeInterpolant(spline_pts, l0.sum(axis=0, keepdims=True))[0]
+    common_dispersion = 0.1 * 2**overall
+
+    # Allow dispersion trend?
+    AveLogCPM = aveLogCPM(
+        y, lib_size=lib_size, dispersion=common_dispersion, weights=weights
+    )
+    if trend_method != "none":
+        out_1 = WLEB(
+            theta=spline_pts,
+            loglik=l0,
+            covariate=AveLogCPM[sel],
+            trend_method=trend_method,
+            span=span,
+            overall=False,
+            individual=False,
+            m0_out=True,
+        )
+        span = out_1["span"]
+        m0 = out_1["shared_loglik"]
+        disp_trend = 0.1 * 2 ** out_1["trend"]
+        trended_dispersion = np.full(ntags, disp_trend[np.argmin(AveLogCPM[sel])])
+        trended_dispersion[sel] = disp_trend
+    else:
+        m0 = np.broadcast_to(l0.mean(axis=0), l0.shape)
+        disp_trend = common_dispersion
+        trended_dispersion = None
+
+    # Are tagwise dispersions required?
+    if not tagwise:
+        return {
+            "common_dispersion": common_dispersion,
+            "trended_dispersion": trended_dispersion,
+            "span": span,
+            "prior_df": prior_df,
+            "prior_n": None,
+        }
+
+    # Calculate prior_df
+    if prior_df is None:
+        glmfit = glmFit(
+            sely,
+            design,
+            offset=seloffset,
+            weights=selweights,
+            dispersion=disp_trend,
+            prior_count=0,
+            n_jobs=n_jobs,
+        )
+
+        # Adjust df_residual for fitted values at zero
+        zerofit = (np.asarray(glmfit.counts) < 1e-4) & (glmfit.fitted_values < 1e-4)
+        df_residual = np.asarray(_residDF(pd.DataFrame(zerofit), design))
+
+        # Empirical Bayes squeezing of the quasi-likelihood variance factors
+        with np.errstate(invalid="ignore", divide="ignore"):
+            s2 = glmfit.deviance / df_residual
+        s2[df_residual == 0] = 0
+        s2 = np.maximum(s2, 0)
+        s2_fit = squeezeVar(
+            s2,
+            df=df_residual,
+            covariate=AveLogCPM[sel],
+        )
+        prior_df = s2_fit["df_prior"]
+    ncoefs = design.shape[1]
+    prior_n = prior_df / (nlibs - ncoefs)
+
+    # Initiate tagwise dispersions
+    if trend_method != "none":
+        tagwise_dispersion = trended_dispersion.copy()
+    else:
+        tagwise_dispersion = np.full(ntags, common_dispersion)
+
+    # Checking if the shrinkage is near-infinite
+    if prior_n <= 1e6:
+        # Estimating tagwise dispersions
+        out_2 = WLEB(
+            theta=spline_pts,
+            loglik=l0,
+            prior_n=prior_n,
+            covariate=AveLogCPM[sel],
+            trend_method=trend_method,
+            span=span,
+            overall=False,
+            trend=False,
+            m0=m0,
+        )
+        tagwise_dispersion[sel] = 0.1 * 2 ** out_2["individual"]
+
+    return {
+        "common_dispersion": common_dispersion,
+        "trended_dispersion": trended_dispersion,
+        "tagwise_dispersion": tagwise_dispersion,
+        "span": span,
+        "prior_df": prior_df,
+        "prior_n": prior_n,
+    }
@@ -27,7 +27,7 @@ from .validDGEList import validDGEList
 
 
 def estimateGLMCommonDisp_DGEList(
-    self, design=None, method="CoxReid", subset=10000, verbose=False
+    self, design=None, method="CoxReid", subset=10000, verbose=False, n_jobs=None
 ):
     """
     Estimate a common negative binomial dispersion parameter for a DGE dataset
@@ -48,6 +48,8 @@ def estimateGLMCommonDisp_DGEList(
         maximum number of rows of :code:`y` to use in the calculation. Rows
         used are chosen evenly spaced by :code:`AveLogCPM` using
         :func:`systematicSubset`.
+    n_jobs : int, optional
+        number of worker processes, see :func:`dispCoxReid`
 
     Returns
     -------
@@ -67,6 +69,7 @@ def estimateGLMCommonDisp_DGEList(
         AveLogCPM=AveLogCPM,
         verbose=verbose,
         weights=y.weights,
+        n_jobs=n_jobs,
     )
 
     y.common_dispersion = disp
@@ -83,6 +86,7 @@ def estimateGLMCommonDisp(
     AveLogCPM=None,
     verbose=False,
     weights=None,
+    n_jobs=None,
 ):
     """
     Estimate a common negative binomial dispersion parameter for a DGE dataset
@@ -122,6 +126,9 @@ def estimateGLMCommonDisp(
         vector of log2 average counts per million for each gene
     weights : matrix, optional
         observation weights
+    n_jobs : int, optional
+        number of worker processes for the "CoxReid" method, see
+        :func:`dispCoxReid`
 
     Returns
     -------
@@ -157,6 +164,7 @@ def estimateGLMCommonDisp(
             subset=subset,
             AveLogCPM=AveLogCPM,
             weights=weights,
+            n_jobs=n_jobs,
         )
     elif method == "Pearson":
         raise NotImplementedError(
@@ -0,0 +1,175 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2008-2022 Yunshun Chen, Aaron TL Lun, Davis J McCarthy, Matthew E Ritchie, Belinda Phipson, Yifang Hu, Xiaobei Zhou, Mark D Robinson, Gordon K Smyth
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+# This file is based on the file 'R/estimateGLMTrendedDisp.R' of the Bioconductor edgeR package (version 3.38.4).
+
+
+import numpy as np
+
+from ..utils import LOGGER
+from .aveLogCPM import aveLogCPM
+from .dispBinTrend import dispBinTrend
+from .dispCoxReidPowerTrend import dispCoxReidPowerTrend
+from .validDGEList import validDGEList
+
+
+def estimateGLMTrendedDisp_DGEList(self, design=None, method="auto", **kwargs):
+    """
+    Estimate the abundance-dependent trend in the negative binomial dispersion
+    of a DGE dataset with a general experimental design.
+
+    NB: modifies :code:`self` in place
+
+    Arguments
+    ---------
+    self : DGEList
+        the DGEList containing the matrix of counts, as in :func:`glmFit`
+    design : matrix, optional
+        design matrix, as in :func:`glmFit`
+    method : str
+        method for estimating the trend, see :func:`estimateGLMTrendedDisp`
+    **kwargs
+        additional arguments passed to the lower-level function (see
+        :func:`dispBinTrend` and :func:`dispCoxReidPowerTrend`)
+
+    Returns
+    -------
+    DGEList
+        :code:`self` updated with :code:`trended_dispersion`, and
+        :code:`AveLogCPM` if it was not already present in input :code:`self`.
+    """
+    y = validDGEList(self)
+    if y.AveLogCPM is None:
+        y.AveLogCPM = y.aveLogCPM()
+    y.trended_dispersion = estimateGLMTrendedDisp(
+        y.counts,
+        design=design,
+        offset=y.getOffset(),
+        AveLogCPM=y.AveLogCPM,
+        method=method,
+        weights=y.weights,
+        **kwargs,
+    )
+    return y
+
+
+def estimateGLMTrendedDisp(
+    y, design=None, offset=None, AveLogCPM=None, method="auto", weights=None, **kwargs
+):
+    """
+    Estimate the abundance-dependent trend in the negative binomial dispersion
+    of a DGE dataset with a general experimental design.
+
+    The trend is estimated by one of the following methods:
+
+    - "bin.spline" and "bin.loess" group the genes into bins of similar
+      abundance, estimate a common dispersion for each bin and smooth the bin
+      dispersions with a natural spline or a lowess curve respectively (see
+      :func:`dispBinTrend`). The cost of the estimation is a few dozen common
+      dispersion fits on small sets of genes, whatever the number of genes.
+    - "power" fits a power-law trend of the dispersion with respect to the
+      abundance, by maximizing the Cox-Reid adjusted profile likelihood (see
+      :func:`dispCoxReidPowerTrend`).
+    - "auto" chooses "power" when there are fewer than 200 genes, and
+      "bin.spline" otherwise.
+
+    See also
+    --------
+    estimateGLMCommonDisp : for the common dispersion
+    estimateGLMTagwiseDisp : for genewise dispersions in the context of a GLM
+
+    Arguments
+    ---------
+    y : matrix
+        matrix of counts, as in :func:`glmFit`
+    design : matrix, optional
+        design matrix, as in :func:`glmFit`
+    offset : array_like, optional
+        vector or matrix of offsets for the log-linear models, as in
+        :func:`glmFit`. Defaults to :code:`log(colSums(y))`.
+    AveLogCPM : array_like, optional
+        vector of log2 average counts per million for each gene
+    method : str
+        method for estimating the trend. Possible values are "auto",
+        "bin.spline", "bin.loess" and "power". Defaults to "auto".
+    weights : matrix, optional
+        observation weights
+    **kwargs
+        additional arguments passed to :func:`dispBinTrend` or
+        :func:`dispCoxReidPowerTrend`
+
+    Returns
+    -------
+    ndarray
+        vector of the trended dispersion of each gene
+    """
+    # Check y
+    y = np.asarray(y)
+    (ntags, nlibs) = y.shape
+    if ntags == 0:
+        return np.zeros(0)
+
+    # Check design
+    if design is None:
+        design = np.ones((nlibs, 1))
+    else:
+        design = np.asarray(design)
+        if design.shape[1] >= nlibs:
+            LOGGER.warning("No residual df: cannot estimate dispersion")
+            return np.full(ntags, np.nan)
+
+    # Check offset
+    if offset is None:
+        offset = np.log(y.sum(axis=0))
+
+    # Check AveLogCPM
+    if AveLogCPM is None:
+        AveLogCPM = aveLogCPM(y, offset=offset, weights=weights)
+
+    # Check method
+    if method == "auto":
+        method = "power" if ntags < 200 else "bin.spline"
+
+    if method == "bin.spline":
+        trend = dispBinTrend(
+            y,
+            design,
+            offset=offset,
+            method_trend="spline",
+            AveLogCPM=AveLogCPM,
+            weights=weights,
+            **kwargs,
+        )
+    elif method == "bin.loess":
+        trend = dispBinTrend(
+            y,
+            design,
+            offset=offset,
+            method_trend="loess",
+            AveLogCPM=AveLogCPM,
+            weights=weights,
+            **kwargs,
+        )
+    elif method == "power":
+        trend = dispCoxReidPowerTrend(
+            y, design, offset=offset, AveLogCPM=AveLogCPM, weights=weights, **kwargs
+        )
+    else:
+        raise ValueError(f"invalid method for trended dispersion: {method}")
+
+    return trend["dispersion"]
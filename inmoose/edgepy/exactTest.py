@@ -241,19 +241,21 @@ def exactTest(
 
     # Equalize library sizes
     abundance = mglmOneGroup(y.to_numpy(), dispersion=dispersion, offset=offset)
-    e = np.exp(abundance)
-    input_mean = np.broadcast_to(e, (n1, ntags))
-    output_mean = input_mean * lib_size_average
-    input_mean = (input_mean.T * np.broadcast_to(lib_size[j1], input_mean.T.shape)).T
+    # genes along rows, libraries along columns
+    e = np.exp(abundance)[:, None]
+    dispersion2d = dispersion[:, None]
     y1 = q2qnbinom(
-        y1.T, input_mean=input_mean, output_mean=output_mean, dispersion=dispersion
-    ).T
-    input_mean = np.broadcast_to(e, (n2, ntags))
-    output_mean = input_mean * lib_size_average
-    input_mean = (input_mean.T * np.broadcast_to(lib_size[j2], input_mean.T.shape)).T
+        y1.to_numpy(),
+        input_mean=e * np.asarray(lib_size[j1]),
+        output_mean=e * lib_size_average,
+        dispersion=dispersion2d,
+    )
     y2 = q2qnbinom(
-        y2.T, input_mean=input_mean, output_mean=output_mean, dispersion=dispersion
-    ).T
+        y2.to_numpy(),
+        input_mean=e * np.asarray(lib_size[j2]),
+        output_mean=e * lib_size_average,
+        dispersion=dispersion2d,
+    )
 
     if rejection_region == "doubletail":
         exact_pvals = exactTestDoubleTail(
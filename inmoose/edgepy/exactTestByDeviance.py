@@ -19,11 +19,11 @@
 # This file is based on the file 'R/exactTestByDeviance.R' of the Bioconductor edgeR package (version 3.38.4).
 
 import numpy as np
-from scipy.stats import nbinom
 
 from .binomTest import binomTest
-from .edgepy_cpp import compute_unit_nb_deviance
-from .exactTestDoubleTail import exactTestDoubleTail
+from .edgepy_cpp import exact_test_by_deviance_cython
+from .exactTestDoubleTail import _logCondDnbinom, exactTestDoubleTail
+from .parallel import _numThreads
 
 
 def exactTestByDeviance(y1, y2, dispersion=0.0):
@@ -32,7 +32,8 @@ def exactTestByDeviance(y1, y2, dispersion=0.0):
 
     This function uses the deviance goodness of fit statistics to define the
     rejection region, and is therefore equivalent to a conditional likelihood
-    ratio test.
+    ratio test. The probabilities are summed by compiled code, in parallel
+    across genes.
 
     See also
     --------
@@ -97,6 +98,8 @@ def exactTestByDeviance(y1, y2, dispersion=0.0):
         return pvals
 
     # The code below was originally written in C++
+    sum1 = sum1.astype("double")
+    sum2 = sum2.astype("double")
     nlibs = n1 + n2
     stotal = sum1 + sum2
     mu = stotal / nlibs
@@ -104,42 +107,20 @@ def exactTestByDeviance(y1, y2, dispersion=0.0):
     mu2 = mu * n2
     r1 = n1 / dispersion
     r2 = n2 / dispersion
-    p = r1 / (r1 + mu1)
 
     # The aim is to sum conditional probabilities for all partitions of the
     # total sum with deviances greater than that observed for the current
     # partition. We start computing from the extremes in both cases
-    phi1 = 1 / r1
-    phi2 = 1 / r2
-
-    for i in range(ntags):
-        obsdev = compute_unit_nb_deviance(
-            sum1[i], mu1[i], phi1[i]
-        ) + compute_unit_nb_deviance(sum2[i], mu2[i], phi2[i])
-
-        # Going from the left
-        for j in range(int(stotal[i]) + 1):
-            if obsdev <= compute_unit_nb_deviance(
-                j, mu1[i], phi1[i]
-            ) + compute_unit_nb_deviance(stotal[i] - j, mu2[i], phi2[i]):
-                pvals[i] += nbinom.pmf(j, r1[i], p[i]) * nbinom.pmf(
-                    stotal[i] - j, r2[i], p[i]
-                )
-            else:
-                break
-
-        # Going from the right, or what's left of it
-        for k in range(int(stotal[i]) - j + 1):
-            if obsdev <= compute_unit_nb_deviance(
-                k, mu2[i], phi2[i]
-            ) + compute_unit_nb_deviance(stotal[i] - k, mu1[i], phi1[i]):
-                pvals[i] += nbinom.pmf(k, r2[i], p[i]) * nbinom.pmf(
-                    stotal[i] - k, r1[i], p[i]
-                )
-            else:
-                break
-
-    totalr = r1 + r2
-    pvals /= nbinom.pmf(stotal, totalr, totalr / (totalr + mu1 + mu2))
-
+    zeros = np.zeros(ntags)
+    pvals = exact_test_by_deviance_cython(
+        sum1,
+        sum2,
+        mu1,
+        mu2,
+        r1,
+        r2,
+        _logCondDnbinom(zeros, stotal, r1, r2, mu1, mu2),
+        _logCondDnbinom(stotal, stotal, r1, r2, mu1, mu2),
+        nthreads=_numThreads(),
+    )
     return np.minimum(pvals, 1)
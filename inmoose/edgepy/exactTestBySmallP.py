@@ -20,9 +20,10 @@
 
 import numpy as np
 
-from ..utils import dnbinom_mu as dnbinom
 from .binomTest import binomTest
-from .exactTestDoubleTail import exactTestDoubleTail
+from .edgepy_cpp import exact_test_by_small_p_cython
+from .exactTestDoubleTail import _logCondDnbinom, exactTestDoubleTail
+from .parallel import _numThreads
 
 
 def exactTestBySmallP(y1, y2, dispersion=0):
@@ -34,6 +35,11 @@ def exactTestBySmallP(y1, y2, dispersion=0):
     dispersion approaches zero, but gives poor results when the dispersion is
     very large.
 
+    Partitions of the total count whose probability equals the probability of
+    the observed partition up to a relative tolerance of 1e-7 are considered
+    no more likely than the observed partition. The probabilities are summed by
+    compiled code, in parallel across genes.
+
     See also
     --------
     exactTest
@@ -96,17 +102,16 @@ def exactTestBySmallP(y1, y2, dispersion=0):
         )
         return pvals
 
-    for i in range(ntags):
-        ind = np.arange(N[i] + 1)
-        p_top = dnbinom(ind, size=n1 * r[i], mu=n1 * mu[i]) * dnbinom(
-            N[i] - ind, size=n2 * r[i], mu=n2 * mu[i]
-        )
-        p_obs = dnbinom(sum1[i], size=n1 * r[i], mu=n1 * mu[i]) * dnbinom(
-            sum2[i], size=n2 * r[i], mu=n2 * mu[i]
-        )
-        keep = p_top <= p_obs
-        p_bot = dnbinom(N[i], size=(n1 + n2) * r[i], mu=(n1 + n2) * mu[i])
-        pvals[i] = np.sum(p_top[keep] / p_bot)
+    # sum the conditional probabilities of the partitions of the total count
+    # which are not more likely than the observed one
+    size1 = n1 * r
+    size2 = n2 * r
+    sum1 = sum1.astype("double")
+    N = N.astype("double")
+    logp_obs = _logCondDnbinom(sum1, N, size1, size2, n1 * mu, n2 * mu)
+    pvals = exact_test_by_small_p_cython(
+        sum1, N, size1, size2, logp_obs, nthreads=_numThreads()
+    )
 
     # edgeR code returns "min(pvals, 1)" but it looks like a typo: "pmin(pvals, 1)"
     # anyhow, we choose to align with edgeR behavior here
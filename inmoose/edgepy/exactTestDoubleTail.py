@@ -22,7 +22,36 @@ import numpy as np
 
 from ..utils import dnbinom_mu as dnbinom
 from .binomTest import binomTest
+from .edgepy_cpp import exact_test_double_tail_cython
 from .exactTestBetaApprox import exactTestBetaApprox
+from .parallel import _numThreads
+
+
+def _logCondDnbinom(x, s, size1, size2, mu1, mu2):
+    """
+    Log-probability that the first of two independent negative binomial counts
+    is :code:`x`, given that their sum is :code:`s`
+
+    The two distributions must have the same probability parameter, *i.e.*
+    :code:`mu1 / size1 == mu2 / size2`.
+    """
+    size = size1 + size2
+    mu = mu1 + mu2
+    with np.errstate(divide="ignore"):
+        res = (
+            np.log(dnbinom(x, size=size1, mu=mu1))
+            + np.log(dnbinom(s - x, size=size2, mu=mu2))
+            - np.log(dnbinom(s, size=size, mu=mu))
+        )
+    # fall back to log-space computations when the probabilities underflow
+    underflow = ~np.isfinite(res)
+    if underflow.any():
+        res[underflow] = (
+            dnbinom(x, size=size1, mu=mu1, log=True)
+            + dnbinom(s - x, size=size2, mu=mu2, log=True)
+            - dnbinom(s, size=size, mu=mu, log=True)
+        )[underflow]
+    return res
 
 
 def exactTestDoubleTail(y1, y2, dispersion=0, big_count=900):
@@ -30,7 +59,8 @@ def exactTestDoubleTail(y1, y2, dispersion=0, big_count=900):
     Compute genewise *p*-values for differences in the means between two groups of negative-binomially distributed counts.
 
     This function computes two-sided *p*-values by doubling the smaller tail
-    probability.
+    probability. The tail probabilities are summed by compiled code, in
+    parallel across genes.
 
     See also
     --------
@@ -90,33 +120,25 @@ def exactTestDoubleTail(y1, y2, dispersion=0, big_count=900):
     if big.any():
         pvals[big] = exactTestBetaApprox(y1[big, :], y2[big, :], dispersion[big])
 
-    pbot = np.zeros(ntags)
-    size1 = np.zeros(ntags)
-    size2 = np.zeros(ntags)
+    # Sum the conditional probabilities of the partitions of the total count
+    # that are at least as extreme as the observed one, on the same side
     left = (s1 < mu1) & ~pois & ~big
-    if left.any():
-        pbot[left] = dnbinom(s[left], size=(n1 + n2) / dispersion[left], mu=s[left])
-        size1[left] = n1 / dispersion[left]
-        size2[left] = n2 / dispersion[left]
-        for g in np.nonzero(left)[0]:
-            x = np.arange(s1[g] + 1)
-            p_top = dnbinom(x, size=size1[g], mu=mu1[g]) * dnbinom(
-                s[g] - x, size=size2[g], mu=mu2[g]
-            )
-            pvals[g] = 2 * p_top.sum()
-        pvals[left] = pvals[left] / pbot[left]
-
     right = (s1 > mu1) & ~pois & ~big
-    if right.any():
-        pbot[right] = dnbinom(s[right], size=(n1 + n2) / dispersion[right], mu=s[right])
-        size1[right] = n1 / dispersion[right]
-        size2[right] = n2 / dispersion[right]
-        for g in np.nonzero(right)[0]:
-            x = np.arange(s1[g], s[g] + 1)
-            p_top = dnbinom(x, size=size1[g], mu=mu1[g]) * dnbinom(
-                s[g] - x, size=size2[g], mu=mu2[g]
-            )
-            pvals[g] = 2 * p_top.sum()
-        pvals[right] = pvals[right] / pbot[right]
+    tail = left | right
+    if tail.any():
+        size1 = n1 / dispersion[tail]
+        size2 = n2 / dispersion[tail]
+        st1 = s1[tail].astype("double")
+        st = s[tail].astype("double")
+        logp_obs = _logCondDnbinom(st1, st, size1, size2, mu1[tail], mu2[tail])
+        pvals[tail] = 2 * exact_test_double_tail_cython(
+            st1,
+            st,
+            size1,
+            size2,
+            logp_obs,
+            right[tail].astype(np.uint8),
+            nthreads=_numThreads(),
+        )
 
     return np.minimum(pvals, 1)
@@ -0,0 +1,171 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2008-2022 Yunshun Chen, Aaron TL Lun, Davis J McCarthy, Matthew E Ritchie, Belinda Phipson, Yifang Hu, Xiaobei Zhou, Mark D Robinson, Gordon K Smyth
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+
+# This file is based on the file 'R/filterByExpr.R' of the Bioconductor edgeR package (version 3.38.4).
+
+
+import numpy as np
+from scipy.sparse import issparse
+
+from ..utils import LOGGER, asfactor
+from .cpm import cpm
+
+
+def filterByExpr_DGEList(self, design=None, group=None, lib_size=None, **kwargs):
+    """
+    Determine which genes of a DGEList have sufficiently large counts to be
+    retained in a statistical analysis.
+
+    See :func:`filterByExpr` for details. The genes can then be filtered by
+    subsetting the DGEList, *e.g.* :code:`y = y[keep]`.
+
+    Arguments
+    ---------
+    self : DGEList
+        the DGEList containing the matrix of counts
+    design : matrix, optional
+        design matrix. Defaults to :code:`self.design`.
+    group : array_like or Factor, optional
+        vector or factor giving the experimental group/condition for each
+        library. Defaults to the groups of the samples, if :code:`design` is
+        not specified and :code:`self.design` is :code:`None`.
+    lib_size : array_like, optional
+        vector of library sizes. Defaults to the normalized library sizes of
+        :code:`self`.
+    **kwargs
+        additional arguments passed to :func:`filterByExpr`
+
+    Returns
+    -------
+    ndarray
+        boolean vector of length :code:`self.counts.shape[0]`, indicating
+        which genes are to be kept
+    """
+    if design is None and group is None:
+        design = self.design
+        if design is None:
+            group = self.samples["group"]
+    if lib_size is None:
+        lib_size = self.getLibSize()
+    return filterByExpr(
+        self.counts, design=design, group=group, lib_size=lib_size, **kwargs
+    )
+
+
+def filterByExpr(
+    y,
+    design=None,
+    group=None,
+    lib_size=None,
+    min_count=10,
+    min_total_count=15,
+    large_n=10,
+    min_prop=0.7,
+):
+    """
+    Determine which genes have sufficiently large counts to be retained in a
+    statistical analysis.
+
+    This function implements the filtering strategy of Chen et al. (2016)
+    [1]_. Roughly speaking, the strategy keeps genes that have at least
+    :code:`min_count` reads in a worthwhile number of samples. More precisely,
+    the filtering keeps genes that have CPM values above a cutoff in at least
+    :code:`n` samples, where the cutoff is :code:`min_count` divided by the
+    median library size (in millions), and :code:`n` is the smallest group
+    sample size or, more generally, the minimum inverse leverage computed
+    from the design matrix. If :code:`n` is greater than :code:`large_n`, it
+    is reduced to :code:`large_n + (n - large_n) * min_prop`. In addition, each
+    kept gene is required to have at least :code:`min_total_count` reads
+    across all the samples.
+
+    Sparse counts are not densified: only their non-zero values are compared
+    to the cutoff.
+
+    Arguments
+    ---------
+    y : array_like, pd.DataFrame or sparse matrix
+        matrix of counts, genes in rows and libraries in columns
+    design : matrix, optional
+        design matrix. Ignored if :code:`group` is not :code:`None`.
+    group : array_like or Factor, optional
+        vector or factor giving the experimental group/condition for each
+        library
+    lib_size : array_like, optional
+        vector of library sizes. Defaults to the column sums of :code:`y`.
+    min_count : float
+        minimum count required for at least some samples
+    min_total_count : float
+        minimum total count required
+    large_n : int
+        number of samples per group that is considered to be "large"
+    min_prop : float
+        minimum proportion of samples in the smallest group that express the
+        gene
+
+    Returns
+    -------
+    ndarray
+        boolean vector of length :code:`y.shape[0]`, indicating which genes
+        are to be kept
+
+    References
+    ----------
+    .. [1] Y. Chen, A. T. L. Lun, G. K. Smyth. 2016. From reads to genes to
+       pathways: differential expression analysis of RNA-Seq experiments using
+       Rsubread and the edgeR quasi-likelihood pipeline. F1000Research 5, 1438.
+       :doi:`10.12688/f1000research.8987.2`
+    """
+    if not issparse(y):
+        y = np.asarray(y)
+    if lib_size is None:
+        lib_size = np.asarray(y.sum(axis=0)).ravel()
+    lib_size = np.asarray(lib_size, dtype=float)
+
+    # Minimum effective sample size for any of the coefficients
+    if group is None:
+        if design is None:
+            LOGGER.info(
+                "No group or design set. Assuming all samples belong to one group."
+            )
+            min_sample_size = y.shape[1]
+        else:
+            # inverse of the largest leverage
+            Q = np.linalg.qr(np.asarray(design, dtype=float))[0]
+            min_sample_size = 1 / (Q**2).sum(axis=1).max()
+    else:
+        n = asfactor(group).value_counts().to_numpy()
+        min_sample_size = n[n > 0].min()
+    if min_sample_size > large_n:
+        min_sample_size = large_n + (min_sample_size - large_n) * min_prop
+
+    # CPM cutoff
+    cpm_cutoff = min_count / np.median(lib_size) * 1e6
+    tol = 1e-14
+    if cpm_cutoff > 0:
+        # zero counts never pass a positive cutoff
+        above = cpm(y, lib_size=lib_size) >= cpm_cutoff
+        n_above = np.asarray(above.sum(axis=1)).ravel()
+    else:
+        n_above = np.full(y.shape[0], y.shape[1])
+    keep_cpm = n_above >= min_sample_size - tol
+
+    # Total count cutoff
+    keep_total_count = np.asarray(y.sum(axis=1)).ravel() >= min_total_count - tol
+
+    return keep_cpm & keep_total_count
@@ -27,14 +27,21 @@ from patsy import DesignMatrix, dmatrix
 from ..utils import asfactor
 from .DGEGLM import DGEGLM
 from .DGELRT import DGELRT
-from .makeCompressedMatrix import _compressDispersions, _compressOffsets
+from .makeCompressedMatrix import (
+    _compressDispersions,
+    _compressOffsets,
+    _compressWeights,
+)
 from .mglmLevenberg import mglmLevenberg
 from .mglmOneWay import designAsFactor, mglmOneWay
 from .nbinomDeviance import nbinomDeviance
+from .parallel import mapGeneBlocks
 from .predFC import predFC
 
 
-def glmFit_DGEList(self, design=None, dispersion=None, prior_count=0.125, start=None):
+def glmFit_DGEList(
+    self, design=None, dispersion=None, prior_count=0.125, start=None, n_jobs=None
+):
     """
     Fit a negative binomial generalized log-linear model to the read counts for
     each gene. Conduct genewise statistical tests for a given coefficient or
@@ -61,6 +68,8 @@ def glmFit_DGEList(self, design=None, dispersion=None, prior_count=0.125, start=
         log-fold-change towards zero.
     start : matrix, optional
         initial estimates for the linear model coefficients
+    n_jobs : int, optional
+        number of worker processes fitting the genes, see :func:`glmFit`
 
     Returns
     -------
@@ -94,6 +103,7 @@ def glmFit_DGEList(self, design=None, dispersion=None, prior_count=0.125, start=
         weights=self.weights,
         prior_count=prior_count,
         start=start,
+        n_jobs=n_jobs,
     )
 
     fit.samples = self.samples
@@ -112,6 +122,7 @@ def glmFit(
     weights=None,
     prior_count=0.125,
     start=None,
+    n_jobs=None,
 ):
     """
     Fit a negative binomial generalized log-linear model to the read counts for
@@ -134,6 +145,10 @@ def glmFit(
     shrinkage. The returned coefficients are affected but not the likelihood
     ratio tests or p-values.
 
+    If :code:`n_jobs` is greater than 1, the genes are fitted by blocks in as
+    many worker processes, which read the counts, offsets, weights and
+    dispersions from shared memory (see :func:`mapGeneBlocks`).
+
     See also
     --------
     mglmOneGroup : low-level computations
@@ -168,6 +183,11 @@ def glmFit(
         log-fold-change towards zero.
     start : matrix, optional
         initial estimates for the linear model coefficients
+    n_jobs : int, optional
+        number of worker processes fitting the genes. Negative values count
+        from the number of CPUs (-1 for all CPUs). Defaults to 1, *i.e.* the
+        genes are fitted in the current process (by multi-threaded compiled
+        code).
 
     Returns
     -------
@@ -194,6 +214,75 @@ def glmFit(
     # Check y
     (ntag, nlib) = y.shape
 
+    # Check design, dispersion, offset and lib_size
+    (design, dispersion, offset, lib_size) = _checkGLMInputs(
+        y, design, dispersion, offset, lib_size
+    )
+    dispersion_mat = _compressDispersions(y, dispersion)
+
+    # Consolidate lib_size and offset into a compressed matrix
+    offset = _compressOffsets(y=y, lib_size=lib_size, offset=offset)
+
+    # weights are checked in lower-level functions
+
+    # Fit the tagwise GLMs
+    # If the design is equivalent to a oneway layout, use a shortcut algorithm
+    group = designAsFactor(design)
+    oneway = group.nlevels() == design.shape[1]
+    res = mapGeneBlocks(
+        _fitGLMs,
+        {
+            "y": y,
+            "dispersion": dispersion_mat,
+            "offset": offset,
+            # weights are split by genes, they must be a matrix
+            "weights": None if weights is None else _compressWeights(y, weights),
+            "start": start,
+        },
+        n_jobs=n_jobs,
+        design=np.asarray(design, order="F"),
+        group=group if oneway else None,
+        prior_count=prior_count,
+    )
+
+    # Prepare output
+    fit = DGEGLM(res[:5])
+    fit.counts = y
+    fit.method = "oneway" if oneway else "levenberg"
+    if prior_count > 0:
+        fit.unshrunk_coefficients = fit.coefficients
+        fit.coefficients = res[5]
+
+    # counts N,M
+    # design M,P
+    assert y.shape[1] == design.shape[0]
+    w_vec = fit.fitted_values / (1.0 + dispersion_mat * fit.fitted_values)
+    if weights is not None:
+        w_vec = weights * w_vec
+    ridge = np.diag(np.repeat(1e-6 / (np.log(2) ** 2), design.shape[1]))
+    xtwxr_inv = np.linalg.inv(design.T @ (design * w_vec[:, :, None]) + ridge)
+    sigma = xtwxr_inv @ design.T @ (design * w_vec[:, :, None]) @ xtwxr_inv
+    fit.coeff_SE = np.diagonal(sigma, axis1=-2, axis2=-1)
+
+    # FIXME (from original R source) we are not allowing missing values, so df.residual must be same for all tags
+    fit.df_residual = np.full(ntag, nlib - design.shape[1])
+    fit.design = design
+    fit.offset = offset
+    fit.dispersion = dispersion
+    fit.weights = weights
+    fit.prior_count = prior_count
+    return fit
+
+
+def _checkGLMInputs(y, design, dispersion, offset, lib_size):
+    """
+    check the design, dispersion, offset and library sizes given to
+    :func:`glmFit` against the counts :code:`y`
+
+    Return the checked (design, dispersion, offset, lib_size), as arrays.
+    """
+    (ntag, nlib) = y.shape
+
     # Check design
     if design is None:
         design = dmatrix("~1", pd.DataFrame(y.T))
@@ -218,7 +307,6 @@ def glmFit(
     # TODO check dispersion for NaN and non-numeric values
     if dispersion.shape not in [(), (1,), (ntag,), y.shape]:
         raise ValueError("Dimensions of dispersion do not agree with dimensions of y")
-    dispersion_mat = _compressDispersions(y, dispersion)
 
     # Check offset
     if offset is not None:
@@ -234,75 +322,57 @@ def glmFit(
         if lib_size.shape not in [(), (1,), (nlib,)]:
             raise ValueError("lib_size has wrong length, should agree with ncol(y)")
 
-    # Consolidate lib_size and offset into a compressed matrix
-    offset = _compressOffsets(y=y, lib_size=lib_size, offset=offset)
+    return (design, dispersion, offset, lib_size)
 
-    # weights are checked in lower-level functions
 
-    # Fit the tagwise GLMs
-    # If the design is equivalent to a oneway layout, use a shortcut algorithm
-    group = designAsFactor(design)
-    if group.nlevels() == design.shape[1]:
+def _fitGLMs(
+    y, dispersion, offset, weights, start, design, group, prior_count, tol=1e-6
+):
+    """
+    fit the genewise GLMs of :func:`glmFit` (a oneway layout if :code:`group`
+    is not :code:`None`, otherwise with convergence tolerance :code:`tol`), and
+    compute the shrunk coefficients if :code:`prior_count` is positive
+
+    Return a 6-tuple (coefficients, fitted values, deviance, iterations,
+    failures, shrunk coefficients).
+    """
+    if group is not None:
         (coef, fitted_values) = mglmOneWay(
             y,
             design=design,
             group=group,
-            dispersion=dispersion_mat,
+            dispersion=dispersion,
             offset=offset,
             weights=weights,
             coef_start=start,
         )
         deviance = nbinomDeviance(
-            y=y, mean=fitted_values, dispersion=dispersion_mat, weights=weights
+            y=y, mean=fitted_values, dispersion=dispersion, weights=weights
         )
-        fit_method = "oneway"
         fit = (coef, fitted_values, deviance, None, None)
     else:
         fit = mglmLevenberg(
             y,
             design=design,
-            dispersion=dispersion_mat,
+            dispersion=dispersion,
             offset=offset,
             weights=weights,
             coef_start=start,
             maxit=250,
+            tol=tol,
         )
-        fit_method = "levenberg"
 
-    # Prepare output
-    fit = DGEGLM(fit)
-    fit.counts = y
-    fit.method = fit_method
+    shrunk = None
     if prior_count > 0:
-        fit.unshrunk_coefficients = fit.coefficients
-        fit.coefficients = predFC(
+        shrunk = predFC(
             y,
             design,
             offset=offset,
-            dispersion=dispersion_mat,
+            dispersion=dispersion,
             prior_count=prior_count,
             weights=weights,
         ) * np.log(2)
-
-    # counts N,M
-    # design M,P
-    assert y.shape[1] == design.shape[0]
-    w_vec = fit.fitted_values / (1.0 + dispersion_mat * fit.fitted_values)
-    if weights is not None:
-        w_vec = weights * w_vec
-    ridge = np.diag(np.repeat(1e-6 / (np.log(2) ** 2), design.shape[1]))
-    xtwxr_inv = np.linalg.inv(design.T @ (design * w_vec[:, :, None]) + ridge)
-    sigma = xtwxr_inv @ design.T @ (design * w_vec[:, :, None]) @ xtwxr_inv
-    fit.coeff_SE = np.diagonal(sigma, axis1=-2, axis2=-1)
-
-    # FIXME (from original R source) we are not allowing missing values, so df.residual must be same for all tags
-    fit.df_residual = np.full(ntag, nlib - design.shape[1])
-    fit.design = design
-    fit.offset = offset
-    fit.dispersion = dispersion
-    fit.weights = weights
-    fit.prior_count = prior_count
-    return fit
+    return tuple(fit) + (shrunk,)
 
 
 def glmLRT(glmfit, coef=None, contrast=None):
@@ -319,24 +389,36 @@ def glmLRT(glmfit, coef=None, contrast=None):
     contrast of :code:`[0,1,-1]`, assuming there are three coefficients, would
     test the hypothesis that the second and third coefficients are equal.
 
+    Several tests can be conducted at once, by passing a list of :code:`coef`
+    (*e.g.* :code:`[[1], [2], [1, 2]]`) or a list of :code:`contrast`. The
+    null models of the tests are then fitted in a single call: tests sharing
+    the same null design share the same null fit.
+
+    Each null model is fitted starting from the coefficients of the full model
+    projected onto the null design, which is closer to the solution than the
+    default starting values.
+
     Arguments
     ---------
     glmfit : DGEGLM
         a :class:`DGEGLM` object, usually output from :func:`glmFit`
-    coef : array_like of integers or strings
+    coef : array_like of integers or strings, or list of array_like
         vector indicating which coefficients of the linear model are to be
         tested equal to zero. Values must be column indices or column names of
         :code:`design`. Defaults to the last coefficient. Ignored if
-        :code:`contrast` is specified.
-    contrast : array or matrix of integers
+        :code:`contrast` is specified. A list of such vectors conducts one test
+        per vector.
+    contrast : array or matrix of integers, or list of arrays or matrices
         vector or matrix specifying one or more contrasts of the linear model
         coefficients to be tested equal to zero. Number of rows must equal to
         the number of columns of :code:`design`. If specified, then takes
-        precedence over :code:`coef`.
+        precedence over :code:`coef`. A list of such vectors or matrices
+        conducts one test per element, whereas a plain list of numbers is a
+        single contrast vector.
 
     Returns
     -------
-    DGELRT
+    DGELRT or list of DGELRT
         dataframe with two additional components:
 
         - :code:`fit` containing the result of :func:`glmFit`
@@ -353,51 +435,75 @@ def glmLRT(glmfit, coef=None, contrast=None):
           over all libraries in :code:`y`.
         - :code:`"stat"`, likelihood ratio statistics.
         - :code:`"pvalue"`, *p*-values.
+
+        When several tests are requested, a list with one such dataframe per
+        test, in the order of the tests.
     """
-    if coef is None:
-        coef = glmfit.design.shape[1] - 1
     if not isinstance(glmfit, DGEGLM):
         raise ValueError("glmfit must be a DGEGLM object (usually produced by glmFit).")
 
     if glmfit.AveLogCPM is None:
         glmfit.AveLogCPM = glmfit.aveLogCPM()
-    nlibs = glmfit.coefficients.shape[1]
 
     # check design matrix
-    design = glmfit.design
-    nbeta = design.shape[1]
-    if nbeta < 2:
+    if glmfit.design.shape[1] < 2:
         raise ValueError(
             "Need at least two columns for design, usually the first is the intercept columns"
         )
+
+    # null fits, shared by the tests with the same null design
+    null_fits = {}
+    if contrast is not None:
+        # a list of vectors or matrices conducts several tests, while a single
+        # vector (possibly given as a list) or a matrix conducts one test
+        if isinstance(contrast, (list, tuple)) and any(
+            isinstance(c, (list, tuple, np.ndarray)) for c in contrast
+        ):
+            return [_glmLRT(glmfit, None, c, null_fits) for c in contrast]
+    elif isinstance(coef, (list, tuple, np.ndarray)) and any(
+        isinstance(c, (list, tuple, np.ndarray)) for c in coef
+    ):
+        return [_glmLRT(glmfit, c, None, null_fits) for c in coef]
+    return _glmLRT(glmfit, coef, contrast, null_fits)
+
+
+def _glmLRT(glmfit, coef, contrast, null_fits):
+    """conduct a single likelihood ratio test for :func:`glmLRT`"""
+    if coef is None:
+        coef = glmfit.design.shape[1] - 1
+    nlibs = glmfit.coefficients.shape[1]
+
+    design = glmfit.design
     coef_names = design.design_info.column_names
 
     # Evaluate logFC for coef to be tested
     # Note that contrast takes precedence over coef: if contrast is given then reform
     # design matrix so that contrast of interest is last column
     if contrast is None:
-        if not isinstance(coef, (list, np.ndarray)):
+        if not isinstance(coef, (list, tuple, np.ndarray)):
             coef = [coef]
         if isinstance(coef[0], str):
-            check_coef = np.isin(coef, design.design_info.column_names)
+            check_coef = np.isin(coef, coef_names)
             if (~check_coef).any():
                 raise ValueError(
                     "One or more named coef arguments do not match a column of the design matrix."
                 )
             coef_name = coef
-            coef = np.nonzero([design.design_info.column_names == c for c in coef])[0]
+            coef = [coef_names.index(c) for c in coef]
         else:
             coef_name = [coef_names[c] for c in coef]
         logFC = glmfit.coefficients[:, coef] / np.log(2)
         lfcSE = glmfit.coeff_SE[:, coef] / np.log(2)
     else:
-        # TODO make sure contrast is a matrix
+        contrast = np.asarray(contrast)
+        if contrast.ndim == 1:
+            contrast = contrast[:, None]
         if contrast.shape[0] != glmfit.coefficients.shape[1]:
             raise ValueError(
                 "contrast vector of wrong length, should be equal to number of coefficients in the linear model"
             )
         ncontrasts = np.linalg.matrix_rank(contrast)
-        Q, R = np.linalg.qr(contrast)
+        Q, R = np.linalg.qr(contrast, mode="complete")
         if ncontrasts == 0:
             raise ValueError("contrasts are all zero")
         coef = np.arange(ncontrasts)
@@ -406,29 +512,35 @@ def glmLRT(glmfit, coef=None, contrast=None):
         if ncontrasts > 1:
             coef_name = f"LR test on {ncontrasts} degrees of freedom"
         else:
-            contrast = np.squeeze(contrast)
+            logFC = logFC[:, 0]
+            lfcSE = lfcSE[:, 0]
+            contrast = contrast[:, 0]
             i = contrast != 0
             coef_name = " ".join(
-                [f"{a}*{b}" for a, b in zip(contrast[i], coef_names[i])]
+                [f"{a}*{b}" for a, b in zip(contrast[i], np.asarray(coef_names)[i])]
             )
-        Dvec = np.ones(nlibs, int)
+        Dvec = np.ones(nlibs)
         Dvec[coef] = np.diag(R)[coef]
         Q = Q * Dvec
         design = design @ Q
 
     # Null design matrix
     non_coef = np.setdiff1d(np.arange(design.shape[1]), coef)
-    design0 = design[:, non_coef]
+    design0 = np.asarray(design[:, non_coef], order="F")
 
     # Null fit
-    fit_null = glmFit(
-        glmfit.counts,
-        design=design0,
-        offset=glmfit.offset,
-        weights=glmfit.weights,
-        dispersion=glmfit.dispersion,
-        prior_count=0,
-    )
+    key = (design0.shape, design0.tobytes())
+    if key not in null_fits:
+        null_fits[key] = glmFit(
+            glmfit.counts,
+            design=design0,
+            offset=glmfit.offset,
+            weights=glmfit.weights,
+            dispersion=glmfit.dispersion,
+            prior_count=0,
+            start=_projectCoefficients(glmfit, design0),
+        )
+    fit_null = null_fits[key]
 
     # Likelihood ratio statistic
     LR = np.subtract(fit_null.deviance, glmfit.deviance)
@@ -455,3 +567,37 @@ def glmLRT(glmfit, coef=None, contrast=None):
     res.comparison = coef_name
     res.df_test = df_test
     return res
+
+
+def _projectCoefficients(glmfit, design0):
+    """
+    Starting values for the fit of a null design, from a fit of the full model
+
+    The linear predictors of the full model are projected onto the column
+    space of :code:`design0` by weighted least squares, with the working
+    weights of the full fit. Libraries with negligible fitted values (*e.g.*
+    groups of zero counts, whose linear predictors are very large negative
+    numbers) thus do not weigh on the projection.
+
+    Genes for which the projection is not defined get :code:`NaN` starting
+    values, and are started from the default values by the fitting functions.
+    """
+    beta = glmfit.unshrunk_coefficients
+    if beta is None:
+        beta = glmfit.coefficients
+    design = np.asarray(glmfit.design)
+    eta = beta @ design.T
+
+    mu = glmfit.fitted_values
+    disp = np.asarray(_compressDispersions(mu, glmfit.dispersion))
+    w = mu / (1 + disp * mu)
+    if glmfit.weights is not None:
+        w = w * glmfit.weights
+
+    A = np.einsum("gl,li,lj->gij", w, design0, design0)
+    b = np.einsum("gl,li->gi", w * eta, design0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        start = np.einsum("gij,gj->gi", np.linalg.pinv(A), b)
+    undefined = ~np.isfinite(start).all(axis=1) | (w.sum(axis=1) <= 0)
+    start[undefined] = np.nan
+    return start
@@ -26,6 +26,7 @@ from ..limma import squeezeVar
 from .aveLogCPM import aveLogCPM
 from .DGEGLM import DGEGLM
 from .glmFit import glmFit, glmLRT
+from .makeCompressedMatrix import _compressDispersions
 from .residDF import _residDF
 
 
@@ -36,6 +37,7 @@ def glmQLFit_DGEList(
     abundance_trend=True,
     robust=False,
     winsor_tail_p=(0.05, 0.1),
+    n_jobs=None,
 ):
     """
     Fit a quasi-likelihood negative binomial generalized log-linear model to count data.
@@ -64,6 +66,8 @@ def glmQLFit_DGEList(
         the hyperparameters. Positive values produce robust empirical Bayes
         ignoring outlier small or large deviances. Only used when
         :code:`robust=True`.
+    n_jobs : int, optional
+        number of worker processes fitting the genes, see :func:`glmFit`
 
     Returns
     -------
@@ -110,6 +114,7 @@ def glmQLFit_DGEList(
         robust=robust,
         winsor_tail_p=winsor_tail_p,
         weights=self.weights,
+        n_jobs=n_jobs,
     )
     fit.samples = self.samples
     fit.genes = self.genes
@@ -128,6 +133,7 @@ def glmQLFit(
     AveLogCPM=None,
     robust=False,
     winsor_tail_p=(0.05, 0.1),
+    n_jobs=None,
 ):
     """
     Fit a quasi-likelihood negative binomial generalized log-linear model to count data.
@@ -184,6 +190,8 @@ def glmQLFit(
         the hyperparameters. Positive values produce robust empirical Bayes
         ignoring outlier small or large deviances. Only used when
         :code:`robust=True`.
+    n_jobs : int, optional
+        number of worker processes fitting the genes, see :func:`glmFit`
 
     Returns
     -------
@@ -209,6 +217,7 @@ def glmQLFit(
         offset=offset,
         lib_size=lib_size,
         weights=weights,
+        n_jobs=n_jobs,
     )
 
     # Setting up the abundances.
@@ -275,12 +284,14 @@ def glmQLFTest(glmfit, coef=None, contrast=None, poisson_bound=True):
     ---------
     glmfit : DGEGLM
         a :class:`DGEGLM` object, usually output from :func:`glmQLFit`
-    coeff : int or string array
+    coeff : int or string array, or list of arrays
         indicated which coefficients of the linear model are to be tested equal to zero.
-        Ignored if :code:`contrast` is not :code:`None`.
-    contrast : array_like
+        Ignored if :code:`contrast` is not :code:`None`. A list of arrays
+        conducts one test per array (see :func:`glmLRT`).
+    contrast : array_like, or list of array_like
         vector or matrix specifying one or more contrasts of the linear model
-        coefficients to be tested equal to zero.
+        coefficients to be tested equal to zero. A list of vectors or matrices
+        conducts one test per element (see :func:`glmLRT`).
     poisson_bound : bool
         if :code:`True` then the *p*-value returned will never be less than
         would be obtained for a likelihood ratio test with NB dispersion equal
@@ -294,6 +305,8 @@ def glmQLFTest(glmfit, coef=None, contrast=None, poisson_bound=True):
         :code:`table` contains quasi-likelihood F-statistics. It also stored
         :code:`df_total`, an array containing the denominator degrees of
         freedom for the F-test, equal to :code:`df_prior + df_residual_zeros`.
+        When several tests are requested, a list with one such object per
+        test.
     """
 
     if coef is None:
@@ -304,17 +317,17 @@ def glmQLFTest(glmfit, coef=None, contrast=None, poisson_bound=True):
     if glmfit.var_post is None:
         raise ValueError("need to run glmQLFit before glmQLFTest")
     out = glmLRT(glmfit, coef=coef, contrast=contrast)
+    several = isinstance(out, list)
+    if not several:
+        out = [out]
 
-    # compute the QL F-statistic
-    F_stat = out["stat"] / out.df_test / glmfit.var_post
     df_total = glmfit.df_prior + glmfit.df_residual_zeros
     max_df_residual = glmfit.counts.shape[1] - glmfit.design.shape[1]
     df_total = np.minimum(df_total, glmfit.counts.shape[0] * max_df_residual)
 
-    # compute p-values from the QL F-statistic
-    F_pvalue = scipy.stats.f.sf(F_stat, dfn=out.df_test, dfd=df_total)
-
     # Ensure is not more significant than chisquare test with Poisson variance
+    # The Poisson fit is shared by all the tests
+    pois_res = [None] * len(out)
     if poisson_bound:
         i = _isBelowPoissonBound(glmfit)
         if i.any():
@@ -327,20 +340,30 @@ def glmQLFTest(glmfit, coef=None, contrast=None, poisson_bound=True):
                 dispersion=0,
             )
             pois_res = glmLRT(pois_fit, coef=coef, contrast=contrast)
-            F_pvalue[i] = np.maximum(F_pvalue[i], pois_res["pvalue"])
+            if not several:
+                pois_res = [pois_res]
+
+    for o, p in zip(out, pois_res):
+        # compute the QL F-statistic
+        F_stat = o["stat"] / o.df_test / glmfit.var_post
+
+        # compute p-values from the QL F-statistic
+        F_pvalue = scipy.stats.f.sf(F_stat, dfn=o.df_test, dfd=df_total)
+        if p is not None:
+            F_pvalue[i] = np.maximum(F_pvalue[i], p["pvalue"])
 
-    out["stat"] = F_stat
-    out["pvalue"] = F_pvalue
-    out.df_total = df_total
+        o["stat"] = F_stat
+        o["pvalue"] = F_pvalue
+        o.df_total = df_total
 
-    return out
+    return out if several else out[0]
 
 
 def _isBelowPoissonBound(glmfit):
     """a convenience function"""
-    disp = glmfit.dispersion
-    s2 = glmfit.var_post[:, None]
     fitted = glmfit.fitted_values
+    disp = np.asarray(_compressDispersions(fitted, glmfit.dispersion))
+    s2 = glmfit.var_post[:, None]
 
     return (((fitted * disp + 1) * s2) < 1).any(axis=1)
 
@@ -22,14 +22,16 @@
 
 import numpy as np
 
-from .edgepy_cpp import glm_one_group_cython
+from .edgepy_cpp import fit_one_way_cython
+from .parallel import _numThreads
 
 
 def glm_one_group(counts, offset, disp, weights, maxit, tolerance, cur_beta):
     """
     Simplified fit for negative binomial GLM when the design matrix is one group
 
-    This is the low-level function called by :func:`fit_one_group`.
+    This is the low-level function called by :func:`fit_one_group`. The genes
+    are fitted in parallel by :func:`fit_one_way_cython`, with a single group.
 
     See Also
     --------
@@ -60,21 +62,22 @@ def glm_one_group(counts, offset, disp, weights, maxit, tolerance, cur_beta):
         whether the fit converged for each coefficient
     """
 
-    out_beta = cur_beta.copy()
-    out_conv = np.repeat(False, out_beta.shape)
-
-    for j in range(out_beta.shape[0]):
-        (out_beta[j], out_conv[j]) = glm_one_group_cython(
-            counts.shape[1],
-            counts[j, :],
-            offset[j, :],
-            disp[j, :],
-            weights[j, :],
-            maxit,
-            tolerance,
-            cur_beta[j],
-        )
-    return (out_beta, out_conv)
+    if counts.dtype != np.dtype("long"):
+        counts = np.asarray(counts, dtype="double")
+    (out_beta, out_conv) = fit_one_way_cython(
+        counts,
+        np.asarray(offset, dtype="double"),
+        np.asarray(disp, dtype="double"),
+        np.asarray(weights, dtype="double"),
+        np.zeros(counts.shape[1], dtype=np.intp),
+        1,
+        np.asarray(cur_beta, dtype="double").reshape((-1, 1)),
+        maxit,
+        tolerance,
+        usePoisson=False,
+        nthreads=_numThreads(),
+    )
+    return (out_beta[:, 0], out_conv[:, 0])
 
 
 def fit_one_group(y, offsets, disp, weights, maxit, tol, beta, usePoisson=True):
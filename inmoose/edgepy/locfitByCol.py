@@ -0,0 +1,106 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2008-2022 Yunshun Chen, Aaron TL Lun, Davis J McCarthy, Matthew E Ritchie, Belinda Phipson, Yifang Hu, Xiaobei Zhou, Mark D Robinson, Gordon K Smyth
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+# This file is based on the file 'R/locfitByCol.R' of the Bioconductor edgeR package (version 3.38.4).
+
+
+import numpy as np
+
+
+def locfitByCol(y, x=None, weights=1, span=0.5, degree=0, nvert=200):
+    """
+    Local regression smoother for matrix columns.
+
+    Each column of :code:`y` is smoothed against the covariate :code:`x` by a
+    local constant (:code:`degree=0`) or local linear (:code:`degree=1`)
+    regression with tricube weights and a nearest-neighbour bandwidth covering
+    the proportion :code:`span` of the values of :code:`x`.
+
+    As in the :code:`locfit` R package, the local regressions are computed at
+    (at most) :code:`nvert` vertices spread over the quantiles of :code:`x`,
+    and interpolated in between, so that the cost is linear in the number of
+    rows of :code:`y`.
+
+    Arguments
+    ---------
+    y : array_like
+        numeric matrix
+    x : array_like, optional
+        vector of covariate values, one per row of :code:`y`. Defaults to the
+        row indices.
+    weights : float or array_like
+        prior weight of each row of :code:`y`
+    span : float
+        proportion of the data used in each local regression
+    degree : int
+        degree of the local polynomials, 0 or 1
+    nvert : int
+        maximum number of points at which the local regressions are computed
+
+    Returns
+    -------
+    ndarray
+        numeric matrix of the smoothed values, of same shape as :code:`y`
+    """
+    y = np.asarray(y, dtype=float)
+    (n, m) = y.shape
+    if x is None:
+        x = np.arange(n, dtype=float)
+    x = np.asarray(x, dtype=float)
+    weights = np.broadcast_to(np.asarray(weights, dtype=float), (n,))
+    if degree not in [0, 1]:
+        raise ValueError("degree must be 0 or 1")
+    k = int(np.ceil(span * n))
+    if n <= 1 or k <= 1:
+        return y
+
+    # Vertices
+    ux = np.unique(x)
+    if len(ux) <= nvert:
+        vert = ux
+    else:
+        vert = np.unique(np.quantile(x, np.linspace(0, 1, nvert)))
+
+    # Local regressions at the vertices
+    fit = np.empty((len(vert), m))
+    for i, v in enumerate(vert):
+        d = np.abs(x - v)
+        h = np.partition(d, k - 1)[k - 1]
+        if h > 0:
+            w = np.clip(1 - (d / h) ** 3, 0, None) ** 3
+        else:
+            w = (d == 0).astype(float)
+        w = w * weights
+        if degree == 0:
+            fit[i] = w @ y / w.sum()
+        else:
+            xc = x - v
+            s0, s1, s2 = w.sum(), w @ xc, w @ xc**2
+            det = s0 * s2 - s1**2
+            if det > 0:
+                fit[i] = (s2 * (w @ y) - s1 * ((w * xc) @ y)) / det
+            else:
+                fit[i] = w @ y / s0
+
+    # Interpolation between the vertices
+    if len(vert) == 1:
+        return np.broadcast_to(fit, (n, m)).copy()
+    res = np.empty((n, m))
+    for j in range(m):
+        res[:, j] = np.interp(x, vert, fit[:, j])
+    return res
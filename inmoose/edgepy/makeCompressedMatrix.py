@@ -22,15 +22,83 @@
 import numpy as np
 
 
-# NB: we do not fully implement edgeR class CompressedMatrix: we use fully-expanded 2D numpy arrays instead
-#     still, to avoid useless calls to `_compress*` and `check_finite`, we subclass ndarray
-#     note that the name `CompressedMatrix` for the subclass is only historical
 class CompressedMatrix(np.ndarray):
+    """
+    A matrix of genewise and/or librarywise values, stored compactly
+
+    Offsets, dispersions and weights are conceptually matrices of the same
+    shape as the count matrix, but often hold one value per library (all rows
+    identical), one value per gene (all columns identical) or a single value.
+    A :class:`CompressedMatrix` is a :class:`numpy.ndarray` of the full shape
+    which, in these cases, is a read-only view of the unique values (with a
+    zero stride along the repeated dimension), as created by
+    :func:`makeCompressedMatrix`. This plays the role of the "repeat.row" and
+    "repeat.col" flags of edgeR class :code:`CompressedMatrix`.
+
+    Compact matrices can be passed as is to the Cython kernels, which access
+    them row by row through strided memory views. Subsetting genes or
+    libraries, including with boolean or integer arrays, keeps the storage
+    compact. Element-wise operations return regular, fully-expanded, arrays.
+    """
+
     def __new__(cls, input_array):
         # Input array is an already formed ndarray instance
         # We thus cast to be our class type
         return np.asarray(input_array).view(cls)
 
+    @property
+    def repeat_row(self):
+        """whether all rows are identical, *i.e.* one value per library"""
+        return self.ndim == 2 and self.strides[0] == 0
+
+    @property
+    def repeat_col(self):
+        """whether all columns are identical, *i.e.* one value per gene"""
+        return self.ndim == 2 and self.strides[1] == 0
+
+    def compressed(self):
+        """
+        The unique values of the matrix, as a 2D array that broadcasts to the
+        shape of the matrix
+        """
+        x = np.asarray(self)
+        if self.repeat_row:
+            x = x[:1]
+        if self.repeat_col:
+            x = x[:, :1]
+        return x
+
+    def __getitem__(self, key):
+        keys = key if isinstance(key, tuple) else (key,)
+        # basic indexing already preserves the zero strides: only advanced
+        # indexing along a single dimension, by a 1D integer or boolean array,
+        # needs special handling
+        advanced = [isinstance(k, (np.ndarray, list)) for k in keys]
+        if (
+            not any(advanced)
+            or any(
+                np.ndim(k) != 1 or np.asarray(k).dtype.kind not in "biu"
+                for (k, a) in zip(keys, advanced)
+                if a
+            )
+            or not (self.repeat_row or self.repeat_col)
+            or len(keys) > 2
+            or sum(advanced) > 1
+            or any(k is None or k is Ellipsis for k in keys)
+        ):
+            return super().__getitem__(key)
+        keys = keys + (slice(None),) * (2 - len(keys))
+
+        # indices selected along each dimension
+        rows = np.arange(self.shape[0])[keys[0]]
+        cols = np.arange(self.shape[1])[keys[1]]
+        # apply them to the unique values only, then broadcast back
+        compact = self.compressed()
+        i = np.atleast_1d(rows) if compact.shape[0] > 1 else [0]
+        j = np.atleast_1d(cols) if compact.shape[1] > 1 else [0]
+        values = np.broadcast_to(compact[np.ix_(i, j)], (np.size(rows), np.size(cols)))
+        return CompressedMatrix(values.reshape(np.shape(rows) + np.shape(cols)))
+
 
 def makeCompressedMatrix(x, dims, byrow=True):
     """
@@ -58,6 +126,8 @@ def makeCompressedMatrix(x, dims, byrow=True):
 
 
 def check_finite(x, what, negative_allowed):
+    if isinstance(x, CompressedMatrix):
+        x = x.compressed()
     xmin = np.amin(x)
     if np.isnan(xmin):
         raise ValueError("NaN " + what + " not allowed")
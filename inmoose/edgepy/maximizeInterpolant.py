@@ -21,10 +21,11 @@
 
 import numpy as np
 
-from .edgepy_cpp import cxx_maximize_interpolant
+from .edgepy_cpp import maximize_interpolant_cython
+from .parallel import _numThreads
 
 
-def maximizeInterpolant(x, y):
+def maximizeInterpolant(x, y, nthreads=None):
     """
     Maximize a function given a table of values by spline interpolation.
 
@@ -40,7 +41,11 @@ def maximizeInterpolant(x, y):
     y : array_like
         matrix of function values at the values of :code:`x`. Columns correspond
         to :code:`x` values and each row corresponds to a different function to
-        be maximized.
+        be maximized. Single precision matrices, and matrices of any memory
+        layout, are processed without copy.
+    nthreads : int, optional
+        number of threads used to process the rows. Defaults to the number of
+        CPUs.
 
     Returns
     -------
@@ -52,8 +57,10 @@ def maximizeInterpolant(x, y):
     .. [1] G. E. Forsythe, M. A. Malcolm, C. B. Moler. 1977. Computer Methods
        for Mathematical Computations. Prentice-Hall.
     """
-    x = np.asarray(x, order="F", dtype="double")
-    y = np.asarray(y, order="F", dtype="double")
+    x = np.ascontiguousarray(x, dtype="double")
+    y = np.asarray(y)
+    if y.dtype not in (np.float32, np.float64):
+        y = y.astype("double")
     if y.ndim != 2:
         raise ValueError("y is not a matrix: cannot perform interpolation")
     if len(x) != y.shape[1]:
@@ -61,6 +68,6 @@ def maximizeInterpolant(x, y):
     if not np.array_equal(np.unique(x), x):
         raise ValueError("spline points must be unique and sorted")
 
-    # Performing some type checking
-    out = cxx_maximize_interpolant(x, y)
-    return out
+    nthreads = _numThreads(nthreads)
+
+    return maximize_interpolant_cython(x, y, nthreads=nthreads)
@@ -41,6 +41,7 @@ def mglmLevenberg(
     start_method="null",
     maxit=200,
     tol=1e-6,
+    nthreads=None,
 ):
     """
     Fit genewise negative binomial GLMs with log-link using Levenberg damping to
@@ -82,7 +83,8 @@ def mglmLevenberg(
         matrix of starting values for the linear model coefficient. Number of
         rows should agree with :code:`y` and number of columns should agree with
         :code:`design`. This argument does not usually need to be set as the
-        automatic starting values perform well.
+        automatic starting values perform well. Genes with :code:`NaN`
+        starting values are started as if :code:`coef_start` were not set.
     start_method : str
         method used to generate starting values when :code:`coef_start = None`.
         Possible values are "null" to start from the null model of equal
@@ -94,6 +96,9 @@ def mglmLevenberg(
         convergence criterion has not been satisfied.
     tol : float
         the convergence tolerance.
+    nthreads : int, optional
+        number of threads used to fit the genes. Defaults to the number of
+        CPUs.
 
     Returns
     -------
@@ -126,15 +131,28 @@ def mglmLevenberg(
     weights = _compressWeights(y, weights)
 
     # Initialize values for the coefficients at reasonable best guess with linear models
+    if start_method not in ["null", "y"]:
+        raise ValueError(f"invalid start_method {start_method}")
     if coef_start is None:
-        if start_method not in ["null", "y"]:
-            raise ValueError(f"invalid start_method {start_method}")
         beta = get_levenberg_start(
             y, offset, dispersion, weights, design, start_method == "null"
         )
     else:
-        beta = np.asarray(coef_start, dtype="double")
+        beta = np.array(coef_start, dtype="double")
+        # genes with missing starting values are started from the default
+        missing = np.isnan(beta).any(axis=1)
+        if missing.any():
+            beta[missing] = get_levenberg_start(
+                y[missing],
+                offset[missing],
+                dispersion[missing],
+                weights[missing],
+                design,
+                start_method == "null",
+            )
 
     assert beta.shape == (y.shape[0], design.shape[1])
     # Call the actual fit
-    return fit_levenberg(y, offset, dispersion, weights, design, beta, tol, maxit)
+    return fit_levenberg(
+        y, offset, dispersion, weights, design, beta, tol, maxit, nthreads=nthreads
+    )
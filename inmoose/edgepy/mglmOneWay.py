@@ -22,17 +22,18 @@
 # 'src/R_get_one_way_fitted.cpp' of the Bioconductor edgeR package (version
 # 3.38.4).
 
-
 import numpy as np
 from scipy.linalg import solve
 
-from ..utils import Factor, asfactor
+from ..utils import LOGGER, Factor, asfactor
+from .edgepy_cpp import fit_one_way_cython
 from .makeCompressedMatrix import (
     _compressDispersions,
     _compressOffsets,
     _compressWeights,
 )
-from .mglmOneGroup import mglmOneGroup
+from .parallel import _numThreads
+from .utils import _isAllZero
 
 
 def designAsFactor(design):
@@ -74,6 +75,7 @@ def mglmOneWay(
     coef_start=None,
     maxit=50,
     tol=1e-10,
+    nthreads=None,
 ):
     """
     Fit multiple negative binomial GLMs with log-link by Fisher scoring with a
@@ -88,9 +90,12 @@ def mglmOneWay(
     operates on atomic objects (matrices and vectors).
 
     This function fits a oneway layout to each response vector. It treats the
-    libraries as belonging to a number of groups and calls :func:`mglmOneGroup`
-    for each group. It treats the dispersion parameter of the negative binomial
-    distribution as a known input.
+    libraries as belonging to a number of groups and fits a single group model
+    (as in :func:`mglmOneGroup`) for each group. All the groups of a gene are
+    fitted in one pass over its libraries, by compiled code that does not copy
+    the data of each group and processes the genes in parallel. It treats the
+    dispersion parameter of the negative binomial distribution as a known
+    input.
 
     Arguments
     ---------
@@ -129,6 +134,9 @@ def mglmOneWay(
         convergence criterion has not been satisfied.
     tol : float
         the convergence tolerance.
+    nthreads : int, optional
+        number of threads used to fit the genes. Defaults to the number of
+        CPUs.
 
     Returns
     -------
@@ -141,6 +149,7 @@ def mglmOneWay(
     """
     y = np.asarray(y)
     (ngenes, nlibs) = y.shape
+    _isAllZero(y)
 
     offset = _compressOffsets(y, offset=offset)
     dispersion = _compressDispersions(y, dispersion)
@@ -158,16 +167,15 @@ def mglmOneWay(
         group = asfactor(group)
 
     # Convert factor to integer levels for efficiency
-    levg = group.categories
-    ngroups = len(levg)
-    i = group.__array__()
+    ngroups = len(group.categories)
+    i = np.asarray(group.codes, dtype=np.intp)
 
     if design is not None:
         if design.shape[1] != ngroups:
             raise ValueError("design matrix is not equivalent to a oneway layout")
 
     # Reduce to representative design matrix, based on the column in which each group appears first
-    firstjofgroup = [(i == x).nonzero()[0][0] for x in levg]
+    firstjofgroup = [(i == g).nonzero()[0][0] for g in range(ngroups)]
     if design is not None:
         designunique = design[firstjofgroup, :]
     else:
@@ -181,28 +189,36 @@ def mglmOneWay(
         design = None
 
     # If necessary, convert starting values to group fitted values
-    if design is not None and coef_start is not None:
+    if coef_start is None:
+        coef_start = np.full((ngenes, ngroups), np.nan)
+    elif design is not None:
         coef_start = coef_start @ designunique.T
 
-    # Cycle through groups
-    beta = np.zeros((ngenes, ngroups), dtype="double")
-    for g in range(ngroups):
-        j = np.nonzero(i == levg[g])[0]
-        beta[:, g] = mglmOneGroup(
-            y[:, j],
-            dispersion=dispersion[:, j],
-            offset=offset[:, j],
-            weights=weights[:, j] if weights is not None else None,
-            coef_start=coef_start[:, g] if coef_start is not None else None,
-            maxit=maxit,
-            tol=tol,
-        )
+    nthreads = _numThreads(nthreads)
+
+    # Fit all groups at once
+    if y.dtype != np.dtype("long"):
+        y = np.asarray(y, dtype="double")
+    beta, conv = fit_one_way_cython(
+        y,
+        np.asarray(offset, dtype="double"),
+        np.asarray(dispersion, dtype="double"),
+        np.asarray(weights, dtype="double"),
+        i,
+        ngroups,
+        np.asarray(coef_start, dtype="double").reshape((ngenes, ngroups)),
+        maxit,
+        tol,
+        nthreads=nthreads,
+    )
+    if not conv.all():
+        LOGGER.debug(f"max iterations exceeded for {np.count_nonzero(~conv)} tags")
 
     # Reset -inf values to finite values to simplify calculations downstream
     beta = np.where(beta > -1e8, beta, -1e8)
 
     # Fitted values from group-wise beta's
-    mu = get_one_way_fitted(beta, offset, i - 1)
+    mu = get_one_way_fitted(beta, offset, i)
 
     # If necessary, reformat the beta's to reflect the original design.
     if design is not None:
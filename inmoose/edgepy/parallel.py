@@ -0,0 +1,324 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+import atexit
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .makeCompressedMatrix import CompressedMatrix
+
+# number of blocks of genes dispatched to each worker process
+_BLOCKS_PER_JOB = 4
+
+# the persistent pool of worker processes, and its number of workers
+_pool = None
+_poolSize = 0
+
+# whether the current process is a worker process
+_inWorker = False
+
+
+def _numThreads(nthreads=None):
+    """
+    number of threads of the compiled kernels: :code:`nthreads` if specified,
+    otherwise the number of CPUs, or 1 in a worker process (the workers
+    already run in parallel)
+    """
+    if nthreads is not None:
+        return nthreads
+    if _inWorker:
+        return 1
+    return os.cpu_count() or 1
+
+
+def _numJobs(n_jobs=None):
+    """
+    number of worker processes for :code:`n_jobs`: :code:`None` means 1,
+    negative values count from the number of CPUs (-1 for all CPUs)
+    """
+    if n_jobs is None or _inWorker:
+        return 1
+    if n_jobs < 0:
+        n_jobs = (os.cpu_count() or 1) + 1 + n_jobs
+    if n_jobs < 1:
+        raise ValueError("n_jobs must be a positive integer, or a negative one")
+    return n_jobs
+
+
+def _initWorker():
+    global _inWorker
+    _inWorker = True
+
+
+def _getPool(n_jobs):
+    """return the persistent pool of worker processes, with n_jobs workers"""
+    global _pool, _poolSize
+    if _pool is None or _poolSize != n_jobs:
+        shutdownWorkers()
+        # worker processes are spawned rather than forked, as forking a
+        # process that has run OpenMP threads is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=n_jobs,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initWorker,
+        )
+        _poolSize = n_jobs
+    return _pool
+
+
+def shutdownWorkers():
+    """
+    Stop the worker processes started by the functions called with
+    :code:`n_jobs` greater than 1.
+
+    The worker processes are kept alive between calls, so that they are started
+    only once. They are stopped automatically when the interpreter exits, or
+    when a different number of workers is requested.
+    """
+    global _pool, _poolSize
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+        _poolSize = 0
+
+
+atexit.register(shutdownWorkers)
+
+
+def _share(x, segments):
+    """
+    copy x into a new shared memory segment (appended to segments), and return
+    the description needed to attach to it
+
+    Compressed matrices are shared in their compressed form.
+    """
+    if x is None:
+        return None
+    compressed = isinstance(x, CompressedMatrix)
+    shape = x.shape
+    x = np.ascontiguousarray(x.compressed() if compressed else x)
+    shm = SharedMemory(create=True, size=max(1, x.nbytes))
+    segments.append(shm)
+    np.ndarray(x.shape, dtype=x.dtype, buffer=shm.buf)[...] = x
+    return (shm.name, x.shape, x.dtype.str, shape if compressed else None)
+
+
+def _attach(desc, rows, segments):
+    """the rows of a shared array, as described by :func:`_share`"""
+    if desc is None:
+        return None
+    (name, shape, dtype, fullshape) = desc
+    shm = SharedMemory(name=name)
+    segments.append(shm)
+    x = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    if fullshape is None:
+        return x[rows]
+    x = x if x.shape[0] == 1 else x[rows]
+    nrows = len(range(*rows.indices(fullshape[0])))
+    return CompressedMatrix(np.broadcast_to(x, (nrows,) + tuple(fullshape[1:])))
+
+
+def _runBlock(func, descs, rows, kwargs):
+    """run func on a block of rows of the shared arrays (in a worker process)"""
+    segments = []
+    try:
+        arrays = {k: _attach(d, rows, segments) for k, d in descs.items()}
+        res = func(**arrays, **kwargs)
+        # the results must not refer to the shared memory, which is closed below
+        if isinstance(res, tuple):
+            out = tuple(None if r is None else np.array(r) for r in res)
+        else:
+            out = np.array(res)
+        del arrays, res
+        return out
+    finally:
+        for shm in segments:
+            try:
+                shm.close()
+            except BufferError:
+                # still referenced by a failing block, closed when collected
+                pass
+
+
+def _concat(blocks):
+    if blocks[0] is None:
+        return None
+    return np.concatenate(blocks, axis=0)
+
+
+class SharedGeneArrays(object):
+    """
+    Arrays with one row per gene, copied once into shared memory for repeated
+    calls to a genewise function by blocks of genes (see
+    :func:`mapGeneBlocks`).
+
+    This avoids copying the counts, offsets and weights at every evaluation of
+    an objective function, when optimizing a parameter shared by all genes. It
+    is meant to be used as a context manager, which releases the shared memory
+    on exit:
+
+    .. code-block:: python
+
+        with SharedGeneArrays({"y": y, "offset": offset}, n_jobs=4) as shared:
+            for dispersion in grid:
+                res = shared.map(func, {"dispersion": dispersion})
+
+    If :code:`n_jobs` is 1 (or :code:`None`), nothing is shared and the
+    function is simply called on the whole arrays in the current process.
+
+    Arguments
+    ---------
+    arrays : dict
+        the arrays with one row per gene, by name. :code:`None` values are
+        passed as is.
+    n_jobs : int, optional
+        number of worker processes, as in :func:`mapGeneBlocks`
+    """
+
+    def __init__(self, arrays, n_jobs=None):
+        self.n_jobs = _numJobs(n_jobs)
+        self.arrays = {}
+        self._descs = {}
+        self._segments = []
+        try:
+            self.update(arrays)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def update(self, arrays):
+        """share more arrays with one row per gene"""
+        self.arrays.update(arrays)
+        if self.n_jobs > 1:
+            for k, a in arrays.items():
+                self._descs[k] = _share(a, self._segments)
+
+    def close(self):
+        """release the shared memory"""
+        for shm in self._segments:
+            shm.close()
+            shm.unlink()
+        self._segments = []
+        self._descs = {}
+
+    def map(self, func, arrays=None, **kwargs):
+        """
+        Apply a genewise function by blocks of genes to the shared arrays.
+
+        Arguments
+        ---------
+        func : callable
+            the genewise function, see :func:`mapGeneBlocks`
+        arrays : dict, optional
+            other arrays with one row per gene, shared for this call only
+        **kwargs
+            other arguments of :code:`func`, passed to each block
+
+        Returns
+        -------
+        ndarray or tuple
+            the results of :code:`func`, concatenated over the blocks of genes
+        """
+        arrays = {} if arrays is None else arrays
+        if self.n_jobs == 1:
+            return func(**self.arrays, **arrays, **kwargs)
+
+        ngenes = next(
+            len(a)
+            for a in list(self.arrays.values()) + list(arrays.values())
+            if a is not None
+        )
+        bounds = np.linspace(
+            0, ngenes, min(ngenes, self.n_jobs * _BLOCKS_PER_JOB) + 1, dtype=int
+        )
+        segments = []
+        try:
+            descs = dict(self._descs)
+            descs.update({k: _share(a, segments) for k, a in arrays.items()})
+            pool = _getPool(self.n_jobs)
+            futures = [
+                pool.submit(_runBlock, func, descs, slice(start, stop), kwargs)
+                for start, stop in zip(bounds[:-1], bounds[1:])
+            ]
+            blocks = [f.result() for f in futures]
+        finally:
+            for shm in segments:
+                shm.close()
+                shm.unlink()
+
+        if isinstance(blocks[0], tuple):
+            return tuple(_concat(list(b)) for b in zip(*blocks))
+        return _concat(blocks)
+
+
+def mapGeneBlocks(func, arrays, n_jobs=None, **kwargs):
+    """
+    Apply a genewise function by blocks of genes, in parallel worker processes.
+
+    This is the execution backend of the functions of edgepy accepting a
+    :code:`n_jobs` argument. The arrays with one row per gene (counts,
+    offsets, weights, dispersions...) are copied once into shared memory,
+    compressed matrices being shared in their compressed form. The genes are
+    split into contiguous blocks, dispatched to a persistent pool of worker
+    processes, each of which reads the rows of its block from the shared
+    memory, without copy. The results of the blocks are then concatenated.
+    To call a function repeatedly on the same arrays, share them once with
+    :class:`SharedGeneArrays`.
+
+    If :code:`n_jobs` is 1 (or :code:`None`), :code:`func` is simply called
+    on the whole arrays in the current process. In the worker processes, the
+    compiled kernels use a single thread by default, and :code:`n_jobs` is
+    ignored (there is no nested parallelism).
+
+    The worker processes are spawned (not forked): as with
+    :mod:`multiprocessing`, the entry point of a script using them must be
+    protected by :code:`if __name__ == "__main__":`.
+
+    Arguments
+    ---------
+    func : callable
+        the genewise function. It must be defined at the top level of a
+        module, so that the worker processes can import it. It is called with
+        the arrays (or blocks of rows thereof) and :code:`kwargs` as keyword
+        arguments, and must return an array, or a tuple of arrays (or
+        :code:`None`), with one row per gene.
+    arrays : dict
+        the arrays with one row per gene, by name. :code:`None` values are
+        passed as is.
+    n_jobs : int, optional
+        number of worker processes. Negative values count from the number of
+        CPUs (-1 for all CPUs). Defaults to 1.
+    **kwargs
+        other arguments of :code:`func`, passed to each block
+
+    Returns
+    -------
+    ndarray or tuple
+        the results of :code:`func`, concatenated over the blocks of genes
+    """
+    with SharedGeneArrays(arrays, n_jobs=n_jobs) as shared:
+        return shared.map(func, **kwargs)
@@ -23,10 +23,18 @@ import numpy as np
 
 from ..utils import LOGGER
 from .addPriorCount import addPriorCount
+from .makeCompressedMatrix import _compressDispersions, _compressWeights
+from .mglmOneWay import designAsFactor
 
 
 def predFC_DGEList(
-    self, design, prior_count=0.125, offset=None, dispersion=None, weights=None
+    self,
+    design,
+    prior_count=0.125,
+    offset=None,
+    dispersion=None,
+    weights=None,
+    prior_counts=None,
 ):
     """
     Compute estimated coefficients for a negative binomial GLM in such a way
@@ -54,10 +62,19 @@ def predFC_DGEList(
         offset=offset,
         dispersion=dispersion,
         weights=weights,
+        prior_counts=prior_counts,
     )
 
 
-def predFC(y, design, prior_count=0.125, offset=None, dispersion=0, weights=None):
+def predFC(
+    y,
+    design,
+    prior_count=0.125,
+    offset=None,
+    dispersion=0,
+    weights=None,
+    prior_counts=None,
+):
     """
     Compute estimated coefficients for a negative binomial GLM in such a way
     that the log-fold-changes are shrunk towards zero.
@@ -84,6 +101,13 @@ def predFC(y, design, prior_count=0.125, offset=None, dispersion=0, weights=None
     from zero counts are avoided. The exact degree to which this is done depends
     on the negative binomial dispersion.
 
+    Several prior counts can be given at once through :code:`prior_counts`,
+    *e.g.* to check the stability of the log-fold-changes. The GLMs are then
+    fitted once for each prior count, all starting from the coefficients
+    fitted for the first one, which converges faster than independent fits.
+    These fits are run to a tighter tolerance, so that their results do not
+    depend on the order of the prior counts.
+
     See also
     --------
     glmFit, exactTest, addPriorCount
@@ -94,9 +118,9 @@ def predFC(y, design, prior_count=0.125, offset=None, dispersion=0, weights=None
         matrix of counts
     design : array_like
         the design matrix for the experiment
-    prior_count : float
+    prior_count : float or array_like
         the average prior count to be added to each observation. Larger values
-        produce more shrinkage.
+        produce more shrinkage. A vector gives a prior count for each gene.
     offset : array_like
         vector or matrix giving the offset in the log-linear model predicto,
         as in :func:`glmFit`. Usually equal to log library size.
@@ -104,11 +128,16 @@ def predFC(y, design, prior_count=0.125, offset=None, dispersion=0, weights=None
         vector of negative binomial dispersions
     weights : array_like, optional
         observation weights
+    prior_counts : sequence, optional
+        several prior counts (each as in :code:`prior_count`) for which to
+        compute the coefficients. If given, :code:`prior_count` is ignored.
 
     Returns
     -------
     ndarray
-        matrix of (shrunk) linear model coefficients on the log2 scale
+        matrix of (shrunk) linear model coefficients on the log2 scale, or, if
+        :code:`prior_counts` is given, array of such matrices stacked along the
+        first axis (one per prior count)
 
     References
     ----------
@@ -116,7 +145,39 @@ def predFC(y, design, prior_count=0.125, offset=None, dispersion=0, weights=None
     associations. PhD thesis. University of Melbourne, Australia.
     http://repository.unimelb.edu.au/10187/17614
     """
-    from .glmFit import glmFit
+    from .glmFit import _checkGLMInputs, _fitGLMs, glmFit
+
+    if prior_counts is not None:
+        # Fit every prior count starting from the fit of the first one
+        y = np.asarray(y)
+        (design, dispersion, offset, _) = _checkGLMInputs(
+            y, design, dispersion, offset, None
+        )
+        dispersion = _compressDispersions(y, dispersion)
+        design = np.asarray(design, dtype="double", order="F")
+        group = designAsFactor(design)
+        if group.nlevels() != design.shape[1]:
+            group = None
+        weights = None if weights is None else _compressWeights(y, weights)
+        coefs = []
+        start = None
+        for pc in prior_counts:
+            (out_y, out_offset) = addPriorCount(y, offset=offset, prior_count=pc)
+            coefs.append(
+                _fitGLMs(
+                    out_y,
+                    dispersion,
+                    out_offset,
+                    weights,
+                    start,
+                    design,
+                    group,
+                    0,
+                    tol=1e-10,
+                )[0]
+            )
+            start = coefs[0]
+        return np.stack(coefs) / np.log(2)
 
     # Add prior counts in proportion to library size
     (out_y, out_offset) = addPriorCount(y, offset=offset, prior_count=prior_count)
@@ -18,12 +18,13 @@
 
 # This file is based on the file 'R/q2qnbinom.R' of the Bioconductor edgeR package (version 3.38.4).
 
-from .edgepy_cpp import _q2qnbinom
+import numpy as np
 
+from .edgepy_cpp import q2qnbinom_cython
+from .parallel import _numThreads
 
-# the actual implementation in done in Cython
-# this Python wrapper allows to use optional and named arguments
-def q2qnbinom(x, input_mean, output_mean, dispersion=0):
+
+def q2qnbinom(x, input_mean, output_mean, dispersion=0, nthreads=None):
     """
     Interpolated quantile to quantile mapping between negative-binomial distributions with the same dispersion but different means.
 
@@ -37,6 +38,10 @@ def q2qnbinom(x, input_mean, output_mean, dispersion=0):
     It is called by :func:`equalizeLibSizes` to perform quantile-to-quantile
     normalization.
 
+    The arguments are broadcast against each other (without copy), and the
+    mapping is computed by compiled code, distributing the rows of the result
+    across threads.
+
     See also
     --------
     equalizeLibSizes
@@ -53,6 +58,8 @@ def q2qnbinom(x, input_mean, output_mean, dispersion=0):
         same length as :code:`x.shape[0]`
     dispersion : array_like
         scalar, vector or matrix giving negative binomial dispersion values
+    nthreads : int, optional
+        number of threads. Defaults to the number of CPUs.
 
     Returns
     -------
@@ -60,5 +67,21 @@ def q2qnbinom(x, input_mean, output_mean, dispersion=0):
         matrix of same dimensions as :code:`x`, with :code:`output_mean` as the
         new nominal population mean
     """
+    args = np.broadcast_arrays(
+        *[
+            np.asarray(a, dtype="double")
+            for a in (x, input_mean, output_mean, dispersion)
+        ]
+    )
+    for name, a in zip(["x", "input_mean", "output_mean", "dispersion"], args):
+        if (a < 0).any():
+            raise ValueError(f"{name} must be non-negative")
+
+    nthreads = _numThreads(nthreads)
 
-    return _q2qnbinom(x, input_mean, output_mean, dispersion)
+    shape = args[0].shape
+    if len(shape) != 2:
+        # the compiled code works on matrices
+        args = [a.reshape((-1, shape[-1] if len(shape) > 0 else 1)) for a in args]
+    res = q2qnbinom_cython(*args, nthreads=nthreads)
+    return res.reshape(shape)[()]
@@ -0,0 +1,407 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2008-2022 Yunshun Chen, Aaron TL Lun, Davis J McCarthy, Matthew E Ritchie, Belinda Phipson, Yifang Hu, Xiaobei Zhou, Mark D Robinson, Gordon K Smyth
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+
+# This file is based on the file 'R/readDGE.R' of the Bioconductor edgeR package (version 3.38.4).
+
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csc_matrix
+
+from ..utils import LOGGER, Factor
+from .DGEList import DGEList
+from .parallel import _numThreads
+
+
+def readDGE(
+    files,
+    path=None,
+    columns=(0, 1),
+    group=None,
+    labels=None,
+    header=False,
+    sep="\t",
+    meta_tags="^__",
+    mmap_file=None,
+    nthreads=None,
+    **kwargs,
+):
+    """
+    Read and merge a set of files containing count data, one per sample, into
+    a DGEList.
+
+    See :func:`readCounts` for details on how the files are read and merged.
+
+    Arguments
+    ---------
+    files : array_like or pd.DataFrame
+        the names of the count files, or a dataframe of sample information
+        with a column :code:`files` (and possibly :code:`group`)
+    path : str, optional
+        the directory of the files, if not the current directory
+    columns : tuple of int
+        the positions of the columns containing the gene identifiers and the
+        counts. Defaults to the first two columns.
+    group : array_like or Factor, optional
+        the experimental group of each sample
+    labels : array_like, optional
+        the names of the samples. Defaults to the file names without
+        extension.
+    header : bool
+        whether the files have a header line. Defaults to :code:`False`.
+    sep : str
+        the field separator of the files. Defaults to a tab.
+    meta_tags : str, optional
+        regular expression matching the meta tags (the summary rows of
+        HTSeq-count, such as :code:`__no_feature`), which are removed.
+    mmap_file : str, optional
+        file in which the counts are written as a memory-mapped :code:`.npy`
+        array, instead of being held in memory
+    nthreads : int, optional
+        number of files read concurrently. Defaults to the number of CPUs.
+    **kwargs
+        other arguments passed to :func:`pandas.read_csv`
+
+    Returns
+    -------
+    DGEList
+        the merged counts, with a column :code:`files` in :code:`samples`
+    """
+    (counts, genes, samples) = readCounts(
+        files,
+        path=path,
+        columns=columns,
+        group=group,
+        labels=labels,
+        header=header,
+        sep=sep,
+        meta_tags=meta_tags,
+        mmap_file=mmap_file,
+        nthreads=nthreads,
+        **kwargs,
+    )
+    if counts.dtype.kind == "f":
+        raise ValueError(
+            "non-integer counts found, which a DGEList cannot hold: "
+            "use readCounts to read them"
+        )
+    if mmap_file is None:
+        counts = pd.DataFrame(counts, index=genes, columns=samples.index)
+    # memory-mapped counts are passed as is, so that DGEList does not copy them
+    y = DGEList(
+        counts,
+        lib_size=samples["lib_size"].values,
+        group=samples["group"].values,
+        samples=samples.drop(columns=["group", "lib_size"]),
+    )
+    y.counts.index = genes
+    y.counts.columns = samples.index
+    y.samples.index = samples.index
+    return y
+
+
+def readCounts(
+    files,
+    path=None,
+    columns=(0, 1),
+    group=None,
+    labels=None,
+    header=False,
+    sep="\t",
+    meta_tags="^__",
+    sparse=False,
+    mmap_file=None,
+    nthreads=None,
+    **kwargs,
+):
+    """
+    Read and merge a set of files containing count data, one per sample.
+
+    This is the reader behind :func:`readDGE`, which can also store the counts
+    in a sparse matrix, and read non-integer counts (such as the expected
+    counts of RSEM). The files are read concurrently by a pool of threads, in
+    two passes. The first pass only reads the gene identifiers, to gather the
+    genes of all the files in a hash index, so that the counts matrix is
+    allocated once. The second pass reads the counts, and writes them directly
+    into the matrix (genes missing from a file get a zero count). When all the
+    files list the same genes in the same order, as is typical, no matching is
+    needed beyond the first file. The library sizes (excluding the meta tags)
+    are computed in the second pass.
+
+    Arguments
+    ---------
+    files : array_like or pd.DataFrame
+        the names of the count files, or a dataframe of sample information
+        with a column :code:`files` (and possibly :code:`group`)
+    path : str, optional
+        the directory of the files, if not the current directory
+    columns : tuple of int
+        the positions of the columns containing the gene identifiers and the
+        counts. Defaults to the first two columns.
+    group : array_like or Factor, optional
+        the experimental group of each sample
+    labels : array_like, optional
+        the names of the samples. Defaults to the file names without
+        extension.
+    header : bool
+        whether the files have a header line. Defaults to :code:`False`.
+    sep : str
+        the field separator of the files. Defaults to a tab.
+    meta_tags : str, optional
+        regular expression matching the meta tags (the summary rows of
+        HTSeq-count, such as :code:`__no_feature`), which are removed.
+    sparse : bool
+        whether to return the counts as a sparse CSC matrix, only the nonzero
+        counts of each file being kept. Defaults to :code:`False`.
+    mmap_file : str, optional
+        file in which the counts are written as a memory-mapped :code:`.npy`
+        array, instead of being held in memory. Incompatible with
+        :code:`sparse`.
+    nthreads : int, optional
+        number of files read concurrently. Defaults to the number of CPUs.
+    **kwargs
+        other arguments passed to :func:`pandas.read_csv`
+
+    Returns
+    -------
+    counts : ndarray, np.memmap or csc_matrix
+        the matrix of counts, one row per gene and one column per sample, of
+        integers unless some file holds non-integer counts
+    genes : pd.Index
+        the gene identifiers, in order of first appearance in the files
+    samples : pd.DataFrame
+        the sample information, with columns :code:`files`, :code:`group` and
+        :code:`lib_size`, indexed by the sample labels
+    """
+    if sparse and mmap_file is not None:
+        raise ValueError("sparse counts cannot be memory-mapped")
+
+    if isinstance(files, pd.DataFrame):
+        samples = files.copy()
+        if labels is None and not isinstance(samples.index, pd.RangeIndex):
+            labels = samples.index
+        files = samples.pop("files").values
+        if group is None and "group" in samples.columns:
+            group = samples.pop("group").values
+    else:
+        files = np.asarray(files, dtype=object)
+        samples = pd.DataFrame(index=range(len(files)))
+    nfiles = len(files)
+    if nfiles == 0:
+        raise ValueError("no count file to read")
+    if group is None:
+        group = np.ones(nfiles)
+    if len(group) != nfiles:
+        raise ValueError("length of 'group' must be equal to the number of files")
+    if labels is None:
+        labels = [os.path.splitext(os.path.basename(f))[0] for f in files]
+    if len(labels) != nfiles:
+        raise ValueError("length of 'labels' must be equal to the number of files")
+    paths = [f if path is None else os.path.join(path, f) for f in files]
+
+    merger = _CountMerger(nfiles, sparse, mmap_file, meta_tags)
+    nworkers = min(nfiles, _numThreads(nthreads))
+    with ThreadPoolExecutor(max_workers=nworkers) as pool:
+        # first pass: gather the genes of all the files, so that the counts
+        # matrix is allocated once
+        for j, tags in enumerate(
+            _readAhead(
+                pool, nworkers, _readCountTags, paths, columns[0], header, sep, kwargs
+            )
+        ):
+            merger.addTags(tags, paths[j])
+        # second pass: write the counts of each file into the matrix
+        for j, (tags, values) in enumerate(
+            _readAhead(
+                pool, nworkers, _readCountFile, paths, columns, header, sep, kwargs
+            )
+        ):
+            merger.add(j, tags, values, paths[j])
+    (counts, genes, lib_size) = merger.result()
+
+    samples.insert(0, "files", files)
+    samples.insert(1, "group", Factor(group))
+    samples.insert(2, "lib_size", lib_size)
+    samples.index = labels
+    return (counts, genes, samples)
+
+
+def _readAhead(pool, nworkers, func, paths, *args):
+    """
+    yield the results of :code:`func` on each path, in order, reading ahead a
+    bounded number of files so that at most a few of them are held in memory
+    """
+    pending = deque()
+    nsubmitted = 0
+    for _ in range(len(paths)):
+        while nsubmitted < len(paths) and len(pending) < 2 * nworkers:
+            pending.append(pool.submit(func, paths[nsubmitted], *args))
+            nsubmitted += 1
+        yield pending.popleft().result()
+
+
+def _readCountTags(fn, tagcol, header, sep, kwargs):
+    """read the gene identifiers of a count file"""
+    d = pd.read_csv(
+        fn, sep=sep, header=0 if header else None, usecols=[tagcol], **kwargs
+    )
+    return d.iloc[:, 0].astype(str).values
+
+
+def _readCountFile(fn, columns, header, sep, kwargs):
+    """read the gene identifiers and the counts of a count file"""
+    (tagcol, countcol) = columns
+    usecols = sorted(columns)
+    d = pd.read_csv(
+        fn, sep=sep, header=0 if header else None, usecols=usecols, **kwargs
+    )
+    tags = d.iloc[:, usecols.index(tagcol)].astype(str).values
+    values = d.iloc[:, usecols.index(countcol)].values
+    if values.dtype.kind in "biu":
+        values = values.astype(np.int64, copy=False)
+    elif values.dtype.kind != "f":
+        raise ValueError(f"non-numeric counts found in {fn}")
+    elif np.array_equal(values, np.floor(values)):
+        values = values.astype(np.int64)
+    return (tags, values)
+
+
+class _CountMerger(object):
+    """
+    merge the counts of the files, one column at a time, into a dense,
+    memory-mapped or sparse matrix
+
+    The genes of all the files are first gathered by :meth:`addTags`, so that
+    the matrix is allocated once. The counts are held as integers, unless a
+    file holds non-integer counts.
+    """
+
+    def __init__(self, nfiles, sparse, mmap_file, meta_tags):
+        self.nfiles = nfiles
+        self.sparse = sparse
+        self.mmap_file = mmap_file
+        self.meta_tags = meta_tags
+        self.index = pd.Index([], dtype=object)
+        self.counts = None
+        self.lib_size = np.zeros(nfiles, dtype=np.int64)
+        # genes of the last file, for the first pass
+        self.last_tags = None
+        # genes of the last file, their rows and their meta tag mask
+        self.last = None
+        self.meta = set()
+        # nonzero counts of each column, for sparse matrices
+        self.indices = []
+        self.data = []
+
+    def _keep(self, tags):
+        """mask of the genes of a file that are not meta tags"""
+        if self.meta_tags is None:
+            return np.ones(len(tags), dtype=bool)
+        return ~pd.Series(tags).str.match(self.meta_tags).values
+
+    def addTags(self, tags, fn):
+        """add the new genes of a file to the index"""
+        if self.last_tags is not None and np.array_equal(tags, self.last_tags):
+            return
+        if pd.Index(tags).has_duplicates:
+            raise ValueError(f"repeated tags found in {fn}")
+        keep = self._keep(tags)
+        self.meta.update(tags[~keep])
+        new = self.index.get_indexer(tags[keep]) < 0
+        if new.any():
+            self.index = self.index.append(pd.Index(tags[keep][new], dtype=object))
+        self.last_tags = tags
+
+    def _rows(self, tags, fn):
+        """rows of the genes of a file"""
+        if self.last is None or not np.array_equal(tags, self.last[0]):
+            keep = self._keep(tags)
+            rows = self.index.get_indexer(tags[keep])
+            if (rows < 0).any():
+                raise ValueError(f"{fn} changed while being read")
+            self.last = (tags, rows, keep)
+        return self.last[1:]
+
+    def _allocate(self, dtype):
+        """allocate the counts matrix, or convert it to :code:`dtype`"""
+        shape = (len(self.index), self.nfiles)
+        if self.mmap_file is None:
+            if self.counts is None:
+                self.counts = np.zeros(shape, dtype=dtype)
+            else:
+                self.counts = self.counts.astype(dtype)
+        elif self.counts is None:
+            self.counts = np.lib.format.open_memmap(
+                self.mmap_file, mode="w+", dtype=dtype, shape=shape
+            )
+        else:
+            # convert through a temporary file, and close the memory-mapped
+            # array before replacing its file
+            fn = self.mmap_file + ".tmp"
+            counts = np.lib.format.open_memmap(fn, mode="w+", dtype=dtype, shape=shape)
+            counts[...] = self.counts
+            counts.flush()
+            del counts
+            self.counts = None
+            os.replace(fn, self.mmap_file)
+            self.counts = np.load(self.mmap_file, mmap_mode="r+")
+
+    def add(self, j, tags, values, fn):
+        """merge the counts of the j-th file"""
+        (rows, keep) = self._rows(tags, fn)
+        values = values[keep]
+        if values.dtype.kind == "f" and self.lib_size.dtype.kind != "f":
+            # non-integer counts: hold all the counts as floats
+            self.lib_size = self.lib_size.astype(np.float64)
+            if self.counts is not None:
+                self._allocate(np.float64)
+        self.lib_size[j] = values.sum()
+        if self.sparse:
+            nz = values != 0
+            self.indices.append(rows[nz])
+            self.data.append(values[nz])
+        else:
+            if self.counts is None:
+                self._allocate(self.lib_size.dtype)
+            self.counts[rows, j] = values
+
+    def result(self):
+        if self.meta:
+            LOGGER.info(f"Meta tags detected: {', '.join(sorted(self.meta))}")
+        if self.sparse:
+            indptr = np.zeros(self.nfiles + 1, dtype=np.int64)
+            np.cumsum([len(i) for i in self.indices], out=indptr[1:])
+            counts = csc_matrix(
+                (
+                    np.concatenate(self.data).astype(self.lib_size.dtype),
+                    np.concatenate(self.indices),
+                    indptr,
+                ),
+                shape=(len(self.index), self.nfiles),
+            )
+            counts.sort_indices()
+        else:
+            counts = self.counts
+            if self.mmap_file is not None:
+                counts.flush()
+        return (counts, self.index, self.lib_size)
@@ -0,0 +1,117 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2008-2022 Yunshun Chen, Aaron TL Lun, Davis J McCarthy, Matthew E Ritchie, Belinda Phipson, Yifang Hu, Xiaobei Zhou, Mark D Robinson, Gordon K Smyth
+# Copyright (C) 2024 Maximilien Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+
+# This file is based on the file 'R/rpkm.R' of the Bioconductor edgeR package (version 3.38.4).
+
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import issparse
+
+from .cpm import _sparseRows, cpm
+
+
+def rpkm_DGEList(
+    self, gene_length=None, normalized_lib_sizes=True, log=False, prior_count=2
+):
+    """
+    Compute reads per kilobase per million (RPKM) of a DGEList.
+
+    See :func:`rpkm` for details.
+
+    Arguments
+    ---------
+    self : DGEList
+        the DGEList containing the matrix of counts
+    gene_length : array_like, optional
+        vector of gene lengths (in bases), one per gene. Defaults to the
+        column :code:`"Length"` (or :code:`"length"`) of :code:`self.genes`.
+    normalized_lib_sizes : bool
+        whether to use normalized library sizes. Defaults to :code:`True`.
+    log : bool
+        whether to return log2 values. Defaults to :code:`False`.
+    prior_count : float or array_like
+        average count to be added to each observation to avoid taking log of
+        zero. Used only if :code:`log=True`.
+
+    Returns
+    -------
+    pd.DataFrame
+        matrix of RPKM values, with the same labels as :code:`self.counts`
+    """
+    if gene_length is None:
+        genes = self.genes
+        if genes is not None and "Length" in genes.columns:
+            gene_length = genes["Length"]
+        elif genes is not None and "length" in genes.columns:
+            gene_length = genes["length"]
+        else:
+            raise ValueError("Gene lengths not found")
+    return rpkm(
+        self.counts,
+        gene_length=gene_length,
+        lib_size=self.getLibSize(normalized=normalized_lib_sizes),
+        log=log,
+        prior_count=prior_count,
+    )
+
+
+def rpkm(y, gene_length, lib_size=None, log=False, prior_count=2):
+    """
+    Compute reads per kilobase per million (RPKM).
+
+    RPKM values are counts per million (see :func:`cpm`) divided by the gene
+    lengths in kilobases. As for :func:`cpm`, sparse counts yield sparse RPKM
+    values unless :code:`log=True`.
+
+    Arguments
+    ---------
+    y : array_like, pd.DataFrame or sparse matrix
+        matrix of counts, genes in rows and libraries in columns
+    gene_length : array_like
+        vector of gene lengths (in bases), one per gene
+    lib_size : array_like, optional
+        vector of library sizes. Defaults to the column sums of :code:`y`.
+    log : bool
+        whether to return log2 values. Defaults to :code:`False`.
+    prior_count : float or array_like
+        average count to be added to each observation to avoid taking log of
+        zero. Used only if :code:`log=True`.
+
+    Returns
+    -------
+    ndarray, pd.DataFrame or sparse matrix
+        matrix of RPKM values, of the same shape and type as the result of
+        :func:`cpm`
+    """
+    gene_length_kb = np.asarray(gene_length, dtype=float) / 1000
+    if gene_length_kb.shape != (y.shape[0],):
+        raise ValueError("length of gene_length must equal the number of genes")
+    y = cpm(y, lib_size=lib_size, log=log, prior_count=prior_count)
+    if log:
+        if isinstance(y, pd.DataFrame):
+            return y.sub(np.log2(gene_length_kb), axis=0)
+        return y - np.log2(gene_length_kb)[:, None]
+    if issparse(y):
+        # y is a new matrix, it can be modified in place
+        y.data /= gene_length_kb[_sparseRows(y)]
+        return y
+    if isinstance(y, pd.DataFrame):
+        return y.div(gene_length_kb, axis=0)
+    return y / gene_length_kb[:, None]
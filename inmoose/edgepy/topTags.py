@@ -22,7 +22,7 @@ import numpy as np
 import pandas as pd
 from statsmodels.stats.multitest import multipletests
 
-from ..utils import LOGGER
+from ..utils import LOGGER, top_order
 from .DGEExact import DGEExact
 
 
@@ -104,7 +104,7 @@ def topTags(self, n=10, adjust_method="fdr_bh", sort_by="PValue", p_value=1):
         test = "exact"
     else:
         test = "glm"
-    MultipleContrasts = test == "glm" and self.shape[1] > 4
+    MultipleContrasts = (self.columns == "log2FoldChange").sum() > 1
 
     # Check n
     n = np.min([n, self.shape[0]])
@@ -129,59 +129,69 @@ def topTags(self, n=10, adjust_method="fdr_bh", sort_by="PValue", p_value=1):
             LOGGER.warning(
                 "Two or more logFC columns in DGELRT object. First logFC column used to rank by logFC"
             )
-        alfc = np.abs(self["log2FoldChange"].iloc[:, 0])
+        alfc = np.abs(self["log2FoldChange"].iloc[:, 0].values)
     else:
-        alfc = np.abs(self["log2FoldChange"])
+        alfc = np.abs(self["log2FoldChange"].values)
 
-    # Choose top genes
+    # Adjusted p-values
+    adj_p_val = _adjustPValues(self, adjust_method)
+
+    # Thin out fit p_value threshold
+    if p_value < 1:
+        candidates = np.flatnonzero(adj_p_val <= p_value)
+    else:
+        candidates = np.arange(self.shape[0])
+
+    # Choose top genes, only sorting the candidates for the first n positions
     if sort_by == "logFC":
-        o = np.argsort(-alfc)
+        o = top_order([-alfc[candidates]], n)
     elif sort_by == "PValue":
-        o = np.argsort(
-            np.array(
-                [(a, b) for a, b in zip(self["pvalue"], -alfc)],
-                dtype=[("x", self["pvalue"].dtype), ("y", alfc.dtype)],
-            ),
-            order=("x", "y"),
-        )
-    elif sort_by == "none":
-        o = np.arange(self.shape[0])
+        pvalue = self["pvalue"].values
+        o = top_order([-alfc[candidates], pvalue[candidates]], n)
     else:
-        raise ValueError(f"invalid value {sort_by} for 'sort_by'")
-    tab = self.iloc[o, :]
+        o = np.arange(min(n, len(candidates)))
+    o = candidates[o]
+    if len(o) < 1:
+        return pd.DataFrame()
+    tab = self.iloc[o, :].copy()
 
-    # Add adjusted p-values if appropriate
-    adj_p_val = multipletests(self["pvalue"], method=adjust_method)[1]
-    if adjust_method != "none":
-        if adjust_method in FWER_methods:
-            adjustment = "FWER"
-        if adjust_method in FDR_methods:
-            adjustment = "FDR"
-        self.loc[self.index[o], adjustment] = adj_p_val[o]
+    # Add adjusted p-values
+    if adjust_method in FWER_methods:
+        adjustment = "FWER"
+    if adjust_method in FDR_methods:
+        adjustment = "FDR"
+    tab[adjustment] = adj_p_val[o]
 
     # Add gene annotation if appropriate
-    if self.genes is not None:
-        rn = self.genes.index
-        for c in self.genes.columns:
-            tab[c] = self.genes[c]
-        tab.index = rn
-
-    # Thin out fit p_value threshold
-    if p_value < 1:
-        sig = adj_p_val[o] <= p_value
-        sig[np.isnan(sig)] = False
-        tab = tab[sig, :]
-
-    # Enough rows left?
-    if tab.shape[0] < n:
-        n = tab.shape[0]
-    if n < 1:
-        return pd.DataFrame()
+    genes = getattr(self, "genes", None)
+    if genes is not None:
+        genes = genes.iloc[o]
+        for c in genes.columns:
+            tab[c] = genes[c].values
+        tab.index = genes.index
 
     # Output object
     return TopTags(
-        table=tab.iloc[:n, :],
+        table=tab,
         adjust_method=adjust_method,
         comparison=self.comparison,
         test=test,
     )
+
+
+def _adjustPValues(self, adjust_method):
+    """
+    adjusted *p*-values of a test object, cached in the object so that repeated
+    calls to :func:`topTags` adjust the *p*-values only once. The cache is
+    discarded if the *p*-values of the object change.
+    """
+    pvalue = self["pvalue"].values
+    cache = getattr(self, "_adjusted_pvalues", None)
+    if cache is None or not np.array_equal(cache["pvalue"], pvalue, equal_nan=True):
+        cache = {"pvalue": pvalue.copy()}
+        self._adjusted_pvalues = cache
+    if adjust_method not in cache:
+        adjusted = multipletests(pvalue, method=adjust_method)[1]
+        adjusted.flags.writeable = False
+        cache[adjust_method] = adjusted
+    return cache[adjust_method]
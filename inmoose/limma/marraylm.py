@@ -97,6 +97,9 @@ class MArrayLM:
         self.p_value = None
         self.lods = None
 
+        # adjusted p-values, cached by topTable
+        self._adjusted_pvalues = None
+
     def __getitem__(self, idx):
         row_idx, col_idx = idx
 
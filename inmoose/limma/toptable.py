@@ -26,6 +26,7 @@ import scipy
 from statsmodels.stats.multitest import multipletests
 
 from ..diffexp import DEResults
+from ..utils import top_order
 from .marraylm import MArrayLM
 
 
@@ -282,47 +283,36 @@ def _topTableF(
         raise ValueError(f"invalid value {sort_by} for argument sort_by")
 
     # Apply multiple testing adjustment
-    adj_P_Value = multipletests(Fp, method=adjust_method)[1]
+    adj_P_Value = _adjustPValues(fit, "F", Fp, adjust_method)
 
     # Thin out fit by lfc and p_value thresholds
-    if lfc > 0 or p_value < 1:
-        if lfc > 0:
-            big = np.nansum(np.abs(M) > lfc, axis=1) > 0
-        else:
-            big = True
-        if p_value < 1:
-            sig = adj_P_Value <= p_value
-            sig[np.isnan(sig)] = False
-        else:
-            sig = True
-        keep = big & sig
-        if not np.all(keep):
-            M = M[keep, :]
-            rn = rn[keep]
-            Amean = Amean[keep]
-            Fstat = Fstat[keep]
-            Fp = Fp[keep]
-            genelist = genelist[keep, :]
-            adj_P_Value = adj_P_Value[keep]
+    keep = np.ones(len(Fp), dtype=bool)
+    if lfc > 0:
+        keep &= np.nansum(np.abs(M.values) > lfc, axis=1) > 0
+    if p_value < 1:
+        keep &= adj_P_Value <= p_value
+    candidates = np.flatnonzero(keep)
 
     # Enough rows left?
-    if M.shape[0] < number:
-        number = M.shape[0]
+    if len(candidates) < number:
+        number = len(candidates)
     if number < 1:
         return pd.DataFrame()
 
     # Find rows of top genes
     if sort_by == "F":
-        o = np.argsort(Fp)[:number]
+        o = candidates[top_order([Fp[candidates]], number)]
     else:
-        o = np.arange(number)
+        o = candidates[:number]
 
     # Assemble data frame
     if genelist is None:
         tab = pd.DataFrame(M.iloc[o, :])
     else:
-        tab = pd.DataFrame(genelist[o, :], M[o, :])
-    tab["AveExpr"] = Amean.iloc[o]
+        tab = pd.DataFrame(genelist.iloc[o, :])
+        for c in M.columns:
+            tab[c] = M[c].values[o]
+    tab["AveExpr"] = Amean.iloc[o].values
     tab["F"] = Fstat[o]
     tab["pvalue"] = Fp[o]
     tab["adj_P_Val"] = adj_P_Value[o]
@@ -435,54 +425,48 @@ def _topTableT(
         B = eb.lods.loc[:, coef]
 
     # Apply multiple testing adjustment
-    adj_P_Value = multipletests(P_Value, method=adjust_method)[1]
+    adj_P_Value = _adjustPValues(fit, coef, P_Value.values, adjust_method)
 
     # Thin out fit by p_value and lfc thresholds
     if p_value < 1 or lfc > 0:
-        sig = (adj_P_Value <= p_value) & (np.abs(M) >= lfc)
-        if np.any(np.isnan(sig)):
-            sig[np.isnan(sig)] = False
+        sig = (adj_P_Value <= p_value) & (np.abs(M.values) >= lfc)
         if not np.any(sig):
             return pd.DataFrame()
-        genelist = genelist[sig, :]
-        M = M[sig]
-        lfcSE = lfcSE[sig]
-        A = A[sig]
-        tstat = tstat[sig]
-        P_Value = P_Value[sig]
-        adj_P_Value = adj_P_Value[sig]
-        if include_B:
-            B = B[sig]
-        rn = rn[sig]
+        candidates = np.flatnonzero(sig)
+    else:
+        candidates = np.arange(len(M))
 
     # Are enough rows left?
-    if len(M) < number:
-        number = len(M)
+    if len(candidates) < number:
+        number = len(candidates)
     if number < 1:
         return pd.DataFrame()
 
-    # Select top rows
+    # Select top rows, only sorting the candidates for the first positions
     if sort_by == "logFC":
-        ord = np.flip(np.argsort(np.abs(M)))
+        key = -np.abs(M.values)
     elif sort_by == "AveExpr":
-        ord = np.flip(np.argsort(A))
+        key = -np.asarray(A)
     elif sort_by == "P":
-        ord = np.argsort(P_Value)
+        key = P_Value.values
     elif sort_by == "t":
-        ord = np.flip(np.argsort(np.abs(tstat)))
+        key = -np.abs(tstat.values)
     elif sort_by == "B":
-        ord = np.flip(np.argsort(B))
-    elif sort_by == "none":
-        ord = np.arange(len(M))
-    top = ord[:number]
+        key = -B.values
+    else:
+        key = None
+    if key is None:
+        top = candidates[:number]
+    else:
+        top = candidates[top_order([key[candidates]], number)]
 
     # Assemble output data frame
     if genelist is None:
         tab = pd.DataFrame({"log2FoldChange": M.iloc[top], "lfcSE": lfcSE.iloc[top]})
     else:
-        tab = pd.DataFrame(genelist.loc[top, :])
-        tab["log2FoldChange"] = M[top]
-        tab["lfcSE"] = lfcSE[top]
+        tab = pd.DataFrame(genelist.iloc[top, :])
+        tab["log2FoldChange"] = M.values[top]
+        tab["lfcSE"] = lfcSE.values[top]
 
     if confint is not False:
         if isinstance(confint, (int, float)):
@@ -498,13 +482,13 @@ def _topTableT(
         tab["CI_R"] = M.iloc[top] + margin_error
 
     if A is not None:
-        tab["AveExpr"] = A.iloc[top]
-    tab["stat"] = tstat.iloc[top]
-    tab["pvalue"] = P_Value.iloc[top]
+        tab["AveExpr"] = np.asarray(A)[top]
+    tab["stat"] = tstat.values[top]
+    tab["pvalue"] = P_Value.values[top]
     tab["adj_P_Val"] = adj_P_Value[top]
 
     if include_B:
-        tab["B"] = B.iloc[top]
+        tab["B"] = B.values[top]
     tab.index = rn[top]
 
     # Resort table
@@ -519,6 +503,28 @@ def _topTableT(
             ord = np.flip(np.argsort(tab["stat"]))
         elif resort_by == "B":
             ord = np.flip(np.argsort(tab["B"]))
-        tab = tab[ord, :]
+        tab = tab.iloc[ord, :]
 
     return DEResults(tab)
+
+
+def _adjustPValues(fit, key, pvalue, adjust_method):
+    """
+    adjusted *p*-values of a coefficient (or of the *F*-test if :code:`key` is
+    :code:`"F"`), cached in :code:`fit` so that repeated calls to
+    :func:`topTable` adjust the *p*-values only once. Cached values are
+    discarded if the *p*-values change.
+    """
+    cache = getattr(fit, "_adjusted_pvalues", None)
+    if cache is None:
+        cache = {}
+        fit._adjusted_pvalues = cache
+    entry = cache.get(key)
+    if entry is None or not np.array_equal(entry["pvalue"], pvalue, equal_nan=True):
+        entry = {"pvalue": np.array(pvalue)}
+        cache[key] = entry
+    if adjust_method not in entry:
+        adjusted = multipletests(pvalue, method=adjust_method)[1]
+        adjusted.flags.writeable = False
+        entry[adjust_method] = adjusted
+    return entry[adjust_method]
@@ -0,0 +1,59 @@
+# -----------------------------------------------------------------------------
+# Copyright (C) 2024 M. Colange
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# -----------------------------------------------------------------------------
+
+import numpy as np
+
+
+def top_order(keys, n):
+    """
+    Indices of the first elements of the lexicographic order of keys
+
+    This is equivalent to :code:`np.lexsort(keys)[:n]`, but only the
+    candidates for the first :code:`n` positions are sorted: they are selected
+    by a partial sort (:func:`numpy.partition`) on the primary key, which is
+    linear in the number of elements.
+
+    As for :func:`numpy.lexsort`, the last key is the primary key, ties are
+    broken by the other keys and then by position, and :code:`NaN` values are
+    sorted last.
+
+    Arguments
+    ---------
+    keys : sequence of array_like
+        the sort keys, all of the same length
+    n : int
+        the number of indices to return
+
+    Returns
+    -------
+    ndarray
+        the indices of the first :code:`n` elements, in order
+    """
+    keys = [np.asarray(k) for k in keys]
+    primary = keys[-1]
+    n = int(max(0, min(n, len(primary))))
+    if n == 0:
+        return np.zeros(0, dtype=np.intp)
+    if n < len(primary):
+        # all elements not greater than the n-th smallest primary key (ties
+        # included) are candidates
+        threshold = np.partition(primary, n - 1)[n - 1]
+        if not np.isnan(threshold):
+            candidates = np.flatnonzero(primary <= threshold)
+            o = np.lexsort([k[candidates] for k in keys])[:n]
+            return candidates[o]
+    return np.lexsort(keys)[:n]
@@ -57,6 +57,7 @@ def spline_design(knots, x, order, derivs=0):
         B-spline is defined by a set of :code:`ord` successive knots so the
         total number of B-splines is :code:`len(knots) - ord`.
     """
+    x = np.asarray(x, dtype=float)
     derivs = np.asarray(derivs)
     if derivs.ndim == 0:
         der = np.repeat(derivs, len(x))
@@ -68,8 +69,9 @@ def spline_design(knots, x, order, derivs=0):
     for i in range(n_bases):
         coefs = np.zeros((n_bases,))
         coefs[i] = 1
-        for j in range(len(x)):
-            res[j, i] = splev(x, (knots, coefs, order - 1), der=der[j])[j]
+        for d in np.unique(der):
+            sel = der == d
+            res[sel, i] = splev(x[sel], (knots, coefs, order - 1), der=d)
     return res
 
 
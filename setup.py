@@ -7,11 +7,22 @@ from setuptools.command.build_ext import build_ext
 
 class build_ext_cxx17(build_ext):
     def build_extensions(self):
-        std_flag = (
-            "-std:c++17" if self.compiler.compiler_type == "msvc" else "-std=c++17"
-        )
+        msvc = self.compiler.compiler_type == "msvc"
+        std_flag = "-std:c++17" if msvc else "-std=c++17"
+        # OpenMP is used to parallelize some loops (Cython prange). The default
+        # macOS toolchain does not support it: loops then run sequentially.
+        if msvc:
+            openmp_flags = ["/openmp"]
+        elif sys.platform == "darwin":
+            openmp_flags = []
+        else:
+            openmp_flags = ["-fopenmp"]
         for e in self.extensions:
             e.extra_compile_args.append(std_flag)
+            if e.name in openmp_extensions:
+                e.extra_compile_args.extend(openmp_flags)
+                if not msvc:
+                    e.extra_link_args.extend(openmp_flags)
         super().build_extensions()
 
 
@@ -53,6 +64,8 @@ edgepy_cpp = Extension(
     define_macros=macros,
 )
 
+openmp_extensions = {edgepy_cpp.name}
+
 
 setup(
     cmdclass={"build_ext": build_ext_cxx17},
@@ -78,7 +91,6 @@ setup(
             "__init__.pxd",
             "edgepy_cpp.h",
             "interpolator.h",
-            "maximize_interpolant.cpp",
             "utils.h",
         ],
         "inmoose/common_cpp": [
@@ -1,5 +1,6 @@
 import unittest
 
+import numpy as np
 import patsy
 
 from inmoose.deseq2 import DESeq, makeExampleDESeqDataSet
@@ -56,3 +57,45 @@ class Test(unittest.TestCase):
             ValueError, expected_regex="full model matrix is not full rank"
         ):
             DESeq(dds)
+
+    def test_DESeq_float32(self):
+        """test that DESeq() in single precision stays close to double precision"""
+        dds = makeExampleDESeqDataSet(n=500, m=12, betaSD=1, seed=42)
+        with self.assertRaisesRegex(
+            ValueError, expected_regex="invalid value for parameter 'dtype'"
+        ):
+            DESeq(dds.copy(), dtype="float16")
+        with self.assertRaisesRegex(
+            ValueError, expected_regex="invalid value for parameter 'dtype'"
+        ):
+            DESeq(dds.copy(), dtype="foo")
+
+        dds64 = DESeq(dds.copy(), quiet=True)
+        dds32 = DESeq(dds.copy(), quiet=True, dtype=np.float32)
+        for layer in ["mu", "H", "cooks"]:
+            self.assertEqual(dds64.layers[layer].dtype, np.float64)
+            self.assertEqual(dds32.layers[layer].dtype, np.float32)
+
+        # accuracy envelope documented in DESeq
+        res64 = dds64.results()
+        res32 = dds32.results()
+        self.assertTrue(
+            np.allclose(
+                res32.log2FoldChange,
+                res64.log2FoldChange,
+                atol=5e-2,
+                rtol=0,
+                equal_nan=True,
+            )
+        )
+        self.assertTrue(
+            np.allclose(res32.lfcSE, res64.lfcSE, atol=0, rtol=5e-2, equal_nan=True)
+        )
+        self.assertTrue(
+            np.allclose(res32.pvalue, res64.pvalue, atol=0, rtol=5e-2, equal_nan=True)
+        )
+        self.assertTrue(
+            np.allclose(
+                dds32.dispersions, dds64.dispersions, atol=0, rtol=5e-2, equal_nan=True
+            )
+        )
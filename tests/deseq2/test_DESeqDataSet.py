@@ -1,6 +1,7 @@
 import unittest
 
 import numpy as np
+import pandas as pd
 from pandas.api.types import CategoricalDtype
 
 from inmoose.deseq2 import DESeqDataSet
@@ -51,3 +52,45 @@ class Test(unittest.TestCase):
         self.assertTrue(isinstance(dds.obs["C(x)"].dtype, CategoricalDtype))
         self.assertFalse(isinstance(dds.obs["y"].dtype, CategoricalDtype))
         self.assertTrue(isinstance(dds.obs["C(y)"].dtype, CategoricalDtype))
+
+    def test_compiledDesign(self):
+        """test that the quantities derived from the design are shared and invalidated"""
+        dds = DESeqDataSet(np.arange(36).reshape(6, 6))
+        dds.obs["x"] = pd.Categorical(["A", "A", "A", "B", "B", "C"])
+        dds.design = "~x"
+        cd = dds.compiledDesign
+        self.assertIs(cd, dds.compiledDesign)
+
+        # gene-wise subsets share the design and the compiled design
+        sub = dds[:, :3]
+        self.assertIs(sub.design, dds.design)
+        self.assertIs(sub.compiledDesign, cd)
+        # sample-wise subsets get their own design
+        sub = dds[1:, :]
+        self.assertEqual(sub.design.shape, (5, 3))
+        self.assertIsNot(sub.compiledDesign, cd)
+
+        self.assertIs(dds.makeExpandedModelMatrix(), dds.makeExpandedModelMatrix())
+        self.assertEqual(
+            dds.makeExpandedModelMatrix().design_info.column_names,
+            ["Intercept", "x[T.A]", "x[T.B]", "x[T.C]"],
+        )
+        self.assertEqual(
+            cd.convertNames(),
+            {"x[T.B]": "x_B_vs_A", "x[T.C]": "x_C_vs_A"},
+        )
+        self.assertEqual(cd.rank(), 3)
+        self.assertEqual(cd.cells().nlevels(), 3)
+        self.assertEqual(
+            list(cd.nOrMoreInCell(3)), [True, True, True, False, False, False]
+        )
+        xRinv, Qt = cd.linearModelFactors()
+        y = np.arange(12).reshape(6, 2)
+        self.assertTrue(
+            np.allclose(xRinv @ (Qt @ y), cd.design @ np.linalg.lstsq(cd.design, y)[0])
+        )
+
+        # setting a new design invalidates the compiled design
+        dds.design = "~1"
+        self.assertIsNot(dds.compiledDesign, cd)
+        self.assertEqual(dds.compiledDesign.rank(), 1)
@@ -12,6 +12,7 @@ from inmoose.deseq2 import (
     nbinomLRT,
     nbinomWaldTest,
 )
+from inmoose.deseq2.Hmisc import wtd_quantile, wtd_quantile_cols
 from inmoose.utils import Factor, pt
 
 
@@ -139,3 +140,39 @@ class Test(unittest.TestCase):
             res.pvalue.iloc[1]
             == 2 * pt(abs(res.stat.iloc[1]), df=15 - 1 - 3, lower_tail=False)
         )
+
+    def test_betaPriorVar_expanded(self):
+        """test the vectorized beta prior variance for expanded model matrices"""
+        rng = np.random.default_rng(42)
+        x = np.abs(rng.normal(size=(200, 6)))
+        x[rng.uniform(size=x.shape) < 0.1] = np.nan
+        x[:, 5] = np.nan
+        w = rng.uniform(0.5, 2, 200)
+        res = wtd_quantile_cols(x, w, 0.95, normwt=True)
+        for j in range(5):
+            use = ~np.isnan(x[:, j])
+            ref = wtd_quantile(x[use, j], weights=w[use], probs=0.95, normwt=True)
+            self.assertAlmostEqual(res[j], ref[0])
+        self.assertTrue(np.isnan(res[5]))
+
+        dds = makeExampleDESeqDataSet(n=200, m=12, betaSD=1, seed=42)
+        dds.obs["condition"] = Factor(np.repeat(["A", "B", "C", "D"], 3))
+        dds.design = "~condition"
+        dds = DESeq(dds, betaPrior=True)
+        self.assertEqual(dds.modelMatrixType, "expanded")
+        betaMatrix = dds.var.filter(regex="MLE_condition")
+        betaMatrix.columns = ["condition[T.B]", "condition[T.C]", "condition[T.D]"]
+        contrasts = dds.addAllContrasts(betaMatrix)
+        self.assertEqual(
+            list(contrasts.columns[3:]),
+            [f"conditionCntrst{k}" for k in range(3)],
+        )
+        # all pairwise differences between levels, ordered by the subtrahend
+        B, C, D = betaMatrix.values.T
+        self.assertTrue(
+            np.allclose(contrasts.values[:, 3:], np.stack([C - B, D - B, D - C], 1))
+        )
+        for method in ["weighted", "quantile"]:
+            bpv = estimateBetaPriorVar(dds, betaPriorMethod=method)
+            self.assertEqual(bpv["Intercept"], 1e6)
+            self.assertEqual(bpv.filter(like="condition").nunique(), 1)
@@ -0,0 +1,86 @@
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from inmoose.deseq2 import (
+    DESeq,
+    makeExampleDESeqDataSet,
+    readDESeqDataSet,
+    varianceStabilizingTransformation,
+    writeDESeqDataSet,
+)
+
+
+class Test(unittest.TestCase):
+    def assertResultsEqual(self, r1, r2):
+        self.assertEqual(list(r1.columns), list(r2.columns))
+        self.assertTrue(
+            np.allclose(
+                r1.values.astype(float), r2.values.astype(float), equal_nan=True
+            )
+        )
+
+    def test_roundtrip(self):
+        """test that a fitted DESeqDataSet is preserved by save/load"""
+        for betaPrior in [False, True]:
+            dds = makeExampleDESeqDataSet(n=100, m=12, betaSD=1, seed=42)
+            dds.obs["condition"] = pd.Categorical(np.repeat(["A", "B", "C"], 4))
+            dds.design = "~condition"
+            dds = DESeq(dds, betaPrior=betaPrior)
+
+            with tempfile.TemporaryDirectory() as d:
+                dds.save(d)
+                dds2 = readDESeqDataSet(d)
+
+                self.assertIsInstance(dds2.X, np.memmap)
+                self.assertIsInstance(dds2.layers["mu"], np.memmap)
+                self.assertTrue(np.array_equal(dds2.X, dds.X))
+                self.assertEqual(dds2.modelMatrixType, dds.modelMatrixType)
+                self.assertEqual(
+                    dds2.modelMatrix.design_info.column_names,
+                    dds.modelMatrix.design_info.column_names,
+                )
+                self.assertEqual(
+                    dds2.design.design_info.column_names,
+                    dds.design.design_info.column_names,
+                )
+                self.assertTrue(np.allclose(dds2.betaPriorVar, dds.betaPriorVar))
+                self.assertEqual(dds2.var.attrs, dds.var.attrs)
+                self.assertEqual(dds2.var.type["dispFit"], "intermediate")
+                self.assertEqual(
+                    dds2.dispersionFunction.fitType, dds.dispersionFunction.fitType
+                )
+                self.assertTrue(
+                    np.allclose(
+                        dds2.dispersionFunction(dds.var["baseMean"]),
+                        dds.dispersionFunction(dds.var["baseMean"]),
+                    )
+                )
+
+                self.assertResultsEqual(dds2.results(), dds.results())
+                contrast = ["condition", "C", "B"]
+                self.assertResultsEqual(
+                    dds2.results(contrast=contrast), dds.results(contrast=contrast)
+                )
+                self.assertTrue(
+                    np.allclose(
+                        varianceStabilizingTransformation(dds2, blind=False).X,
+                        varianceStabilizingTransformation(dds, blind=False).X,
+                    )
+                )
+
+                dds3 = readDESeqDataSet(d, mmap=False)
+                self.assertNotIsInstance(dds3.X, np.memmap)
+
+    def test_roundtrip_dispersion_mean(self):
+        """test the save/load of mean dispersion fits and single precision"""
+        dds = makeExampleDESeqDataSet(n=100, m=12, seed=42)
+        dds = DESeq(dds, fitType="mean", dtype="float32")
+        with tempfile.TemporaryDirectory() as d:
+            writeDESeqDataSet(dds, d)
+            dds2 = readDESeqDataSet(d)
+        self.assertEqual(dds2.computeDtype, np.float32)
+        self.assertEqual(dds2.dispersionFunction.mean, dds.dispersionFunction.mean)
+        self.assertResultsEqual(dds2.results(), dds.results())
@@ -1,8 +1,20 @@
+import importlib.util
+import os
+import tempfile
 import unittest
 
+import anndata
 import numpy as np
 
-from inmoose.deseq2 import makeExampleDESeqDataSet, varianceStabilizingTransformation
+from inmoose.deseq2 import (
+    estimateDispersionsGeneEst,
+    iterNormalizedCounts,
+    iterVarianceStabilizedData,
+    makeExampleDESeqDataSet,
+    varianceStabilizingTransformation,
+    writeVarianceStabilizedData,
+)
+from inmoose.deseq2.vst import getVarianceStabilizedData
 
 
 class Test(unittest.TestCase):
@@ -447,3 +459,75 @@ class Test(unittest.TestCase):
         vst = varianceStabilizingTransformation(dds, fitType="mean")
 
         self.assertTrue(np.allclose(vst.X, ref.T, atol=3e-2))
+
+    def test_streamingVST(self):
+        """check that the streaming VST matches the in-memory VST"""
+        dds = makeExampleDESeqDataSet(n=50, m=12, seed=42)
+        dds = dds.estimateSizeFactors()
+        dds = dds.estimateDispersions(fitType="mean", quiet=True)
+        ref = getVarianceStabilizedData(dds)
+
+        for axis in [0, 1]:
+            blocks = list(iterVarianceStabilizedData(dds, blockSize=5, axis=axis))
+            self.assertEqual(len(blocks), 3 if axis == 0 else 10)
+            self.assertTrue(
+                np.allclose(np.concatenate([b for _, b in blocks], axis), ref)
+            )
+
+        norm = np.concatenate(
+            [b for _, b in iterNormalizedCounts(dds, blockSize=7, axis=1)], 1
+        )
+        self.assertTrue(np.allclose(norm, dds.counts(normalized=True)))
+
+        with tempfile.TemporaryDirectory() as d:
+            fname = os.path.join(d, "vst.npy")
+            writeVarianceStabilizedData(dds, fname, blockSize=5)
+            self.assertTrue(np.allclose(np.load(fname, mmap_mode="r"), ref))
+
+            fname = os.path.join(d, "vst.h5ad")
+            writeVarianceStabilizedData(dds, fname, blockSize=5, axis=1)
+            ad = anndata.read_h5ad(fname)
+            self.assertTrue(np.allclose(ad.X, ref))
+            self.assertTrue((ad.var_names == dds.var_names).all())
+
+            fname = os.path.join(d, "norm.npy")
+            writeVarianceStabilizedData(dds, fname, transform="normalized")
+            self.assertTrue(np.allclose(np.load(fname), dds.counts(normalized=True)))
+
+            with self.assertRaisesRegex(ValueError, "invalid value for format"):
+                writeVarianceStabilizedData(dds, os.path.join(d, "vst.csv"))
+            with self.assertRaisesRegex(ValueError, "blocks of samples"):
+                writeVarianceStabilizedData(dds, os.path.join(d, "vst.parquet"), axis=1)
+
+    def test_streamingVST_local(self):
+        """check the streaming VST with a local dispersion fit"""
+        dds = makeExampleDESeqDataSet(n=50, m=12, seed=42)
+        dds = dds.estimateSizeFactors()
+        dds = estimateDispersionsGeneEst(dds, quiet=True)
+
+        def dispFunction(means):
+            return 0.1 + 1 / means
+
+        dispFunction.fitType = "local"
+        dds.setDispFunction(dispFunction)
+        ref = getVarianceStabilizedData(dds)
+        self.assertEqual(ref.shape, dds.shape)
+        res = np.concatenate(
+            [b for _, b in iterVarianceStabilizedData(dds, blockSize=5)]
+        )
+        self.assertTrue(np.allclose(res, ref))
+
+    @unittest.skipIf(importlib.util.find_spec("pyarrow") is None, "requires pyarrow")
+    def test_streamingVST_parquet(self):
+        """check the export of the VST to a parquet file"""
+        import pandas as pd
+
+        dds = makeExampleDESeqDataSet(n=50, m=12, seed=42)
+        dds = dds.estimateSizeFactors()
+        dds = dds.estimateDispersions(fitType="mean", quiet=True)
+        with tempfile.TemporaryDirectory() as d:
+            fname = os.path.join(d, "vst.parquet")
+            writeVarianceStabilizedData(dds, fname, blockSize=5)
+            res = pd.read_parquet(fname)
+            self.assertEqual(list(res.columns), list(dds.var_names))
+            self.assertTrue(np.allclose(res.values, getVarianceStabilizedData(dds)))
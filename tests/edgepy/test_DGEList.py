@@ -81,6 +81,58 @@ class test_DGEList(unittest.TestCase):
         d.offset = 0
         self.assertEqual(d.getOffset(), 0)
 
+    def test_memoize(self):
+        """test the memoization of the library sizes, offsets and AveLogCPM"""
+        rng = np.random.default_rng(42)
+        d = DGEList(rng.negative_binomial(5, 0.2, size=(30, 4)))
+        ave = d.aveLogCPM()
+        self.assertIs(d.aveLogCPM(), ave)
+        self.assertFalse(ave.flags.writeable)
+        self.assertIsNot(d.aveLogCPM(prior_count=1), ave)
+        self.assertIsNot(d.aveLogCPM(dispersion=0.1), ave)
+        # memoized Series are returned as new Series on the same read-only values
+        offset = d.getOffset()
+        self.assertTrue(np.shares_memory(d.getOffset().values, offset.values))
+        lib_size = d.getLibSize()
+        with self.assertRaises(ValueError):
+            lib_size.iloc[0] = 0
+        with self.assertRaises(ValueError):
+            offset.iloc[0] = 0
+        self.assertTrue(np.array_equal(d.getLibSize(), d.counts.sum(axis=0)))
+        d.AveLogCPM = ave
+
+        # changing the normalization factors invalidates the memoized values
+        d.samples["norm_factors"] = [0.8, 1.25, 1.0, 1.0]
+        self.assertIsNone(d.AveLogCPM)
+        ave2 = d.aveLogCPM()
+        self.assertIsNot(ave2, ave)
+        self.assertTrue(
+            np.allclose(
+                d.getOffset(), np.log(d.samples["lib_size"] * d.samples["norm_factors"])
+            )
+        )
+        self.assertTrue(
+            np.allclose(
+                d.getLibSize(normalized=False), d.counts.sum(axis=0).astype(float)
+            )
+        )
+
+        # the counts are copied, so that changing the caller's array leaves
+        # the memoized values valid
+        c = rng.negative_binomial(5, 0.2, size=(30, 4))
+        d2 = DGEList(c)
+        ave3 = d2.aveLogCPM()
+        c[0] *= 100
+        self.assertFalse(np.shares_memory(d2.counts.values, c))
+        self.assertTrue(np.array_equal(d2.aveLogCPM(), DGEList(d2.counts).aveLogCPM()))
+        self.assertIs(d2.aveLogCPM(), ave3)
+
+        # so does replacing the counts
+        d.AveLogCPM = ave2
+        d.counts = d.counts * 2
+        self.assertIsNone(d.AveLogCPM)
+        self.assertIsNot(d.aveLogCPM(), ave2)
+
     def test_getDispersion(self):
         d = DGEList([[42]])
         self.assertIsNone(d.getDispersion())
@@ -102,3 +154,35 @@ class test_DGEList(unittest.TestCase):
         self.assertFalse((d.samples.group.values == None).any())  # noqa: E711
         self.assertFalse((d.samples.lib_size.values == None).any())  # noqa: E711
         self.assertFalse((d.samples.norm_factors.values == None).any())  # noqa: E711
+
+    def test_subset(self):
+        rng = np.random.default_rng(42)
+        counts = rng.poisson(20, size=(10, 4))
+        d = DGEList(counts, group=[1, 1, 2, 2], genes=pd.DataFrame({"x": range(10)}))
+        d.tagwise_dispersion = np.linspace(0.1, 1, 10)
+        d.common_dispersion = 0.2
+        d.offset = np.log(counts.sum(axis=0))
+        d.AveLogCPM = d.aveLogCPM()
+
+        keep = np.arange(10) % 3 != 0
+        d2 = d[keep]
+        self.assertEqual(d2.counts.shape, (6, 4))
+        self.assertTrue(np.array_equal(d2.counts.to_numpy(), counts[keep]))
+        self.assertTrue(
+            np.array_equal(d2.tagwise_dispersion, d.tagwise_dispersion[keep])
+        )
+        self.assertEqual(d2.common_dispersion, 0.2)
+        self.assertTrue(np.array_equal(d2.genes["x"], np.arange(10)[keep]))
+        self.assertTrue(np.array_equal(d2.AveLogCPM, d.AveLogCPM[keep]))
+        self.assertTrue(np.array_equal(d2.samples["lib_size"], d.samples["lib_size"]))
+        # the original object is left untouched
+        self.assertEqual(d.counts.shape, (10, 4))
+
+        d3 = d.subset(keep, [0, 1, 2], keep_lib_sizes=False)
+        self.assertEqual(d3.counts.shape, (6, 3))
+        self.assertTrue(
+            np.array_equal(d3.samples["lib_size"], counts[keep][:, :3].sum(axis=0))
+        )
+        self.assertTrue(np.array_equal(d3.offset, d.offset[:3]))
+        self.assertTrue(np.array_equal(d3[:2, 2:].counts, counts[keep][:2, 2:3]))
+        self.assertEqual(list(d3[:, 2:].samples["group"].cat.categories), [2])
@@ -0,0 +1,144 @@
+import sys
+import unittest
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.stats import rankdata
+
+from inmoose.edgepy import DGEList, calcNormFactors
+from inmoose.utils import rnbinom
+
+
+def refTMM(obs, ref, nO, nR, logratioTrim=0.3, sumTrim=0.05):
+    """straightforward port of edgeR's .calcFactorTMM"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logR = np.log2((obs / nO) / (ref / nR))
+        absE = (np.log2(obs / nO) + np.log2(ref / nR)) / 2
+        v = (nO - obs) / nO / obs + (nR - ref) / nR / ref
+    fin = np.isfinite(logR) & np.isfinite(absE)
+    logR, absE, v = logR[fin], absE[fin], v[fin]
+    if np.max(np.abs(logR)) < 1e-6:
+        return 1
+    n = len(logR)
+    loL = np.floor(n * logratioTrim) + 1
+    hiL = n + 1 - loL
+    loS = np.floor(n * sumTrim) + 1
+    hiS = n + 1 - loS
+    rR, rE = rankdata(logR), rankdata(absE)
+    keep = (rR >= loL) & (rR <= hiL) & (rE >= loS) & (rE <= hiS)
+    return 2 ** (np.sum(logR[keep] / v[keep]) / np.sum(1 / v[keep]))
+
+
+def refTMMwsp(obs, ref, nO, nR, logratioTrim=0.3, sumTrim=0.05):
+    """straightforward port of edgeR's .calcFactorTMMwsp"""
+    npos = 2 * (obs > 0) + (ref > 0)
+    obs, ref, npos = obs[npos > 0], ref[npos > 0], npos[npos > 0]
+    zero_obs, zero_ref = npos == 1, npos == 2
+    k = zero_obs | zero_ref
+    m = min(zero_obs.sum(), zero_ref.sum())
+    refk = np.sort(ref[k])[::-1][:m]
+    obsk = np.sort(obs[k])[::-1][:m]
+    obs = np.concatenate((obs[~k], obsk))
+    ref = np.concatenate((ref[~k], refk))
+    n = len(obs)
+    obs_p, ref_p = obs / nO, ref / nR
+    M = np.log2(obs_p / ref_p)
+    A = 0.5 * np.log2(obs_p * ref_p)
+    if np.max(np.abs(M)) < 1e-6:
+        return 1
+    M_shrunk = np.log2(((obs + 0.5) / (nO + 0.5)) / ((ref + 0.5) / (nR + 0.5)))
+    loM = int(n * logratioTrim) + 1
+    loA = int(n * sumTrim) + 1
+    keep_M = np.zeros(n, dtype=bool)
+    keep_M[np.lexsort((M_shrunk, M))[loM - 1 : n + 1 - loM]] = True
+    keep_A = np.zeros(n, dtype=bool)
+    keep_A[np.argsort(A, kind="stable")[loA - 1 : n + 1 - loA]] = True
+    keep = keep_M & keep_A
+    v = (1 - obs_p[keep]) / obs_p[keep] / nO + (1 - ref_p[keep]) / ref_p[keep] / nR
+    w = (1 + 1e-6) / (v + 1e-6)
+    return 2 ** (np.sum(w * M[keep]) / np.sum(w))
+
+
+class test_calcNormFactors(unittest.TestCase):
+    def setUp(self):
+        y = np.array(rnbinom(6000, size=2, mu=10, seed=42)).reshape((1000, 6))
+        # library-specific effects and some sparsity
+        y = y * np.array([1, 2, 1, 3, 1, 1])
+        y[:100, 2] = 0
+        y[900:, 5] = 0
+        y[950:] = 0
+        self.y = y
+        self.lib_size = y.sum(axis=0)
+
+    def test_TMM(self):
+        f = calcNormFactors(self.y)
+        # the reference has the upper quartile (of the genes with a positive
+        # count) closest to the mean
+        f75 = np.quantile(self.y[:950], 0.75, axis=0) / self.lib_size
+        r = np.argmin(np.abs(f75 - f75.mean()))
+        ref = np.array(
+            [
+                refTMM(self.y[:, i], self.y[:, r], self.lib_size[i], self.lib_size[r])
+                for i in range(6)
+            ]
+        )
+        self.assertTrue(np.allclose(f, ref / np.exp(np.mean(np.log(ref)))))
+        self.assertAlmostEqual(np.prod(f), 1)
+
+    def test_TMMwsp(self):
+        f = calcNormFactors(self.y, method="TMMwsp")
+        r = np.argmax(np.sqrt(self.y).sum(axis=0))
+        ref = np.array(
+            [
+                refTMMwsp(
+                    self.y[:, i], self.y[:, r], self.lib_size[i], self.lib_size[r]
+                )
+                for i in range(6)
+            ]
+        )
+        self.assertTrue(np.allclose(f, ref / np.exp(np.mean(np.log(ref)))))
+
+    def test_RLE_upperquartile(self):
+        y = self.y[(self.y > 0).all(axis=1)]
+        gm = np.exp(np.log(y).mean(axis=1))
+        ref = np.median(y / gm[:, None], axis=0) / self.lib_size
+        f = calcNormFactors(self.y, method="RLE")
+        self.assertTrue(np.allclose(f, ref / np.exp(np.mean(np.log(ref)))))
+
+        ref = np.quantile(self.y[:950], 0.5, axis=0) / self.lib_size
+        f = calcNormFactors(self.y, method="upperquartile", p=0.5)
+        self.assertTrue(np.allclose(f, ref / np.exp(np.mean(np.log(ref)))))
+
+        self.assertTrue(
+            np.array_equal(calcNormFactors(self.y, method="none"), np.ones(6))
+        )
+        with self.assertRaisesRegex(ValueError, "invalid normalization method"):
+            calcNormFactors(self.y, method="foo")
+
+    def test_sparse_blocks(self):
+        m = sys.modules["inmoose.edgepy.calcNormFactors"]
+
+        for method in ["TMM", "TMMwsp", "RLE", "upperquartile"]:
+            dense = calcNormFactors(self.y, method=method)
+            self.assertTrue(
+                np.allclose(dense, calcNormFactors(csr_matrix(self.y), method=method))
+            )
+            # process the libraries in several blocks
+            block_size = m._BLOCK_SIZE
+            m._BLOCK_SIZE = 2000
+            try:
+                self.assertTrue(
+                    np.allclose(dense, calcNormFactors(self.y, method=method))
+                )
+            finally:
+                m._BLOCK_SIZE = block_size
+
+    def test_DGEList(self):
+        d = DGEList(self.y)
+        d.calcNormFactors()
+        self.assertTrue(np.allclose(d.samples["norm_factors"], calcNormFactors(self.y)))
+        self.assertTrue(
+            np.allclose(
+                d.getOffset(), np.log(self.lib_size * d.samples["norm_factors"])
+            )
+        )
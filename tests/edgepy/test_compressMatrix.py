@@ -2,7 +2,7 @@ import unittest
 
 import numpy as np
 
-from inmoose.edgepy.makeCompressedMatrix import makeCompressedMatrix
+from inmoose.edgepy.makeCompressedMatrix import _compressOffsets, makeCompressedMatrix
 
 
 class Test(unittest.TestCase):
@@ -52,6 +52,44 @@ class Test(unittest.TestCase):
         ):
             makeCompressedMatrix(np.ones(shape=(1, 2, 3)), dims=(2, 3))
 
+    def test_compressed_storage(self):
+        m = np.arange(12.0).reshape((4, 3))
+        mats = [
+            makeCompressedMatrix([1.0, 2.0, 3.0], dims=(4, 3), byrow=True),
+            makeCompressedMatrix([1.0, 2.0, 3.0, 4.0], dims=(4, 3), byrow=False),
+            makeCompressedMatrix(42.0, dims=(4, 3)),
+            makeCompressedMatrix(m, dims=(4, 3)),
+        ]
+        flags = [(True, False), (False, True), (True, True), (False, False)]
+        shapes = [(1, 3), (4, 1), (1, 1), (4, 3)]
+        keys = [
+            np.array([True, False, True, True]),
+            [3, 0],
+            (slice(None), [2, 0]),
+            (np.array([1, 2]), 0),
+            (1, [0, 2]),
+            (slice(1, 3), 2),
+            2,
+        ]
+        for x, f, s in zip(mats, flags, shapes):
+            self.assertEqual((x.repeat_row, x.repeat_col), f)
+            self.assertEqual(x.compressed().shape, s)
+            dense = np.array(x)
+            for k in keys:
+                sub = x[k]
+                self.assertTrue(np.array_equal(sub, dense[k]))
+                if x.repeat_row and sub.ndim == 2:
+                    self.assertEqual(sub.strides[0], 0)
+                if x.repeat_col and sub.ndim == 2:
+                    self.assertEqual(sub.strides[1], 0)
+
+            # 2D boolean masks select elements, as for regular arrays
+            self.assertTrue(np.array_equal(x[x > 1], dense[dense > 1]))
+            self.assertTrue(np.array_equal(x[[[0, 1]], 2], dense[[[0, 1]], 2]))
+
+        with self.assertRaisesRegex(ValueError, expected_regex="NaN offset"):
+            _compressOffsets(np.ones((4, 3)), offset=[0, np.nan, 1])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from patsy import dmatrix
+
+from inmoose.edgepy import DGEList, cpm, filterByExpr, rpkm
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        y = rng.negative_binomial(2, 0.1, size=(100, 6))
+        y[rng.random(y.shape) < 0.5] = 0
+        self.y = y
+        self.lib_size = y.sum(axis=0)
+        self.group = np.array([1, 1, 1, 2, 2, 2])
+
+    def test_cpm(self):
+        y = self.y
+        ref = y / self.lib_size * 1e6
+        self.assertTrue(np.allclose(cpm(y), ref))
+        for fmt in [sp.csr_matrix, sp.csc_matrix, sp.coo_matrix]:
+            res = cpm(fmt(y))
+            self.assertTrue(sp.issparse(res))
+            self.assertEqual(res.nnz, np.count_nonzero(y))
+            self.assertTrue(np.allclose(res.toarray(), ref))
+
+        lib_size = np.arange(1000, 1006)
+        self.assertTrue(np.allclose(cpm(y, lib_size=lib_size), y / lib_size * 1e6))
+        offset = np.log(lib_size) + np.linspace(0, 1, 100)[:, None]
+        ref = y / np.exp(offset) * 1e6
+        self.assertTrue(np.allclose(cpm(y, offset=offset), ref))
+        self.assertTrue(
+            np.allclose(cpm(sp.csr_matrix(y), offset=offset).toarray(), ref)
+        )
+
+        # log-CPM with library size-adjusted prior counts
+        prior = 2 * self.lib_size / self.lib_size.mean()
+        ref = np.log2((y + prior) / (self.lib_size + 2 * prior) * 1e6)
+        self.assertTrue(np.allclose(cpm(y, log=True), ref))
+        self.assertTrue(np.allclose(cpm(sp.csr_matrix(y), log=True), ref))
+
+        d = DGEList(y, norm_factors=np.array([0.5, 2, 1, 1, 1, 1]))
+        res = d.cpm()
+        self.assertIsInstance(res, pd.DataFrame)
+        self.assertTrue(res.columns.equals(d.counts.columns))
+        self.assertTrue(np.allclose(res, y / d.getLibSize().to_numpy() * 1e6))
+        self.assertTrue(
+            np.allclose(d.cpm(normalized_lib_sizes=False), cpm(y), equal_nan=True)
+        )
+
+    def test_rpkm(self):
+        y = self.y
+        gene_length = np.linspace(500, 5000, 100)
+        ref = cpm(y) / (gene_length[:, None] / 1000)
+        self.assertTrue(np.allclose(rpkm(y, gene_length), ref))
+        self.assertTrue(np.allclose(rpkm(sp.csr_matrix(y), gene_length).toarray(), ref))
+        self.assertTrue(
+            np.allclose(
+                rpkm(y, gene_length, log=True),
+                cpm(y, log=True) - np.log2(gene_length / 1000)[:, None],
+            )
+        )
+        with self.assertRaisesRegex(ValueError, "length of gene_length"):
+            rpkm(y, gene_length[:10])
+
+        d = DGEList(y)
+        with self.assertRaisesRegex(ValueError, "Gene lengths not found"):
+            d.rpkm()
+        d.genes = pd.DataFrame({"Length": gene_length})
+        self.assertTrue(np.allclose(d.rpkm(), ref))
+
+    def test_filterByExpr(self):
+        y = self.y
+        lib_size = self.lib_size
+        # reference, following the definition of edgeR
+        cutoff = 10 / np.median(lib_size) * 1e6
+        ref = ((y / lib_size * 1e6 >= cutoff).sum(axis=1) >= 3) & (y.sum(axis=1) >= 15)
+        self.assertTrue(0 < ref.sum() < 100)
+
+        keep = filterByExpr(y, group=self.group)
+        self.assertTrue(np.array_equal(keep, ref))
+        self.assertTrue(
+            np.array_equal(filterByExpr(sp.csr_matrix(y), group=self.group), ref)
+        )
+        # a group-means design has the same minimum group size
+        design = dmatrix("0+C(g)", pd.DataFrame({"g": self.group}))
+        self.assertTrue(np.array_equal(filterByExpr(y, design=design), ref))
+        # no group: all samples in a single group
+        ref6 = ((y / lib_size * 1e6 >= cutoff).sum(axis=1) >= 6) & (y.sum(axis=1) >= 15)
+        self.assertTrue(np.array_equal(filterByExpr(y), ref6))
+        # large groups: 10 + (12 - 10) * 0.7 samples
+        ybig = np.hstack([y] * 4)
+        refbig = ((ybig / np.tile(lib_size, 4) * 1e6 >= cutoff).sum(axis=1) >= 11.4) & (
+            ybig.sum(axis=1) >= 15
+        )
+        self.assertTrue(
+            np.array_equal(filterByExpr(ybig, group=np.repeat([1, 2], 12)), refbig)
+        )
+
+        d = DGEList(y, group=self.group)
+        keep = d.filterByExpr()
+        self.assertTrue(np.array_equal(keep, ref))
+        d2 = d[keep]
+        self.assertEqual(d2.counts.shape, (ref.sum(), 6))
@@ -1,14 +1,30 @@
 import unittest
 
 import numpy as np
+from scipy.optimize import minimize_scalar
+from scipy.special import gammaln
 
 from inmoose.edgepy import (
     DGEList,
+    adjustedProfileLik,
+    cutWithMinN,
+    dispBinTrend,
     dispCoxReid,
+    dispCoxReidPowerTrend,
+    equalizeLibSizes,
+    estimateCommonDisp,
+    estimateDisp,
+    estimateGLMTrendedDisp,
+    locfitByCol,
     maximizeInterpolant,
+    mglmOneGroup,
     movingAverageByCol,
+    q2qnbinom,
+    splitIntoGroups,
     systematicSubset,
 )
+from inmoose.edgepy.dispCoxReidInterpolateTagwise import _gridAPL
+from inmoose.edgepy.makeCompressedMatrix import _compressOffsets, _compressWeights
 from inmoose.utils import rnbinom
 
 
@@ -66,6 +82,22 @@ class test_dispersion(unittest.TestCase):
         interpolation = maximizeInterpolant(spline_pts, self.d.counts)
         self.assertTrue(np.allclose(interpolation, ref, atol=1e-6, rtol=0))
 
+        # memory layouts, precisions and number of threads
+        y = np.asarray(self.d.counts, dtype="double")
+        for z in [np.asfortranarray(y), y.T.copy().T, np.repeat(y, 2, axis=0)[::2]]:
+            self.assertTrue(
+                np.array_equal(maximizeInterpolant(spline_pts, z), interpolation)
+            )
+        for nthreads in [1, 3]:
+            self.assertTrue(
+                np.array_equal(
+                    maximizeInterpolant(spline_pts, y, nthreads=nthreads),
+                    interpolation,
+                )
+            )
+        interpolation = maximizeInterpolant(spline_pts, y.astype(np.float32))
+        self.assertTrue(np.allclose(interpolation, ref, atol=1e-5, rtol=0))
+
     def test_systematicSubset(self):
         res = systematicSubset(3, np.arange(1, 10))
         self.assertTrue(np.array_equal(res + 1, [2, 5, 8]))
@@ -83,6 +115,29 @@ class test_dispersion(unittest.TestCase):
             dispCoxReid(self.d.counts, subset=5, tol=1e-15), 0.091028284006027, 7
         )
 
+        # warm-started and cold-started fits agree within the tolerance of the
+        # optimization, in as many evaluations
+        rng = np.random.default_rng(5)
+        group = np.repeat([0, 1], 4)
+        batch = np.tile([0, 1], 4)
+        design = np.column_stack((np.ones(8), group, batch))
+        offset = np.log(rng.uniform(0.5, 2, 8) * 1e6) + rng.normal(0, 0.1, (400, 8))
+        mu = np.exp(
+            offset
+            + rng.normal(-10, 2, (400, 1))
+            + 0.3 * rng.normal(0, 0.5, (400, 3)) @ design.T
+        )
+        y = rng.negative_binomial(10, 10 / (10 + mu))
+        warm, info = dispCoxReid(y, design, offset=offset, return_info=True)
+        cold, info_cold = dispCoxReid(
+            y, design, offset=offset, warm_start=False, return_info=True
+        )
+        self.assertTrue(np.isclose(warm, cold, rtol=1e-4, atol=0))
+        self.assertLessEqual(info["nfev"], info_cold["nfev"])
+        self.assertGreater(info["nfev"], 0)
+        self.assertGreaterEqual(info["time"], 0)
+        self.assertEqual(set(info.keys()), {"nfev", "nit", "time"})
+
         with self.assertRaisesRegex(
             ValueError, expected_regex="no data rows with required number of counts"
         ):
@@ -93,6 +148,41 @@ class test_dispersion(unittest.TestCase):
         ):
             dispCoxReid(self.d.counts, interval=(-1, 4))
 
+    def test_gridAPL(self):
+        """test the warm-started APL grid against cold evaluations at each point"""
+        rng = np.random.default_rng(0)
+        mu = rng.gamma(0.7, 100, size=(500, 1)) * np.ones((1, 6))
+        y = rng.negative_binomial(10, 10 / (10 + mu))
+        y = y[y.sum(axis=1) >= 5]
+        offset = _compressOffsets(y, offset=np.log(y.sum(axis=0)))
+        weights = _compressWeights(y, None)
+        spline_pts = np.linspace(-6, 6, 11)
+        group = [0, 0, 0, 1, 1, 1]
+        for design, dispersion, oneway in [
+            # oneway layout, with a common dispersion (as in estimateDisp)
+            (np.column_stack((np.ones(6), group)), 0.1, True),
+            # Levenberg fits, with genewise dispersions (as in
+            # dispCoxReidInterpolateTagwise)
+            (
+                np.column_stack((np.ones(6), group, [0, 1, 2, 0, 1, 3])),
+                rng.uniform(0.05, 0.3, y.shape[0]),
+                False,
+            ),
+        ]:
+            spline_disp = [dispersion * 2**pt for pt in spline_pts]
+            warm = _gridAPL(y, offset, weights, design, spline_disp, 5)
+            cold = np.column_stack(
+                [adjustedProfileLik(d, y, design, offset, weights) for d in spline_disp]
+            )
+            if oneway:
+                # oneway fits are exact
+                self.assertTrue(np.allclose(warm, cold, rtol=1e-10, atol=1e-10))
+            # Levenberg fits agree within the GLM convergence tolerance, except
+            # for genes with zero counts, whose coefficients may diverge
+            pos = (y > 0).all(axis=1)
+            self.assertGreater(pos.sum(), 0.9 * y.shape[0])
+            self.assertTrue(np.allclose(warm[pos], cold[pos], rtol=1e-5, atol=1e-4))
+
     @unittest.skip("TODO")
     def test_dispCoxReidInterpolateTagwise(self):
         # TODO
@@ -196,6 +286,211 @@ class test_dispersion(unittest.TestCase):
         e = self.d.estimateGLMCommonDisp()
         self.assertAlmostEqual(e.common_dispersion, 0.16157151, 5)
 
+    def test_equalizeLibSizes(self):
+        y = self.d.counts.to_numpy()
+        lib_size = np.arange(1001, 1005)
+        dispersion = np.linspace(0.05, 0.2, y.shape[0])
+        out = equalizeLibSizes(
+            y, group=self.group, dispersion=dispersion, lib_size=lib_size
+        )
+        common_lib_size = np.exp(np.log(lib_size).mean())
+        self.assertAlmostEqual(out["pseudo_lib_size"], common_lib_size)
+
+        # reference: one group at a time
+        ref = np.zeros(y.shape)
+        for g in [1, 2]:
+            j = self.group == g
+            lam = np.exp(
+                mglmOneGroup(y[:, j], dispersion=dispersion, offset=np.log(lib_size[j]))
+            )
+            for k in j.nonzero()[0]:
+                ref[:, k] = q2qnbinom(
+                    y[:, k],
+                    input_mean=lam * lib_size[k],
+                    output_mean=lam * common_lib_size,
+                    dispersion=dispersion,
+                )
+        ref[ref < 0] = 0
+        self.assertTrue(np.allclose(out["pseudo_counts"], ref))
+
+        d = self.d.equalizeLibSizes(dispersion=0.1)
+        self.assertTrue(
+            np.allclose(
+                d.pseudo_counts,
+                equalizeLibSizes(
+                    y, group=self.group, dispersion=0.1, lib_size=lib_size
+                )["pseudo_counts"],
+            )
+        )
+        self.assertAlmostEqual(d.pseudo_lib_size, common_lib_size)
+
+    def test_estimateCommonDisp(self):
+        y = self.d.counts.to_numpy()
+        lib_size = np.arange(1001, 1005)
+
+        # reference: conditional log-likelihood computed group by group
+        def condLogLik(delta, y_split):
+            r = 1 / delta - 1
+            res = 0
+            for yg in y_split:
+                n = yg.shape[1]
+                t = yg.sum(axis=1)
+                res += np.sum(
+                    gammaln(yg + r).sum(axis=1)
+                    + gammaln(n * r)
+                    - gammaln(t + n * r)
+                    - n * gammaln(r)
+                )
+            return res
+
+        sel = y.sum(axis=1) > 5
+        disp = 0.01
+        for _ in range(2):
+            pseudo = equalizeLibSizes(
+                y, group=self.group, dispersion=disp, lib_size=lib_size
+            )["pseudo_counts"][sel]
+            y_split = splitIntoGroups(pseudo, group=self.group)
+            delta = minimize_scalar(
+                lambda d: -condLogLik(d, y_split),
+                bounds=(1e-4, 100 / 101),
+                method="bounded",
+                options={"xatol": 1e-6},
+            ).x
+            disp = delta / (1 - delta)
+
+        res = estimateCommonDisp(y, group=self.group, lib_size=lib_size)
+        self.assertAlmostEqual(res, disp, places=5)
+
+        d = self.d.estimateCommonDisp()
+        self.assertAlmostEqual(d.common_dispersion, res)
+        self.assertEqual(d.pseudo_counts.shape, y.shape)
+        self.assertTrue(np.allclose(d.AveLogCPM, d.aveLogCPM(dispersion=res)))
+
+        with self.assertRaisesRegex(
+            ValueError, expected_regex="No genes satisfy rowsum filter"
+        ):
+            estimateCommonDisp(y, group=self.group, rowsum_filter=1e6)
+
+        d = DGEList(counts=y, group=[1, 2, 3, 4])
+        with self.assertLogs("inmoose", level="WARNING"):
+            d.estimateCommonDisp()
+        self.assertTrue(np.isnan(d.common_dispersion))
+
+    def test_cutWithMinN(self):
+        x = np.random.default_rng(1).exponential(size=1000)
+        group, breaks = cutWithMinN(x, intervals=10, min_n=50)
+        self.assertTrue(np.all(np.bincount(group, minlength=10) >= 50))
+        self.assertTrue(np.array_equal(group, np.digitize(x, breaks[1:-1], right=True)))
+        group, breaks = cutWithMinN(x, intervals=10, min_n=100)
+        self.assertTrue(np.array_equal(np.bincount(group), np.full(10, 100)))
+        self.assertTrue(np.all(np.diff(group[np.argsort(x)]) >= 0))
+        with self.assertRaisesRegex(ValueError, "too few observations"):
+            cutWithMinN(x, intervals=10, min_n=101)
+
+    def test_estimateGLMTrendedDisp(self):
+        # with few genes, the binned trend is flat
+        y = self.d.counts
+        pos = y.sum(axis=1) > 0
+        common = dispCoxReid(y[pos], min_row_sum=0)
+        for method in ["bin.spline", "bin.loess"]:
+            res = estimateGLMTrendedDisp(y, method=method)
+            self.assertTrue(np.allclose(res, common))
+
+        # the power trend
+        res = dispCoxReidPowerTrend(y)
+        a, b = res["coefficients"]
+        self.assertTrue(
+            np.allclose(res["dispersion"], np.exp(a + b * res["AveLogCPM"]))
+        )
+        self.assertTrue(np.array_equal(estimateGLMTrendedDisp(y), res["dispersion"]))
+
+        # a dataset with a decreasing trend
+        rng = np.random.default_rng(0)
+        base = rng.gamma(0.5, 200, size=(2000, 1))
+        disp = 0.05 + 1 / np.sqrt(base + 1)
+        mu = base * np.ones((1, 8))
+        y = rng.negative_binomial(1 / disp, 1 / (1 + mu * disp))
+        design = np.column_stack((np.ones(8), np.repeat([0, 1], 4)))
+        expressed = base[:, 0] > 1
+        for method in ["spline", "loess"]:
+            res = dispBinTrend(y, design, min_n=100, method_trend=method)
+            self.assertEqual(
+                len(res["bin_dispersion"]), (y.sum(axis=1) > 0).sum() // 100
+            )
+            self.assertTrue(np.all(np.diff(res["bin_AveLogCPM"]) > 0))
+            self.assertGreater(
+                np.corrcoef(
+                    np.log(res["dispersion"][expressed]), np.log(disp[expressed, 0])
+                )[0, 1],
+                0.95,
+            )
+
+        d = DGEList(counts=y)
+        d.estimateGLMTrendedDisp(design, method="bin.loess", min_n=100)
+        self.assertTrue(
+            np.allclose(
+                d.trended_dispersion,
+                dispBinTrend(y, design, min_n=100, method_trend="loess")["dispersion"],
+            )
+        )
+        d.estimateGLMTagwiseDisp(design)
+        self.assertEqual(d.tagwise_dispersion.shape, (2000,))
+
+        with self.assertRaisesRegex(ValueError, "invalid method"):
+            dispBinTrend(y, design, method_bin="Pearson")
+        with self.assertRaisesRegex(ValueError, "invalid method"):
+            d.estimateGLMTrendedDisp(design, method="spline")
+
+    def test_locfitByCol(self):
+        x = np.random.default_rng(0).uniform(size=500)
+        y = np.column_stack((np.full(500, 3.0), 2 * x + 1))
+        res = locfitByCol(y, x, span=0.3, degree=0)
+        self.assertTrue(np.allclose(res[:, 0], 3))
+        self.assertTrue(np.corrcoef(res[:, 1], y[:, 1])[0, 1] > 0.99)
+        # local linear regression reproduces lines exactly
+        res = locfitByCol(y, x, span=0.3, degree=1, nvert=20)
+        self.assertTrue(np.allclose(res, y))
+
+    def test_estimateDisp(self):
+        design = np.column_stack((np.ones(4), [0, 0, 1, 1]))
+        offset = self.d.getOffset()
+        res = estimateDisp(self.d.counts, design, offset=offset)
+        # the common dispersion maximizes the interpolated sum of the APL
+        self.assertAlmostEqual(
+            res["common_dispersion"],
+            dispCoxReid(self.d.counts, design, offset=offset),
+            2,
+        )
+        self.assertEqual(res["span"], 1)
+        self.assertEqual(res["tagwise_dispersion"].shape, (22,))
+        # genes with small counts get the trended dispersion
+        self.assertTrue(
+            np.array_equal(res["tagwise_dispersion"][:2], res["trended_dispersion"][:2])
+        )
+
+        # the one-way layout defined by the groups is the default design
+        res2 = estimateDisp(self.d.counts, group=self.group, offset=offset)
+        for k in ["common_dispersion", "trended_dispersion", "tagwise_dispersion"]:
+            self.assertTrue(np.allclose(res[k], res2[k]))
+
+        # infinite shrinkage gives the trend
+        res = estimateDisp(self.d.counts, design, offset=offset, prior_df=1e8)
+        self.assertTrue(
+            np.array_equal(res["tagwise_dispersion"], res["trended_dispersion"])
+        )
+        res = estimateDisp(self.d.counts, design, trend_method="none", tagwise=False)
+        self.assertIsNone(res["trended_dispersion"])
+        self.assertNotIn("tagwise_dispersion", res)
+
+        d = self.d.estimateDisp(design)
+        self.assertTrue(np.array_equal(d.design, design))
+        self.assertAlmostEqual(d.prior_n, d.prior_df / 2)
+        self.assertTrue(np.allclose(d.AveLogCPM, d.aveLogCPM()))
+
+        with self.assertLogs("inmoose", level="WARNING"):
+            res = estimateDisp(self.d.counts, group=[1, 2, 3, 4])
+        self.assertTrue(np.isnan(res["common_dispersion"]))
+
     def test_estimateGLMTagwiseDisp(self):
         # first initialize d.common_dispersion
         self.d.estimateGLMCommonDisp()
@@ -2,8 +2,19 @@ import unittest
 
 import numpy as np
 import pandas as pd
+from scipy.stats import binom, chi2_contingency
+from statsmodels.stats.multitest import multipletests
 
-from inmoose.edgepy import DGEList, binomTest, exactTest, exactTestBetaApprox, topTags
+from inmoose.edgepy import (
+    DGEList,
+    binomTest,
+    exactTest,
+    exactTestBetaApprox,
+    exactTestDoubleTail,
+    topTags,
+)
+from inmoose.edgepy.DGEExact import DGEExact
+from inmoose.utils import dnbinom_mu as dnbinom
 from inmoose.utils import rnbinom
 
 
@@ -320,6 +331,28 @@ class Test(unittest.TestCase):
         )
         self.assertTrue(np.allclose(pref, pval, atol=1e-6, rtol=0))
 
+    def test_exactTestDoubleTail_deep(self):
+        # compare the compiled tail sums with a direct computation, including
+        # counts large enough for the probabilities to underflow
+        y1 = np.array([[300, 250], [2, 5], [3000, 20], [0, 1]])
+        y2 = np.array([[100, 150], [40, 35], [10, 5], [7, 6]])
+        disp = np.array([0.1, 2.0, 0.05, 0.5])
+        pval = exactTestDoubleTail(y1, y2, dispersion=disp)
+
+        ref = []
+        for g in range(y1.shape[0]):
+            s1, s = y1[g].sum(), y1[g].sum() + y2[g].sum()
+            x = np.arange(s + 1)
+            logp = (
+                dnbinom(x, size=2 / disp[g], mu=s / 2, log=True)
+                + dnbinom(s - x, size=2 / disp[g], mu=s / 2, log=True)
+                - dnbinom(s, size=4 / disp[g], mu=s, log=True)
+            )
+            tail = x <= s1 if s1 < s / 2 else x >= s1
+            ref.append(min(2 * np.exp(logp[tail]).sum(), 1))
+        self.assertTrue(np.allclose(pval, ref, atol=0, rtol=1e-8))
+        self.assertGreater(pval[2], 0)
+
     def test_binomTest(self):
         pval = binomTest(self.d.counts.iloc[:, 0], self.d.counts.iloc[:, 1])
         pref = [
@@ -348,6 +381,28 @@ class Test(unittest.TestCase):
         ]
         self.assertTrue(np.allclose(pval, pref, atol=1e-6, rtol=0))
 
+        # exact test for p != 0.5, including a tie between the two modes
+        y1 = np.array([4, 2, 0, 30, 11, 0])
+        y2 = np.array([9, 4, 12, 3, 40, 0])
+        p = 2 / 7
+        pval = binomTest(y1, y2, p=p)
+        ref = []
+        for x, n in zip(y1, y1 + y2):
+            d = binom.pmf(np.arange(n + 1), n, p)
+            ref.append(min(d[d <= d[x] * (1 + 1e-7)].sum(), 1))
+        self.assertTrue(np.allclose(pval, ref, atol=0, rtol=1e-10))
+        self.assertAlmostEqual(pval[0], 1)
+
+        # chi-square test for large counts
+        y1 = np.array([5000, 12000, 20000])
+        y2 = np.array([8000, 25000, 35000])
+        pval = binomTest(y1, y2, n1=1e6, n2=3e6)
+        ref = [
+            chi2_contingency([[a, 1e6 - a], [b, 3e6 - b]]).pvalue
+            for a, b in zip(y1, y2)
+        ]
+        self.assertTrue(np.allclose(pval, ref, atol=0, rtol=1e-10))
+
     def test_topTags(self):
         t = topTags(exactTest(self.d))
         self.assertTrue(
@@ -367,3 +422,34 @@ class Test(unittest.TestCase):
                 ],
             )
         )
+
+    def test_topTags_partial(self):
+        """test that topTags matches a full sort of the table"""
+        rng = np.random.default_rng(42)
+        res = DGEExact(
+            pd.DataFrame(
+                {
+                    "log2FoldChange": rng.normal(size=500).round(1),
+                    "lfcSE": np.ones(500),
+                    "pvalue": rng.uniform(size=500).round(2),
+                },
+                index=[f"gene{i}" for i in range(500)],
+            ),
+            comparison=["1", "2"],
+            genes=None,
+        )
+        padj = multipletests(res["pvalue"], method="fdr_bh")[1]
+        o = np.lexsort([-np.abs(res["log2FoldChange"]), res["pvalue"]])
+        t = topTags(res, n=30)
+        self.assertTrue(np.array_equal(t.table.index, res.index[o[:30]]))
+        self.assertTrue(np.allclose(t.table["FDR"], padj[o[:30]]))
+        self.assertNotIn("FDR", res.columns)
+
+        # the adjusted p-values are cached, and discarded with new p-values
+        self.assertIn("fdr_bh", res._adjusted_pvalues)
+        res["pvalue"] = res["pvalue"][::-1].values
+        t = topTags(res, n=10, sort_by="logFC", p_value=0.99)
+        padj = multipletests(res["pvalue"], method="fdr_bh")[1]
+        o = np.argsort(-np.abs(res["log2FoldChange"]), kind="stable")
+        o = o[padj[o] <= 0.99]
+        self.assertTrue(np.array_equal(t.table.index, res.index[o[:10]]))
@@ -2,6 +2,7 @@ import unittest
 
 import numpy as np
 import pandas as pd
+from patsy import dmatrix
 
 from inmoose.edgepy import DGEList, glmFit, glmLRT, glmQLFTest
 from inmoose.utils import rnbinom
@@ -535,3 +536,42 @@ class test_glm(unittest.TestCase):
             index=[f"gene{i}" for i in range(22)],
         )
         pd.testing.assert_frame_equal(table_ref, s, check_frame_type=False, rtol=1e-4)
+
+    def test_glmLRT_several(self):
+        """test several likelihood ratio tests from a single call"""
+        rng = np.random.default_rng(42)
+        y = rng.negative_binomial(5, 0.1, size=(100, 12))
+        y[:5, :4] = 0
+        group = np.repeat(["a", "b", "c"], 4)
+        x = rng.normal(size=12)
+        design = dmatrix("~group+x", pd.DataFrame({"group": group, "x": x}))
+        d = DGEList(counts=y, group=group)
+        d.common_dispersion = 0.1
+        fit = d.glmFit(design=design)
+
+        coefs = [[1], [2], ["x"], [1, 2]]
+        res = glmLRT(fit, coef=coefs)
+        self.assertEqual(len(res), len(coefs))
+        for c, r in zip(coefs, res):
+            ref = glmLRT(fit, coef=c)
+            self.assertEqual(r.comparison, ref.comparison)
+            self.assertTrue(np.allclose(r["stat"], ref["stat"], atol=1e-5))
+            self.assertTrue(np.allclose(r["pvalue"], ref["pvalue"], atol=1e-6))
+
+        contrasts = [np.array([0, 1, 0, 0]), np.array([[0, 1, 0, 0], [0, 0, 1, 0]]).T]
+        res2 = glmLRT(fit, contrast=contrasts)
+        self.assertEqual(res2[1].df_test[0], 2)
+        self.assertTrue(np.allclose(res2[0]["stat"], res[0]["stat"], atol=1e-5))
+        self.assertTrue(np.allclose(res2[1]["stat"], res[3]["stat"], atol=1e-5))
+        # a single contrast given as a plain list
+        res4 = glmLRT(fit, contrast=[0, 1, 0, 0])
+        self.assertEqual(res4.comparison, res2[0].comparison)
+        self.assertTrue(np.allclose(res4["stat"], res2[0]["stat"]))
+
+        d.trended_dispersion = np.full(100, 0.1)
+        qlfit = d.glmQLFit(design=design)
+        res3 = glmQLFTest(qlfit, coef=coefs)
+        for c, r in zip(coefs, res3):
+            ref = glmQLFTest(qlfit, coef=c)
+            self.assertTrue(np.allclose(r["stat"], ref["stat"], atol=1e-5))
+            self.assertTrue(np.allclose(r["pvalue"], ref["pvalue"], atol=1e-6))
@@ -45,3 +45,24 @@ class test_APL(unittest.TestCase):
             -13.04470154,
         ]
         self.assertTrue(np.allclose(apl, ref, atol=0, rtol=1e-9))
+
+    def test_compute_apl(self):
+        from inmoose.edgepy.edgepy_cpp import compute_apl
+
+        y = np.asarray(self.d.counts)[2:]
+        design = np.array([[1, 0], [1, 0], [1, 1], [1, 1]], dtype=float)
+        mu = np.broadcast_to(y.mean(axis=1, keepdims=True), y.shape).copy()
+        disp = np.full(y.shape, 0.05)
+        weights = np.ones(y.shape)
+
+        apl1 = compute_apl(y, mu, disp, weights, True, design, nthreads=1)
+        apl3 = compute_apl(y, mu, disp, weights, True, design, nthreads=3)
+        self.assertTrue(np.array_equal(apl1, apl3))
+        apl = compute_apl(y.astype(float), mu, disp, weights, True, design)
+        self.assertTrue(np.allclose(apl, apl1, atol=0, rtol=1e-12))
+
+        # Cox-Reid adjustment is half the log-determinant of XtWX
+        apl0 = compute_apl(y, mu, disp, weights, False, design)
+        w = mu / (1 + disp * mu)
+        logdet = np.linalg.slogdet(design.T @ (design * w[:, :, None]))[1]
+        self.assertTrue(np.allclose(apl0 - apl1, 0.5 * logdet, atol=0, rtol=1e-10))
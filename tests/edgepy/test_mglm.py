@@ -175,6 +175,21 @@ class test_mglm(unittest.TestCase):
         )
         self.assertTrue(np.allclose(coef, coef_ref, atol=1e-6, rtol=0, equal_nan=True))
 
+        # multi-group design, with a group of zero counts
+        design2 = np.array([[1, 0], [1, 0], [1, 1], [1, 1]])
+        res1 = mglmLevenberg(self.y, design2, dispersion=0.05, nthreads=1)
+        res3 = mglmLevenberg(self.y, design2, dispersion=0.05, nthreads=3)
+        for r1, r3 in zip(res1, res3):
+            self.assertTrue(np.array_equal(r1, r3, equal_nan=True))
+        (coef, fit, dev, it, fail) = res1
+        self.assertTrue(np.isnan(coef[0]).all())
+        self.assertTrue(np.allclose(fit[1], [0, 0, 2, 2], atol=1e-6, rtol=0))
+        self.assertGreater(coef[1, 1], 10)
+        for j in [slice(0, 2), slice(2, 4)]:
+            self.assertTrue(
+                np.allclose(fit[2:, j].sum(axis=1), self.y[2:, j].sum(axis=1))
+            )
+
         with self.assertRaisesRegex(ValueError, expected_regex="no data"):
             mglmLevenberg(np.ones(shape=(0, 1)), None)
         with self.assertRaisesRegex(
@@ -288,3 +303,35 @@ class test_mglmOneWay(unittest.TestCase):
         )
         (coef, fit) = mglmOneWay(self.y, design=design)
         self.assertTrue(np.allclose(coef, coef_ref, atol=1e-6, rtol=0))
+
+    def test_mglmOneWay_groups(self):
+        """test that the one-way fit matches group-wise single group fits"""
+        rng = np.random.default_rng(42)
+        y = rng.negative_binomial(5, 0.2, size=(50, 9))
+        y[0, :] = 0
+        y[1, :3] = 0
+        group = np.array([0, 1, 2, 0, 1, 2, 0, 1, 2])
+        offset = np.log(y.sum(axis=0) + 1)
+        dispersion = rng.uniform(0.01, 0.2, size=50)
+
+        ref = np.zeros((50, 3))
+        for g in range(3):
+            j = group == g
+            ref[:, g] = mglmOneGroup(
+                y[:, j], dispersion=dispersion, offset=offset[j], maxit=50, tol=1e-10
+            )
+        ref = np.where(ref > -1e8, ref, -1e8)
+
+        for labels in [group, np.array(["a", "b", "c"])[group]]:
+            for nthreads in [1, 3]:
+                (coef, fit) = mglmOneWay(
+                    y,
+                    group=labels,
+                    dispersion=dispersion,
+                    offset=offset,
+                    nthreads=nthreads,
+                )
+                self.assertTrue(np.allclose(coef, ref, atol=1e-6, rtol=0))
+                self.assertTrue(
+                    np.allclose(fit, np.exp(coef[:, group] + offset), rtol=1e-10)
+                )
@@ -0,0 +1,108 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from patsy import dmatrix
+
+from inmoose.edgepy import (
+    DGEList,
+    SharedGeneArrays,
+    adjustedProfileLik,
+    dispCoxReid,
+    estimateDisp,
+    glmFit,
+    glmQLFit,
+    mapGeneBlocks,
+    shutdownWorkers,
+)
+from inmoose.edgepy.makeCompressedMatrix import makeCompressedMatrix
+
+
+def _rowSums(x, y, scale):
+    return (np.asarray(x).sum(axis=1) * scale, None if y is None else y + 0)
+
+
+class Test(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(42)
+        cls.y = rng.negative_binomial(5, 0.2, size=(300, 6))
+        cls.obs = pd.DataFrame({"g": ["a", "a", "b", "b", "c", "c"], "x": range(6)})
+
+    @classmethod
+    def tearDownClass(cls):
+        shutdownWorkers()
+
+    def test_mapGeneBlocks(self):
+        x = makeCompressedMatrix(np.arange(6.0), (300, 6))
+        self.assertTrue(x.repeat_row)
+        res = mapGeneBlocks(_rowSums, {"x": x, "y": None}, n_jobs=2, scale=2)
+        self.assertTrue(np.array_equal(res[0], np.full(300, 30.0)))
+        self.assertIsNone(res[1])
+        res = mapGeneBlocks(
+            _rowSums, {"x": self.y, "y": self.y[:, 0]}, n_jobs=2, scale=1
+        )
+        self.assertTrue(np.array_equal(res[0], self.y.sum(axis=1)))
+        self.assertTrue(np.array_equal(res[1], self.y[:, 0]))
+
+        with self.assertRaisesRegex(ValueError, "n_jobs must be"):
+            mapGeneBlocks(_rowSums, {"x": x, "y": None}, n_jobs=0, scale=1)
+
+    def test_SharedGeneArrays(self):
+        with SharedGeneArrays({"x": self.y}, n_jobs=2) as shared:
+            nsegments = len(shared._segments)
+            for i in range(3):
+                res = shared.map(_rowSums, {"y": self.y[:, i]}, scale=i)
+                self.assertTrue(np.array_equal(res[0], self.y.sum(axis=1) * i))
+                self.assertTrue(np.array_equal(res[1], self.y[:, i]))
+            # the arrays are shared once, the per-call arrays are released
+            self.assertEqual(len(shared._segments), nsegments)
+        self.assertEqual(shared._segments, [])
+
+    def test_glmFit(self):
+        for formula in ["~g", "~x"]:
+            design = dmatrix(formula, self.obs)
+            dispersion = np.linspace(0.05, 0.2, self.y.shape[0])
+            f1 = glmFit(self.y, design, dispersion=dispersion, weights=np.ones(6))
+            f2 = glmFit(
+                self.y, design, dispersion=dispersion, weights=np.ones(6), n_jobs=2
+            )
+            self.assertEqual(f1.method, f2.method)
+            for attr in [
+                "coefficients",
+                "unshrunk_coefficients",
+                "fitted_values",
+                "deviance",
+                "coeff_SE",
+            ]:
+                self.assertTrue(np.allclose(getattr(f1, attr), getattr(f2, attr)))
+
+        d = DGEList(self.y, group=self.obs["g"])
+        d.common_dispersion = 0.1
+        f1 = d.glmQLFit()
+        f2 = d.glmQLFit(n_jobs=2)
+        self.assertTrue(np.allclose(f1.var_post, f2.var_post))
+
+        f1 = glmQLFit(self.y, dmatrix("~x", self.obs), dispersion=0.1)
+        f2 = glmQLFit(self.y, dmatrix("~x", self.obs), dispersion=0.1, n_jobs=2)
+        self.assertTrue(np.allclose(f1.coefficients, f2.coefficients))
+
+    def test_dispersion(self):
+        design = np.asarray(dmatrix("~g", self.obs))
+        offset = np.log(self.y.sum(axis=0))
+        apl1, coef1 = adjustedProfileLik(0.1, self.y, design, offset, get_coef=True)
+        apl2, coef2 = adjustedProfileLik(
+            0.1, self.y, design, offset, get_coef=True, n_jobs=2
+        )
+        self.assertTrue(np.allclose(apl1, apl2))
+        self.assertTrue(np.allclose(coef1, coef2))
+
+        d1 = estimateDisp(self.y, design=design)
+        d2 = estimateDisp(self.y, design=design, n_jobs=2)
+        for k in ["trended_dispersion", "tagwise_dispersion"]:
+            self.assertTrue(np.allclose(d1[k], d2[k]))
+        self.assertAlmostEqual(d1["common_dispersion"], d2["common_dispersion"])
+
+        c1 = dispCoxReid(self.y, design, offset=offset)
+        c2 = dispCoxReid(self.y, design, offset=offset, n_jobs=2)
+        self.assertAlmostEqual(c1, c2)
@@ -2,7 +2,7 @@ import unittest
 
 import numpy as np
 
-from inmoose.edgepy import DGEList
+from inmoose.edgepy import DGEList, addPriorCount, mglmLevenberg, predFC
 from inmoose.utils import rnbinom
 
 
@@ -45,3 +45,60 @@ class test_predFC(unittest.TestCase):
             ]
         )
         self.assertTrue(np.allclose(res, ref, atol=1e-6, rtol=0))
+
+    def test_predFC_prior_counts(self):
+        """test predFC with several prior counts"""
+        prior_counts = [0.125, 0.5, 2, 5]
+        for design in [
+            np.array([[1, 0], [1, 0], [0, 1], [0, 2]]),
+            np.array([[1, 0], [1, 0], [1, 1], [1, 1]]),
+        ]:
+            res = predFC(
+                self.d.counts, design, prior_counts=prior_counts, dispersion=0.1
+            )
+            self.assertEqual(res.shape, (len(prior_counts), 22, 2))
+            # the results match tightly converged independent fits...
+            for i, pc in enumerate(prior_counts):
+                (y, offset) = addPriorCount(self.d.counts, prior_count=pc)
+                ref = mglmLevenberg(
+                    y, design, dispersion=0.1, offset=offset, maxit=250, tol=1e-12
+                )[0] / np.log(2)
+                self.assertTrue(np.allclose(res[i], ref, atol=1e-5, rtol=0))
+            # ... whatever the order of the prior counts
+            rev = predFC(
+                self.d.counts, design, prior_counts=prior_counts[::-1], dispersion=0.1
+            )
+            self.assertTrue(np.allclose(rev[::-1], res, atol=1e-5, rtol=0))
+
+        # the inputs are checked as in glmFit
+        for kwargs, msg in [
+            ({"design": np.ones((4, 2))}, "not full rank"),
+            ({"dispersion": None}, "No dispersion"),
+            ({"dispersion": np.full(3, 0.1)}, "Dimensions of dispersion"),
+            ({"offset": np.zeros(3)}, "Dimensions of offset"),
+        ]:
+            args = {"design": design, "dispersion": 0.1, **kwargs}
+            with self.assertRaisesRegex(ValueError, msg):
+                predFC(self.d.counts, prior_counts=prior_counts, **args)
+        res = predFC(
+            self.d.counts,
+            design,
+            prior_counts=prior_counts,
+            dispersion=np.full(22, 0.1),
+        )
+        ref = predFC(self.d.counts, design, prior_counts=prior_counts, dispersion=0.1)
+        self.assertTrue(np.allclose(res, ref, atol=1e-10, rtol=0))
+
+        # a vector prior count is still gene-specific
+        design = np.array([[1, 0], [1, 0], [1, 1], [1, 1]])
+        res = predFC(
+            self.d.counts, design, prior_count=np.full(22, 0.5), dispersion=0.1
+        )
+        ref = predFC(self.d.counts, design, prior_count=0.5, dispersion=0.1)
+        self.assertEqual(res.shape, (22, 2))
+        self.assertTrue(np.allclose(res, ref, atol=1e-10, rtol=0))
+        pc = np.linspace(0.1, 5, 22)
+        res = predFC(self.d.counts, design, prior_count=pc, dispersion=0.1)
+        for i in [0, 10, 21]:
+            ref = predFC(self.d.counts, design, prior_count=pc[i], dispersion=0.1)
+            self.assertTrue(np.allclose(res[i], ref[i], atol=1e-6, rtol=0))
@@ -41,3 +41,51 @@ class Test(unittest.TestCase):
             x, input_mean=input_mean, output_mean=output_mean, dispersion=dispersion
         )
         self.assertTrue(np.allclose(res, ref))
+
+    def test_q2qnbinom_matrix(self):
+        rng = np.random.default_rng(42)
+        x = rng.poisson(10, size=(50, 6)).astype(float)
+        input_mean = rng.uniform(5, 15, size=(50, 6))
+        output_mean = rng.uniform(5, 15, size=(50, 1))
+        dispersion = rng.uniform(0, 0.5, size=(50, 1))
+
+        ref = np.array(
+            [
+                [
+                    q2qnbinom(
+                        x[i, j],
+                        input_mean=input_mean[i, j],
+                        output_mean=output_mean[i, 0],
+                        dispersion=dispersion[i, 0],
+                    )
+                    for j in range(x.shape[1])
+                ]
+                for i in range(x.shape[0])
+            ]
+        )
+        for nthreads in [1, 3]:
+            res = q2qnbinom(
+                x,
+                input_mean=input_mean,
+                output_mean=output_mean,
+                dispersion=dispersion,
+                nthreads=nthreads,
+            )
+            self.assertEqual(res.shape, x.shape)
+            self.assertTrue(np.allclose(res, ref))
+
+        # non-contiguous inputs
+        res = q2qnbinom(
+            x.T, input_mean=input_mean.T, output_mean=output_mean.T, dispersion=0.1
+        )
+        self.assertTrue(
+            np.allclose(
+                res.T,
+                q2qnbinom(
+                    x, input_mean=input_mean, output_mean=output_mean, dispersion=0.1
+                ),
+            )
+        )
+
+        with self.assertRaisesRegex(ValueError, "dispersion must be non-negative"):
+            q2qnbinom(x, input_mean=input_mean, output_mean=output_mean, dispersion=-1)
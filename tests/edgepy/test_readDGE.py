@@ -0,0 +1,136 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+import inmoose.data.pasilla
+from inmoose.edgepy import readCounts, readDGE
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.dirname(inmoose.data.pasilla.__file__)
+        self.files = [
+            "treated1fb.txt",
+            "treated2fb.txt",
+            "untreated1fb.txt",
+            "untreated2fb.txt",
+        ]
+
+    def test_readDGE_pasilla(self):
+        """test readDGE against a direct read of the HTSeq files"""
+        y = readDGE(
+            self.files,
+            path=self.path,
+            group=["T", "T", "U", "U"],
+            meta_tags="^_",
+            nthreads=2,
+        )
+        ref = pd.concat(
+            [
+                pd.read_csv(
+                    os.path.join(self.path, f), sep="\t", header=None, index_col=0
+                ).iloc[:, 0]
+                for f in self.files
+            ],
+            axis=1,
+        )
+        ref = ref[~ref.index.str.startswith("_")]
+        self.assertEqual(list(y.counts.index), list(ref.index))
+        self.assertTrue(np.array_equal(y.counts.values, ref.values))
+        self.assertEqual(
+            list(y.samples.index),
+            ["treated1fb", "treated2fb", "untreated1fb", "untreated2fb"],
+        )
+        self.assertEqual(list(y.samples["files"]), self.files)
+        self.assertEqual(list(y.samples["group"]), ["T", "T", "U", "U"])
+        self.assertTrue(np.array_equal(y.samples["lib_size"], ref.sum(axis=0)))
+
+    def test_readCounts_merge(self):
+        """test the merge of files with different genes"""
+        with tempfile.TemporaryDirectory() as d:
+            files = {
+                "s1.tsv": [("a", 1), ("b", 0), ("c", 3), ("__no_feature", 9)],
+                "s2.tsv": [("c", 4), ("d", 5), ("a", 0), ("__no_feature", 7)],
+                "s3.tsv": [("c", 4), ("d", 5), ("a", 0), ("__no_feature", 7)],
+            }
+            for f, lines in files.items():
+                with open(os.path.join(d, f), "w") as fh:
+                    fh.write("gene\tlength\tcount\n")
+                    for tag, n in lines:
+                        fh.write(f"{tag}\t100\t{n}\n")
+            ref = np.array([[1, 0, 0], [0, 0, 0], [3, 4, 4], [0, 5, 5]])
+
+            samples = pd.DataFrame(
+                {"files": list(files), "group": [1, 2, 2]}, index=["x", "y", "z"]
+            )
+            (counts, genes, sam) = readCounts(
+                samples, path=d, columns=(0, 2), header=True
+            )
+            self.assertEqual(list(genes), ["a", "b", "c", "d"])
+            self.assertTrue(np.array_equal(counts, ref))
+            self.assertEqual(list(sam.index), ["x", "y", "z"])
+            self.assertEqual(list(sam["group"]), [1, 2, 2])
+            self.assertEqual(list(sam["lib_size"]), [4, 9, 9])
+
+            (counts, genes, _) = readCounts(
+                samples, path=d, columns=(0, 2), header=True, sparse=True
+            )
+            self.assertTrue(sp.issparse(counts))
+            self.assertEqual(counts.nnz, 6)
+            self.assertTrue(np.array_equal(counts.toarray(), ref))
+
+            mmap_file = os.path.join(d, "counts.npy")
+            y = readDGE(
+                samples, path=d, columns=(0, 2), header=True, mmap_file=mmap_file
+            )
+            self.assertTrue(np.array_equal(y.counts.values, ref))
+            self.assertTrue(np.array_equal(np.load(mmap_file), ref))
+            # the memory-mapped counts are not copied into memory
+            m = np.load(mmap_file, mmap_mode="r+")
+            m[1, 1] = 7
+            m.flush()
+            self.assertEqual(y.counts.iloc[1, 1], 7)
+            self.assertEqual(list(y.counts.index), ["a", "b", "c", "d"])
+            self.assertEqual(list(y.counts.columns), ["x", "y", "z"])
+            self.assertEqual(list(y.samples.index), ["x", "y", "z"])
+            self.assertEqual(list(y.samples["lib_size"]), [4, 9, 9])
+
+            with self.assertRaisesRegex(ValueError, "cannot be memory-mapped"):
+                readCounts(samples, path=d, sparse=True, mmap_file=mmap_file)
+
+            # non-integer counts are kept as floats, in all the storage modes
+            with open(os.path.join(d, "s5.tsv"), "w") as fh:
+                fh.write("gene\tlength\tcount\nd\t1\t2.5\ne\t1\t1.0\n")
+            with open(os.path.join(d, "s6.tsv"), "w") as fh:
+                fh.write("gene\tlength\tcount\na\t1\t2.0\ne\t1\t1.0\n")
+            ref = np.array([[1, 0, 2], [0, 0, 0], [3, 0, 0], [0, 2.5, 0], [0, 1, 1]])
+            for kwargs in [{}, {"sparse": True}, {"mmap_file": mmap_file}]:
+                (counts, genes, sam) = readCounts(
+                    ["s1.tsv", "s5.tsv", "s6.tsv"],
+                    path=d,
+                    columns=(0, 2),
+                    header=True,
+                    **kwargs,
+                )
+                if sp.issparse(counts):
+                    counts = counts.toarray()
+                self.assertEqual(counts.dtype, np.float64)
+                self.assertEqual(list(genes), ["a", "b", "c", "d", "e"])
+                self.assertTrue(np.array_equal(counts, ref))
+                self.assertEqual(list(sam["lib_size"]), [4, 3.5, 3])
+            self.assertFalse(os.path.exists(mmap_file + ".tmp"))
+            self.assertTrue(np.array_equal(np.load(mmap_file), ref))
+            # integer-valued counts are kept as integers
+            (counts, _, _) = readCounts(["s6.tsv"], path=d, columns=(0, 2), header=True)
+            self.assertEqual(counts.dtype, np.int64)
+            with self.assertRaisesRegex(ValueError, "non-integer counts"):
+                readDGE(["s5.tsv"], path=d, columns=(0, 2), header=True)
+
+            with open(os.path.join(d, "s4.tsv"), "w") as fh:
+                fh.write("gene\tlength\tcount\na\t1\t1\nb\t1\t2\na\t1\t3\n")
+            with self.assertRaisesRegex(ValueError, "repeated tags"):
+                readCounts(["s1.tsv", "s4.tsv"], path=d, columns=(0, 2), header=True)
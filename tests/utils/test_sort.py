@@ -0,0 +1,18 @@
+import unittest
+
+import numpy as np
+
+from inmoose.utils import top_order
+
+
+class Test(unittest.TestCase):
+    def test_top_order(self):
+        rng = np.random.default_rng(42)
+        x = rng.integers(0, 20, size=1000).astype(float)
+        y = rng.normal(size=1000)
+        x[rng.integers(0, 1000, size=50)] = np.nan
+        for n in [0, 1, 10, 100, 999, 1000, 2000, np.inf]:
+            ref = np.lexsort([x])[: int(min(n, 1000))]
+            self.assertTrue(np.array_equal(top_order([x], n), ref))
+            ref = np.lexsort([y, x])[: int(min(n, 1000))]
+            self.assertTrue(np.array_equal(top_order([y, x], n), ref))